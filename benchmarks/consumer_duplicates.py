@@ -0,0 +1,141 @@
+"""Compare the cost of new and redelivered messages to a streaming consumer.
+
+Runs in process, against a broker stand-in that runs ack callbacks at
+once::
+
+    python benchmarks/consumer_duplicates.py --messages 20000
+
+Delivers TimecardCreated messages, each with its own message_id, to a
+StreamingConsumer whose handler takes handler-cost seconds per batch, as a
+stand-in for a bulk write. Then delivers the same messages again. Reports
+the time the I/O thread spends per delivery and the messages handled per
+second for both runs; the redeliveries are recognized in memory and acked
+without being decoded or handled.
+"""
+import argparse
+import json
+import threading
+import time
+from datetime import datetime, timedelta
+
+from timecardsystem.common.dtos import event_codecs
+from timecardsystem.timecardservice.adapters.processed_messages import \
+    ProcessedMessages
+from timecardsystem.timecardservice.domain import events
+from timecardsystem.timecardservice.entrypoints import \
+    rabbitmq_event_consumer
+
+
+def _body(number: int) -> bytes:
+    week_ending_date = datetime(2022, 8, 12)
+    _, fields = event_codecs.REGISTRY.encode(events.TimecardCreated(
+        f"aaa6eaa1-3197-4b3e-9b52-{number:012d}",
+        "5dbf600d-305a-4f77-b2b8-51401f443597",
+        week_ending_date,
+        {
+            week_ending_date - timedelta(days=day): {
+                "work_hours": "8.0",
+                "sick_hours": "0.0",
+                "vacation_hours": "0.0",
+            }
+            for day in range(5)
+        }
+    ))
+    return json.dumps(fields).encode("utf-8")
+
+
+class Delivery:
+
+    def __init__(self, delivery_tag):
+        self.delivery_tag = delivery_tag
+
+
+class Properties:
+    content_type = "TimecardCreated"
+    content_encoding = None
+    headers = None
+
+    def __init__(self, message_id):
+        self.message_id = message_id
+
+
+class BrokerStandIn:
+    # the channel and I/O loop of a consumer; acks free a prefetch slot
+
+    def __init__(self, prefetch_count: int) -> None:
+        self.prefetch_count = prefetch_count
+        self.credit = threading.Semaphore(prefetch_count)
+        self.ioloop = self
+
+    def add_callback_threadsafe(self, callback):
+        callback()
+
+    def basic_ack(self, delivery_tag, multiple=False):
+        self.credit.release()
+
+    def basic_nack(self, delivery_tag, requeue=True):
+        self.credit.release()
+
+    def wait_for_acks(self):
+        for _ in range(self.prefetch_count):
+            self.credit.acquire()
+        for _ in range(self.prefetch_count):
+            self.credit.release()
+
+
+def run(consumer, broker, messages) -> dict:
+    delivering = 0.0
+    started = time.perf_counter()
+    for number, (properties, body) in enumerate(messages):
+        broker.credit.acquire()
+        delivery_started = time.perf_counter()
+        consumer.handle_delivery(
+            broker, Delivery(number), properties, body
+        )
+        delivering += time.perf_counter() - delivery_started
+    broker.wait_for_acks()
+    elapsed = time.perf_counter() - started
+    return {
+        "microseconds_per_delivery": delivering / len(messages) * 1e6,
+        "messages_per_second": len(messages) / elapsed,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--messages", type=int, default=20000)
+    parser.add_argument("--prefetch", type=int, default=100)
+    parser.add_argument("--batch-size", type=int, default=50)
+    parser.add_argument("--handler-cost", type=float, default=0.002)
+    args = parser.parse_args(argv)
+
+    broker = BrokerStandIn(args.prefetch)
+    consumer = rabbitmq_event_consumer.StreamingConsumer(
+        lambda received: time.sleep(args.handler_cost),
+        prefetch_count=args.prefetch,
+        ack_batch_size=1,
+        max_batch_size=args.batch_size,
+        max_batch_wait=0.005,
+        processed_messages=ProcessedMessages(
+            args.messages, persistent=False
+        )
+    )
+    consumer.channel = broker
+    consumer.connection = broker
+    consumer._start_worker()
+    messages = [
+        (Properties(f"message-{number}"), _body(number))
+        for number in range(args.messages)
+    ]
+
+    print(f"{'deliveries':>12}{'us/delivery':>13}{'messages/s':>12}")
+    for label in ("new", "redelivered"):
+        result = run(consumer, broker, messages)
+        print(f"{label:>12}{result['microseconds_per_delivery']:>13.1f}"
+              f"{result['messages_per_second']:>12.1f}")
+    consumer._queue.put(rabbitmq_event_consumer._STOP)
+    consumer._worker.join()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+"""Compare the memory held by the list-collecting and streaming consumers.
+
+Runs in process, against a broker stand-in that honours the prefetch
+limit::
+
+    python benchmarks/consumer_memory.py --messages 20000
+
+Delivers TimecardCreated messages to MessageConsumerDTO.receive_message,
+which keeps every decoded event, and to a StreamingConsumer, which hands
+the events to a handler and acks them. Reports the Python heap in use at
+every tenth of the run: it grows with the message count for the first and
+stays flat for the second.
+"""
+import argparse
+import json
+import threading
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+from timecardsystem.common.dtos import event_codecs
+from timecardsystem.common.dtos.message_dto import MessageConsumerDTO
+from timecardsystem.timecardservice.domain import events
+from timecardsystem.timecardservice.entrypoints import \
+    rabbitmq_event_consumer
+
+
+def _body(number: int) -> bytes:
+    week_ending_date = datetime(2022, 8, 12)
+    _, fields = event_codecs.REGISTRY.encode(events.TimecardCreated(
+        f"aaa6eaa1-3197-4b3e-9b52-{number:012d}",
+        "5dbf600d-305a-4f77-b2b8-51401f443597",
+        week_ending_date,
+        {
+            week_ending_date - timedelta(days=day): {
+                "work_hours": "8.0",
+                "sick_hours": "0.0",
+                "vacation_hours": "0.0",
+            }
+            for day in range(5)
+        }
+    ))
+    return json.dumps(fields).encode("utf-8")
+
+
+class Delivery:
+
+    def __init__(self, delivery_tag):
+        self.delivery_tag = delivery_tag
+
+
+class Properties:
+    content_type = "TimecardCreated"
+    content_encoding = None
+    headers = None
+    message_id = None
+
+
+class FakeBroker:
+    # stands in for the channel and its I/O loop: delivers a message only
+    # while fewer than prefetch_count are unacked, and runs ack callbacks
+    # at once
+
+    def __init__(self, prefetch_count: int) -> None:
+        self.prefetch_count = prefetch_count
+        self.unacked = 0
+        self.condition = threading.Condition()
+        self.ioloop = self
+
+    def add_callback_threadsafe(self, callback):
+        callback()
+
+    def basic_ack(self, delivery_tag):
+        with self.condition:
+            self.unacked -= 1
+            self.condition.notify()
+
+    basic_nack = basic_ack
+
+    def wait_for_credit(self):
+        with self.condition:
+            while self.unacked >= self.prefetch_count:
+                self.condition.wait()
+            self.unacked += 1
+
+
+def _sample(number: int, messages: int, samples: list):
+    if (number + 1) % max(messages // 10, 1) == 0:
+        samples.append(tracemalloc.get_traced_memory()[0])
+
+
+def run_collecting(messages: int) -> list:
+    dto = MessageConsumerDTO()
+    dto.set_deserializer(json.loads)
+    samples = []
+    tracemalloc.start()
+    for number in range(messages):
+        dto.receive_message(None, Delivery(number), Properties, _body(number))
+        _sample(number, messages, samples)
+    tracemalloc.stop()
+    return samples
+
+
+def run_streaming(messages: int, prefetch_count: int) -> list:
+    broker = FakeBroker(prefetch_count)
+    consumer = rabbitmq_event_consumer.StreamingConsumer(
+        lambda received: None,
+        prefetch_count=prefetch_count,
+        ack_batch_size=1
+    )
+    consumer.channel = broker
+    consumer.connection = broker
+    samples = []
+    tracemalloc.start()
+    consumer._start_worker()
+    for number in range(messages):
+        broker.wait_for_credit()
+        consumer.handle_delivery(
+            broker, Delivery(number), Properties, _body(number)
+        )
+        _sample(number, messages, samples)
+    consumer._queue.put(rabbitmq_event_consumer._STOP)
+    consumer._worker.join()
+    tracemalloc.stop()
+    return samples
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--messages", type=int, default=20000)
+    parser.add_argument("--prefetch", type=int, default=100)
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    collecting = run_collecting(args.messages)
+    streaming = run_streaming(args.messages, args.prefetch)
+    print(f"{'messages':>10}{'collecting MiB':>16}{'streaming MiB':>16}")
+    for index, (held, streamed) in enumerate(zip(collecting, streaming)):
+        count = (index + 1) * max(args.messages // 10, 1)
+        print(f"{count:>10}{held / 2 ** 20:>16.1f}"
+              f"{streamed / 2 ** 20:>16.1f}")
+    print(f"finished in {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+"""Compare the requeue and retry failure policies with poison messages.
+
+Runs in process, against a broker stand-in::
+
+    python benchmarks/consumer_poison.py --messages 5000 --poison 5
+
+Delivers EmployeeCreated messages, a few of which always fail, to a
+StreamingConsumer whose handler takes handler-cost seconds per batch. A
+requeued message goes back to the head of the queue and is delivered again
+at once, as RabbitMQ does; a retried one is republished to a retry queue
+whose delay outlasts the run. Reports, for each policy, the seconds taken
+to handle every good message, the good messages handled per second and
+the deliveries spent on poison messages.
+"""
+import argparse
+import json
+import logging
+import threading
+import time
+from collections import deque
+
+from timecardsystem.timecardservice.entrypoints import \
+    rabbitmq_event_consumer
+
+
+class Delivery:
+
+    def __init__(self, delivery_tag):
+        self.delivery_tag = delivery_tag
+
+
+class Properties:
+    content_type = "EmployeeCreated"
+    content_encoding = None
+    headers = None
+
+    def __init__(self, message_id):
+        self.message_id = message_id
+
+
+def _body(employee_id: str) -> bytes:
+    return json.dumps({
+        "employee_id": employee_id,
+        "name": "Azure Diamond",
+    }).encode("utf-8")
+
+
+class BrokerStandIn:
+    # the channel and I/O loop of a consumer; callbacks run at once, under
+    # the lock guarding the queue
+
+    def __init__(self, messages, prefetch_count: int) -> None:
+        self.ready = deque(messages)
+        self.prefetch_count = prefetch_count
+        self.unacked = {}
+        self.good_messages = sum(
+            1 for message in messages if not message[0].startswith("poison")
+        )
+        self.good_acked = 0
+        self.poison_deliveries = 0
+        self.retried = 0
+        self.condition = threading.Condition()
+        self.ioloop = self
+
+    def add_callback_threadsafe(self, callback):
+        with self.condition:
+            callback()
+            self.condition.notify_all()
+
+    def basic_ack(self, delivery_tag, multiple=False):
+        message_id, _ = self.unacked.pop(delivery_tag)
+        if not message_id.startswith("poison"):
+            self.good_acked += 1
+
+    def basic_nack(self, delivery_tag, requeue=True):
+        message = self.unacked.pop(delivery_tag)
+        if requeue:
+            self.ready.appendleft(message)
+
+    def basic_publish(self, exchange, routing_key, body, properties):
+        self.retried += 1
+
+    def run(self, consumer) -> float:
+        started = time.perf_counter()
+        delivery_tag = 0
+        while True:
+            with self.condition:
+                while self.good_acked < self.good_messages and (
+                    not self.ready
+                    or len(self.unacked) >= self.prefetch_count
+                ):
+                    self.condition.wait()
+                if self.good_acked == self.good_messages:
+                    return time.perf_counter() - started
+                delivery_tag += 1
+                message = self.ready.popleft()
+                self.unacked[delivery_tag] = message
+                if message[0].startswith("poison"):
+                    self.poison_deliveries += 1
+            message_id, body = message
+            consumer.handle_delivery(
+                self, Delivery(delivery_tag), Properties(message_id), body
+            )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--messages", type=int, default=5000)
+    parser.add_argument("--poison", type=int, default=5)
+    parser.add_argument("--prefetch", type=int, default=100)
+    parser.add_argument("--batch-size", type=int, default=10)
+    parser.add_argument("--handler-cost", type=float, default=0.0005)
+    args = parser.parse_args(argv)
+    # every failure is logged with its traceback
+    logging.getLogger(rabbitmq_event_consumer.__name__).disabled = True
+
+    def handler(received):
+        time.sleep(args.handler_cost)
+        if any(event.employee_id.value.startswith("poison")
+               for event in received):
+            raise RuntimeError("poison message")
+
+    spacing = max(args.messages // max(args.poison, 1), 1)
+    messages = []
+    for number in range(args.messages):
+        employee_id = f"poison-{number}" if number % spacing == 0 \
+            and number // spacing < args.poison else f"employee-{number}"
+        messages.append((employee_id, _body(employee_id)))
+
+    print(f"{'policy':>8}{'seconds':>9}{'messages/s':>12}"
+          f"{'poison deliveries':>19}")
+    for policy in ("requeue", "retry"):
+        broker = BrokerStandIn(messages, args.prefetch)
+        consumer = rabbitmq_event_consumer.StreamingConsumer(
+            handler,
+            prefetch_count=args.prefetch,
+            ack_batch_size=1,
+            failure_policy=policy,
+            max_batch_size=args.batch_size,
+            max_batch_wait=0.001
+        )
+        consumer.channel = broker
+        consumer.connection = broker
+        consumer._start_worker()
+        elapsed = broker.run(consumer)
+        consumer._queue.put(rabbitmq_event_consumer._STOP)
+        consumer._worker.join()
+        print(f"{policy:>8}{elapsed:>9.2f}"
+              f"{broker.good_messages / elapsed:>12.1f}"
+              f"{broker.poison_deliveries:>19}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+"""Measure StreamingConsumer throughput by prefetch and ack batching.
+
+Runs in process, against a broker stand-in::
+
+    python benchmarks/consumer_throughput.py --messages 20000
+
+The stand-in runs the consumer's I/O loop on the calling thread. It holds
+back deliveries beyond the prefetch limit, and frees the credit an ack
+returns only round-trip seconds after the consumer sent it. Every ack or
+nack frame also costs frame-cost seconds of the loop's time, for writing
+it to the socket. Reports messages per second and ack frames sent for
+each combination of prefetch count and ack batch size.
+"""
+import argparse
+import heapq
+import itertools
+import json
+import threading
+import time
+from collections import deque
+
+from timecardsystem.timecardservice.entrypoints import \
+    rabbitmq_event_consumer
+
+
+class Delivery:
+
+    def __init__(self, delivery_tag):
+        self.delivery_tag = delivery_tag
+
+
+class Properties:
+    content_type = "EmployeeCreated"
+    content_encoding = None
+    headers = None
+    message_id = None
+
+
+BODY = json.dumps({
+    "employee_id": "5dbf600d-305a-4f77-b2b8-51401f443597",
+    "name": "Azure Diamond",
+}).encode("utf-8")
+
+
+class BrokerStandIn:
+    # the channel and I/O loop of a consumer, in one object
+
+    is_open = True
+
+    def __init__(self, prefetch_count, round_trip, frame_cost) -> None:
+        self.round_trip = round_trip
+        self.frame_cost = frame_cost
+        self.window = prefetch_count
+        self.settled = 0
+        self.frames = 0
+        self._callbacks = deque()
+        self._timers = []
+        self._sequence = itertools.count()
+        self._wake = threading.Event()
+        self.ioloop = self
+
+    # I/O loop
+
+    def add_callback_threadsafe(self, callback):
+        self._callbacks.append(callback)
+        self._wake.set()
+
+    def call_later(self, delay, callback):
+        timer = [time.perf_counter() + delay, next(self._sequence), callback]
+        heapq.heappush(self._timers, timer)
+        return timer
+
+    def remove_timeout(self, timer):
+        timer[2] = None
+
+    # channel
+
+    def basic_ack(self, delivery_tag, multiple=False):
+        settled = delivery_tag - self.settled if multiple else 1
+        self._settle(settled)
+
+    def basic_nack(self, delivery_tag, requeue=True, multiple=False):
+        self._settle(1)
+
+    def _settle(self, count):
+        self.frames += 1
+        self.settled += count
+        time.sleep(self.frame_cost)
+        self.call_later(self.round_trip, lambda: self._credit(count))
+
+    def _credit(self, count):
+        self.window += count
+
+    def run(self, consumer, messages: int):
+        delivered = 0
+        while self.settled < messages:
+            while self._callbacks:
+                self._callbacks.popleft()()
+            now = time.perf_counter()
+            while self._timers and self._timers[0][0] <= now:
+                _, _, callback = heapq.heappop(self._timers)
+                if callback is not None:
+                    callback()
+            if self.window and delivered < messages:
+                delivered += 1
+                self.window -= 1
+                consumer.handle_delivery(
+                    self, Delivery(delivered), Properties, BODY
+                )
+                continue
+            timeout = 0.001
+            if self._timers:
+                timeout = min(max(self._timers[0][0] - now, 0), timeout)
+            self._wake.wait(timeout)
+            self._wake.clear()
+
+
+def benchmark(messages, prefetch_count, ack_batch_size, args) -> dict:
+    broker = BrokerStandIn(prefetch_count, args.round_trip, args.frame_cost)
+    consumer = rabbitmq_event_consumer.StreamingConsumer(
+        lambda received: None,
+        prefetch_count=prefetch_count,
+        ack_batch_size=ack_batch_size,
+        ack_interval=args.ack_interval
+    )
+    consumer.channel = broker
+    consumer.connection = broker
+    consumer._start_worker()
+    started = time.perf_counter()
+    broker.run(consumer, messages)
+    elapsed = time.perf_counter() - started
+    consumer._queue.put(rabbitmq_event_consumer._STOP)
+    consumer._worker.join()
+    return {
+        "prefetch": prefetch_count,
+        "ack_batch": ack_batch_size,
+        "messages_per_second": messages / elapsed,
+        "frames": broker.frames,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--messages", type=int, default=20000)
+    parser.add_argument("--round-trip", type=float, default=0.0005)
+    parser.add_argument("--frame-cost", type=float, default=0.00005)
+    parser.add_argument("--ack-interval", type=float, default=0.05)
+    args = parser.parse_args(argv)
+
+    # one message at a time is far slower, so it gets fewer of them
+    results = [
+        benchmark(max(args.messages // 20, 1), 1, 1, args),
+        benchmark(args.messages, 100, 1, args),
+        benchmark(args.messages, 100, 50, args),
+        benchmark(args.messages, 500, 100, args),
+    ]
+
+    print(f"{'prefetch':>10}{'ack batch':>11}{'messages/s':>12}"
+          f"{'ack frames':>12}")
+    for result in results:
+        print(f"{result['prefetch']:>10}{result['ack_batch']:>11}"
+              f"{result['messages_per_second']:>12.1f}"
+              f"{result['frames']:>12}")
+
+
+if __name__ == "__main__":
+    main()
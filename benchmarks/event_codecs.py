@@ -0,0 +1,141 @@
+"""Measure event codec throughput against the previous if/elif encoders.
+
+Runs in process, without the stack::
+
+    python benchmarks/event_codecs.py --events 100000
+
+Reports events per second for encoding a TimecardCreated event to its wire
+dict and decoding it back, for the codec registry and for the class-name
+dispatch with dataclasses.asdict it replaced, then the size and round-trip
+throughput of the wire dict in JSON and in the compact binary format.
+"""
+import argparse
+import json
+import time
+from dataclasses import asdict
+from datetime import datetime, timedelta
+from decimal import Decimal
+from typing import Callable, Dict
+
+from timecardsystem.common.domain import model as common_model
+from timecardsystem.common.dtos import binary_wire_format, event_codecs
+from timecardsystem.timecardservice.domain import events, model
+
+
+def _timecard_created() -> events.TimecardCreated:
+    week_ending_date = datetime(2022, 8, 12)
+    return events.TimecardCreated(
+        "aaa6eaa1-3197-4b3e-9b52-c91c55b91956",
+        "5dbf600d-305a-4f77-b2b8-51401f443597",
+        week_ending_date,
+        {
+            week_ending_date - timedelta(days=day): {
+                "work_hours": "8.0",
+                "sick_hours": "0.0",
+                "vacation_hours": "0.0",
+            }
+            for day in range(5)
+        }
+    )
+
+
+def legacy_encode(message) -> Dict:
+    if message.__class__.__name__ == "EmployeeCreated":
+        return asdict(message)
+    elif message.__class__.__name__ == "TimecardCreated":
+        temp = asdict(message)
+        temp["week_ending_date"] = temp["week_ending_date"].isoformat()
+        temp["dates_and_hours"] = {
+            date.isoformat(): {
+                "work_hours": hours["work_hours"],
+                "sick_hours": hours["sick_hours"],
+                "vacation_hours": hours["vacation_hours"],
+            }
+            for date, hours in temp["dates_and_hours"].items()
+        }
+        return temp
+    elif message.__class__.__name__ == "TimecardSubmittedForProcessing":
+        return asdict(message)
+
+
+def legacy_decode(content_type: str, temp: Dict):
+    if content_type == "EmployeeCreated":
+        return events.EmployeeCreated(
+            common_model.EmployeeID(temp["employee_id"]),
+            common_model.EmployeeName(temp["name"])
+        )
+    elif content_type == "TimecardCreated":
+        dates_and_hours = {}
+        for date, hours in temp["dates_and_hours"].items():
+            dates_and_hours[datetime.fromisoformat(date)] = \
+                model.WorkDayHours(
+                    work_hours=Decimal(hours["work_hours"]),
+                    sick_hours=Decimal(hours["sick_hours"]),
+                    vacation_hours=Decimal(hours["vacation_hours"])
+                )
+        return events.TimecardCreated(
+            common_model.TimecardID(temp["timecard_id"]),
+            common_model.EmployeeID(temp["employee_id"]),
+            datetime.fromisoformat(temp["week_ending_date"]),
+            dates_and_hours
+        )
+    elif content_type == "TimecardSubmittedForProcessing":
+        return events.TimecardSubmittedForProcessing(
+            common_model.TimecardID(temp["timecard_id"]),
+            common_model.EmployeeID(temp["employee_id"])
+        )
+
+
+def measure(func: Callable[[], object], total: int) -> float:
+    start = time.perf_counter()
+    for _ in range(total):
+        func()
+    return total / (time.perf_counter() - start)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--events", type=int, default=50000)
+    args = parser.parse_args(argv)
+
+    event = _timecard_created()
+    name, fields = event_codecs.REGISTRY.encode(event)
+    assert fields == legacy_encode(event)
+
+    results = [
+        ("encode, if/elif + asdict",
+         measure(lambda: legacy_encode(event), args.events)),
+        ("encode, codec registry",
+         measure(lambda: event_codecs.REGISTRY.encode(event), args.events)),
+        ("decode, if/elif",
+         measure(lambda: legacy_decode(name, fields), args.events)),
+        ("decode, codec registry",
+         measure(lambda: event_codecs.REGISTRY.decode(name, fields),
+                 args.events)),
+    ]
+
+    print(f"{'codec':<30}{'events/s':>12}")
+    for label, events_per_second in results:
+        print(f"{label:<30}{events_per_second:>12.0f}")
+
+    json_body = json.dumps(fields)
+    binary_body = binary_wire_format.dumps(name, fields)
+    wire_formats = [
+        ("json", len(json_body), measure(
+            lambda: json.loads(json.dumps(fields)), args.events
+        )),
+        ("binary", len(binary_body), measure(
+            lambda: binary_wire_format.loads(
+                name, binary_wire_format.dumps(name, fields)
+            ),
+            args.events
+        )),
+    ]
+
+    print(f"\n{'wire format':<30}{'bytes':>12}{'round trips/s':>16}")
+    for label, size, round_trips_per_second in wire_formats:
+        print(f"{label:<30}{size:>12}{round_trips_per_second:>16.0f}")
+
+
+if __name__ == "__main__":
+    main()
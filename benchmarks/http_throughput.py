@@ -0,0 +1,132 @@
+"""Compare request throughput of the Flask and ASGI entrypoints.
+
+Start the stack with ``make up`` (the Flask app listens on port 5005 and the
+ASGI app on port 5006), then run::
+
+    python benchmarks/http_throughput.py --requests 2000 --concurrency 64
+
+Each target gets its own employee; the benchmark then creates timecards for
+it and reads pages of the employee's timecards, reporting requests per
+second and latency percentiles per target and operation.
+"""
+import argparse
+import statistics
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List
+
+import requests
+from timecardsystem.timecardservice import config
+
+_sessions = threading.local()
+
+
+def _session() -> requests.Session:
+    # one keep-alive connection per load generator thread
+    if not hasattr(_sessions, "session"):
+        _sessions.session = requests.Session()
+    return _sessions.session
+
+
+def _timecard_payload(employee_id: str) -> Dict:
+    return {
+        "timecard_id": str(uuid.uuid4()),
+        "employee_id": employee_id,
+        "week_ending_date": "2022-08-14",
+        "dates_and_hours": {
+            f"2022-08-{day:02d}": {
+                "work_hours": "8.0",
+                "sick_hours": "0.0",
+                "vacation_hours": "0.0"
+            }
+            for day in range(8, 13)
+        }
+    }
+
+
+def run(
+    name: str,
+    request_func: Callable[[], requests.Response],
+    total: int,
+    concurrency: int
+) -> Dict:
+    def timed_request(_):
+        start = time.perf_counter()
+        response = request_func()
+        return time.perf_counter() - start, response.status_code < 400
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        outcomes = list(executor.map(timed_request, range(total)))
+    elapsed = time.perf_counter() - start
+
+    latencies = sorted(latency for latency, _ in outcomes)
+    percentiles = statistics.quantiles(latencies, n=100)
+    return {
+        "name": name,
+        "requests_per_second": total / elapsed,
+        "errors": sum(1 for _, ok in outcomes if not ok),
+        "p50_ms": percentiles[49] * 1000,
+        "p99_ms": percentiles[98] * 1000,
+    }
+
+
+def benchmark_target(
+    label: str,
+    url: str,
+    total: int,
+    concurrency: int
+) -> List[Dict]:
+    employee_id = str(uuid.uuid4())
+    requests.post(
+        f"{url}/employees",
+        json={"employee_id": employee_id, "name": "Benchmark Employee"}
+    ).raise_for_status()
+
+    return [
+        run(
+            f"{label} POST /timecards",
+            lambda: _session().post(
+                f"{url}/timecards", json=_timecard_payload(employee_id)
+            ),
+            total,
+            concurrency
+        ),
+        run(
+            f"{label} GET /employees/{{id}}/timecards",
+            lambda: _session().get(
+                f"{url}/employees/{employee_id}/timecards",
+                params={"limit": 50}
+            ),
+            total,
+            concurrency
+        ),
+    ]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--flask-url", default=config.get_api_url())
+    parser.add_argument("--asgi-url", default=config.get_async_api_url())
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    args = parser.parse_args(argv)
+
+    results = []
+    for label, url in (("flask", args.flask_url), ("asgi", args.asgi_url)):
+        results.extend(
+            benchmark_target(label, url, args.requests, args.concurrency)
+        )
+
+    print(f"{'benchmark':<45}{'req/s':>10}{'p50 ms':>10}"
+          f"{'p99 ms':>10}{'errors':>8}")
+    for result in results:
+        print(f"{result['name']:<45}{result['requests_per_second']:>10.1f}"
+              f"{result['p50_ms']:>10.1f}{result['p99_ms']:>10.1f}"
+              f"{result['errors']:>8}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""Compare event publishing throughput of the pooled and buffered publishers.
+
+Start the broker with ``make up`` (RabbitMQ listens on port 6672), then run::
+
+    python benchmarks/publish_throughput.py --events 50000
+
+The pooled publisher sends each event and returns; the buffered publisher
+sends batches on a confirm-mode channel and the benchmark waits until the
+broker has confirmed every event. Events go to the service's own queue, so
+purge it afterwards if consumers rely on it.
+"""
+import argparse
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict
+
+from timecardsystem.timecardservice.adapters import rabbitmq_event_publisher
+from timecardsystem.timecardservice.domain import events
+
+
+def _employee_created() -> events.EmployeeCreated:
+    return events.EmployeeCreated(str(uuid.uuid4()), "Benchmark Employee")
+
+
+def benchmark_pooled(total: int, concurrency: int) -> Dict:
+    publisher = rabbitmq_event_publisher.RabbitMQEventPublisher(
+        max_connections=concurrency
+    )
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(
+            lambda _: publisher.publish_event(
+                "employee_created", _employee_created()
+            ),
+            range(total)
+        ))
+    elapsed = time.perf_counter() - start
+    publisher.close()
+    return {"name": "pooled", "events_per_second": total / elapsed,
+            "nacked": 0}
+
+
+def benchmark_buffered(
+    total: int,
+    batch_size: int,
+    flush_interval: float
+) -> Dict:
+    publisher = rabbitmq_event_publisher.BufferedEventPublisher(
+        max_batch_size=batch_size, flush_interval=flush_interval
+    )
+    start = time.perf_counter()
+    futures = [
+        publisher.publish_event("employee_created", _employee_created())
+        for _ in range(total)
+    ]
+    publisher.flush()
+    elapsed = time.perf_counter() - start
+    publisher.close()
+    return {
+        "name": f"buffered (batch {batch_size})",
+        "events_per_second": total / elapsed,
+        "nacked": sum(1 for future in futures if future.exception()),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--events", type=int, default=20000)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--flush-interval", type=float, default=0.05)
+    args = parser.parse_args(argv)
+
+    results = [
+        benchmark_pooled(args.events, args.concurrency),
+        benchmark_buffered(
+            args.events, args.batch_size, args.flush_interval
+        ),
+    ]
+
+    print(f"{'publisher':<25}{'events/s':>12}{'failed':>8}")
+    for result in results:
+        print(f"{result['name']:<25}{result['events_per_second']:>12.1f}"
+              f"{result['nacked']:>8}")
+
+
+if __name__ == "__main__":
+    main()
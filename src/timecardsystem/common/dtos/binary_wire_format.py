@@ -0,0 +1,230 @@
+import functools
+import struct
+from datetime import date, datetime
+from decimal import Decimal, InvalidOperation
+from typing import Callable, Dict, List, Tuple
+
+# Compact binary encoding of the wire dicts produced by event_codecs, sent
+# with content_encoding CONTENT_ENCODING; messages without it are JSON.
+# IDs are packed as 16-byte UUIDs, dates as day ordinals and hours as
+# hundredths of an hour. Fields that do not fit the packed layout, such as
+# IDs that are not canonical UUID strings or hours with finer precision,
+# raise NotBinaryEncodable and the message is sent as JSON instead.
+#
+# A message is a version byte followed by the event's fields:
+#   EmployeeCreated                 employee_id, name length (H), name
+#   TimecardCreated                 timecard_id, employee_id, week ending
+#                                   ordinal (I), day count (B), then per
+#                                   day its ordinal offset from the week
+#                                   ending (b) and work, sick and vacation
+#                                   hundredths (HHH), packed in one call
+#   TimecardSubmittedForProcessing  timecard_id, employee_id
+#
+# An envelope of events of one type is the version byte followed by each
+# event's fields, prefixed with their length (I).
+
+CONTENT_ENCODING = "x-timecardsystem-binary"
+VERSION = 1
+
+_VERSION = struct.Struct("<B")
+_NAME_LENGTH = struct.Struct("<H")
+_TIMECARD = struct.Struct("<16s16sIB")
+_DAY_FORMAT = "bHHH"
+_ITEM_LENGTH = struct.Struct("<I")
+_MAX_HUNDREDTHS = 0xFFFF
+_HOURS_TYPES = ("work_hours", "sick_hours", "vacation_hours")
+
+
+class NotBinaryEncodable(ValueError):
+    pass
+
+
+def _pack_id(value: str) -> bytes:
+    # only lowercase, hyphenated UUIDs unpack to the same string
+    if not isinstance(value, str) or len(value) != 36 \
+            or value[8] != "-" or value[13] != "-" or value[18] != "-" \
+            or value[23] != "-" or value != value.lower():
+        raise NotBinaryEncodable(f"{value!r} is not a canonical UUID")
+    try:
+        packed = bytes.fromhex(value.replace("-", ""))
+    except ValueError:
+        packed = b""
+    if len(packed) != 16:
+        raise NotBinaryEncodable(f"{value!r} is not a canonical UUID")
+    return packed
+
+
+def _format_id(packed: bytes) -> str:
+    digits = packed.hex()
+    return f"{digits[:8]}-{digits[8:12]}-{digits[12:16]}-{digits[16:20]}-" \
+        f"{digits[20:]}"
+
+
+def _unpack_id(body: bytes, offset: int) -> Tuple[str, int]:
+    return _format_id(body[offset:offset + 16]), offset + 16
+
+
+# dates and hours repeat across timecards, so their conversions are cached
+@functools.lru_cache(maxsize=4096)
+def _pack_midnight(value: str) -> int:
+    parsed = datetime.fromisoformat(value)
+    if parsed.time() != datetime.min.time() or parsed.tzinfo is not None:
+        raise NotBinaryEncodable(f"{value!r} is not a date")
+    return parsed.toordinal()
+
+
+@functools.lru_cache(maxsize=4096)
+def _unpack_midnight(ordinal: int) -> str:
+    return datetime.combine(date.fromordinal(ordinal), datetime.min.time()) \
+        .isoformat()
+
+
+@functools.lru_cache(maxsize=4096)
+def _pack_hours(value: str) -> int:
+    try:
+        hundredths = Decimal(value) * 100
+    except InvalidOperation:
+        raise NotBinaryEncodable(f"{value!r} is not a number of hours")
+    if hundredths != hundredths.to_integral_value() \
+            or not 0 <= hundredths <= _MAX_HUNDREDTHS:
+        raise NotBinaryEncodable(f"{value!r} hours do not fit")
+    return int(hundredths)
+
+
+@functools.lru_cache(maxsize=4096)
+def _unpack_hours(hundredths: int) -> str:
+    return f"{hundredths // 100}.{hundredths % 100:02d}"
+
+
+def _pack_employee_created(fields: Dict) -> bytes:
+    name = fields["name"].encode("utf-8")
+    if len(name) > 0xFFFF:
+        raise NotBinaryEncodable("name is too long")
+    return _pack_id(fields["employee_id"]) + _NAME_LENGTH.pack(len(name)) \
+        + name
+
+
+def _unpack_employee_created(body: bytes, offset: int) -> Dict:
+    employee_id, offset = _unpack_id(body, offset)
+    (length,) = _NAME_LENGTH.unpack_from(body, offset)
+    offset += _NAME_LENGTH.size
+    return {
+        "employee_id": employee_id,
+        "name": body[offset:offset + length].decode("utf-8"),
+    }
+
+
+@functools.lru_cache(maxsize=None)
+def _days_struct(day_count: int) -> struct.Struct:
+    return struct.Struct("<" + _DAY_FORMAT * day_count)
+
+
+def _pack_timecard_created(fields: Dict) -> bytes:
+    week_ending = _pack_midnight(fields["week_ending_date"])
+    days = fields["dates_and_hours"]
+    if len(days) > 0xFF:
+        raise NotBinaryEncodable("too many days")
+    values = []
+    for day, hours in days.items():
+        offset = _pack_midnight(day) - week_ending
+        if not -128 <= offset <= 127:
+            raise NotBinaryEncodable(f"{day} is too far from the week")
+        values += (
+            offset,
+            _pack_hours(hours["work_hours"]),
+            _pack_hours(hours["sick_hours"]),
+            _pack_hours(hours["vacation_hours"]),
+        )
+    return _TIMECARD.pack(
+        _pack_id(fields["timecard_id"]),
+        _pack_id(fields["employee_id"]),
+        week_ending,
+        len(days)
+    ) + _days_struct(len(days)).pack(*values)
+
+
+def _unpack_timecard_created(body: bytes, offset: int) -> Dict:
+    timecard_id, employee_id, week_ending, day_count = \
+        _TIMECARD.unpack_from(body, offset)
+    values = _days_struct(day_count).unpack_from(
+        body, offset + _TIMECARD.size
+    )
+    dates_and_hours = {}
+    for index in range(0, len(values), 4):
+        day, work, sick, vacation = values[index:index + 4]
+        dates_and_hours[_unpack_midnight(week_ending + day)] = {
+            "work_hours": _unpack_hours(work),
+            "sick_hours": _unpack_hours(sick),
+            "vacation_hours": _unpack_hours(vacation),
+        }
+    return {
+        "timecard_id": _format_id(timecard_id),
+        "employee_id": _format_id(employee_id),
+        "week_ending_date": _unpack_midnight(week_ending),
+        "dates_and_hours": dates_and_hours,
+    }
+
+
+def _pack_timecard_submitted(fields: Dict) -> bytes:
+    return _pack_id(fields["timecard_id"]) + _pack_id(fields["employee_id"])
+
+
+def _unpack_timecard_submitted(body: bytes, offset: int) -> Dict:
+    timecard_id, offset = _unpack_id(body, offset)
+    employee_id, offset = _unpack_id(body, offset)
+    return {"timecard_id": timecard_id, "employee_id": employee_id}
+
+
+_FORMATS: Dict[str, Tuple[Callable, Callable]] = {
+    "EmployeeCreated": (_pack_employee_created, _unpack_employee_created),
+    "TimecardCreated": (_pack_timecard_created, _unpack_timecard_created),
+    "TimecardSubmittedForProcessing": (
+        _pack_timecard_submitted, _unpack_timecard_submitted
+    ),
+}
+
+
+def dumps(name: str, fields: Dict) -> bytes:
+    try:
+        pack, _ = _FORMATS[name]
+    except KeyError:
+        raise NotBinaryEncodable(f"{name} has no binary format")
+    return _VERSION.pack(VERSION) + pack(fields)
+
+
+def _check_version(body: bytes):
+    (version,) = _VERSION.unpack_from(body, 0)
+    if version != VERSION:
+        raise ValueError(f"Unsupported binary event version {version}")
+
+
+def loads(name: str, body: bytes) -> Dict:
+    _check_version(body)
+    _, unpack = _FORMATS[name]
+    return unpack(body, _VERSION.size)
+
+
+def dumps_batch(name: str, fields_list: List[Dict]) -> bytes:
+    try:
+        pack, _ = _FORMATS[name]
+    except KeyError:
+        raise NotBinaryEncodable(f"{name} has no binary format")
+    parts = [_VERSION.pack(VERSION)]
+    for fields in fields_list:
+        packed = pack(fields)
+        parts.append(_ITEM_LENGTH.pack(len(packed)))
+        parts.append(packed)
+    return b"".join(parts)
+
+
+def loads_batch(name: str, body: bytes) -> List[Dict]:
+    _check_version(body)
+    _, unpack = _FORMATS[name]
+    fields_list = []
+    offset = _VERSION.size
+    while offset < len(body):
+        (length,) = _ITEM_LENGTH.unpack_from(body, offset)
+        offset += _ITEM_LENGTH.size
+        fields_list.append(unpack(body[offset:offset + length], 0))
+        offset += length
+    return fields_list
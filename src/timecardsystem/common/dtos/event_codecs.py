@@ -0,0 +1,188 @@
+from datetime import datetime
+from decimal import Decimal
+from operator import attrgetter
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+
+from timecardsystem.common.domain import events as common_events
+from timecardsystem.common.domain import model as common_model
+from timecardsystem.timecardservice.domain import events, model
+
+# Converts events to and from the plain dicts sent over the wire. Each event
+# type is registered once, with converters for the fields that are not
+# already JSON types; the field list and converters are resolved at
+# registration, so encoding reads each attribute once and decoding builds
+# the event from positional arguments, without dataclasses.asdict's deep
+# copy. Events are looked up by class when encoding and by name when
+# decoding.
+
+FieldConverter = Callable[[object], object]
+
+
+class UnknownEvent(Exception):
+    pass
+
+
+class EventCodec(NamedTuple):
+    event_type: type
+    name: str
+    encode: Callable[[common_events.Event], Dict]
+    decode: Callable[[Dict], common_events.Event]
+
+
+def _compile_encoder(
+    field_names: Tuple[str, ...],
+    converters: Dict[str, FieldConverter]
+) -> Callable[[common_events.Event], Dict]:
+    if len(field_names) == 1:
+        [field_name] = field_names
+
+        def get_fields(event):
+            return (getattr(event, field_name),)
+    else:
+        get_fields = attrgetter(*field_names)
+    field_converters = tuple(
+        (name, converters.get(name)) for name in field_names
+    )
+
+    def encode(event):
+        return {
+            name: value if convert is None else convert(value)
+            for (name, convert), value in zip(
+                field_converters, get_fields(event)
+            )
+        }
+    return encode
+
+
+def _compile_decoder(
+    event_type: type,
+    field_names: Tuple[str, ...],
+    converters: Dict[str, FieldConverter]
+) -> Callable[[Dict], common_events.Event]:
+    field_converters = tuple(
+        (name, converters.get(name)) for name in field_names
+    )
+
+    def decode(fields):
+        return event_type(*[
+            fields[name] if convert is None else convert(fields[name])
+            for name, convert in field_converters
+        ])
+    return decode
+
+
+class CodecRegistry:
+
+    def __init__(self) -> None:
+        self._by_type: Dict[type, EventCodec] = {}
+        self._by_name: Dict[str, EventCodec] = {}
+
+    def register(
+        self,
+        event_type: type,
+        encoders: Optional[Dict[str, FieldConverter]] = None,
+        decoders: Optional[Dict[str, FieldConverter]] = None,
+        name: Optional[str] = None
+    ) -> EventCodec:
+        # event_type is a dataclass; fields without a converter are sent
+        # and received as they are
+        name = name or event_type.__name__
+        if name in self._by_name:
+            raise ValueError(f"A codec for {name} is already registered")
+        field_names = tuple(event_type.__dataclass_fields__)
+        codec = EventCodec(
+            event_type,
+            name,
+            _compile_encoder(field_names, encoders or {}),
+            _compile_decoder(event_type, field_names, decoders or {})
+        )
+        self._by_type[event_type] = codec
+        self._by_name[name] = codec
+        return codec
+
+    def for_event(self, event: common_events.Event) -> EventCodec:
+        try:
+            return self._by_type[type(event)]
+        except KeyError:
+            raise UnknownEvent(f"No codec for {type(event).__name__}")
+
+    def for_name(self, name: str) -> EventCodec:
+        try:
+            return self._by_name[name]
+        except KeyError:
+            raise UnknownEvent(f"No codec for {name}")
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._by_name
+
+    def names(self) -> List[str]:
+        return list(self._by_name)
+
+    def encode(self, event: common_events.Event) -> Tuple[str, Dict]:
+        codec = self.for_event(event)
+        return codec.name, codec.encode(event)
+
+    def decode(self, name: str, fields: Dict) -> common_events.Event:
+        return self.for_name(name).decode(fields)
+
+
+def encode_dates_and_hours(
+    dates_and_hours: Dict[datetime, Dict[str, str]]
+) -> Dict[str, Dict[str, str]]:
+    return {
+        date.isoformat(): {
+            "work_hours": hours["work_hours"],
+            "sick_hours": hours["sick_hours"],
+            "vacation_hours": hours["vacation_hours"],
+        }
+        for date, hours in dates_and_hours.items()
+    }
+
+
+def decode_dates_and_hours(
+    dates_and_hours: Dict[str, Dict[str, str]]
+) -> Dict[datetime, model.WorkDayHours]:
+    return {
+        datetime.fromisoformat(date): model.WorkDayHours(
+            work_hours=Decimal(hours["work_hours"]),
+            sick_hours=Decimal(hours["sick_hours"]),
+            vacation_hours=Decimal(hours["vacation_hours"])
+        )
+        for date, hours in dates_and_hours.items()
+    }
+
+
+def _isoformat(value: datetime) -> str:
+    return value.isoformat()
+
+
+REGISTRY = CodecRegistry()
+
+# received events carry the common model's value objects
+REGISTRY.register(
+    events.EmployeeCreated,
+    decoders={
+        "employee_id": common_model.EmployeeID,
+        "name": common_model.EmployeeName,
+    }
+)
+REGISTRY.register(
+    events.TimecardCreated,
+    encoders={
+        "week_ending_date": _isoformat,
+        "dates_and_hours": encode_dates_and_hours,
+    },
+    decoders={
+        "timecard_id": common_model.TimecardID,
+        "employee_id": common_model.EmployeeID,
+        "week_ending_date": datetime.fromisoformat,
+        "dates_and_hours": decode_dates_and_hours,
+    }
+)
+REGISTRY.register(
+    events.TimecardSubmittedForProcessing,
+    decoders={
+        "timecard_id": common_model.TimecardID,
+        "employee_id": common_model.EmployeeID,
+    }
+)
@@ -1,67 +1,105 @@
-from dataclasses import asdict
-from datetime import datetime
-from decimal import Decimal
-from typing import Callable, Dict, List, Set
+import time
+import uuid
+from typing import Callable, Dict, List, Optional, Set
 
 from pika.channel import Channel
 from pika.spec import BasicProperties
 from timecardsystem.common.domain import events as common_events
-from timecardsystem.common.domain import model as common_model
-from timecardsystem.timecardservice.domain import events, model
-
-
-def convert_dates_and_hours_to_domain(
-    dates_and_hours: Dict[str, Dict[str, str]]
-) -> Dict[datetime, model.WorkDayHours]:
-    model_dates_and_hours = {}
-    for date, hours in dates_and_hours.items():
-        model_dates_and_hours[datetime.fromisoformat(date)] = \
-            model.WorkDayHours(
-                work_hours=Decimal(hours["work_hours"]),
-                sick_hours=Decimal(hours["sick_hours"]),
-                vacation_hours=Decimal(hours["vacation_hours"])
-            )
-    return model_dates_and_hours
-
-
-def create_dates_and_hours_dto(
-    dates_and_hours: Dict[datetime, Dict[str, str]]
-) -> Dict[str, str]:
-    dates_and_hours_dto = {}
-    for date, hours in dates_and_hours.items():
-        dates_and_hours_dto[date.isoformat()] = {
-            "work_hours": hours["work_hours"],
-            "sick_hours": hours["sick_hours"],
-            "vacation_hours": hours["vacation_hours"],
-        }
-    return dates_and_hours_dto
+from timecardsystem.common.dtos import binary_wire_format, event_codecs
+
+# An envelope carries several events of one type in a single message. Its
+# content_type is the events' type, as for a single event, and this header
+# holds the number of events; the body is a JSON list of the events' fields
+# or a binary envelope.
+EVENT_COUNT_HEADER = "x-event-count"
+
+# Events are partitioned by employee: this header holds the employee_id of
+# the events in a message, and is left out of envelopes mixing employees.
+PARTITION_KEY_HEADER = "x-partition-key"
+PARTITION_KEY_FIELD = "employee_id"
+
+# Milliseconds since the epoch when a message was serialized; consumers
+# measure how far behind the publisher they are from it.
+SERIALIZED_AT_HEADER = "x-serialized-at"
+
+# The number of times consumers have failed to handle a message retried
+# after a delay; absent until the first failure.
+ATTEMPTS_HEADER = "x-attempts"
+
+
+def _serialized_at() -> int:
+    return int(time.time() * 1000)
 
 
 class MessagePublisherDTO:
+    # with binary=True, events that fit the compact binary format are
+    # serialized with it, and content_encoding names it for consumers.
+    # Every serialized message gets a new message_id, which is kept when
+    # the message is published again, so consumers can recognize
+    # redeliveries.
 
-    def __init__(self) -> None:
+    def __init__(self, binary: bool = False) -> None:
         self._serialized_message: bytes = None
         self._message_properties: str = None
+        self._content_encoding: str = None
+        self._headers: Dict = None
+        self._message_id: str = None
         self._serialize_func: Callable = None
+        self._binary = binary
 
     def set_serializer(self, callable_func: Callable):
         self._serialize_func = callable_func
 
     def serialize_outgoing_message(self, message: common_events.Event):
-        self._message_properties = message.__class__.__name__
-
-        if message.__class__.__name__ == "EmployeeCreated":
-            self._serialized_message = self._serialize_func(asdict(message))
-        elif message.__class__.__name__ == "TimecardCreated":
-            temp = asdict(message)
-            temp["week_ending_date"] = temp["week_ending_date"].isoformat()
-            temp["dates_and_hours"] = create_dates_and_hours_dto(
-                temp["dates_and_hours"]
-            )
-            self._serialized_message = self._serialize_func(temp)
-        elif message.__class__.__name__ == "TimecardSubmittedForProcessing":
-            temp = asdict(message)
-            self._serialized_message = self._serialize_func(temp)
+        self._message_properties, fields = \
+            event_codecs.REGISTRY.encode(message)
+        self._message_id = str(uuid.uuid4())
+        self._headers = {SERIALIZED_AT_HEADER: _serialized_at()}
+        if PARTITION_KEY_FIELD in fields:
+            self._headers[PARTITION_KEY_HEADER] = \
+                str(fields[PARTITION_KEY_FIELD])
+        if self._binary:
+            try:
+                self._serialized_message = binary_wire_format.dumps(
+                    self._message_properties, fields
+                )
+                self._content_encoding = binary_wire_format.CONTENT_ENCODING
+                return
+            except binary_wire_format.NotBinaryEncodable:
+                pass
+        self._serialized_message = self._serialize_func(fields)
+        self._content_encoding = None
+
+    def serialize_outgoing_batch(self, messages: List[common_events.Event]):
+        # messages must all be of the same type
+        codec = event_codecs.REGISTRY.for_event(messages[0])
+        if any(type(message) is not codec.event_type
+               for message in messages):
+            raise ValueError("An envelope holds events of a single type")
+        self._message_properties = codec.name
+        self._message_id = str(uuid.uuid4())
+        self._headers = {
+            EVENT_COUNT_HEADER: len(messages),
+            SERIALIZED_AT_HEADER: _serialized_at(),
+        }
+        fields_list = [codec.encode(message) for message in messages]
+        partition_keys = {
+            str(fields.get(PARTITION_KEY_FIELD)) for fields in fields_list
+        }
+        if len(partition_keys) == 1 and \
+                PARTITION_KEY_FIELD in fields_list[0]:
+            self._headers[PARTITION_KEY_HEADER] = partition_keys.pop()
+        if self._binary:
+            try:
+                self._serialized_message = binary_wire_format.dumps_batch(
+                    codec.name, fields_list
+                )
+                self._content_encoding = binary_wire_format.CONTENT_ENCODING
+                return
+            except binary_wire_format.NotBinaryEncodable:
+                pass
+        self._serialized_message = self._serialize_func(fields_list)
+        self._content_encoding = None
 
     @property
     def serialized_message(self) -> bytes:
@@ -71,16 +109,44 @@ class MessagePublisherDTO:
     def message_properties(self) -> str:
         return self._message_properties
 
+    @property
+    def content_encoding(self) -> str:
+        return self._content_encoding
+
+    @property
+    def headers(self) -> Dict:
+        return self._headers
+
+    @property
+    def message_id(self) -> str:
+        return self._message_id
+
+
+def is_envelope(header: BasicProperties) -> bool:
+    return bool(header.headers) and EVENT_COUNT_HEADER in header.headers
+
+
+def serialized_at(header: BasicProperties) -> Optional[float]:
+    # seconds since the epoch, or None for a message without the header
+    milliseconds = (header.headers or {}).get(SERIALIZED_AT_HEADER)
+    if milliseconds is None:
+        return None
+    return milliseconds / 1000
+
+
+def failed_attempts(header: BasicProperties) -> int:
+    return int((header.headers or {}).get(ATTEMPTS_HEADER, 0))
+
 
 class MessageConsumerDTO:
+    # receive_message keeps every event it decodes in deserialized_messages
+    # until the caller removes them, which suits tests and short-lived
+    # scripts; long-running consumers call decode_message and hand the
+    # events on instead, as StreamingConsumer does
 
     def __init__(self) -> None:
         self._whitelisted_events: Set = \
-            set({
-                "EmployeeCreated",
-                "TimecardCreated",
-                "TimecardSubmittedForProcessing"
-            })
+            set(event_codecs.REGISTRY.names())
         self._deserialize_func: Callable = None
         self._deserialized_messages: List[common_events.Event] = []
         self._app_callback: Callable = None
@@ -123,27 +189,34 @@ class MessageConsumerDTO:
         :param pika.spec.BasicProperties header
         :param bytes body
         """
-        temp = self._deserialize_func(body)
-        if header.content_type == "EmployeeCreated":
-            event = events.EmployeeCreated(
-                common_model.EmployeeID(temp["employee_id"]),
-                common_model.EmployeeName(temp["name"])
-            )
-            self._deserialized_messages.append(event)
-        elif header.content_type == "TimecardCreated":
-            event = events.TimecardCreated(
-                common_model.TimecardID(temp["timecard_id"]),
-                common_model.EmployeeID(temp["employee_id"]),
-                datetime.fromisoformat(temp["week_ending_date"]),
-                convert_dates_and_hours_to_domain(temp["dates_and_hours"])
-            )
-            self._deserialized_messages.append(event)
-        elif header.content_type == "TimecardSubmittedForProcessing":
-            event = events.TimecardSubmittedForProcessing(
-                common_model.TimecardID(temp["timecard_id"]),
-                common_model.EmployeeID(temp["employee_id"])
-            )
-            self._deserialized_messages.append(event)
+        self._deserialized_messages.extend(self.decode_message(header, body))
+
+    def decode_message(
+        self,
+        header: BasicProperties,
+        body: bytes
+    ) -> Optional[List[common_events.Event]]:
+        # the message's events, or None if it is not an event this DTO
+        # reads. An envelope is decoded in full before any of its events is
+        # returned, so a malformed one raises rather than delivering some.
+        if not self._can_be_deserialized(header):
+            return None
+        codec = event_codecs.REGISTRY.for_name(header.content_type)
+        binary = \
+            header.content_encoding == binary_wire_format.CONTENT_ENCODING
+        if is_envelope(header):
+            if binary:
+                fields_list = binary_wire_format.loads_batch(
+                    codec.name, body
+                )
+            else:
+                fields_list = self._deserialize_func(body)
+            return [codec.decode(fields) for fields in fields_list]
+        if binary:
+            fields = binary_wire_format.loads(codec.name, body)
+        else:
+            fields = self._deserialize_func(body)
+        return [codec.decode(fields)]
 
     @property
     def deserialized_messages(self) -> List[common_events.Event]:
@@ -0,0 +1,34 @@
+import os
+from typing import Dict
+
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from timecardsystem.timecardservice import config
+
+_clients: Dict[str, AsyncIOMotorClient] = {}
+_clients_pid: int = None
+
+
+def get_async_client(uri: str) -> AsyncIOMotorClient:
+    # asyncio counterpart of mongodb_client.get_client: one pooled client
+    # per URI and process. Creating a client does no I/O and all callers
+    # run on the event loop thread, so no lock is needed. Schema and index
+    # setup is done once at startup through the synchronous client.
+    global _clients_pid
+    pid = os.getpid()
+    if _clients_pid != pid:
+        _clients.clear()
+        _clients_pid = pid
+    client = _clients.get(uri)
+    if client is None:
+        client = AsyncIOMotorClient(
+            uri, maxPoolSize=config.get_mongodb_max_pool_size()
+        )
+        _clients[uri] = client
+    return client
+
+
+def close_async_clients():
+    for client in _clients.values():
+        client.close()
+    _clients.clear()
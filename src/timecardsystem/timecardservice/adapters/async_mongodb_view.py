@@ -0,0 +1,85 @@
+from datetime import datetime
+from typing import Dict, List
+
+import pymongo
+from motor.motor_asyncio import AsyncIOMotorClient
+from timecardsystem.common.domain import model as common_model
+from timecardsystem.timecardservice import config
+from timecardsystem.timecardservice.adapters import (async_mongodb_client,
+                                                     mongodb_view)
+from timecardsystem.timecardservice.domain import model
+
+# asyncio counterparts of the view projections in mongodb_view.py; the view
+# documents are built by the same functions.
+
+
+def get_async_view_client() -> AsyncIOMotorClient:
+    return async_mongodb_client.get_async_client(
+        config.get_mongodb_view_uri()
+    )
+
+
+def _connect_to_view_database():
+    client = get_async_view_client()
+    return client[mongodb_view.DATABASE_NAME]
+
+
+async def add_employee_to_view_model(
+    employee_id: common_model.EmployeeID,
+    employee_name: common_model.EmployeeName
+):
+    view_db = _connect_to_view_database()
+    await view_db[mongodb_view.EMPLOYEES_VIEW_COLLECTION_NAME].update_one(
+        filter={"_id": employee_id.value},
+        update={"$set": {"name": employee_name.value}},
+        upsert=True
+    )
+
+
+async def add_timecard_to_view_model(
+    employee_id: common_model.EmployeeID,
+    employee_name: common_model.EmployeeName,
+    timecard_id: common_model.TimecardID,
+    week_ending_date: datetime,
+    dates_and_hours: Dict[datetime, model.WorkDayHours]
+):
+    view_db = _connect_to_view_database()
+    row_data = mongodb_view.create_timecard_row(
+        employee_id,
+        employee_name,
+        timecard_id,
+        week_ending_date,
+        dates_and_hours
+    )
+    await view_db[mongodb_view.TIMECARDS_VIEW_COLLECTION_NAME].replace_one(
+        filter={"timecard_id": timecard_id.value},
+        replacement=row_data,
+        upsert=True
+    )
+    await view_db[mongodb_view.EMPLOYEES_VIEW_COLLECTION_NAME].update_one(
+        filter={"_id": employee_id.value},
+        update=mongodb_view.TIMECARDS_VERSION_UPDATE,
+        upsert=True
+    )
+
+
+async def add_timecards_to_view_model_bulk(rows: List[Dict]):
+    # same writes as mongodb_view.add_timecards_to_view_model_bulk
+    if not rows:
+        return
+    view_db = _connect_to_view_database()
+    await view_db[mongodb_view.TIMECARDS_VIEW_COLLECTION_NAME].bulk_write([
+        pymongo.ReplaceOne(
+            {"timecard_id": row["timecard_id"]}, row, upsert=True
+        )
+        for row in rows
+    ])
+    employee_ids = dict.fromkeys(row["employee_id"] for row in rows)
+    await view_db[mongodb_view.EMPLOYEES_VIEW_COLLECTION_NAME].bulk_write([
+        pymongo.UpdateOne(
+            {"_id": employee_id},
+            mongodb_view.TIMECARDS_VERSION_UPDATE,
+            upsert=True
+        )
+        for employee_id in employee_ids
+    ])
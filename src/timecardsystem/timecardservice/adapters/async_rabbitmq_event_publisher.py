@@ -0,0 +1,105 @@
+import asyncio
+import contextlib
+import contextvars
+from typing import List
+
+import aio_pika
+from timecardsystem.common.domain import events
+from timecardsystem.common.dtos import message_dto
+from timecardsystem.timecardservice import config, metrics
+from timecardsystem.timecardservice.adapters import rabbitmq_event_publisher
+
+HOST, PORT = config.get_rabbitmq_host_and_port()
+
+# asyncio counterpart of rabbitmq_event_publisher.publish_event. One robust
+# connection and channel are shared by every publish on the event loop and
+# are re-established by aio-pika after a connection loss.
+_connection: aio_pika.abc.AbstractRobustConnection = None
+_exchange: aio_pika.abc.AbstractExchange = None
+_lock: asyncio.Lock = None
+
+
+async def _get_exchange() -> aio_pika.abc.AbstractExchange:
+    # declares the same topology as the blocking publisher, through the
+    # underlying AMQP channel, as the declarations are shared
+    global _connection, _exchange, _lock
+    if _lock is None:
+        _lock = asyncio.Lock()
+    async with _lock:
+        if _exchange is None:
+            _connection = await aio_pika.connect_robust(host=HOST, port=PORT)
+            channel = await _connection.channel()
+            for method, arguments in \
+                    rabbitmq_event_publisher.topology_declarations():
+                await getattr(channel.channel, method)(**arguments)
+            _exchange = await channel.get_exchange(
+                rabbitmq_event_publisher.EXCHANGE_NAME, ensure=False
+            )
+    return _exchange
+
+
+_batched_events: contextvars.ContextVar = contextvars.ContextVar(
+    "batched_events", default=None
+)
+
+
+@contextlib.asynccontextmanager
+async def batching():
+    # asyncio counterpart of rabbitmq_event_publisher.batching: events
+    # published by this task inside the block are sent in envelopes when it
+    # exits, even if it raises. Nested blocks join the outer one.
+    if _batched_events.get() is not None:
+        yield
+        return
+    token = _batched_events.set([])
+    try:
+        yield
+    finally:
+        batched_events = _batched_events.get()
+        _batched_events.reset(token)
+        if batched_events:
+            await publish_events(batched_events)
+
+
+async def publish_events(batched_events: List[events.Event]):
+    with metrics.PUBLISH_DURATION.labels("envelope").time():
+        for dto, _ in rabbitmq_event_publisher.serialize_envelopes(
+            batched_events, config.get_event_envelope_max_events()
+        ):
+            await _publish(dto)
+
+
+async def publish_event(name, event: events.Event):
+    # inside batching() the event is only collected
+    batched_events = _batched_events.get()
+    if batched_events is not None:
+        batched_events.append(event)
+        return
+    with metrics.PUBLISH_DURATION.labels(type(event).__name__).time():
+        await _publish(rabbitmq_event_publisher.serialize_event(event))
+
+
+async def _publish(dto: message_dto.MessagePublisherDTO):
+    exchange = await _get_exchange()
+    body = dto.serialized_message
+    if isinstance(body, str):
+        body = body.encode("utf-8")
+    await exchange.publish(
+        aio_pika.Message(
+            body=body,
+            content_type=dto.message_properties,
+            content_encoding=dto.content_encoding,
+            headers=dto.headers,
+            message_id=dto.message_id
+        ),
+        routing_key=rabbitmq_event_publisher.routing_key_for(
+            dto.message_properties
+        )
+    )
+
+
+async def close():
+    global _connection, _exchange
+    if _connection is not None:
+        await _connection.close()
+    _connection, _exchange = None, None
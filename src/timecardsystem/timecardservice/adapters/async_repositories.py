@@ -0,0 +1,246 @@
+import abc
+from typing import Dict, Iterable, List
+
+import pymongo
+from motor.motor_asyncio import AsyncIOMotorClientSession
+from timecardsystem.common.domain import model as common_model
+from timecardsystem.timecardservice.adapters import odm
+from timecardsystem.timecardservice.adapters.repositories import (
+    MongoDBEmployeeRepository, MongoDBTimecardRepository)
+from timecardsystem.timecardservice.domain import model
+
+# asyncio counterparts of the repositories in repositories.py; documents are
+# mapped to and from the domain model by the synchronous repositories'
+# converters, so both share one storage format.
+
+
+class AbstractAsyncTimecardRepository(abc.ABC):
+
+    def __init__(self) -> None:
+        self.seen = set()
+
+    async def add(self, timecard: model.Timecard):
+        await self._add(timecard)
+        self.seen.add(timecard)
+
+    async def add_all(self, timecards: List[model.Timecard]):
+        await self._add_all(timecards)
+        self.seen.update(timecards)
+
+    async def get(
+        self,
+        timecard_id: common_model.TimecardID
+    ) -> model.Timecard:
+        timecard = await self._get(timecard_id)
+        if timecard:
+            self.seen.add(timecard)
+        return timecard
+
+    async def get_many(
+        self,
+        timecard_ids: Iterable[common_model.TimecardID]
+    ) -> Dict[common_model.TimecardID, model.Timecard]:
+        timecards = await self._get_many(timecard_ids)
+        self.seen.update(timecards.values())
+        return timecards
+
+    @abc.abstractmethod
+    async def _add(self, timecard: model.Timecard):
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    async def _add_all(self, timecards: List[model.Timecard]):
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    async def _get(self, timecard_id: common_model.TimecardID):
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    async def _get_many(
+        self,
+        timecard_ids: Iterable[common_model.TimecardID]
+    ) -> Dict[common_model.TimecardID, model.Timecard]:
+        raise NotImplementedError
+
+
+class AbstractAsyncEmployeeRepository(abc.ABC):
+
+    def __init__(self) -> None:
+        self.seen = set()
+
+    async def add(self, employee: model.Employee):
+        await self._add(employee)
+        self.seen.add(employee)
+
+    async def add_all(self, employees: List[model.Employee]):
+        await self._add_all(employees)
+        self.seen.update(employees)
+
+    async def get(
+        self,
+        employee_id: common_model.EmployeeID
+    ) -> model.Employee:
+        employee = await self._get(employee_id)
+        if employee:
+            self.seen.add(employee)
+        return employee
+
+    async def get_many(
+        self,
+        employee_ids: Iterable[common_model.EmployeeID]
+    ) -> Dict[common_model.EmployeeID, model.Employee]:
+        employees = await self._get_many(employee_ids)
+        self.seen.update(employees.values())
+        return employees
+
+    @abc.abstractmethod
+    async def _add(self, employee: model.Employee):
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    async def _add_all(self, employees: List[model.Employee]):
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    async def _get(self, employee_id: common_model.EmployeeID):
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    async def _get_many(
+        self,
+        employee_ids: Iterable[common_model.EmployeeID]
+    ) -> Dict[common_model.EmployeeID, model.Employee]:
+        raise NotImplementedError
+
+
+class MotorTimecardRepository(AbstractAsyncTimecardRepository):
+
+    def __init__(self, session: AsyncIOMotorClientSession) -> None:
+        self.session = session
+        self.database = session.client[odm.DATABASE_NAME]
+        self.timecards_collection = \
+            self.database[odm.TIMECARDS_COLLECTION_NAME]
+        super().__init__()
+
+    async def _add(self, timecard: model.Timecard):
+        await self.timecards_collection.replace_one(
+            filter={"_id": timecard.id.value},
+            replacement=MongoDBTimecardRepository._to_document(timecard),
+            upsert=True,
+            session=self.session
+        )
+
+    async def _add_all(self, timecards: List[model.Timecard]):
+        if not timecards:
+            return
+        await self.timecards_collection.bulk_write(
+            [
+                pymongo.ReplaceOne(
+                    filter={"_id": timecard.id.value},
+                    replacement=MongoDBTimecardRepository._to_document(
+                        timecard
+                    ),
+                    upsert=True
+                )
+                for timecard in timecards
+            ],
+            ordered=False,
+            session=self.session
+        )
+
+    async def _get(
+        self,
+        timecard_id: common_model.TimecardID
+    ) -> model.Timecard:
+        timecard_dto = await self.timecards_collection.find_one(
+            {"_id": timecard_id.value}, session=self.session
+        )
+        if timecard_dto:
+            return MongoDBTimecardRepository._from_document(timecard_dto)
+        else:
+            return None
+
+    async def _get_many(
+        self,
+        timecard_ids: Iterable[common_model.TimecardID]
+    ) -> Dict[common_model.TimecardID, model.Timecard]:
+        ids = list({timecard_id.value for timecard_id in timecard_ids})
+        if not ids:
+            return {}
+        cursor = self.timecards_collection.find(
+            {"_id": {"$in": ids}}, session=self.session
+        )
+        timecards = {}
+        async for timecard_dto in cursor:
+            timecard = MongoDBTimecardRepository._from_document(timecard_dto)
+            timecards[timecard.id] = timecard
+        return timecards
+
+
+class MotorEmployeeRepository(AbstractAsyncEmployeeRepository):
+
+    def __init__(self, session: AsyncIOMotorClientSession) -> None:
+        self.session = session
+        self.database = session.client[odm.DATABASE_NAME]
+        self.employees_collection = \
+            self.database[odm.EMPLOYEES_COLLECTION_NAME]
+        super().__init__()
+
+    async def _add(self, employee: model.Employee):
+        await self.employees_collection.replace_one(
+            filter={"_id": employee.id.value},
+            replacement={
+                "_id": employee.id.value,
+                "name": employee.name.value
+            },
+            upsert=True,
+            session=self.session
+        )
+
+    async def _add_all(self, employees: List[model.Employee]):
+        if not employees:
+            return
+        await self.employees_collection.bulk_write(
+            [
+                pymongo.ReplaceOne(
+                    filter={"_id": employee.id.value},
+                    replacement={
+                        "_id": employee.id.value,
+                        "name": employee.name.value
+                    },
+                    upsert=True
+                )
+                for employee in employees
+            ],
+            ordered=False,
+            session=self.session
+        )
+
+    async def _get(
+        self,
+        employee_id: common_model.EmployeeID
+    ) -> model.Employee:
+        employee_dto = await self.employees_collection.find_one(
+            {"_id": employee_id.value}, session=self.session
+        )
+        if employee_dto:
+            return MongoDBEmployeeRepository._from_document(employee_dto)
+        else:
+            return None
+
+    async def _get_many(
+        self,
+        employee_ids: Iterable[common_model.EmployeeID]
+    ) -> Dict[common_model.EmployeeID, model.Employee]:
+        ids = list({employee_id.value for employee_id in employee_ids})
+        if not ids:
+            return {}
+        cursor = self.employees_collection.find(
+            {"_id": {"$in": ids}}, session=self.session
+        )
+        employees = {}
+        async for employee_dto in cursor:
+            employee = MongoDBEmployeeRepository._from_document(employee_dto)
+            employees[employee.id] = employee
+        return employees
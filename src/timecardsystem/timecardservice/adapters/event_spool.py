@@ -0,0 +1,273 @@
+import base64
+import fcntl
+import json
+import logging
+import mmap
+import os
+import struct
+import threading
+import zlib
+from typing import Dict, List, Tuple, Union
+
+from timecardsystem.timecardservice import metrics
+
+logger = logging.getLogger(__name__)
+
+# Append-only spool of serialized events, kept in a memory-mapped file so
+# that appending is a copy into the page cache rather than a system call.
+# The file starts with a header holding the offsets of the oldest unread
+# record and of the end of the last complete record; each record is its
+# length, its CRC-32 and its JSON payload. The header is updated after the
+# record is written, so a crash mid-append loses at most that record.
+# Writes reach the page cache at once and survive the process dying; they
+# are flushed to disk by sync(), which the replayer calls while idle.
+#
+# Once every record has been read, both offsets go back to the start. While
+# the publisher keeps appending during a drain, the spool is compacted
+# instead: once the read offset is compact_after bytes in, and again before
+# an append that would not fit, the unread records are moved to the start
+# of the file. Only when they fit entirely in the space already read, so
+# the move never overwrites a record the old header still points to, and a
+# crash before the header update loses nothing. An append that still does
+# not fit raises SpoolFull.
+
+MAGIC = b"TCSP"
+VERSION = 1
+HEADER = struct.Struct("<4sIQQ")
+RECORD_HEADER = struct.Struct("<II")
+
+SPOOLED_EVENTS = metrics.counter(
+    "timecardservice_event_spool_appends",
+    "Events written to the local spool, or rejected when it was full.",
+    ("outcome",)
+)
+
+SPOOL_BYTES = metrics.gauge(
+    "timecardservice_event_spool_bytes",
+    "Bytes of unreplayed events in the local spool."
+)
+
+SPOOL_EVENTS = metrics.gauge(
+    "timecardservice_event_spool_events",
+    "Unreplayed events in the local spool."
+)
+
+
+COMPACTIONS = metrics.counter(
+    "timecardservice_event_spool_compactions",
+    "Times the unread records were moved to the start of the spool."
+)
+
+
+class SpoolFull(Exception):
+    pass
+
+
+class SpoolLocked(Exception):
+    pass
+
+
+class MmapSpool:
+
+    def __init__(
+        self,
+        path: str,
+        max_bytes: int = 64 * 1024 * 1024,
+        compact_after: int = None
+    ) -> None:
+        if max_bytes <= HEADER.size:
+            raise ValueError("max_bytes is smaller than the spool header")
+        self.path = path
+        self._lock = threading.Lock()
+        self._file = open(path, "a+b")
+        try:
+            # one process per spool file; a second one would interleave
+            # appends with the first
+            fcntl.flock(self._file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            self._file.close()
+            raise SpoolLocked(f"{path} is in use by another process")
+
+        size = os.fstat(self._file.fileno()).st_size
+        if size < max_bytes:
+            self._file.truncate(max_bytes)
+        self._map = mmap.mmap(self._file.fileno(), max(size, max_bytes))
+        if compact_after is None:
+            compact_after = self.capacity // 4
+        self.compact_after = compact_after
+        if size == 0:
+            self._read_offset = self._write_offset = HEADER.size
+            self._count = 0
+            self._write_header()
+        else:
+            self._recover()
+
+    @property
+    def capacity(self) -> int:
+        return len(self._map) - HEADER.size
+
+    def __len__(self) -> int:
+        return self._count
+
+    def pending_bytes(self) -> int:
+        return self._write_offset - self._read_offset
+
+    def append(self, record: Dict):
+        payload = json.dumps(record).encode("utf-8")
+        size = RECORD_HEADER.size + len(payload)
+        with self._lock:
+            if self._write_offset + size > len(self._map):
+                self._compact()
+            if self._write_offset + size > len(self._map):
+                SPOOLED_EVENTS.labels("rejected").inc()
+                raise SpoolFull(
+                    f"{self.path} has no room for another {size} bytes"
+                )
+            offset = self._write_offset
+            RECORD_HEADER.pack_into(
+                self._map, offset, len(payload), zlib.crc32(payload)
+            )
+            self._map[offset + RECORD_HEADER.size:offset + size] = payload
+            self._write_offset += size
+            self._count += 1
+            self._write_header()
+        SPOOLED_EVENTS.labels("spooled").inc()
+        self._update_gauges()
+
+    def peek(self, limit: int) -> List[Tuple[int, Dict]]:
+        # the oldest unread records, each with its size in the spool to
+        # pass to commit once it has been handled
+        records = []
+        with self._lock:
+            offset = self._read_offset
+            while offset < self._write_offset and len(records) < limit:
+                length, _ = RECORD_HEADER.unpack_from(self._map, offset)
+                start = offset + RECORD_HEADER.size
+                payload = self._map[start:start + length]
+                records.append(
+                    (RECORD_HEADER.size + length, json.loads(payload))
+                )
+                offset = start + length
+        return records
+
+    def commit(self, size: int):
+        # marks the oldest record, size bytes long, as read
+        with self._lock:
+            self._read_offset = min(
+                self._read_offset + size, self._write_offset
+            )
+            self._count -= 1
+            if self._read_offset == self._write_offset:
+                self._read_offset = self._write_offset = HEADER.size
+                self._count = 0
+            elif self._read_offset - HEADER.size >= self.compact_after:
+                self._compact()
+            self._write_header()
+        self._update_gauges()
+
+    def sync(self):
+        with self._lock:
+            self._map.flush()
+
+    def close(self):
+        with self._lock:
+            self._map.flush()
+            self._map.close()
+            self._file.close()
+
+    def _compact(self):
+        # called with the lock held
+        read = self._read_offset - HEADER.size
+        pending = self.pending_bytes()
+        if read == 0 or pending > read:
+            return
+        self._map.move(HEADER.size, self._read_offset, pending)
+        self._read_offset = HEADER.size
+        self._write_offset = HEADER.size + pending
+        self._write_header()
+        COMPACTIONS.inc()
+
+    def _write_header(self):
+        HEADER.pack_into(
+            self._map, 0, MAGIC, VERSION,
+            self._read_offset, self._write_offset
+        )
+
+    def _recover(self):
+        magic, version, read_offset, write_offset = HEADER.unpack_from(
+            self._map, 0
+        )
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{self.path} is not an event spool")
+
+        # keep the records up to the first one that does not check out
+        count = 0
+        offset = read_offset
+        while offset < write_offset:
+            if offset + RECORD_HEADER.size > write_offset:
+                break
+            length, checksum = RECORD_HEADER.unpack_from(self._map, offset)
+            start = offset + RECORD_HEADER.size
+            if start + length > write_offset or \
+                    zlib.crc32(self._map[start:start + length]) != checksum:
+                break
+            offset = start + length
+            count += 1
+        if offset != write_offset:
+            logger.error(
+                "Discarding %d corrupt bytes at the end of %s",
+                write_offset - offset, self.path
+            )
+        self._read_offset, self._write_offset = read_offset, offset
+        self._count = count
+        self._write_header()
+        self._update_gauges()
+
+    def _update_gauges(self):
+        SPOOL_BYTES.set(self.pending_bytes())
+        SPOOL_EVENTS.set(self._count)
+
+
+def create_record(
+    body: Union[str, bytes],
+    event_type: str,
+    message_id: str,
+    content_encoding: str = None,
+    headers: Dict = None
+) -> Dict:
+    # binary bodies are stored base64 encoded
+    record = {
+        "event_type": event_type,
+        "message_id": message_id,
+        "content_encoding": content_encoding,
+        "headers": headers,
+    }
+    if isinstance(body, bytes):
+        record["body_base64"] = base64.b64encode(body).decode("ascii")
+    else:
+        record["body"] = body
+    return record
+
+
+def record_body(record: Dict) -> Union[str, bytes]:
+    if "body_base64" in record:
+        return base64.b64decode(record["body_base64"])
+    return record["body"]
+
+
+def open_spool(
+    directory: str,
+    max_bytes: int = 64 * 1024 * 1024,
+    max_files: int = 64
+) -> MmapSpool:
+    # each process takes the first spool file no other process holds, so
+    # a restarted worker picks up what its predecessor left behind
+    os.makedirs(directory, exist_ok=True)
+    for number in range(max_files):
+        try:
+            return MmapSpool(
+                os.path.join(directory, f"events-{number}.spool"), max_bytes
+            )
+        except SpoolLocked:
+            continue
+    raise SpoolLocked(f"All {max_files} spool files in {directory} are in use")
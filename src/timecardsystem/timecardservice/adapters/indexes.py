@@ -0,0 +1,72 @@
+import logging
+from dataclasses import dataclass, field
+from typing import List
+
+import pymongo
+from pymongo.collection import Collection
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_INDEX_NAME = "_id_"
+
+
+@dataclass
+class IndexReport:
+    collection_name: str
+    created: List[str] = field(default_factory=list)
+    mismatched: List[str] = field(default_factory=list)
+    extra: List[str] = field(default_factory=list)
+
+    @property
+    def in_sync(self) -> bool:
+        return not (self.created or self.mismatched or self.extra)
+
+
+def _index_name(index_model: pymongo.IndexModel) -> str:
+    return index_model.document["name"]
+
+
+def _matches(index_model: pymongo.IndexModel, index_info: dict) -> bool:
+    declared_keys = list(index_model.document["key"].items())
+    existing_keys = [tuple(key) for key in index_info["key"]]
+    declared_unique = bool(index_model.document.get("unique", False))
+    existing_unique = bool(index_info.get("unique", False))
+    return declared_keys == existing_keys \
+        and declared_unique == existing_unique
+
+
+def ensure_indexes(
+    collection: Collection,
+    index_models: List[pymongo.IndexModel]
+) -> IndexReport:
+    # creates declared indexes that are missing, and reports indexes whose
+    # definition differs from the declaration or that are not declared at
+    # all. Existing indexes are never dropped automatically.
+    report = IndexReport(collection.name)
+    existing = collection.index_information()
+
+    missing = []
+    for index_model in index_models:
+        name = _index_name(index_model)
+        if name not in existing:
+            missing.append(index_model)
+        elif not _matches(index_model, existing[name]):
+            report.mismatched.append(name)
+
+    if missing:
+        collection.create_indexes(missing)
+        report.created = [_index_name(model) for model in missing]
+
+    declared = {_index_name(model) for model in index_models}
+    report.extra = sorted(
+        name for name in existing
+        if name not in declared and name != DEFAULT_INDEX_NAME
+    )
+
+    if report.mismatched or report.extra:
+        logger.warning(
+            "Indexes on %s differ from declaration; mismatched: %s, "
+            "extra: %s",
+            report.collection_name, report.mismatched, report.extra
+        )
+    return report
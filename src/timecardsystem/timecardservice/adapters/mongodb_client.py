@@ -0,0 +1,52 @@
+import os
+import threading
+from typing import Callable, Dict
+
+import pymongo
+
+from timecardsystem.timecardservice import config
+
+_clients: Dict[str, pymongo.MongoClient] = {}
+_clients_pid: int = None
+_lock = threading.Lock()
+
+
+def get_client(
+    uri: str,
+    initializer: Callable[[pymongo.MongoClient], None] = None
+) -> pymongo.MongoClient:
+    # MongoClient is thread-safe and keeps its own connection pool, so one
+    # instance per URI is shared by every request handled in this process.
+    # Clients must not be carried across a fork, so a child process (e.g. a
+    # pre-forked web worker) starts with an empty cache. The initializer
+    # (schema and index setup) runs once, before the client is shared.
+    global _clients_pid
+    pid = os.getpid()
+    client = _clients.get(uri) if _clients_pid == pid else None
+    if client is not None:
+        return client
+
+    with _lock:
+        if _clients_pid != pid:
+            _clients.clear()
+            _clients_pid = pid
+        client = _clients.get(uri)
+        if client is None:
+            client = pymongo.MongoClient(
+                uri, maxPoolSize=config.get_mongodb_max_pool_size()
+            )
+            if initializer:
+                try:
+                    initializer(client)
+                except Exception:
+                    client.close()
+                    raise
+            _clients[uri] = client
+    return client
+
+
+def close_clients():
+    with _lock:
+        for client in _clients.values():
+            client.close()
+        _clients.clear()
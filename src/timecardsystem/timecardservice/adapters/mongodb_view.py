@@ -1,19 +1,84 @@
 from datetime import datetime
-from typing import Dict
+from typing import Dict, Iterable, List, Set, Tuple
 
 import pymongo
 
 from timecardsystem.timecardservice.domain import model
 from timecardsystem.common.domain import model as common_model
 from timecardsystem.timecardservice import config
+from timecardsystem.timecardservice.adapters import indexes, mongodb_client
 
 DATABASE_NAME = "view_database"
 EMPLOYEES_VIEW_COLLECTION_NAME = "view_employees"
 TIMECARDS_VIEW_COLLECTION_NAME = "view_timecards"
+PROCESSED_MESSAGES_COLLECTION_NAME = "processed_messages"
+
+TIMECARDS_VIEW_INDEXES = [
+    pymongo.IndexModel(
+        [("timecard_id", pymongo.ASCENDING)],
+        name="timecard_id",
+        unique=True
+    ),
+    # serves the keyset-paginated timecards_page_for_employee query
+    pymongo.IndexModel(
+        [
+            ("employee_id", pymongo.ASCENDING),
+            ("week_ending_date", pymongo.ASCENDING),
+            ("timecard_id", pymongo.ASCENDING)
+        ],
+        name="employee_id_week_ending_date_timecard_id"
+    ),
+    # serves the per-week export
+    pymongo.IndexModel(
+        [
+            ("week_ending_date", pymongo.ASCENDING),
+            ("timecard_id", pymongo.ASCENDING)
+        ],
+        name="week_ending_date_timecard_id"
+    ),
+]
+
+EMPLOYEES_VIEW_INDEXES = []
+
+# the ids of messages the event consumer has projected are kept this long;
+# a redelivery arriving later is projected again
+PROCESSED_MESSAGES_RETENTION_SECONDS = 7 * 24 * 60 * 60
+
+PROCESSED_MESSAGES_INDEXES = [
+    pymongo.IndexModel(
+        [("processed_at", pymongo.ASCENDING)],
+        name="processed_at_ttl",
+        expireAfterSeconds=PROCESSED_MESSAGES_RETENTION_SECONDS
+    ),
+]
+
+DUPLICATE_KEY_ERROR = 11000
+
+
+def ensure_indexes(client) -> List[indexes.IndexReport]:
+    view_db = client[DATABASE_NAME]
+    return [
+        indexes.ensure_indexes(
+            view_db[TIMECARDS_VIEW_COLLECTION_NAME], TIMECARDS_VIEW_INDEXES
+        ),
+        indexes.ensure_indexes(
+            view_db[EMPLOYEES_VIEW_COLLECTION_NAME], EMPLOYEES_VIEW_INDEXES
+        ),
+        indexes.ensure_indexes(
+            view_db[PROCESSED_MESSAGES_COLLECTION_NAME],
+            PROCESSED_MESSAGES_INDEXES
+        ),
+    ]
+
+
+def get_view_client() -> pymongo.MongoClient:
+    return mongodb_client.get_client(
+        config.get_mongodb_view_uri(), initializer=ensure_indexes
+    )
 
 
 def _connect_to_view_database():
-    client = pymongo.MongoClient(config.get_mongodb_view_uri())
+    client = get_view_client()
     view_db = client[DATABASE_NAME]
     return view_db
 
@@ -37,27 +102,23 @@ def add_employee_to_view_model(
 ):
     view_db = _connect_to_view_database()
     employees_view_c = view_db[EMPLOYEES_VIEW_COLLECTION_NAME]
-    row_data = {
-        "_id": employee_id.value,
-        "name": employee_name.value
-    }
-    employees_view_c.replace_one(
+    # $set rather than a replacement, so the timecards version kept on the
+    # same document survives
+    employees_view_c.update_one(
         filter={"_id": employee_id.value},
-        replacement=row_data,
+        update={"$set": {"name": employee_name.value}},
         upsert=True
     )
 
 
-def add_timecard_to_view_model(
+def create_timecard_row(
     employee_id: common_model.EmployeeID,
     employee_name: common_model.EmployeeName,
     timecard_id: common_model.TimecardID,
     week_ending_date: datetime,
     dates_and_hours: Dict[datetime, model.WorkDayHours]
-):
-    view_db = _connect_to_view_database()
-    timecards_view_c = view_db[TIMECARDS_VIEW_COLLECTION_NAME]
-    row_data = {
+) -> Dict:
+    return {
         "employee_id": employee_id.value,
         "employee_name": employee_name.value,
         "timecard_id": timecard_id.value,
@@ -66,8 +127,113 @@ def add_timecard_to_view_model(
             dates_and_hours
         )
     }
+
+
+# every change to an employee's timecards bumps a version counter on the
+# employee's view document; HTTP caching validators are derived from it
+# with a single _id lookup.
+TIMECARDS_VERSION_UPDATE = {
+    "$inc": {"timecards_version": 1},
+    "$currentDate": {"timecards_modified_at": True}
+}
+
+
+def add_timecard_to_view_model(
+    employee_id: common_model.EmployeeID,
+    employee_name: common_model.EmployeeName,
+    timecard_id: common_model.TimecardID,
+    week_ending_date: datetime,
+    dates_and_hours: Dict[datetime, model.WorkDayHours]
+):
+    view_db = _connect_to_view_database()
+    timecards_view_c = view_db[TIMECARDS_VIEW_COLLECTION_NAME]
+    row_data = create_timecard_row(
+        employee_id,
+        employee_name,
+        timecard_id,
+        week_ending_date,
+        dates_and_hours
+    )
     timecards_view_c.replace_one(
         filter={"timecard_id": timecard_id.value},
         replacement=row_data,
         upsert=True
     )
+    view_db[EMPLOYEES_VIEW_COLLECTION_NAME].update_one(
+        filter={"_id": employee_id.value},
+        update=TIMECARDS_VERSION_UPDATE,
+        upsert=True
+    )
+
+
+def add_employees_to_view_model_bulk(
+    employees: List[Tuple[common_model.EmployeeID, common_model.EmployeeName]]
+):
+    # one bulk write for a batch of employees, applied in order
+    if not employees:
+        return
+    view_db = _connect_to_view_database()
+    view_db[EMPLOYEES_VIEW_COLLECTION_NAME].bulk_write([
+        pymongo.UpdateOne(
+            {"_id": employee_id.value},
+            {"$set": {"name": employee_name.value}},
+            upsert=True
+        )
+        for employee_id, employee_name in employees
+    ])
+
+
+def add_timecards_to_view_model_bulk(rows: List[Dict]):
+    # rows are built by create_timecard_row. Replaced in order, so the last
+    # row of a timecard wins; each employee's timecards version is bumped
+    # once per batch.
+    if not rows:
+        return
+    view_db = _connect_to_view_database()
+    view_db[TIMECARDS_VIEW_COLLECTION_NAME].bulk_write([
+        pymongo.ReplaceOne(
+            {"timecard_id": row["timecard_id"]}, row, upsert=True
+        )
+        for row in rows
+    ])
+    employee_ids = dict.fromkeys(row["employee_id"] for row in rows)
+    view_db[EMPLOYEES_VIEW_COLLECTION_NAME].bulk_write([
+        pymongo.UpdateOne(
+            {"_id": employee_id}, TIMECARDS_VERSION_UPDATE, upsert=True
+        )
+        for employee_id in employee_ids
+    ])
+
+
+def processed_message_ids(message_ids: Iterable[str]) -> Set[str]:
+    # those of message_ids recorded as processed, in one query
+    message_ids = list(message_ids)
+    if not message_ids:
+        return set()
+    view_db = _connect_to_view_database()
+    return {
+        document["_id"]
+        for document in view_db[PROCESSED_MESSAGES_COLLECTION_NAME].find(
+            {"_id": {"$in": message_ids}}, projection={"_id": True}
+        )
+    }
+
+
+def record_processed_messages(message_ids: Iterable[str]):
+    # ids recorded before, by a redelivery handled twice, are left as they
+    # are
+    documents = [
+        {"_id": message_id, "processed_at": datetime.utcnow()}
+        for message_id in message_ids
+    ]
+    if not documents:
+        return
+    view_db = _connect_to_view_database()
+    try:
+        view_db[PROCESSED_MESSAGES_COLLECTION_NAME].insert_many(
+            documents, ordered=False
+        )
+    except pymongo.errors.BulkWriteError as err:
+        if any(error["code"] != DUPLICATE_KEY_ERROR
+               for error in err.details["writeErrors"]):
+            raise
@@ -1,10 +1,15 @@
-from typing import Dict
+import hashlib
+import json
+from typing import Dict, List
 import pymongo
 from collections import OrderedDict
 
+from timecardsystem.timecardservice.adapters import indexes
+
 DATABASE_NAME = "timecard-service"
 TIMECARDS_COLLECTION_NAME = "timecards"
 EMPLOYEES_COLLECTION_NAME = "employees"
+OUTBOX_COLLECTION_NAME = "outbox"
 
 TIMECARD_SCHEMA = {
     "employee_id": {
@@ -32,6 +37,36 @@ EMPLOYEE_SCHEMA = {
     }
 }
 
+# the employee_id prefix also serves lookups by employee alone
+TIMECARD_INDEXES = [
+    pymongo.IndexModel(
+        [
+            ("employee_id", pymongo.ASCENDING),
+            ("week_ending_date", pymongo.ASCENDING)
+        ],
+        name="employee_id_week_ending_date"
+    ),
+]
+
+EMPLOYEE_INDEXES = []
+
+# published outbox entries are kept this long for troubleshooting
+OUTBOX_RETENTION_SECONDS = 7 * 24 * 60 * 60
+
+OUTBOX_INDEXES = [
+    # serves the relay's scan for unpublished entries in insertion order
+    pymongo.IndexModel(
+        [("published_at", pymongo.ASCENDING), ("_id", pymongo.ASCENDING)],
+        name="published_at_id"
+    ),
+    # unpublished entries have no date, so only published ones expire
+    pymongo.IndexModel(
+        [("published_at", pymongo.ASCENDING)],
+        name="published_at_ttl",
+        expireAfterSeconds=OUTBOX_RETENTION_SECONDS
+    ),
+]
+
 
 def create_validator(schema: Dict[str, str]):
     validator = {
@@ -56,39 +91,90 @@ def create_validator(schema: Dict[str, str]):
     return validator
 
 
-def startup_timecards_collection(client):
-    database = client[DATABASE_NAME]
-    # create schema
-    validator = create_validator(TIMECARD_SCHEMA)
+def fingerprint_validator(validator: Dict) -> str:
+    canonical = json.dumps(validator, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def _get_collection_options(database, collection_name: str):
+    for collection_info in database.list_collections(
+        filter={"name": collection_name}
+    ):
+        return collection_info.get("options", {})
+    return None
 
-    try:
-        database.create_collection(TIMECARDS_COLLECTION_NAME)
-    except pymongo.errors.CollectionInvalid:
-        pass
+
+def ensure_collection_schema(
+    client,
+    collection_name: str,
+    schema: Dict[str, Dict]
+) -> bool:
+    # creates the collection and issues collMod only when the validator
+    # stored on the server differs from the one built from the schema.
+    # Returns True if anything was changed.
+    database = client[DATABASE_NAME]
+    validator = create_validator(schema)
+
+    options = _get_collection_options(database, collection_name)
+    if options is None:
+        try:
+            database.create_collection(
+                collection_name, validator=validator
+            )
+            return True
+        except pymongo.errors.CollectionInvalid:
+            # created concurrently by another process
+            options = _get_collection_options(database, collection_name)
+
+    current_validator = options.get("validator", {})
+    if fingerprint_validator(current_validator) == \
+            fingerprint_validator(validator):
+        return False
 
     # add schema validation
-    query = [('collMod', TIMECARDS_COLLECTION_NAME), ('validator', validator)]
+    query = [('collMod', collection_name), ('validator', validator)]
     command_result = database.command(OrderedDict(query))
 
     # if our schema was rejected, fail everything
     if not command_result.get("ok", False):
         raise Exception
+    return True
 
 
-def startup_employees_collection(client):
-    database = client[DATABASE_NAME]
-    # create schema
-    validator = create_validator(EMPLOYEE_SCHEMA)
+def startup_timecards_collection(client) -> bool:
+    return ensure_collection_schema(
+        client, TIMECARDS_COLLECTION_NAME, TIMECARD_SCHEMA
+    )
 
-    try:
-        database.create_collection(EMPLOYEES_COLLECTION_NAME)
-    except pymongo.errors.CollectionInvalid:
-        pass
 
-    # add schema validation
-    query = [('collMod', EMPLOYEES_COLLECTION_NAME), ('validator', validator)]
-    command_result = database.command(OrderedDict(query))
+def startup_employees_collection(client) -> bool:
+    return ensure_collection_schema(
+        client, EMPLOYEES_COLLECTION_NAME, EMPLOYEE_SCHEMA
+    )
 
-    # if our schema was rejected, fail everything
-    if not command_result.get("ok", False):
-        raise Exception
+
+def ensure_schema(client) -> Dict[str, bool]:
+    return {
+        TIMECARDS_COLLECTION_NAME: startup_timecards_collection(client),
+        EMPLOYEES_COLLECTION_NAME: startup_employees_collection(client),
+    }
+
+
+def ensure_indexes(client) -> List[indexes.IndexReport]:
+    database = client[DATABASE_NAME]
+    return [
+        indexes.ensure_indexes(
+            database[TIMECARDS_COLLECTION_NAME], TIMECARD_INDEXES
+        ),
+        indexes.ensure_indexes(
+            database[EMPLOYEES_COLLECTION_NAME], EMPLOYEE_INDEXES
+        ),
+        indexes.ensure_indexes(
+            database[OUTBOX_COLLECTION_NAME], OUTBOX_INDEXES
+        ),
+    ]
+
+
+def initialize_database(client):
+    ensure_schema(client)
+    ensure_indexes(client)
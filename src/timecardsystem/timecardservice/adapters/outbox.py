@@ -0,0 +1,105 @@
+import json
+from datetime import datetime
+from typing import Dict, Iterable, List
+
+import pymongo
+from pymongo.database import Database
+from timecardsystem.common.domain import events as common_events
+from timecardsystem.common.dtos import message_dto
+from timecardsystem.timecardservice import config
+from timecardsystem.timecardservice.adapters import odm
+from timecardsystem.timecardservice.domain import events
+
+# Transactional outbox: the unit of work stores the events to publish next
+# to the writes that raised them, and the outbox relay publishes them to the
+# message broker afterwards. Entries are serialized once, on write, so the
+# relay only moves bytes.
+
+
+def create_outbox_document(event: common_events.Event) -> Dict:
+    dto = message_dto.MessagePublisherDTO(
+        binary=config.get_binary_event_encoding()
+    )
+    dto.set_serializer(json.dumps)
+    dto.serialize_outgoing_message(event)
+    return {
+        "name": events.PUBLISHED_EVENT_NAMES[type(event)],
+        "event_type": dto.message_properties,
+        "content_encoding": dto.content_encoding,
+        "headers": dto.headers,
+        "message_id": dto.message_id,
+        "body": dto.serialized_message,
+        "created_at": datetime.utcnow(),
+        "published_at": None,
+    }
+
+
+def create_outbox_documents(
+    raised_events: Iterable[common_events.Event]
+) -> List[Dict]:
+    return [
+        create_outbox_document(event)
+        for event in raised_events
+        if type(event) in events.PUBLISHED_EVENT_NAMES
+    ]
+
+
+class PendingEvents:
+    # tracks which events raised on a unit of work's aggregates were already
+    # written to the outbox, so committing twice does not write them twice.
+    # The events are referenced to keep their ids from being reused.
+
+    def __init__(self) -> None:
+        self._written: Dict[int, common_events.Event] = {}
+
+    def take(self, aggregates: Iterable) -> List[common_events.Event]:
+        taken = []
+        for aggregate in aggregates:
+            for event in aggregate.events:
+                if id(event) not in self._written:
+                    self._written[id(event)] = event
+                    taken.append(event)
+        return taken
+
+
+def _outbox_collection(database: Database):
+    return database[odm.OUTBOX_COLLECTION_NAME]
+
+
+class MongoDBOutbox:
+
+    def __init__(self, database: Database) -> None:
+        self.collection = _outbox_collection(database)
+
+    def add_all(self, documents: List[Dict], session=None):
+        # written in session's transaction, so the entries are committed or
+        # aborted together with the writes that raised their events
+        if documents:
+            self.collection.insert_many(
+                documents, ordered=True, session=session
+            )
+
+    def fetch_pending(self, limit: int) -> List[Dict]:
+        cursor = self.collection.find(
+            {"published_at": None},
+            sort=[("published_at", pymongo.ASCENDING),
+                  ("_id", pymongo.ASCENDING)],
+            limit=limit
+        )
+        return [doc for doc in cursor]
+
+    def mark_published(self, ids: List) -> int:
+        if not ids:
+            return 0
+        result = self.collection.update_many(
+            {"_id": {"$in": ids}},
+            {"$currentDate": {"published_at": True}}
+        )
+        return result.modified_count
+
+    def oldest_pending(self) -> Dict:
+        return self.collection.find_one(
+            {"published_at": None},
+            sort=[("published_at", pymongo.ASCENDING),
+                  ("_id", pymongo.ASCENDING)]
+        )
@@ -0,0 +1,67 @@
+import threading
+from collections import OrderedDict
+from typing import Iterable, Set
+
+from timecardsystem.timecardservice.adapters import mongodb_view
+
+# Remembers the ids of the messages a consumer has handled, so that
+# redeliveries can be acknowledged without handling them again. The last
+# max_size ids are kept in memory, least recently seen first out, and
+# checked with a single dictionary lookup as each message arrives. With
+# persistent set they are also recorded in the view database, where a TTL
+# index expires them, so a message redelivered after a restart or to
+# another worker process is recognized too. Checked and recorded from
+# different threads.
+
+
+class ProcessedMessages:
+
+    def __init__(self, max_size: int = 100000, persistent: bool = True):
+        if max_size < 1:
+            raise ValueError("max_size must be at least 1")
+        self.max_size = max_size
+        self.persistent = persistent
+        self._recent: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __contains__(self, message_id: str) -> bool:
+        # in memory only
+        with self._lock:
+            if message_id not in self._recent:
+                return False
+            self._recent.move_to_end(message_id)
+            return True
+
+    def __len__(self) -> int:
+        return len(self._recent)
+
+    def processed(self, message_ids: Iterable[str]) -> Set[str]:
+        # those of message_ids handled before, looking the ones not in
+        # memory up in one query
+        message_ids = list(message_ids)
+        known = {
+            message_id for message_id in message_ids if message_id in self
+        }
+        if self.persistent:
+            stored = mongodb_view.processed_message_ids(
+                message_id for message_id in message_ids
+                if message_id not in known
+            )
+            self._remember(stored)
+            known |= stored
+        return known
+
+    def record(self, message_ids: Iterable[str]):
+        # remembered in memory even if the store cannot be written
+        message_ids = list(message_ids)
+        self._remember(message_ids)
+        if self.persistent:
+            mongodb_view.record_processed_messages(message_ids)
+
+    def _remember(self, message_ids: Iterable[str]):
+        with self._lock:
+            for message_id in message_ids:
+                self._recent[message_id] = None
+                self._recent.move_to_end(message_id)
+            while len(self._recent) > self.max_size:
+                self._recent.popitem(last=False)
@@ -1,39 +1,1150 @@
+import collections
+import contextlib
+import itertools
 import json
+import logging
+import os
+import queue
+import threading
+import time
+from concurrent import futures as concurrent_futures
+from concurrent.futures import Future
+from typing import Callable, Dict, Iterator, List, Optional, Tuple, Union
 
 import pika
 from timecardsystem.common.domain import events
 from timecardsystem.common.dtos import message_dto
-from timecardsystem.timecardservice import config
+from timecardsystem.timecardservice import config, metrics
+from timecardsystem.timecardservice.adapters import event_spool
+
+logger = logging.getLogger(__name__)
 
 HOST, PORT = config.get_rabbitmq_host_and_port()
 
+# Events are published to a topic exchange with a routing key derived from
+# their type, and each consumer's queue is bound to the keys it handles, so
+# the broker only delivers a consumer the events it wants. The queues in
+# BINDINGS are declared by the publisher as well as by their consumers, so
+# events published before a consumer first starts are not dropped.
+EXCHANGE_NAME = config.get_rabbitmq_exchange()
+BINDINGS = config.get_rabbitmq_bindings()
 
-def publish_event(name, event: events.Event):
-    dto = message_dto.MessagePublisherDTO()
-    dto.set_serializer(json.dumps)
-    dto.serialize_outgoing_message(event)
+# bound to every routing key by default, for the service's own consumer
+QUEUE_NAME = "test"
+
+# with dead lettering, messages a consumer rejects go to the queue's own
+# dead-letter queue through this exchange
+DEAD_LETTERING = config.get_rabbitmq_dead_lettering()
+DEAD_LETTER_EXCHANGE_NAME = f"{EXCHANGE_NAME}.dead-letter"
+
+# with the retry failure policy, a consumer republishes a failed message to
+# one of its queue's retry queues, one per delay, which return it to the
+# queue once it has waited there for the delay, and parks it in the queue's
+# parking queue once it has failed MAX_ATTEMPTS times. Both are reached
+# through the default exchange, by queue name. A retried message returns to
+# its partition only after its delay, behind the employee's later events,
+# so with PARTITIONS the retry policy gives up per-employee ordering for
+# the messages it retries.
+RETRYING = config.get_rabbitmq_consumer_failure_policy() == "retry"
+RETRY_DELAY = config.get_rabbitmq_consumer_retry_delay()
+MAX_ATTEMPTS = config.get_rabbitmq_consumer_max_attempts()
+
+ROUTING_KEYS = {
+    "EmployeeCreated": "employee.created",
+    "TimecardCreated": "timecard.created",
+    "TimecardSubmittedForProcessing": "timecard.submitted",
+}
+
+# errors after which a pooled connection is discarded and the publish is
+# retried on a new one
+CONNECTION_ERRORS = (
+    pika.exceptions.AMQPConnectionError,
+    pika.exceptions.AMQPChannelError,
+    pika.exceptions.StreamLostError,
+    OSError,
+)
+
+OPEN_CONNECTIONS = metrics.gauge(
+    "timecardservice_publisher_open_connections",
+    "Broker connections held by the event publisher."
+)
+
+RECONNECTS = metrics.counter(
+    "timecardservice_publisher_reconnects",
+    "Publishes retried on a new connection after a connection error."
+)
 
-    connection = pika.BlockingConnection(
+CONFIRM_OUTCOMES = metrics.counter(
+    "timecardservice_publisher_confirm_outcomes",
+    "Buffered publishes by broker confirm outcome.",
+    ("outcome",)
+)
+
+UNCONFIRMED_MESSAGES = metrics.gauge(
+    "timecardservice_publisher_unconfirmed_messages",
+    "Buffered publishes waiting to be sent or confirmed."
+)
+
+CONFIRM_DURATION = metrics.histogram(
+    "timecardservice_publisher_confirm_duration_seconds",
+    "Time from a buffered publish to the broker's confirm."
+)
+
+REPLAYED_EVENTS = metrics.counter(
+    "timecardservice_event_spool_replayed_events",
+    "Spooled events published to the broker by the replayer."
+)
+
+FLUSH_SIZE = metrics.histogram(
+    "timecardservice_publisher_flush_size",
+    "Messages sent per flush of the publish buffer.",
+    buckets=(1, 10, 50, 100, 250, 500, 1000, 2500, 5000)
+)
+
+
+def connect() -> pika.BlockingConnection:
+    return pika.BlockingConnection(
         pika.ConnectionParameters(
             host=HOST,
             port=PORT
         )
     )
-    channel = connection.channel()
 
-    channel.queue_declare(
-        queue="test",
-        durable=True,
-        exclusive=False,
-        auto_delete=False
-    )
 
+def routing_key_for(event_type: str) -> str:
+    return ROUTING_KEYS[event_type]
+
+
+# with partitions, each bound queue is a group of queue.0 to queue.N-1,
+# bound to a consistent-hash exchange that spreads events over them by the
+# partition key header, so all the events of an employee reach the same
+# queue in the order they were published. This needs the broker's
+# rabbitmq_consistent_hash_exchange plugin.
+PARTITIONS = config.get_rabbitmq_partitions()
+
+
+def partition_exchange_name(queue_name: str) -> str:
+    return f"{EXCHANGE_NAME}.{queue_name}"
+
+
+def partition_queue_name(queue_name: str, partition: int) -> str:
+    return f"{queue_name}.{partition}"
+
+
+def dead_letter_queue_name(queue_name: str) -> str:
+    return f"{queue_name}.dead-letter"
+
+
+def retry_delays(max_attempts: int = None) -> Tuple[float, ...]:
+    # the seconds a message waits after each failed attempt but the last,
+    # doubling from RETRY_DELAY
+    if max_attempts is None:
+        max_attempts = MAX_ATTEMPTS
+    return tuple(RETRY_DELAY * 2 ** attempt
+                 for attempt in range(max_attempts - 1))
+
+
+def retry_queue_name(queue_name: str, delay: float) -> str:
+    # a queue's TTL is fixed when it is declared, so a new delay makes a
+    # new queue
+    return f"{queue_name}.retry.{int(delay * 1000)}ms"
+
+
+def parking_queue_name(queue_name: str) -> str:
+    return f"{queue_name}.parked"
+
+
+def return_destination(queue_name: str) -> Tuple[str, str]:
+    # the exchange and routing key that put a retried or replayed message
+    # back on queue_name: the queue itself through the default exchange,
+    # or for a partitioned queue its group's exchange, which hashes the
+    # message's partition key header to the partition it came from
+    if PARTITIONS:
+        return partition_exchange_name(queue_name), queue_name
+    return "", queue_name
+
+
+def queue_arguments(queue_name: str) -> Optional[Dict]:
+    # rejected messages keep their original routing key in the x-death
+    # header
+    if not DEAD_LETTERING:
+        return None
+    return {
+        "x-dead-letter-exchange": DEAD_LETTER_EXCHANGE_NAME,
+        "x-dead-letter-routing-key": queue_name,
+    }
+
+
+def _queue_declarations(
+    queue_name: str,
+    exchange: str,
+    binding_keys: Tuple[str, ...],
+    arguments: Dict = None
+) -> List[Tuple[str, Dict]]:
+    declarations = []
+    if DEAD_LETTERING:
+        declarations += [
+            ("queue_declare", {
+                "queue": dead_letter_queue_name(queue_name),
+                "durable": True,
+                "exclusive": False,
+                "auto_delete": False,
+            }),
+            ("queue_bind", {
+                "queue": dead_letter_queue_name(queue_name),
+                "exchange": DEAD_LETTER_EXCHANGE_NAME,
+                "routing_key": queue_name,
+            }),
+        ]
+    queue_declare_arguments = queue_arguments(queue_name)
+    if arguments:
+        queue_declare_arguments = {
+            **(queue_declare_arguments or {}), **arguments
+        }
+    declarations.append(("queue_declare", {
+        "queue": queue_name,
+        "durable": True,
+        "exclusive": False,
+        "auto_delete": False,
+        "arguments": queue_declare_arguments,
+    }))
+    for binding_key in binding_keys:
+        declarations.append(("queue_bind", {
+            "queue": queue_name,
+            "exchange": exchange,
+            "routing_key": binding_key,
+        }))
+    return declarations
+
+
+def _partition_declarations(
+    queue_name: str,
+    binding_keys: Tuple[str, ...]
+) -> List[Tuple[str, Dict]]:
+    # the group's exchange receives what the queue would have, and each
+    # partition has an equal weight on its hash ring. A partition has a
+    # single active consumer, so a second worker subscribing to it waits
+    # until the first lets go.
+    exchange = partition_exchange_name(queue_name)
+    declarations = [("exchange_declare", {
+        "exchange": exchange,
+        "exchange_type": "x-consistent-hash",
+        "durable": True,
+        "arguments": {"hash-header": message_dto.PARTITION_KEY_HEADER},
+    })]
+    for binding_key in binding_keys:
+        declarations.append(("exchange_bind", {
+            "destination": exchange,
+            "source": EXCHANGE_NAME,
+            "routing_key": binding_key,
+        }))
+    for partition in range(PARTITIONS):
+        declarations += _queue_declarations(
+            partition_queue_name(queue_name, partition),
+            exchange,
+            ("1",),
+            {"x-single-active-consumer": True}
+        )
+    return declarations
+
+
+def _retry_declarations(
+    queue_name: str,
+    delays: Tuple[float, ...]
+) -> List[Tuple[str, Dict]]:
+    exchange, routing_key = return_destination(queue_name)
+    declarations = [("queue_declare", {
+        "queue": parking_queue_name(queue_name),
+        "durable": True,
+        "exclusive": False,
+        "auto_delete": False,
+    })]
+    for delay in delays:
+        declarations.append(("queue_declare", {
+            "queue": retry_queue_name(queue_name, delay),
+            "durable": True,
+            "exclusive": False,
+            "auto_delete": False,
+            "arguments": {
+                "x-message-ttl": int(delay * 1000),
+                "x-dead-letter-exchange": exchange,
+                "x-dead-letter-routing-key": routing_key,
+            },
+        }))
+    return declarations
+
+
+def topology_declarations(
+    bindings: Dict[str, Tuple[str, ...]] = None,
+    delays: Tuple[float, ...] = None
+) -> List[Tuple[str, Dict]]:
+    # the channel methods and arguments declaring the exchange and the
+    # bound queues, shared by blocking and asynchronous channels. With
+    # delays, or by default with RETRYING, each queue also gets a parking
+    # queue and a retry queue per delay.
+    if delays is None and RETRYING:
+        delays = retry_delays()
+    declarations = [("exchange_declare", {
+        "exchange": EXCHANGE_NAME,
+        "exchange_type": "topic",
+        "durable": True,
+    })]
+    if DEAD_LETTERING:
+        declarations.append(("exchange_declare", {
+            "exchange": DEAD_LETTER_EXCHANGE_NAME,
+            "exchange_type": "direct",
+            "durable": True,
+        }))
+    for queue_name, binding_keys in (bindings or BINDINGS).items():
+        if PARTITIONS:
+            declarations += _partition_declarations(queue_name, binding_keys)
+        else:
+            declarations += _queue_declarations(
+                queue_name, EXCHANGE_NAME, binding_keys
+            )
+        if delays is not None:
+            declarations += _retry_declarations(queue_name, delays)
+    return declarations
+
+
+def declare_topology(channel, bindings: Dict[str, Tuple[str, ...]] = None):
+    for method, arguments in topology_declarations(bindings):
+        getattr(channel, method)(**arguments)
+
+
+def declare_topology_async(
+    channel,
+    callback: Callable[[], None],
+    bindings: Dict[str, Tuple[str, ...]] = None,
+    delays: Tuple[float, ...] = None
+):
+    # declares one after the other on a SelectConnection channel, then
+    # calls callback
+    def declare(declarations):
+        if not declarations:
+            callback()
+            return
+        (method, arguments), remaining = declarations[0], declarations[1:]
+        getattr(channel, method)(
+            callback=lambda _frame: declare(remaining), **arguments
+        )
+
+    declare(topology_declarations(bindings, delays))
+
+
+def publish_message(
+    channel,
+    body: Union[str, bytes],
+    event_type: str,
+    message_id: str = None,
+    content_encoding: str = None,
+    headers: Dict = None
+):
     channel.basic_publish(
-        exchange='',
-        routing_key="test",
-        body=dto.serialized_message,
+        exchange=EXCHANGE_NAME,
+        routing_key=routing_key_for(event_type),
+        body=body,
         properties=pika.BasicProperties(
-            content_type=dto.message_properties
+            content_type=event_type,
+            content_encoding=content_encoding,
+            headers=headers,
+            message_id=message_id
         )
     )
-    connection.close()
+
+
+def republished_properties(
+    properties: pika.BasicProperties,
+    headers: Dict
+) -> pika.BasicProperties:
+    # a received message's properties with headers, for publishing it
+    # again under the same message id; persistent, as it may wait in a
+    # queue for a while
+    return pika.BasicProperties(
+        content_type=properties.content_type,
+        content_encoding=properties.content_encoding,
+        message_id=properties.message_id,
+        delivery_mode=2,
+        headers=headers
+    )
+
+
+def serialize_event(event: events.Event) -> message_dto.MessagePublisherDTO:
+    dto = message_dto.MessagePublisherDTO(
+        binary=config.get_binary_event_encoding()
+    )
+    dto.set_serializer(json.dumps)
+    dto.serialize_outgoing_message(event)
+    return dto
+
+
+def serialize_envelopes(
+    batched_events: List[events.Event],
+    max_events: int = 500
+) -> Iterator[Tuple[message_dto.MessagePublisherDTO, int]]:
+    # consecutive events of the same type share envelopes of up to
+    # max_events, so their order is kept and each envelope is routed by
+    # its events' type. A lone event is sent as a plain message. Yields
+    # each message and the number of events in it. With partitions, an
+    # envelope only holds events of one employee, as it reaches a single
+    # partition.
+    if PARTITIONS:
+        def key(event):
+            return type(event), event.employee_id
+    else:
+        key = type
+    for _, run in itertools.groupby(batched_events, key=key):
+        run = list(run)
+        for start in range(0, len(run), max_events):
+            chunk = run[start:start + max_events]
+            if len(chunk) == 1:
+                yield serialize_event(chunk[0]), 1
+                continue
+            dto = message_dto.MessagePublisherDTO(
+                binary=config.get_binary_event_encoding()
+            )
+            dto.set_serializer(json.dumps)
+            dto.serialize_outgoing_batch(chunk)
+            yield dto, len(chunk)
+
+
+class _PooledChannel:
+
+    def __init__(self, connection: pika.BlockingConnection) -> None:
+        self.connection = connection
+        self.channel = connection.channel()
+
+    @property
+    def is_open(self) -> bool:
+        return self.connection.is_open and self.channel.is_open
+
+    def close(self):
+        try:
+            if self.connection.is_open:
+                self.connection.close()
+        except CONNECTION_ERRORS:
+            pass
+
+
+class RabbitMQEventPublisher:
+    # Long-lived publisher shared by every request thread of a process.
+    # pika connections are not thread-safe, so each publish checks a
+    # connection and its channel out of a pool for exclusive use and
+    # returns it afterwards. At most max_connections are open at once;
+    # further publishers wait for one to be returned. The exchange and bound
+    # queues are declared once per process, on the first publish. A
+    # connection that fails is discarded and the publish retried once on a
+    # new connection.
+    #
+    # With a spool, events that cannot be published are appended to it
+    # instead of failing the request, and so is every event after them
+    # until a SpoolReplayer has drained it, which keeps them in order.
+
+    def __init__(
+        self,
+        connection_factory: Callable[[], pika.BlockingConnection] = connect,
+        max_connections: int = 8,
+        spool: event_spool.MmapSpool = None
+    ) -> None:
+        self.connection_factory = connection_factory
+        self.spool = spool
+        self._idle: "queue.LifoQueue[_PooledChannel]" = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(max_connections)
+        self._declare_lock = threading.Lock()
+        self._declared = False
+        self._closed = False
+
+    def publish_event(self, name, event: events.Event):
+        dto = serialize_event(event)
+        self.publish(
+            dto.serialized_message,
+            dto.message_properties,
+            message_id=dto.message_id,
+            content_encoding=dto.content_encoding,
+            headers=dto.headers
+        )
+
+    def publish_events(self, batched_events: List[events.Event],
+                       max_events: int = 500):
+        for dto, _ in serialize_envelopes(batched_events, max_events):
+            self.publish(
+                dto.serialized_message,
+                dto.message_properties,
+                message_id=dto.message_id,
+                content_encoding=dto.content_encoding,
+                headers=dto.headers
+            )
+
+    def publish(
+        self,
+        body: Union[str, bytes],
+        event_type: str,
+        message_id: str = None,
+        content_encoding: str = None,
+        headers: Dict = None
+    ):
+        if self.spool is not None and len(self.spool):
+            self._append_to_spool(
+                body, event_type, message_id, content_encoding, headers
+            )
+            return
+        try:
+            self.publish_to_broker(
+                body, event_type, message_id, content_encoding, headers
+            )
+        except CONNECTION_ERRORS:
+            if self.spool is None:
+                raise
+            logger.warning("Broker unreachable, spooling %s", event_type)
+            self._append_to_spool(
+                body, event_type, message_id, content_encoding, headers
+            )
+
+    def publish_to_broker(
+        self,
+        body: Union[str, bytes],
+        event_type: str,
+        message_id: str = None,
+        content_encoding: str = None,
+        headers: Dict = None
+    ):
+        try:
+            with self.channel() as channel:
+                publish_message(
+                    channel, body, event_type, message_id,
+                    content_encoding, headers
+                )
+        except CONNECTION_ERRORS:
+            RECONNECTS.inc()
+            logger.warning("Publish failed, retrying on a new connection")
+            with self.channel() as channel:
+                publish_message(
+                    channel, body, event_type, message_id,
+                    content_encoding, headers
+                )
+
+    def _append_to_spool(
+        self,
+        body: Union[str, bytes],
+        event_type: str,
+        message_id: str,
+        content_encoding: str,
+        headers: Dict
+    ):
+        self.spool.append(event_spool.create_record(
+            body, event_type, message_id, content_encoding, headers
+        ))
+
+    @contextlib.contextmanager
+    def channel(self) -> Iterator:
+        if self._closed:
+            raise pika.exceptions.ConnectionWrongStateError(
+                "Publisher is closed"
+            )
+        with self._slots:
+            pooled = self._checkout()
+            try:
+                self._ensure_declared(pooled.channel)
+                yield pooled.channel
+            except BaseException:
+                self._discard(pooled)
+                raise
+            self._idle.put(pooled)
+
+    def _checkout(self) -> _PooledChannel:
+        while True:
+            try:
+                pooled = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            try:
+                # idle BlockingConnections only answer broker heartbeats
+                # when events are processed, so catch up before reuse
+                pooled.connection.process_data_events(0)
+            except CONNECTION_ERRORS:
+                self._discard(pooled)
+                continue
+            if pooled.is_open:
+                return pooled
+            self._discard(pooled)
+        pooled = _PooledChannel(self.connection_factory())
+        OPEN_CONNECTIONS.inc()
+        return pooled
+
+    def _ensure_declared(self, channel):
+        if self._declared:
+            return
+        with self._declare_lock:
+            if not self._declared:
+                declare_topology(channel)
+                self._declared = True
+
+    def _discard(self, pooled: _PooledChannel):
+        pooled.close()
+        OPEN_CONNECTIONS.dec()
+
+    def close(self):
+        self._closed = True
+        while True:
+            try:
+                self._discard(self._idle.get_nowait())
+            except queue.Empty:
+                return
+
+
+class SpoolReplayer:
+    # Publishes spooled events, oldest first, on a confirm-mode channel of
+    # its own, opened with the publisher's connection factory, and marks
+    # each one read only once the broker has acknowledged it. A nack or a
+    # connection error leaves the event in the spool; the replayer then
+    # retries with exponential backoff on a new channel. Delivery is at
+    # least once: an event acked just before the process dies is sent
+    # again.
+
+    def __init__(
+        self,
+        spool: event_spool.MmapSpool,
+        publisher: RabbitMQEventPublisher,
+        batch_size: int = 500,
+        poll_interval: float = 0.5,
+        max_backoff: float = 30.0
+    ) -> None:
+        self.spool = spool
+        self.publisher = publisher
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.max_backoff = max_backoff
+        self._stop = threading.Event()
+        self._thread: threading.Thread = None
+        self._channel = None
+
+    def start(self):
+        self._thread = threading.Thread(
+            target=self.run, name="spool-replayer", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self, timeout: float = 10.0):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        self._close_channel()
+
+    def replay_batch(self) -> int:
+        records = self.spool.peek(self.batch_size)
+        if not records:
+            return 0
+        try:
+            channel = self._confirmed_channel()
+            for size, record in records:
+                # returns once the broker has acked the message, and
+                # raises NackError if it was rejected
+                publish_message(
+                    channel,
+                    event_spool.record_body(record),
+                    record["event_type"],
+                    record["message_id"],
+                    record.get("content_encoding"),
+                    record.get("headers")
+                )
+                self.spool.commit(size)
+                REPLAYED_EVENTS.inc()
+        except CONNECTION_ERRORS:
+            self._close_channel()
+            raise
+        return len(records)
+
+    def _confirmed_channel(self):
+        if self._channel is None or not self._channel.is_open:
+            self._close_channel()
+            connection = self.publisher.connection_factory()
+            channel = connection.channel()
+            channel.confirm_delivery()
+            declare_topology(channel)
+            self._channel = channel
+        return self._channel
+
+    def _close_channel(self):
+        channel, self._channel = self._channel, None
+        if channel is None:
+            return
+        try:
+            if channel.connection.is_open:
+                channel.connection.close()
+        except CONNECTION_ERRORS:
+            pass
+
+    def run(self):
+        backoff = self.poll_interval
+        while not self._stop.is_set():
+            try:
+                replayed = self.replay_batch()
+                backoff = self.poll_interval
+            except CONNECTION_ERRORS:
+                logger.warning(
+                    "Replaying %d spooled events failed, retrying in %.1fs",
+                    len(self.spool), backoff
+                )
+                self._stop.wait(backoff)
+                backoff = min(backoff * 2, self.max_backoff)
+                continue
+            if replayed < self.batch_size:
+                self.spool.sync()
+                self._stop.wait(self.poll_interval)
+
+
+class PublishNacked(Exception):
+    pass
+
+
+class PublishFailed(Exception):
+    pass
+
+
+class ConfirmTracker:
+    # Maps the delivery tags of a confirm-mode channel to the futures of
+    # the messages published on it. The broker numbers messages from 1 per
+    # channel and may acknowledge several at once with multiple=True.
+
+    def __init__(self) -> None:
+        self._unconfirmed: "collections.OrderedDict[int, Future]" = \
+            collections.OrderedDict()
+        self._next_tag = 1
+
+    def __len__(self) -> int:
+        return len(self._unconfirmed)
+
+    def track(self, future: Future) -> int:
+        tag = self._next_tag
+        self._next_tag += 1
+        self._unconfirmed[tag] = future
+        return tag
+
+    def resolve(self, tag: int, multiple: bool, acked: bool) -> List[Future]:
+        if multiple:
+            tags = []
+            for unconfirmed_tag in self._unconfirmed:
+                if unconfirmed_tag > tag:
+                    break
+                tags.append(unconfirmed_tag)
+        else:
+            tags = [tag] if tag in self._unconfirmed else []
+
+        futures = [self._unconfirmed.pop(resolved) for resolved in tags]
+        for future in futures:
+            if acked:
+                future.set_result(True)
+            else:
+                future.set_exception(
+                    PublishNacked("The broker rejected the message")
+                )
+        return futures
+
+    def reset(self, error: Exception):
+        # a new channel numbers its deliveries from 1 again
+        for future in self._unconfirmed.values():
+            future.set_exception(error)
+        self._unconfirmed.clear()
+        self._next_tag = 1
+
+
+class BufferedEventPublisher:
+    # Accumulates messages and sends them on a confirm-mode channel once
+    # max_batch_size are buffered or every flush_interval seconds, without
+    # waiting for the broker between messages. Every publish returns a
+    # future that resolves to True when the broker confirms the message and
+    # raises PublishNacked or PublishFailed otherwise, so many thousands of
+    # messages are in flight at once while callers still learn each
+    # outcome.
+    #
+    # The connection is a pika SelectConnection driven by a dedicated I/O
+    # thread; other threads only touch the buffer, under a lock, and wake
+    # the I/O loop with add_callback_threadsafe. Publishing blocks once
+    # max_in_flight messages are buffered or unconfirmed, for up to
+    # in_flight_timeout seconds, after which the returned future fails with
+    # PublishFailed. Buffered messages survive a reconnect; messages sent
+    # but not confirmed when the connection drops fail with PublishFailed,
+    # as the broker may or may not have them.
+    #
+    # There is no spool behind this publisher: while the broker is down,
+    # messages wait in the buffer until in_flight_timeout runs out, and
+    # callers must handle the futures that fail.
+
+    def __init__(
+        self,
+        parameters: pika.ConnectionParameters = None,
+        max_batch_size: int = 500,
+        flush_interval: float = 0.05,
+        max_in_flight: int = 20000,
+        reconnect_delay: float = 1.0,
+        in_flight_timeout: float = 30.0
+    ) -> None:
+        self.parameters = parameters or pika.ConnectionParameters(
+            host=HOST, port=PORT
+        )
+        self.max_batch_size = max_batch_size
+        self.in_flight_timeout = in_flight_timeout
+        self.flush_interval = flush_interval
+        self.reconnect_delay = reconnect_delay
+        self._lock = threading.Lock()
+        self._buffer = []
+        self._outstanding = set()
+        self._in_flight = threading.BoundedSemaphore(max_in_flight)
+        self._tracker = ConfirmTracker()
+        self._connection: pika.SelectConnection = None
+        self._channel = None
+        self._ready = threading.Event()
+        self._thread: threading.Thread = None
+        self._stopping = False
+
+    def publish_event(self, name, event: events.Event) -> Future:
+        dto = serialize_event(event)
+        return self.publish(
+            dto.serialized_message,
+            dto.message_properties,
+            message_id=dto.message_id,
+            content_encoding=dto.content_encoding,
+            headers=dto.headers
+        )
+
+    def publish_events(
+        self,
+        batched_events: List[events.Event],
+        max_events: int = 500
+    ) -> List[Future]:
+        # one future per event, shared by the events of an envelope
+        futures = []
+        for dto, event_count in serialize_envelopes(
+            batched_events, max_events
+        ):
+            future = self.publish(
+                dto.serialized_message,
+                dto.message_properties,
+                message_id=dto.message_id,
+                content_encoding=dto.content_encoding,
+                headers=dto.headers
+            )
+            futures.extend([future] * event_count)
+        return futures
+
+    def publish(
+        self,
+        body: Union[str, bytes],
+        event_type: str,
+        message_id: str = None,
+        content_encoding: str = None,
+        headers: Dict = None
+    ) -> Future:
+        if self._stopping:
+            raise PublishFailed("Publisher is closed")
+        self._start()
+        future = Future()
+        if not self._in_flight.acquire(timeout=self.in_flight_timeout):
+            CONFIRM_OUTCOMES.labels("failed").inc()
+            logger.error(
+                "%s message %s was not published: no room within %ss",
+                event_type, message_id, self.in_flight_timeout
+            )
+            future.set_exception(PublishFailed(
+                f"No room for the message within {self.in_flight_timeout}s"
+            ))
+            return future
+        published_at = time.perf_counter()
+        future.add_done_callback(
+            lambda done: self._on_done(
+                done, published_at, event_type, message_id
+            )
+        )
+        with self._lock:
+            self._outstanding.add(future)
+            self._buffer.append((
+                body, event_type, message_id, content_encoding, headers,
+                future
+            ))
+            full = len(self._buffer) >= self.max_batch_size
+        UNCONFIRMED_MESSAGES.inc()
+        if full:
+            self._request_flush()
+        return future
+
+    def flush(self, timeout: float = None) -> bool:
+        # sends everything buffered and waits for the broker to confirm or
+        # reject it. Returns False if that did not happen within timeout.
+        self._request_flush()
+        with self._lock:
+            pending = list(self._outstanding)
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for future in pending:
+            remaining = None if deadline is None \
+                else max(deadline - time.monotonic(), 0)
+            try:
+                future.exception(timeout=remaining)
+            except concurrent_futures.TimeoutError:
+                return False
+        return True
+
+    def close(self, timeout: float = 10.0):
+        self.flush(timeout)
+        self._stopping = True
+        connection = self._connection
+        if connection is not None:
+            connection.ioloop.add_callback_threadsafe(self._close_connection)
+        if self._thread is not None:
+            self._thread.join(timeout)
+        with self._lock:
+            unsent, self._buffer = self._buffer, []
+        for *_, future in unsent:
+            future.set_exception(PublishFailed("Publisher closed"))
+
+    def _on_done(
+        self,
+        future: Future,
+        published_at: float,
+        event_type: str,
+        message_id: str
+    ):
+        with self._lock:
+            self._outstanding.discard(future)
+        self._in_flight.release()
+        UNCONFIRMED_MESSAGES.dec()
+        error = future.exception()
+        if error is None:
+            CONFIRM_OUTCOMES.labels("ack").inc()
+            CONFIRM_DURATION.observe(
+                time.perf_counter() - published_at
+            )
+            return
+        CONFIRM_OUTCOMES.labels(
+            "nack" if isinstance(error, PublishNacked) else "failed"
+        ).inc()
+        logger.error(
+            "%s message %s was not confirmed by the broker: %s",
+            event_type, message_id, error
+        )
+
+    def _start(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="buffered-publisher", daemon=True
+                )
+                self._thread.start()
+
+    def _request_flush(self):
+        connection = self._connection
+        if connection is not None and self._ready.is_set():
+            connection.ioloop.add_callback_threadsafe(self._flush)
+
+    # everything below runs on the I/O thread
+
+    def _run(self):
+        while not self._stopping:
+            self._connection = pika.SelectConnection(
+                self.parameters,
+                on_open_callback=self._on_connection_open,
+                on_open_error_callback=self._on_connection_open_error,
+                on_close_callback=self._on_connection_closed
+            )
+            self._connection.ioloop.start()
+            if not self._stopping:
+                time.sleep(self.reconnect_delay)
+
+    def _on_connection_open(self, connection):
+        connection.channel(on_open_callback=self._on_channel_open)
+
+    def _on_connection_open_error(self, connection, error):
+        logger.warning("Connecting to the broker failed: %s", error)
+        connection.ioloop.stop()
+
+    def _on_connection_closed(self, connection, reason):
+        self._ready.clear()
+        self._channel = None
+        self._tracker.reset(PublishFailed(f"Connection closed: {reason}"))
+        connection.ioloop.stop()
+
+    def _on_channel_open(self, channel):
+        self._channel = channel
+        channel.add_on_close_callback(self._on_channel_closed)
+        channel.confirm_delivery(
+            self._on_delivery_confirmation,
+            callback=lambda _: declare_topology_async(
+                channel, self._on_topology_declared
+            )
+        )
+
+    def _on_channel_closed(self, channel, reason):
+        logger.warning("Publisher channel closed: %s", reason)
+        if self._connection.is_open:
+            self._connection.close()
+
+    def _on_topology_declared(self):
+        self._ready.set()
+        self._flush()
+        self._connection.ioloop.call_later(
+            self.flush_interval, self._on_flush_timer
+        )
+
+    def _on_flush_timer(self):
+        if not self._ready.is_set():
+            return
+        self._flush()
+        self._connection.ioloop.call_later(
+            self.flush_interval, self._on_flush_timer
+        )
+
+    def _flush(self):
+        if self._channel is None or not self._channel.is_open:
+            return
+        with self._lock:
+            batch, self._buffer = self._buffer, []
+        if not batch:
+            return
+        FLUSH_SIZE.observe(len(batch))
+        for (body, event_type, message_id, content_encoding, headers,
+             future) in batch:
+            self._tracker.track(future)
+            publish_message(
+                self._channel, body, event_type, message_id,
+                content_encoding, headers
+            )
+
+    def _on_delivery_confirmation(self, frame):
+        method = frame.method
+        self._tracker.resolve(
+            method.delivery_tag,
+            method.multiple,
+            acked=isinstance(method, pika.spec.Basic.Ack)
+        )
+
+    def _close_connection(self):
+        if self._connection.is_open:
+            self._connection.close()
+        else:
+            self._connection.ioloop.stop()
+
+
+_publisher = None
+_replayer: SpoolReplayer = None
+_publisher_pid: int = None
+_publisher_lock = threading.Lock()
+
+
+def _open_spool():
+    directory = config.get_event_spool_directory()
+    if not directory:
+        return None
+    return event_spool.open_spool(
+        directory, max_bytes=config.get_event_spool_max_bytes()
+    )
+
+
+def get_publisher():
+    # one publisher per process; connections are not carried across a fork
+    global _publisher, _replayer, _publisher_pid
+    pid = os.getpid()
+    if _publisher_pid == pid:
+        return _publisher
+    with _publisher_lock:
+        if _publisher_pid != pid:
+            if config.get_rabbitmq_publish_mode() == "buffered":
+                _publisher = BufferedEventPublisher(
+                    max_batch_size=config.get_rabbitmq_publish_batch_size(),
+                    flush_interval=config.get_rabbitmq_publish_interval(),
+                    max_in_flight=config.get_rabbitmq_max_in_flight(),
+                    in_flight_timeout=config.get_rabbitmq_in_flight_timeout()
+                )
+                if config.get_event_spool_directory():
+                    logger.warning(
+                        "EVENT_SPOOL_DIRECTORY is ignored in buffered "
+                        "publish mode"
+                    )
+            else:
+                _publisher = RabbitMQEventPublisher(
+                    max_connections=config.get_rabbitmq_max_connections(),
+                    spool=_open_spool()
+                )
+                if _publisher.spool is not None:
+                    _replayer = SpoolReplayer(_publisher.spool, _publisher)
+                    _replayer.start()
+            _publisher_pid = pid
+    return _publisher
+
+
+def close_publisher():
+    global _publisher, _replayer, _publisher_pid
+    with _publisher_lock:
+        if _publisher is not None and _publisher_pid == os.getpid():
+            if _replayer is not None:
+                _replayer.stop()
+            _publisher.close()
+            if getattr(_publisher, "spool", None) is not None:
+                _publisher.spool.close()
+        _publisher, _replayer, _publisher_pid = None, None, None
+
+
+_batches = threading.local()
+
+
+@contextlib.contextmanager
+def batching():
+    # events published by this thread inside the block are collected and
+    # sent in envelopes when it exits, even if it raises, since the writes
+    # that raised them have committed. Nested blocks join the outer one.
+    # Yields a list that, in buffered mode, receives an (event, confirm
+    # future) pair per event once the outermost block exits; see
+    # failed_confirms.
+    if getattr(_batches, "events", None) is not None:
+        yield _batches.confirms
+        return
+    _batches.events = []
+    _batches.confirms = confirms = []
+    try:
+        yield confirms
+    finally:
+        batched_events, _batches.events = _batches.events, None
+        _batches.confirms = None
+        if batched_events:
+            futures = publish_events(batched_events)
+            if futures:
+                confirms.extend(zip(batched_events, futures))
+
+
+def failed_confirms(
+    confirms: List[Tuple[events.Event, Future]],
+    timeout: float
+) -> List[Tuple[events.Event, Exception]]:
+    # waits up to timeout seconds in all for the broker's confirms and
+    # returns the events it nacked or did not confirm in time, with why
+    deadline = time.monotonic() + timeout
+    failed = []
+    for event, future in confirms:
+        try:
+            error = future.exception(
+                timeout=max(deadline - time.monotonic(), 0)
+            )
+        except concurrent_futures.TimeoutError:
+            error = PublishFailed(f"Not confirmed within {timeout}s")
+        if error is not None:
+            failed.append((event, error))
+    return failed
+
+
+def publish_events(batched_events: List[events.Event]):
+    with metrics.PUBLISH_DURATION.labels("envelope").time():
+        return get_publisher().publish_events(
+            batched_events, config.get_event_envelope_max_events()
+        )
+
+
+def publish_event(name, event: events.Event):
+    # in buffered mode this returns the future of the broker's confirm
+    # instead of waiting for the message to be sent; inside batching() the
+    # event is only collected
+    batched_events = getattr(_batches, "events", None)
+    if batched_events is not None:
+        batched_events.append(event)
+        return None
+    with metrics.PUBLISH_DURATION.labels(type(event).__name__).time():
+        return get_publisher().publish_event(name, event)
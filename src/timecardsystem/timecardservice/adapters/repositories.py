@@ -1,6 +1,6 @@
 import abc
 from datetime import datetime
-from typing import Dict
+from typing import Dict, Iterable, List
 from decimal import Decimal
 
 import pymongo
@@ -45,12 +45,24 @@ class AbstractTimecardRepository(AbstractRepository):
         self._add(timecard)
         self.seen.add(timecard)
 
+    def add_all(self, timecards: List[model.Timecard]):
+        self._add_all(timecards)
+        self.seen.update(timecards)
+
     def get(self, timecard_id: common_model.TimecardID) -> model.Timecard:
         timecard = self._get(timecard_id)
         if timecard:
             self.seen.add(timecard)
         return timecard
 
+    def get_many(
+        self,
+        timecard_ids: Iterable[common_model.TimecardID]
+    ) -> Dict[common_model.TimecardID, model.Timecard]:
+        timecards = self._get_many(timecard_ids)
+        self.seen.update(timecards.values())
+        return timecards
+
     @abc.abstractmethod
     def _add(self, timecard: model.Timecard):
         raise NotImplementedError
@@ -59,6 +71,22 @@ class AbstractTimecardRepository(AbstractRepository):
     def _get(self, timecard_id: common_model.TimecardID):
         raise NotImplementedError
 
+    # repositories that can write or read in bulk should override these
+    def _add_all(self, timecards: List[model.Timecard]):
+        for timecard in timecards:
+            self._add(timecard)
+
+    def _get_many(
+        self,
+        timecard_ids: Iterable[common_model.TimecardID]
+    ) -> Dict[common_model.TimecardID, model.Timecard]:
+        timecards = {}
+        for timecard_id in timecard_ids:
+            timecard = self._get(timecard_id)
+            if timecard:
+                timecards[timecard_id] = timecard
+        return timecards
+
 
 class AbstractEmployeeRepository(AbstractRepository):
 
@@ -69,12 +97,24 @@ class AbstractEmployeeRepository(AbstractRepository):
         self._add(employee)
         self.seen.add(employee)
 
+    def add_all(self, employees: List[model.Employee]):
+        self._add_all(employees)
+        self.seen.update(employees)
+
     def get(self, employee_id: common_model.EmployeeID) -> model.Employee:
         employee = self._get(employee_id)
         if employee:
             self.seen.add(employee)
         return employee
 
+    def get_many(
+        self,
+        employee_ids: Iterable[common_model.EmployeeID]
+    ) -> Dict[common_model.EmployeeID, model.Employee]:
+        employees = self._get_many(employee_ids)
+        self.seen.update(employees.values())
+        return employees
+
     @abc.abstractmethod
     def _add(self, employee: model.Employee):
         raise NotImplementedError
@@ -83,6 +123,22 @@ class AbstractEmployeeRepository(AbstractRepository):
     def _get(self, employee_id: common_model.EmployeeID):
         raise NotImplementedError
 
+    # repositories that can write or read in bulk should override these
+    def _add_all(self, employees: List[model.Employee]):
+        for employee in employees:
+            self._add(employee)
+
+    def _get_many(
+        self,
+        employee_ids: Iterable[common_model.EmployeeID]
+    ) -> Dict[common_model.EmployeeID, model.Employee]:
+        employees = {}
+        for employee_id in employee_ids:
+            employee = self._get(employee_id)
+            if employee:
+                employees[employee_id] = employee
+        return employees
+
 
 class MongoDBTimecardRepository(AbstractTimecardRepository):
 
@@ -97,49 +153,88 @@ class MongoDBTimecardRepository(AbstractTimecardRepository):
         super().__init__()
 
     def _add(self, timecard: model.Timecard):
-        dates_and_hours_dto = \
-            create_dates_and_hours_dto(timecard.dates_and_hours)
-
-        timecard_dto = {
-            "_id": timecard.id.value,
-            "employee_id": timecard.employee_id.value,
-            "week_ending_date": timecard.week_ending_date,
-            "dates_and_hours": dates_and_hours_dto,
-            "submitted": timecard.submitted
-        }
         self.timecards_collection.replace_one(
             filter={"_id": timecard.id.value},
-            replacement=timecard_dto,
-            upsert=True
+            replacement=self._to_document(timecard),
+            upsert=True,
+            session=self.session
+        )
+
+    def _add_all(self, timecards: List[model.Timecard]):
+        if not timecards:
+            return
+        self.timecards_collection.bulk_write(
+            [
+                pymongo.ReplaceOne(
+                    filter={"_id": timecard.id.value},
+                    replacement=self._to_document(timecard),
+                    upsert=True
+                )
+                for timecard in timecards
+            ],
+            ordered=False,
+            session=self.session
         )
 
     def _get(self, timecard_id: common_model.TimecardID) -> model.Timecard:
         timecard_dto = \
             self.timecards_collection.find_one(
-                {"_id": timecard_id.value}
+                {"_id": timecard_id.value}, session=self.session
             )
         if timecard_dto:
-            dates_and_hours = {}
-            for date, hours in timecard_dto["dates_and_hours"].items():
-                date_obj = datetime.fromisoformat(date)
-                work_day_hours = model.WorkDayHours(
-                    work_hours=Decimal(hours[0]),
-                    sick_hours=Decimal(hours[1]),
-                    vacation_hours=Decimal(hours[2]),
-                )
-                dates_and_hours[date_obj] = work_day_hours
-
-            timecard = model.Timecard(
-                common_model.TimecardID(timecard_dto["_id"]),
-                common_model.EmployeeID(timecard_dto["employee_id"]),
-                timecard_dto["week_ending_date"],
-                dates_and_hours,
-                timecard_dto["submitted"]
-            )
-            return timecard
+            return self._from_document(timecard_dto)
         else:
             return None
 
+    def _get_many(
+        self,
+        timecard_ids: Iterable[common_model.TimecardID]
+    ) -> Dict[common_model.TimecardID, model.Timecard]:
+        ids = list({timecard_id.value for timecard_id in timecard_ids})
+        if not ids:
+            return {}
+        cursor = self.timecards_collection.find(
+            {"_id": {"$in": ids}}, session=self.session
+        )
+        timecards = {}
+        for timecard_dto in cursor:
+            timecard = self._from_document(timecard_dto)
+            timecards[timecard.id] = timecard
+        return timecards
+
+    @staticmethod
+    def _to_document(timecard: model.Timecard) -> Dict:
+        dates_and_hours_dto = \
+            create_dates_and_hours_dto(timecard.dates_and_hours)
+
+        return {
+            "_id": timecard.id.value,
+            "employee_id": timecard.employee_id.value,
+            "week_ending_date": timecard.week_ending_date,
+            "dates_and_hours": dates_and_hours_dto,
+            "submitted": timecard.submitted
+        }
+
+    @staticmethod
+    def _from_document(timecard_dto: Dict) -> model.Timecard:
+        dates_and_hours = {}
+        for date, hours in timecard_dto["dates_and_hours"].items():
+            date_obj = datetime.fromisoformat(date)
+            work_day_hours = model.WorkDayHours(
+                work_hours=Decimal(hours[0]),
+                sick_hours=Decimal(hours[1]),
+                vacation_hours=Decimal(hours[2]),
+            )
+            dates_and_hours[date_obj] = work_day_hours
+
+        return model.Timecard(
+            common_model.TimecardID(timecard_dto["_id"]),
+            common_model.EmployeeID(timecard_dto["employee_id"]),
+            timecard_dto["week_ending_date"],
+            dates_and_hours,
+            timecard_dto["submitted"]
+        )
+
 
 class MongoDBEmployeeRepository(AbstractEmployeeRepository):
 
@@ -161,19 +256,58 @@ class MongoDBEmployeeRepository(AbstractEmployeeRepository):
         self.employees_collection.replace_one(
             filter={"_id": employee.id.value},
             replacement=employee_dto,
-            upsert=True
+            upsert=True,
+            session=self.session
+        )
+
+    def _add_all(self, employees: List[model.Employee]):
+        if not employees:
+            return
+        self.employees_collection.bulk_write(
+            [
+                pymongo.ReplaceOne(
+                    filter={"_id": employee.id.value},
+                    replacement={
+                        "_id": employee.id.value,
+                        "name": employee.name.value
+                    },
+                    upsert=True
+                )
+                for employee in employees
+            ],
+            ordered=False,
+            session=self.session
         )
 
     def _get(self, employee_id: common_model.EmployeeID) -> model.Employee:
         employee_dto = \
             self.employees_collection.find_one(
-                {"_id": employee_id.value}
+                {"_id": employee_id.value}, session=self.session
             )
         if employee_dto:
-            employee = model.Employee(
-                common_model.EmployeeID(employee_dto["_id"]),
-                common_model.EmployeeName(employee_dto["name"]),
-            )
-            return employee
+            return self._from_document(employee_dto)
         else:
             return None
+
+    def _get_many(
+        self,
+        employee_ids: Iterable[common_model.EmployeeID]
+    ) -> Dict[common_model.EmployeeID, model.Employee]:
+        ids = list({employee_id.value for employee_id in employee_ids})
+        if not ids:
+            return {}
+        cursor = self.employees_collection.find(
+            {"_id": {"$in": ids}}, session=self.session
+        )
+        employees = {}
+        for employee_dto in cursor:
+            employee = self._from_document(employee_dto)
+            employees[employee.id] = employee
+        return employees
+
+    @staticmethod
+    def _from_document(employee_dto: Dict) -> model.Employee:
+        return model.Employee(
+            common_model.EmployeeID(employee_dto["_id"]),
+            common_model.EmployeeName(employee_dto["name"]),
+        )
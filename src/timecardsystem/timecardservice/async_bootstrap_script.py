@@ -0,0 +1,112 @@
+from typing import Callable
+
+from timecardsystem.timecardservice.adapters import \
+    async_rabbitmq_event_publisher
+from timecardsystem.timecardservice.bootstrap_script import (
+    Bootstrap, BootstrapNotInitialized, _bind_command_handlers,
+    _bind_event_handlers, without_unit_of_work)
+from timecardsystem.timecardservice.domain import commands, events
+from timecardsystem.timecardservice.services import (async_handlers,
+                                                     async_message_bus,
+                                                     async_unit_of_work)
+
+# asyncio counterpart of bootstrap_script.Bootstrap. Every message bus gets
+# its own unit of work from the factory, as concurrent requests interleave
+# on one event loop.
+
+
+class AsyncBootstrap:
+
+    def __init__(
+        self,
+        unit_of_work_factory: Callable[
+            [], async_unit_of_work.AbstractAsyncUnitOfWork
+        ] = async_unit_of_work.MotorUnitOfWork,
+        collect_side_effect_events: bool = True,
+        publish_external_events: bool = True,
+        publisher=async_rabbitmq_event_publisher,
+        project_views: bool = True
+    ):
+        self.unit_of_work_factory = unit_of_work_factory
+        self.initialized = False
+        self.injected_command_handlers = {}
+        self.injected_event_handlers = {}
+        self.injected_batch_event_handlers = {}
+        self.injected_external_event_handlers = {}
+        self.collect_side_effect_events = collect_side_effect_events
+        self.publish_external_events = publish_external_events
+        self.publisher = publisher
+        self.project_views = project_views
+
+    def initialize_app(self):
+        self.injected_command_handlers = {
+            commands.CreateEmployee: async_handlers.create_employee,
+            commands.ImportEmployees: async_handlers.import_employees,
+            commands.CreateTimecard: async_handlers.create_timecard,
+            commands.CreateTimecards: async_handlers.create_timecards,
+            commands.SubmitTimecardForProcessing:
+            async_handlers.submit_timecard_for_processing,
+        }
+
+        self.injected_event_handlers = {
+            events.TimecardCreated: [
+                async_handlers.add_timecard_to_view_model
+            ],
+            events.EmployeeCreated: [
+                without_unit_of_work(
+                    async_handlers.add_employee_to_view_model
+                ),
+            ],
+        }
+        # used for runs of events raised together, such as by
+        # CreateTimecards
+        self.injected_batch_event_handlers = {
+            events.TimecardCreated: [
+                async_handlers.add_timecards_to_view_model
+            ],
+        }
+        if not self.project_views:
+            self.injected_event_handlers = {}
+            self.injected_batch_event_handlers = {}
+
+        self.injected_external_event_handlers = {
+            events.EmployeeCreated: [
+                self.publishing(
+                    async_handlers.publish_employee_created_event
+                ),
+            ],
+            events.TimecardCreated: [
+                self.publishing(async_handlers.publish_timecard_created_event)
+            ],
+            events.TimecardSubmittedForProcessing: [
+                self.publishing(
+                    async_handlers.publish_timecard_submitted_event
+                )
+            ]
+        }
+
+        self.initialized = True
+
+    publishing = Bootstrap.publishing
+
+    def get_message_bus(self) -> async_message_bus.AsyncMessageBus:
+        if not self.initialized:
+            raise BootstrapNotInitialized
+        bus_unit_of_work = self.unit_of_work_factory()
+        return async_message_bus.AsyncMessageBus(
+            bus_unit_of_work,
+            _bind_command_handlers(
+                self.injected_command_handlers, bus_unit_of_work
+            ),
+            _bind_event_handlers(
+                self.injected_event_handlers, bus_unit_of_work
+            ),
+            _bind_event_handlers(
+                self.injected_external_event_handlers, bus_unit_of_work
+            ),
+            self.publish_external_events,
+            self.collect_side_effect_events,
+            batch_event_handlers=_bind_event_handlers(
+                self.injected_batch_event_handlers, bus_unit_of_work
+            )
+        )
@@ -0,0 +1,54 @@
+from datetime import datetime
+from typing import List, Optional
+
+from motor.motor_asyncio import AsyncIOMotorCollection
+from timecardsystem.timecardservice import views
+from timecardsystem.timecardservice.adapters import mongodb_view
+from timecardsystem.timecardservice.services import async_unit_of_work
+
+# asyncio counterparts of the view queries in views.py; queries are built
+# and pages assembled by the same functions.
+
+
+def _timecards_view_collection(
+    unit_of_work: async_unit_of_work.MotorViewUnitOfWork
+) -> AsyncIOMotorCollection:
+    client = unit_of_work.session.client
+    view_database = client[mongodb_view.DATABASE_NAME]
+    return view_database[mongodb_view.TIMECARDS_VIEW_COLLECTION_NAME]
+
+
+async def timecards_version_for_employee(
+    employee_id: str,
+    unit_of_work: async_unit_of_work.MotorViewUnitOfWork
+) -> Optional[views.TimecardsVersion]:
+    async with unit_of_work:
+        client = unit_of_work.session.client
+        view_database = client[mongodb_view.DATABASE_NAME]
+        employee_doc = await view_database[
+            mongodb_view.EMPLOYEES_VIEW_COLLECTION_NAME
+        ].find_one(
+            {"_id": employee_id},
+            projection=views.TIMECARDS_VERSION_PROJECTION
+        )
+    return views.version_from_employee_doc(employee_doc)
+
+
+async def timecards_page_for_employee(
+    employee_id: str,
+    unit_of_work: async_unit_of_work.MotorViewUnitOfWork,
+    limit: int,
+    after: Optional[str] = None,
+    before: Optional[str] = None,
+    fields: Optional[List[str]] = None,
+    week_ending_from: Optional[datetime] = None,
+    week_ending_to: Optional[datetime] = None
+) -> views.TimecardsPage:
+    query = views.build_page_query(
+        employee_id, limit, after, before, fields,
+        week_ending_from, week_ending_to
+    )
+    async with unit_of_work:
+        cursor = _timecards_view_collection(unit_of_work).find(**query)
+        docs = await cursor.to_list(length=query["limit"])
+    return views.build_page(docs, limit, after, before, fields)
@@ -1,7 +1,13 @@
-from typing import Callable
+import functools
+from typing import Callable, Dict, List, Type
+
+from timecardsystem.common.domain import commands as common_commands
+from timecardsystem.common.domain import events as common_events
 from timecardsystem.timecardservice.adapters import rabbitmq_event_publisher
 from timecardsystem.timecardservice.domain import commands, events
-from timecardsystem.timecardservice.services import (handlers, message_bus,
+from timecardsystem.timecardservice import config
+from timecardsystem.timecardservice.services import (event_dispatcher,
+                                                     handlers, message_bus,
                                                      unit_of_work)
 
 
@@ -9,6 +15,47 @@ class BootstrapNotInitialized(Exception):
     pass
 
 
+def _bind_command_handlers(
+    command_handlers: Dict[Type[common_commands.Command], Callable],
+    bound_unit_of_work: unit_of_work.AbstractUnitOfWork
+) -> Dict[Type[common_commands.Command], Callable]:
+    return {
+        command_type: _bind(handler, bound_unit_of_work)
+        for command_type, handler in command_handlers.items()
+    }
+
+
+def _bind_event_handlers(
+    event_handlers: Dict[Type[common_events.Event], List[Callable]],
+    bound_unit_of_work: unit_of_work.AbstractUnitOfWork
+) -> Dict[Type[common_events.Event], List[Callable]]:
+    return {
+        event_type: [
+            _bind(handler, bound_unit_of_work) for handler in handlers_list
+        ]
+        for event_type, handlers_list in event_handlers.items()
+    }
+
+
+def _bind(
+    handler: Callable,
+    bound_unit_of_work: unit_of_work.AbstractUnitOfWork
+) -> Callable:
+    # keeps the handler's name, which labels its latency metrics
+    return functools.wraps(handler)(
+        lambda message: handler(message, bound_unit_of_work)
+    )
+
+
+def without_unit_of_work(handler: Callable) -> Callable:
+    # adapts a handler taking only the message to the (message,
+    # unit_of_work) signature of the handler tables
+    @functools.wraps(handler)
+    def adapted(message, bound_unit_of_work):
+        return handler(message)
+    return adapted
+
+
 # Code modified from function bootstrap obtained from
 # https://github.com/cosmicpython/code/blob/master/src/allocation/bootstrap.py
 
@@ -21,72 +68,144 @@ class Bootstrap:
         unit_of_work.MongoDBUnitOfWork(),
         collect_side_effect_events: bool = True,
         publish_external_events: bool = True,
-        publisher: Callable = rabbitmq_event_publisher
+        publisher: Callable = rabbitmq_event_publisher,
+        unit_of_work_factory: Callable[
+            [], unit_of_work.AbstractUnitOfWork
+        ] = None,
+        background_event_dispatch: bool = False,
+        project_views: bool = True
     ):
         self.unit_of_work = unit_of_work
+        # when a factory is given, each message bus gets its own unit of
+        # work so one Bootstrap can be shared by concurrent requests.
+        self.unit_of_work_factory = unit_of_work_factory
         self.initialized = False
         self.injected_command_handlers = {}
         self.injected_event_handlers = {}
+        self.injected_batch_event_handlers = {}
         self.injected_external_event_handlers = {}
+        # when unset, events are not projected into the views here, and the
+        # event consumer service projects them instead
+        self.project_views = project_views
         self.collect_side_effect_events = collect_side_effect_events
         self.publish_external_events = publish_external_events
         self.publisher: rabbitmq_event_publisher = publisher
+        # when set, events raised by commands are handled on a pool of
+        # worker threads after the command's transaction commits, so the
+        # message bus returns without waiting for projections or publishes
+        self.background_event_dispatch = background_event_dispatch
+        self.event_dispatcher: event_dispatcher.BackgroundEventDispatcher = \
+            None
 
     def initialize_app(self):
+        # handlers are stored unbound, taking (message, unit_of_work), and
+        # are bound to a unit of work each time a message bus is created.
         self.injected_command_handlers = {
-            commands.CreateEmployee:
-            lambda c: handlers.create_employee(c, self.unit_of_work),
-            commands.CreateTimecard:
-            lambda c: handlers.create_timecard(c, self.unit_of_work),
+            commands.CreateEmployee: handlers.create_employee,
+            commands.ImportEmployees: handlers.import_employees,
+            commands.CreateTimecard: handlers.create_timecard,
+            commands.CreateTimecards: handlers.create_timecards,
             commands.SubmitTimecardForProcessing:
-            lambda c: handlers.submit_timecard_for_processing(
-                c, self.unit_of_work
-            ),
+            handlers.submit_timecard_for_processing,
         }
 
         self.injected_event_handlers = {
             events.TimecardCreated: [
-                lambda e: handlers.add_timecard_to_view_model(
-                    e, self.unit_of_work
-                )
+                handlers.add_timecard_to_view_model
+            ],
+            events.EmployeeCreated: [
+                without_unit_of_work(handlers.add_employee_to_view_model),
+            ],
+        }
+
+        # used by MessageBus.handle_batch
+        self.injected_batch_event_handlers = {
+            events.TimecardCreated: [
+                handlers.add_timecards_to_view_model
             ],
             events.EmployeeCreated: [
-                lambda e: handlers.add_employee_to_view_model(e),
+                without_unit_of_work(handlers.add_employees_to_view_model),
             ],
         }
 
+        if not self.project_views:
+            self.injected_event_handlers = {}
+            self.injected_batch_event_handlers = {}
+
         self.injected_external_event_handlers = {
             events.EmployeeCreated: [
-                lambda e: handlers.publish_employee_created_event(
-                    event=e,
-                    publish_action=self.publisher.publish_event
-                ),
+                self.publishing(handlers.publish_employee_created_event),
             ],
             events.TimecardCreated: [
-                lambda e: handlers.publish_timecard_created_event(
-                    event=e,
-                    publish_action=self.publisher.publish_event
-                )
+                self.publishing(handlers.publish_timecard_created_event)
             ],
             events.TimecardSubmittedForProcessing: [
-                lambda e: handlers.publish_timecard_submitted_event(
-                    event=e,
-                    publish_action=self.publisher.publish_event
-                )
+                self.publishing(handlers.publish_timecard_submitted_event)
             ]
         }
 
+        if self.background_event_dispatch:
+            if not self.unit_of_work_factory:
+                raise ValueError(
+                    "Background event dispatch needs a unit_of_work_factory"
+                )
+            self.event_dispatcher = event_dispatcher.BackgroundEventDispatcher(
+                lambda: self._create_message_bus(None),
+                workers=config.get_event_dispatch_workers(),
+                max_queue_size=config.get_event_dispatch_queue_size(),
+                put_timeout=config.get_event_dispatch_put_timeout()
+            )
+
         self.initialized = True
 
+    def shutdown(self, timeout: float = 30.0) -> bool:
+        # drains events still queued for background dispatch
+        if self.event_dispatcher:
+            return self.event_dispatcher.shutdown(timeout)
+        return True
+
+    def publishing(self, handler: Callable) -> Callable:
+        # the publisher is looked up on every call so it can be replaced
+        # after the app is initialized
+        @functools.wraps(handler)
+        def publish(event, bound_unit_of_work):
+            return handler(
+                event=event, publish_action=self.publisher.publish_event
+            )
+        return publish
+
     def get_message_bus(self) -> message_bus.MessageBus:
         if self.initialized:
-            return message_bus.MessageBus(
-                self.unit_of_work,
-                self.injected_command_handlers,
-                self.injected_event_handlers,
-                self.injected_external_event_handlers,
-                self.publish_external_events,
-                self.collect_side_effect_events
+            return self._create_message_bus(
+                self.event_dispatcher.submit if self.event_dispatcher
+                else None
             )
         else:
             raise BootstrapNotInitialized
+
+    def _create_message_bus(
+        self,
+        dispatch_events: Callable
+    ) -> message_bus.MessageBus:
+        if self.unit_of_work_factory:
+            bus_unit_of_work = self.unit_of_work_factory()
+        else:
+            bus_unit_of_work = self.unit_of_work
+        return message_bus.MessageBus(
+            bus_unit_of_work,
+            _bind_command_handlers(
+                self.injected_command_handlers, bus_unit_of_work
+            ),
+            _bind_event_handlers(
+                self.injected_event_handlers, bus_unit_of_work
+            ),
+            _bind_event_handlers(
+                self.injected_external_event_handlers, bus_unit_of_work
+            ),
+            self.publish_external_events,
+            self.collect_side_effect_events,
+            dispatch_events,
+            batch_event_handlers=_bind_event_handlers(
+                self.injected_batch_event_handlers, bus_unit_of_work
+            )
+        )
@@ -1,4 +1,5 @@
 import os
+from typing import Dict, Tuple
 
 
 def get_mongodb_uri() -> str:
@@ -19,12 +20,211 @@ def get_mongodb_view_uri() -> str:
     return f"mongodb://{user_name}:{password}@{host}:{port}"
 
 
+def get_mongodb_max_pool_size() -> int:
+    return int(os.environ.get("DB_MAX_POOL_SIZE", 100))
+
+
+def get_max_timecard_batch_size() -> int:
+    return int(os.environ.get("MAX_TIMECARD_BATCH_SIZE", 10000))
+
+
+def get_employee_import_chunk_size() -> int:
+    return int(os.environ.get("EMPLOYEE_IMPORT_CHUNK_SIZE", 1000))
+
+
+def get_timecards_page_size() -> int:
+    return int(os.environ.get("TIMECARDS_PAGE_SIZE", 100))
+
+
+def get_max_timecards_page_size() -> int:
+    return int(os.environ.get("MAX_TIMECARDS_PAGE_SIZE", 1000))
+
+
+def get_view_cursor_batch_size() -> int:
+    return int(os.environ.get("VIEW_CURSOR_BATCH_SIZE", 500))
+
+
+def get_background_event_dispatch() -> bool:
+    return os.environ.get("EVENT_DISPATCH_MODE", "inline") == "background"
+
+
+def get_event_dispatch_workers() -> int:
+    return int(os.environ.get("EVENT_DISPATCH_WORKERS", 4))
+
+
+def get_event_dispatch_queue_size() -> int:
+    return int(os.environ.get("EVENT_DISPATCH_QUEUE_SIZE", 1000))
+
+
+def get_event_dispatch_put_timeout() -> float:
+    return float(os.environ.get("EVENT_DISPATCH_PUT_TIMEOUT", 0.5))
+
+
+def get_event_dispatch_drain_timeout() -> float:
+    return float(os.environ.get("EVENT_DISPATCH_DRAIN_TIMEOUT", 30))
+
+
+def get_inline_view_projection() -> bool:
+    # "consumer" leaves projecting events into the views to the event
+    # consumer service
+    return os.environ.get("VIEW_PROJECTION", "inline") == "inline"
+
+
+def get_publish_through_outbox() -> bool:
+    return os.environ.get("EVENT_PUBLISHING", "inline") == "outbox"
+
+
+def get_outbox_batch_size() -> int:
+    return int(os.environ.get("OUTBOX_BATCH_SIZE", 500))
+
+
+def get_outbox_poll_interval() -> float:
+    return float(os.environ.get("OUTBOX_POLL_INTERVAL", 0.5))
+
+
 def get_api_url():
     host = os.environ.get("API_HOST", "localhost")
     port = 5005 if host == "localhost" else 80
     return f"http://{host}:{port}"
 
 
+def get_async_api_url():
+    host = os.environ.get("ASYNC_API_HOST", "localhost")
+    port = 5006 if host == "localhost" else 80
+    return f"http://{host}:{port}"
+
+
+def get_rabbitmq_max_connections() -> int:
+    return int(os.environ.get("RABBIT_MQ_MAX_CONNECTIONS", 8))
+
+
+def get_rabbitmq_publish_mode() -> str:
+    # "pooled" publishes each event before the handler returns, "buffered"
+    # batches them and reports broker confirms asynchronously. Buffered mode
+    # never spools: while the broker is down its publishes fail with
+    # PublishFailed once RABBIT_MQ_IN_FLIGHT_TIMEOUT runs out.
+    return os.environ.get("RABBIT_MQ_PUBLISH_MODE", "pooled")
+
+
+def get_rabbitmq_publish_batch_size() -> int:
+    return int(os.environ.get("RABBIT_MQ_PUBLISH_BATCH_SIZE", 500))
+
+
+def get_rabbitmq_publish_interval() -> float:
+    return float(os.environ.get("RABBIT_MQ_PUBLISH_INTERVAL", 0.05))
+
+
+def get_rabbitmq_max_in_flight() -> int:
+    return int(os.environ.get("RABBIT_MQ_MAX_IN_FLIGHT", 20000))
+
+
+def get_rabbitmq_in_flight_timeout() -> float:
+    return float(os.environ.get("RABBIT_MQ_IN_FLIGHT_TIMEOUT", 30))
+
+
+def get_event_spool_directory() -> str:
+    # unset disables spooling: publishing then fails while the broker is
+    # unreachable
+    return os.environ.get("EVENT_SPOOL_DIRECTORY")
+
+
+def get_event_spool_max_bytes() -> int:
+    return int(os.environ.get("EVENT_SPOOL_MAX_BYTES", 64 * 1024 * 1024))
+
+
+def get_binary_event_encoding() -> bool:
+    # consumers read both formats; JSON stays the default for those that
+    # only read JSON
+    return os.environ.get("EVENT_WIRE_FORMAT", "json") == "binary"
+
+
+def get_event_envelope_max_events() -> int:
+    return int(os.environ.get("EVENT_ENVELOPE_MAX_EVENTS", 500))
+
+
+def get_rabbitmq_exchange() -> str:
+    return os.environ.get("RABBIT_MQ_EXCHANGE", "timecardsystem.events")
+
+
+def get_rabbitmq_bindings() -> Dict[str, Tuple[str, ...]]:
+    # queues bound to the exchange, as "queue=key,key;queue=key", where
+    # each key is a topic pattern such as "timecard.*" or "#"
+    bindings = {}
+    value = os.environ.get("RABBIT_MQ_BINDINGS", "test=#")
+    for binding in filter(None, value.split(";")):
+        queue, _, keys = binding.partition("=")
+        bindings[queue.strip()] = tuple(
+            key.strip() for key in keys.split(",") if key.strip()
+        )
+    return bindings
+
+
+def get_rabbitmq_dead_lettering() -> bool:
+    # every queue is declared with these arguments, by publishers and
+    # consumers alike, and the broker refuses to redeclare a queue with
+    # different ones, so switch it for all services at once
+    return os.environ.get("RABBIT_MQ_DEAD_LETTERING", "false") == "true"
+
+
+def get_rabbitmq_partitions() -> int:
+    # with N partitions, each bound queue is split into N queues that
+    # events are spread over by employee; 0 keeps a single queue. Like
+    # dead lettering, it changes the topology every service declares.
+    return int(os.environ.get("RABBIT_MQ_PARTITIONS", 0))
+
+
+def get_rabbitmq_consumer_workers() -> int:
+    return int(os.environ.get("RABBIT_MQ_CONSUMER_WORKERS", os.cpu_count()))
+
+
+def get_rabbitmq_consumer_prefetch() -> int:
+    return int(os.environ.get("RABBIT_MQ_CONSUMER_PREFETCH", 100))
+
+
+def get_rabbitmq_consumer_ack_batch_size() -> int:
+    return int(os.environ.get("RABBIT_MQ_CONSUMER_ACK_BATCH_SIZE", 50))
+
+
+def get_rabbitmq_consumer_ack_interval() -> float:
+    return float(os.environ.get("RABBIT_MQ_CONSUMER_ACK_INTERVAL", 0.05))
+
+
+def get_rabbitmq_consumer_failure_policy() -> str:
+    # what happens to a message whose handler raised: "requeue" delivers
+    # it again, "dead-letter" rejects it to the queue's dead-letter queue,
+    # and "retry" delivers it again after a delay that doubles with each
+    # attempt, parking it once it has failed max attempts times
+    return os.environ.get("RABBIT_MQ_CONSUMER_FAILURE_POLICY", "requeue")
+
+
+def get_rabbitmq_consumer_retry_delay() -> float:
+    # seconds before the first retry
+    return float(os.environ.get("RABBIT_MQ_CONSUMER_RETRY_DELAY", 5.0))
+
+
+def get_rabbitmq_consumer_max_attempts() -> int:
+    return int(os.environ.get("RABBIT_MQ_CONSUMER_MAX_ATTEMPTS", 5))
+
+
+def get_rabbitmq_consumer_batch_size() -> int:
+    return int(os.environ.get("RABBIT_MQ_CONSUMER_BATCH_SIZE", 50))
+
+
+def get_rabbitmq_consumer_batch_wait() -> float:
+    return float(os.environ.get("RABBIT_MQ_CONSUMER_BATCH_WAIT", 0.02))
+
+
+def get_rabbitmq_consumer_deduplication() -> bool:
+    # whether the event consumer service skips messages it has handled
+    return os.environ.get(
+        "RABBIT_MQ_CONSUMER_DEDUPLICATION", "true"
+    ) == "true"
+
+
+def get_rabbitmq_consumer_dedup_cache_size() -> int:
+    return int(os.environ.get("RABBIT_MQ_CONSUMER_DEDUP_CACHE_SIZE", 100000))
+
+
 def get_rabbitmq_host_and_port():
     host = os.environ.get("RABBIT_MQ_HOST", "localhost")
     port = 6672 if host == "localhost" else 5672
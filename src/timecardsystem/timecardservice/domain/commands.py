@@ -1,6 +1,6 @@
 from dataclasses import dataclass
 from datetime import datetime
-from typing import Dict
+from typing import Dict, List
 
 from timecardsystem.common.domain import commands
 
@@ -11,6 +11,11 @@ class CreateEmployee(commands.Command):
     name: str
 
 
+@dataclass
+class ImportEmployees(commands.Command):
+    employees: List[CreateEmployee]
+
+
 @dataclass
 class CreateTimecard(commands.Command):
     timecard_id: str
@@ -19,6 +24,11 @@ class CreateTimecard(commands.Command):
     dates_and_hours: Dict[datetime, Dict[str, str]]
 
 
+@dataclass
+class CreateTimecards(commands.Command):
+    timecards: List[CreateTimecard]
+
+
 @dataclass
 class SubmitTimecardForProcessing(commands.Command):
     timecard_id: str
@@ -23,3 +23,11 @@ class TimecardCreated(events.Event):
 class TimecardSubmittedForProcessing(events.Event):
     timecard_id: str
     employee_id: str
+
+
+# names under which events are published to other services
+PUBLISHED_EVENT_NAMES = {
+    EmployeeCreated: "employee_created",
+    TimecardCreated: "timecard_created",
+    TimecardSubmittedForProcessing: "timecard_submitted",
+}
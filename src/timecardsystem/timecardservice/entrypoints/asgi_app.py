@@ -0,0 +1,317 @@
+import asyncio
+import functools
+import hashlib
+import json
+import time
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Optional
+from urllib.parse import urlencode
+
+from starlette import responses
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.requests import Request
+from starlette.responses import HTMLResponse, Response
+from starlette.routing import Route
+from timecardsystem.timecardservice import (async_views, config, metrics,
+                                            views)
+from timecardsystem.timecardservice.adapters import (
+    async_mongodb_client, async_rabbitmq_event_publisher, mongodb_client,
+    mongodb_view, odm)
+from timecardsystem.timecardservice.async_bootstrap_script import \
+    AsyncBootstrap
+from timecardsystem.timecardservice.domain import commands
+from timecardsystem.timecardservice.entrypoints import payloads
+from timecardsystem.timecardservice.services import (async_unit_of_work,
+                                                     handlers)
+
+# asyncio-native counterpart of flask_app for the write endpoints and the
+# paginated timecards view, built on Starlette. Every database and broker
+# round-trip is awaited, so one process holds many requests in flight on a
+# single event loop.
+# Run with an ASGI server, e.g.
+#   uvicorn timecardsystem.timecardservice.entrypoints.asgi_app:app
+
+bootstrapper = AsyncBootstrap(
+    unit_of_work_factory=functools.partial(
+        async_unit_of_work.MotorUnitOfWork,
+        use_outbox=config.get_publish_through_outbox()
+    ),
+    publish_external_events=not config.get_publish_through_outbox(),
+    project_views=config.get_inline_view_projection()
+)
+bootstrapper.initialize_app()
+
+
+class JSONResponse(responses.JSONResponse):
+
+    def render(self, content) -> bytes:
+        return json.dumps(content, default=_json_default).encode("utf-8")
+
+
+def _json_default(value):
+    # matches the date format of Flask's JSON provider
+    if isinstance(value, datetime):
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=timezone.utc)
+        return format_datetime(value, usegmt=True)
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+async def create_employee(request: Request) -> Response:
+    command = payloads.create_employee_command(await _json_body(request))
+    await bootstrapper.get_message_bus().handle(command)
+    return HTMLResponse("OK", 201)
+
+
+async def create_timecard(request: Request) -> Response:
+    with metrics.REQUEST_PARSE_DURATION.labels("create_timecard").time():
+        command = payloads.create_timecard_command(await _json_body(request))
+    try:
+        await bootstrapper.get_message_bus().handle(command)
+    except (handlers.InvalidTimecard, handlers.EmployeeDoesNotExist) as err:
+        return JSONResponse({"error": str(err)}, 400)
+    return HTMLResponse("OK", 201)
+
+
+async def create_timecards(request: Request) -> Response:
+    body = await _json_body(request)
+    with metrics.REQUEST_PARSE_DURATION.labels("create_timecards").time():
+        timecards_json = payloads.timecard_batch(body)
+        too_large = len(timecards_json) > config.get_max_timecard_batch_size()
+        if not too_large:
+            results, timecard_commands, command_positions = \
+                payloads.parse_timecard_batch(timecards_json)
+    if too_large:
+        return JSONResponse({
+            "error": "Batch exceeds "
+                     f"{config.get_max_timecard_batch_size()} timecards"
+        }, 413)
+
+    if timecard_commands:
+        async with async_rabbitmq_event_publisher.batching():
+            [command_results] = await bootstrapper.get_message_bus().handle(
+                commands.CreateTimecards(timecard_commands)
+            )
+        for position, result in zip(command_positions, command_results):
+            results[position] = result
+
+    all_accepted = all(result["status"] != "rejected" for result in results)
+    return JSONResponse({"results": results}, 201 if all_accepted else 207)
+
+
+async def submit_timecard_for_processing(request: Request) -> Response:
+    command = commands.SubmitTimecardForProcessing(
+        timecard_id=request.path_params["timecard_id"]
+    )
+    await bootstrapper.get_message_bus().handle(command)
+    return HTMLResponse("OK", 200)
+
+
+def _parse_iso_date_arg(request: Request, name: str) -> Optional[datetime]:
+    value = request.query_params.get(name)
+    return datetime.fromisoformat(value) if value else None
+
+
+def _page_link(
+    request: Request,
+    cursor_name: str,
+    cursor: str,
+    rel: str
+) -> str:
+    args = dict(request.query_params)
+    args.pop("after", None)
+    args.pop("before", None)
+    args[cursor_name] = cursor
+    base_url = request.url.replace(query="")
+    return f'<{base_url}?{urlencode(args)}>; rel="{rel}"'
+
+
+def _is_not_modified(
+    request: Request,
+    etag: str,
+    last_modified: datetime
+) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match:
+        tags = [tag.strip() for tag in if_none_match.split(",")]
+        return "*" in tags or f'"{etag}"' in tags \
+            or f'W/"{etag}"' in tags
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            return last_modified <= parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+async def get_timecards_for_employee(request: Request) -> Response:
+    employee_id = request.path_params["employee_id"]
+    version = await async_views.timecards_version_for_employee(
+        employee_id, async_unit_of_work.MotorViewUnitOfWork()
+    )
+    if not version:
+        return await _get_timecards_for_employee(request, employee_id)
+
+    # same validators as flask_app.get_timecards_for_employee
+    etag = hashlib.sha1(
+        f"{employee_id}:{version.version}:".encode("utf-8")
+        + request.scope["query_string"]
+    ).hexdigest()
+    last_modified = version.modified_at.replace(
+        microsecond=0, tzinfo=timezone.utc
+    )
+    if _is_not_modified(request, etag, last_modified):
+        response = Response(status_code=304)
+    else:
+        response = await _get_timecards_for_employee(request, employee_id)
+    if response.status_code in (200, 304):
+        response.headers["etag"] = f'"{etag}"'
+        response.headers["last-modified"] = format_datetime(
+            last_modified, usegmt=True
+        )
+    return response
+
+
+async def _get_timecards_for_employee(
+    request: Request,
+    employee_id: str
+) -> Response:
+    try:
+        limit = min(
+            int(request.query_params.get(
+                "limit", config.get_timecards_page_size()
+            )),
+            config.get_max_timecards_page_size()
+        )
+        if limit < 1:
+            raise ValueError("limit must be positive")
+        fields = request.query_params.get("fields")
+        page = await async_views.timecards_page_for_employee(
+            employee_id,
+            async_unit_of_work.MotorViewUnitOfWork(),
+            limit=limit,
+            after=request.query_params.get("after"),
+            before=request.query_params.get("before"),
+            fields=fields.split(",") if fields else None,
+            week_ending_from=_parse_iso_date_arg(request, "from"),
+            week_ending_to=_parse_iso_date_arg(request, "to")
+        )
+    except (ValueError, views.InvalidCursor, views.InvalidField) as err:
+        return JSONResponse({"error": str(err)}, 400)
+
+    is_first_page = not (request.query_params.get("after")
+                         or request.query_params.get("before"))
+    if not page.timecards and is_first_page:
+        return HTMLResponse("not found", 404)
+
+    response = JSONResponse(page.timecards)
+    links = []
+    if page.next_cursor:
+        links.append(_page_link(request, "after", page.next_cursor, "next"))
+    if page.previous_cursor:
+        links.append(
+            _page_link(request, "before", page.previous_cursor, "prev")
+        )
+    if links:
+        response.headers["link"] = ", ".join(links)
+    return response
+
+
+async def get_metrics(request: Request) -> Response:
+    return Response(metrics.render(), media_type=metrics.CONTENT_TYPE)
+
+
+async def _json_body(request: Request):
+    try:
+        return await request.json()
+    except ValueError:
+        raise payloads.InvalidPayload("Request body is not JSON") from None
+
+
+async def invalid_payload(
+    request: Request,
+    err: payloads.InvalidPayload
+) -> Response:
+    return JSONResponse({"error": str(err)}, 400)
+
+
+class RequestTimer:
+    # times every request by the route that served it; a request that
+    # raised is counted as the 500 it is answered with
+
+    def __init__(self, app) -> None:
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        started_at = time.perf_counter()
+        status = 500
+
+        async def send_and_record_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_and_record_status)
+        except Exception:
+            status = 500
+            raise
+        finally:
+            endpoint = scope.get("endpoint")
+            metrics.HTTP_REQUEST_DURATION.labels(
+                scope["method"],
+                endpoint.__name__ if endpoint else "unmatched",
+                str(status)
+            ).observe(time.perf_counter() - started_at)
+
+
+def _initialize_databases():
+    # the schema and indexes are ensured through the synchronous clients,
+    # once per process, before any request is served
+    mongodb_client.get_client(
+        config.get_mongodb_uri(), initializer=odm.initialize_database
+    )
+    mongodb_view.get_view_client()
+
+
+async def startup():
+    await asyncio.get_running_loop().run_in_executor(
+        None, _initialize_databases
+    )
+
+
+async def shutdown():
+    await async_rabbitmq_event_publisher.close()
+    async_mongodb_client.close_async_clients()
+    mongodb_client.close_clients()
+
+
+app = Starlette(
+    routes=[
+        Route("/metrics", get_metrics, methods=["GET"]),
+        Route("/employees", create_employee, methods=["POST"]),
+        Route("/timecards", create_timecard, methods=["POST"]),
+        Route("/timecards:batch", create_timecards, methods=["POST"]),
+        Route(
+            "/timecards/{timecard_id}/submit",
+            submit_timecard_for_processing,
+            methods=["POST"]
+        ),
+        Route(
+            "/employees/{employee_id}/timecards",
+            get_timecards_for_employee,
+            methods=["GET"]
+        ),
+    ],
+    middleware=[Middleware(RequestTimer)],
+    exception_handlers={payloads.InvalidPayload: invalid_payload},
+    on_startup=[startup],
+    on_shutdown=[shutdown]
+)
@@ -0,0 +1,409 @@
+import logging
+import multiprocessing
+import signal
+import threading
+import time
+from functools import partial
+from multiprocessing.connection import wait
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from timecardsystem.common.domain import events
+from timecardsystem.timecardservice import config, metrics
+from timecardsystem.timecardservice.adapters import rabbitmq_event_publisher
+from timecardsystem.timecardservice.entrypoints import \
+    rabbitmq_event_consumer
+
+logger = logging.getLogger(__name__)
+
+LIVE_WORKERS = metrics.gauge(
+    "timecardservice_consumer_pool_workers",
+    "Consumer worker processes currently running."
+)
+
+WORKER_EXITS = metrics.counter(
+    "timecardservice_consumer_pool_worker_exits",
+    "Consumer worker processes that exited while the pool was running."
+)
+
+HANDOFFS = metrics.counter(
+    "timecardservice_consumer_pool_partition_handoffs",
+    "Partitions moved from one running worker to another."
+)
+
+HandlerFactory = Callable[[], Callable[[List[events.Event]], None]]
+
+
+def balance(
+    partitions: Iterable[int],
+    slots: Iterable[int],
+    current: Dict[int, Optional[int]]
+) -> Dict[int, int]:
+    # Spreads partitions evenly over slots, moving as few as possible:
+    # each slot keeps its current partitions up to its share, the slots
+    # holding the most get the remainder, and whatever is left over or
+    # unowned goes to the slots below their share.
+    partitions, slots = sorted(partitions), sorted(slots)
+    held: Dict[int, List[int]] = {slot: [] for slot in slots}
+    for partition in partitions:
+        if current.get(partition) in held:
+            held[current[partition]].append(partition)
+    share, remainder = divmod(len(partitions), len(slots))
+    by_load = sorted(slots, key=lambda slot: (-len(held[slot]), slot))
+    quota = {
+        slot: share + (1 if rank < remainder else 0)
+        for rank, slot in enumerate(by_load)
+    }
+
+    target = {}
+    for slot in slots:
+        for partition in held[slot][:quota[slot]]:
+            target[partition] = slot
+    free = [partition for partition in partitions if partition not in target]
+    for slot in slots:
+        count = min(len(held[slot]), quota[slot])
+        for partition in free[:quota[slot] - count]:
+            target[partition] = slot
+        free = free[quota[slot] - count:]
+    return target
+
+
+class PartitionConsumer(rabbitmq_event_consumer.StreamingConsumer):
+    # A StreamingConsumer of the partitions of queue_name it is assigned,
+    # on one channel. When a partition is taken away, the consumer cancels
+    # its subscription, waits until the messages already received from it
+    # have been handled and acknowledged, and then calls on_released with
+    # the partition, so the next owner starts after the last message the
+    # previous one handled. Assignments are made on the I/O thread.
+
+    def __init__(
+        self,
+        handler: Callable[[List[events.Event]], None],
+        queue_name: str = rabbitmq_event_publisher.QUEUE_NAME,
+        on_released: Callable[[int], None] = None,
+        **kwargs
+    ):
+        super().__init__(handler, queue_name, **kwargs)
+        self.on_released = on_released
+        self._assigned: Set[int] = set()
+        self._consumer_tags: Dict[int, str] = {}
+        self._releasing: Set[int] = set()
+        self._cancelled: Set[int] = set()
+        self._unsettled: Dict[int, int] = {}
+        self._delivery_partitions: Dict[int, int] = {}
+        self._consuming = False
+
+    @property
+    def partitions(self) -> Set[int]:
+        return set(self._consumer_tags)
+
+    def start_consuming(self):
+        self._consuming = True
+        self.assign(self._assigned)
+
+    def assign(self, partitions: Iterable[int]):
+        self._assigned = set(partitions)
+        if not self._consuming:
+            return
+        for partition in sorted(self._assigned):
+            if partition not in self._consumer_tags \
+                    and partition not in self._releasing:
+                self._consumer_tags[partition] = self.channel.basic_consume(
+                    rabbitmq_event_publisher.partition_queue_name(
+                        self.queue_name, partition
+                    ),
+                    partial(self._on_partition_delivery, partition)
+                )
+        for partition in sorted(set(self._consumer_tags) - self._assigned):
+            self._releasing.add(partition)
+            self.channel.basic_cancel(
+                self._consumer_tags.pop(partition),
+                callback=partial(self._on_cancelled, partition)
+            )
+
+    def _on_partition_delivery(self, partition: int, channel, method,
+                               header, body):
+        self._delivery_partitions[method.delivery_tag] = partition
+        self._unsettled[partition] = self._unsettled.get(partition, 0) + 1
+        self.handle_delivery(channel, method, header, body)
+
+    def ack_message(self, delivery_tag: int):
+        super().ack_message(delivery_tag)
+        self._on_settled(delivery_tag)
+
+    def nack_message(self, delivery_tag: int, requeue: bool = True):
+        super().nack_message(delivery_tag, requeue)
+        self._on_settled(delivery_tag)
+
+    def _on_settled(self, delivery_tag: int):
+        partition = self._delivery_partitions.pop(delivery_tag, None)
+        if partition is None:
+            return
+        self._unsettled[partition] -= 1
+        self._release_if_done(partition)
+
+    def _on_cancelled(self, partition: int, _frame=None):
+        self._cancelled.add(partition)
+        self._release_if_done(partition)
+
+    def _release_if_done(self, partition: int):
+        if partition not in self._cancelled \
+                or self._unsettled.get(partition, 0):
+            return
+        self.flush_acks()
+        self._cancelled.discard(partition)
+        self._releasing.discard(partition)
+        self._unsettled.pop(partition, None)
+        if self.on_released is not None:
+            self.on_released(partition)
+        if partition in self._assigned:
+            self.assign(self._assigned)
+
+
+def run_worker(
+    handler_factory: HandlerFactory,
+    queue_name: str,
+    control,
+    consumer_options: Dict,
+    metrics_port: int = None
+):
+    # runs in the worker process until told to stop, or until its broker
+    # connection closes, in which case the supervisor starts another
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    logging.basicConfig(level=logging.INFO)
+    if metrics_port:
+        metrics.start_http_server(metrics_port)
+    consumer = PartitionConsumer(
+        handler_factory(),
+        queue_name,
+        on_released=lambda partition: control.send(("released", partition)),
+        **consumer_options
+    )
+    consumer.connect()
+
+    def read_control():
+        while True:
+            try:
+                command, argument = control.recv()
+            except (EOFError, OSError):
+                command = "stop"
+            if command == "assign":
+                consumer.connection.ioloop.add_callback_threadsafe(
+                    partial(consumer.assign, argument)
+                )
+            else:
+                consumer.stop()
+                return
+
+    threading.Thread(target=read_control, daemon=True).start()
+    consumer._start_worker()
+    consumer.connection.ioloop.start()
+
+
+class _Worker:
+
+    def __init__(self, slot: int, process, control) -> None:
+        self.slot = slot
+        self.process = process
+        self.control = control
+        self.partitions: Set[int] = set()
+        self.started_at = time.monotonic()
+
+    def send_assignment(self):
+        try:
+            self.control.send(("assign", tuple(sorted(self.partitions))))
+        except (BrokenPipeError, OSError):
+            # the worker is exiting; the pool finds out from its sentinel
+            pass
+
+
+class ConsumerPool:
+    # Supervises worker processes consuming the partitions of queue_name,
+    # each with a handler from handler_factory, called in the worker.
+    # Every partition is consumed by one worker at a time, so the events of
+    # an employee are handled in order by one process.
+    #
+    # Partitions are spread evenly over the running workers. When a worker
+    # exits, its partitions go to the others at once; the broker requeues
+    # the messages it had not acknowledged, ahead of the rest of the
+    # partition. The worker is restarted after restart_delay seconds,
+    # doubling up to max_restart_delay while it keeps exiting within that
+    # time, and partitions move back to it once their owners have released
+    # them. With worker_metrics_port set, the worker in slot n serves its
+    # metrics on worker_metrics_port + n.
+
+    def __init__(
+        self,
+        handler_factory: HandlerFactory,
+        workers: int = None,
+        queue_name: str = rabbitmq_event_publisher.QUEUE_NAME,
+        partitions: int = None,
+        restart_delay: float = 1.0,
+        max_restart_delay: float = 30.0,
+        consumer_options: Dict = None,
+        context=None,
+        worker_metrics_port: int = None
+    ) -> None:
+        self.handler_factory = handler_factory
+        self.workers = workers or config.get_rabbitmq_consumer_workers()
+        self.queue_name = queue_name
+        self.partitions = partitions or rabbitmq_event_publisher.PARTITIONS
+        if not self.partitions:
+            raise ValueError(
+                "A consumer pool needs RABBIT_MQ_PARTITIONS to be set"
+            )
+        self.restart_delay = restart_delay
+        self.max_restart_delay = max_restart_delay
+        self.consumer_options = consumer_options or {}
+        self.worker_metrics_port = worker_metrics_port
+        self._context = context or multiprocessing.get_context()
+        self._workers: Dict[int, _Worker] = {}
+        self._owners: Dict[int, Optional[int]] = {
+            partition: None for partition in range(self.partitions)
+        }
+        # partitions being released by one worker for another
+        self._handoffs: Dict[int, Tuple[int, int]] = {}
+        self._restarts: Dict[int, Tuple[float, float]] = {}
+
+    def assignment(self) -> Dict[int, Set[int]]:
+        return {
+            slot: set(worker.partitions)
+            for slot, worker in self._workers.items()
+        }
+
+    def run(self, stop: threading.Event, poll_interval: float = 0.5):
+        for slot in range(self.workers):
+            self._start_worker(slot)
+        self._rebalance()
+        try:
+            while not stop.is_set():
+                self._poll(poll_interval)
+                self._restart_due_workers()
+        finally:
+            self.shutdown()
+
+    def shutdown(self, timeout: float = 30.0):
+        workers, self._workers = list(self._workers.values()), {}
+        for worker in workers:
+            try:
+                worker.control.send(("stop", None))
+            except (BrokenPipeError, OSError):
+                pass
+        deadline = time.monotonic() + timeout
+        for worker in workers:
+            worker.process.join(max(deadline - time.monotonic(), 0))
+            if worker.process.is_alive():
+                logger.error("Terminating consumer worker %d", worker.slot)
+                worker.process.terminate()
+                worker.process.join()
+        LIVE_WORKERS.set(0)
+
+    def _start_worker(self, slot: int):
+        control, worker_control = self._context.Pipe()
+        process = self._context.Process(
+            target=run_worker,
+            args=(
+                self.handler_factory, self.queue_name, worker_control,
+                self.consumer_options,
+                self.worker_metrics_port + slot
+                if self.worker_metrics_port else None
+            ),
+            name=f"event-consumer-{slot}",
+            daemon=True
+        )
+        process.start()
+        worker_control.close()
+        self._workers[slot] = _Worker(slot, process, control)
+        LIVE_WORKERS.set(len(self._workers))
+        logger.info("Started consumer worker %d (pid %d)", slot, process.pid)
+
+    def _poll(self, timeout: float):
+        waiting = {}
+        for worker in self._workers.values():
+            waiting[worker.process.sentinel] = (worker, "exit")
+            waiting[worker.control] = (worker, "control")
+        for ready in wait(list(waiting), timeout):
+            worker, kind = waiting[ready]
+            if worker.slot not in self._workers:
+                continue
+            if kind == "control":
+                try:
+                    while worker.control.poll():
+                        _, partition = worker.control.recv()
+                        self._on_released(partition)
+                except (EOFError, OSError):
+                    kind = "exit"
+            if kind == "exit":
+                worker.process.join(5)
+                self._on_worker_exit(worker.slot)
+
+    def _on_worker_exit(self, slot: int):
+        worker = self._workers.pop(slot)
+        LIVE_WORKERS.set(len(self._workers))
+        WORKER_EXITS.inc()
+        logger.error(
+            "Consumer worker %d exited with %s, moving partitions %s",
+            slot, worker.process.exitcode, sorted(worker.partitions)
+        )
+        for partition, owner in self._owners.items():
+            if owner == slot:
+                self._owners[partition] = None
+        # its connection is gone, so what it was releasing is released
+        for partition, (source, _) in list(self._handoffs.items()):
+            if source == slot:
+                del self._handoffs[partition]
+
+        _, delay = self._restarts.get(slot, (0, self.restart_delay / 2))
+        if time.monotonic() - worker.started_at > self.max_restart_delay:
+            delay = self.restart_delay / 2
+        delay = min(delay * 2, self.max_restart_delay)
+        self._restarts[slot] = (time.monotonic() + delay, delay)
+        self._rebalance()
+
+    def _on_released(self, partition: int):
+        _, target = self._handoffs.pop(partition, (None, None))
+        if target in self._workers:
+            self._owners[partition] = target
+            self._workers[target].partitions.add(partition)
+            self._workers[target].send_assignment()
+        else:
+            self._owners[partition] = None
+            self._rebalance()
+
+    def _restart_due_workers(self):
+        now = time.monotonic()
+        for slot, (due, _) in list(self._restarts.items()):
+            if slot not in self._workers and due <= now:
+                self._start_worker(slot)
+                self._rebalance()
+
+    def _rebalance(self):
+        if not self._workers:
+            return
+        current = dict(self._owners)
+        for partition, (_, target) in self._handoffs.items():
+            current[partition] = target
+        target = balance(self._owners, self._workers, current)
+        changed = set()
+        for partition, slot in target.items():
+            owner = self._owners[partition]
+            if partition in self._handoffs:
+                # moves on once released
+                self._handoffs[partition] = (
+                    self._handoffs[partition][0], slot
+                )
+                continue
+            if owner == slot:
+                continue
+            if owner is None:
+                self._owners[partition] = slot
+                self._workers[slot].partitions.add(partition)
+                changed.add(slot)
+            else:
+                self._workers[owner].partitions.discard(partition)
+                self._owners[partition] = None
+                self._handoffs[partition] = (owner, slot)
+                HANDOFFS.inc()
+                changed.add(owner)
+        for slot in sorted(changed):
+            self._workers[slot].send_assignment()
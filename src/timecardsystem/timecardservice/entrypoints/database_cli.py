@@ -0,0 +1,65 @@
+import argparse
+import sys
+from typing import List
+
+from timecardsystem.timecardservice import config
+from timecardsystem.timecardservice.adapters import (indexes, mongodb_client,
+                                                     mongodb_view, odm)
+
+
+def _print_index_reports(
+    database_name: str,
+    reports: List[indexes.IndexReport]
+) -> bool:
+    in_sync = True
+    for report in reports:
+        collection = f"{database_name}.{report.collection_name}"
+        for name in report.created:
+            print(f"index {collection}.{name}: created")
+        for name in report.mismatched:
+            print(f"index {collection}.{name}: differs from declaration")
+        for name in report.extra:
+            print(f"index {collection}.{name}: not declared")
+        if report.in_sync:
+            print(f"indexes {collection}: unchanged")
+        in_sync = in_sync and not (report.mismatched or report.extra)
+    return in_sync
+
+
+def migrate() -> int:
+    client = mongodb_client.get_client(config.get_mongodb_uri())
+    for collection_name, changed in odm.ensure_schema(client).items():
+        status = "updated" if changed else "unchanged"
+        print(f"schema {odm.DATABASE_NAME}.{collection_name}: {status}")
+    data_in_sync = _print_index_reports(
+        odm.DATABASE_NAME, odm.ensure_indexes(client)
+    )
+
+    view_client = mongodb_client.get_client(config.get_mongodb_view_uri())
+    view_in_sync = _print_index_reports(
+        mongodb_view.DATABASE_NAME, mongodb_view.ensure_indexes(view_client)
+    )
+
+    # mismatched or undeclared indexes need a human to decide what to drop
+    return 0 if data_in_sync and view_in_sync else 2
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(
+        description="Timecard service database maintenance"
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser(
+        "migrate",
+        help="create collections, apply schema validators if changed and "
+             "create missing indexes, reporting any undeclared ones"
+    )
+    args = parser.parse_args(argv)
+
+    if args.command == "migrate":
+        return migrate()
+    return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
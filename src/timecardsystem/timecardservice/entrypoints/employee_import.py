@@ -0,0 +1,104 @@
+import argparse
+import json
+import sys
+from typing import Callable, Dict, Iterable, Iterator, List, Tuple
+
+from timecardsystem.timecardservice import config
+from timecardsystem.timecardservice.adapters import rabbitmq_event_publisher
+from timecardsystem.timecardservice.bootstrap_script import Bootstrap
+from timecardsystem.timecardservice.domain import commands
+from timecardsystem.timecardservice.services import message_bus, unit_of_work
+
+# only the first few malformed lines are reported, so the report stays
+# small no matter how large the import is
+MAX_REPORTED_ERRORS = 100
+
+
+def iter_employee_chunks(
+    lines: Iterable[bytes],
+    chunk_size: int,
+    on_error: Callable[[int, str], None]
+) -> Iterator[List[commands.CreateEmployee]]:
+    # lazily parses NDJSON lines ({"employee_id": ..., "name": ...}) and
+    # yields them in chunks, so only one chunk is held in memory at a time
+    chunk = []
+    for line_number, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+            chunk.append(commands.CreateEmployee(
+                str(record["employee_id"]), str(record["name"])
+            ))
+        except (ValueError, KeyError, TypeError) as err:
+            on_error(line_number, f"Malformed employee record: {err}")
+            continue
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def import_employees(
+    lines: Iterable[bytes],
+    bus_factory: Callable[[], message_bus.MessageBus],
+    chunk_size: int = None
+) -> Dict:
+    chunk_size = chunk_size or config.get_employee_import_chunk_size()
+    report = {"imported": 0, "rejected": 0, "errors": []}
+
+    def on_error(line_number: int, error: str):
+        report["rejected"] += 1
+        if len(report["errors"]) < MAX_REPORTED_ERRORS:
+            report["errors"].append({"line": line_number, "error": error})
+
+    for chunk in iter_employee_chunks(lines, chunk_size, on_error):
+        # each chunk is one bulk upsert in its own unit of work, after which
+        # the chunk's EmployeeCreated events are projected in one bulk write
+        # and published in envelopes
+        bus = bus_factory()
+        with rabbitmq_event_publisher.batching():
+            [result] = bus.handle(commands.ImportEmployees(chunk))
+        report["imported"] += result["imported"]
+    return report
+
+
+def _read_lines(path: str) -> Tuple[Iterable[bytes], Callable]:
+    if path == "-":
+        return sys.stdin.buffer, lambda: None
+    ndjson_file = open(path, "rb")
+    return ndjson_file, ndjson_file.close
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(
+        description="Import employees from an NDJSON file"
+    )
+    parser.add_argument("path", help="NDJSON file to import, or - for stdin")
+    parser.add_argument(
+        "--chunk-size", type=int,
+        default=config.get_employee_import_chunk_size()
+    )
+    args = parser.parse_args(argv)
+
+    bootstrapper = Bootstrap(
+        unit_of_work_factory=unit_of_work.MongoDBUnitOfWork,
+        project_views=config.get_inline_view_projection()
+    )
+    bootstrapper.initialize_app()
+
+    lines, close = _read_lines(args.path)
+    try:
+        report = import_employees(
+            lines, bootstrapper.get_message_bus, args.chunk_size
+        )
+    finally:
+        close()
+
+    print(json.dumps(report))
+    return 0 if report["rejected"] == 0 else 2
+
+
+if __name__ == "__main__":
+    sys.exit(main())
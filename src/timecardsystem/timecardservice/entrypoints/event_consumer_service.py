@@ -0,0 +1,117 @@
+import argparse
+import logging
+import signal
+import sys
+import threading
+from typing import Callable, List
+
+from timecardsystem.common.domain import events
+from timecardsystem.timecardservice import config, metrics
+from timecardsystem.timecardservice.adapters import rabbitmq_event_publisher
+from timecardsystem.timecardservice.adapters.processed_messages import \
+    ProcessedMessages
+from timecardsystem.timecardservice.bootstrap_script import Bootstrap
+from timecardsystem.timecardservice.entrypoints import (
+    consumer_pool, rabbitmq_event_consumer)
+from timecardsystem.timecardservice.services import unit_of_work
+
+logger = logging.getLogger(__name__)
+
+# Projects the events published by the API into the views. Run it with
+# VIEW_PROJECTION=consumer set for the API, so the views are written here
+# instead of on the request path:
+#   python -m timecardsystem.timecardservice.entrypoints.event_consumer_service
+VIEWS_QUEUE_NAME = "views"
+VIEWS_BINDING_KEYS = (
+    rabbitmq_event_publisher.ROUTING_KEYS["EmployeeCreated"],
+    rabbitmq_event_publisher.ROUTING_KEYS["TimecardCreated"],
+)
+
+
+def create_handler() -> Callable[[List[events.Event]], None]:
+    # one long-lived message bus per process, fed a micro-batch of events
+    # at a time. Received events are not published again.
+    bootstrapper = Bootstrap(
+        unit_of_work_factory=unit_of_work.MongoDBUnitOfWork,
+        publish_external_events=False
+    )
+    bootstrapper.initialize_app()
+    return bootstrapper.get_message_bus().handle_batch
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(
+        description="Handle the events published by the timecard service"
+    )
+    parser.add_argument("--queue", default=VIEWS_QUEUE_NAME)
+    parser.add_argument(
+        "--workers", type=int, default=1,
+        help="consumer processes; more than one needs RABBIT_MQ_PARTITIONS"
+    )
+    parser.add_argument(
+        "--batch-size", type=int,
+        default=config.get_rabbitmq_consumer_batch_size(),
+        help="most messages handled together"
+    )
+    parser.add_argument(
+        "--batch-wait", type=float,
+        default=config.get_rabbitmq_consumer_batch_wait(),
+        help="seconds to wait for a batch to fill"
+    )
+    parser.add_argument(
+        "--metrics-port", type=int, default=None,
+        help="serve Prometheus metrics on this port; pool workers serve "
+        "theirs on the ports after it"
+    )
+    args = parser.parse_args(argv)
+    if args.workers > 1 and not rabbitmq_event_publisher.PARTITIONS:
+        parser.error("--workers needs RABBIT_MQ_PARTITIONS to be set")
+    logging.basicConfig(level=logging.INFO)
+    if args.metrics_port:
+        metrics.start_http_server(args.metrics_port)
+
+    consumer_options = {
+        "binding_keys": rabbitmq_event_publisher.BINDINGS.get(
+            args.queue, VIEWS_BINDING_KEYS
+        ),
+        "max_batch_size": args.batch_size,
+        "max_batch_wait": args.batch_wait,
+    }
+    if config.get_rabbitmq_consumer_deduplication():
+        # each pool worker gets a copy, empty until it has handled messages
+        consumer_options["processed_messages"] = ProcessedMessages(
+            config.get_rabbitmq_consumer_dedup_cache_size()
+        )
+    stop = threading.Event()
+    if args.workers > 1:
+        pool = consumer_pool.ConsumerPool(
+            create_handler,
+            workers=args.workers,
+            queue_name=args.queue,
+            consumer_options=consumer_options,
+            worker_metrics_port=args.metrics_port + 1
+            if args.metrics_port else None
+        )
+        signal.signal(signal.SIGTERM, lambda *_: stop.set())
+        signal.signal(signal.SIGINT, lambda *_: stop.set())
+        pool.run(stop)
+        return 0
+
+    consumer = rabbitmq_event_consumer.StreamingConsumer(
+        create_handler(), args.queue, **consumer_options
+    )
+
+    def shut_down(*_):
+        # stop() waits for the batch in hand, so not on the I/O thread
+        if not stop.is_set():
+            stop.set()
+            threading.Thread(target=consumer.stop).start()
+    signal.signal(signal.SIGTERM, shut_down)
+    signal.signal(signal.SIGINT, shut_down)
+    consumer.start()
+    # start() also returns when the broker closes the connection
+    return 0 if stop.is_set() else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
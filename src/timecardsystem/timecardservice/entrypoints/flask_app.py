@@ -1,61 +1,99 @@
-from datetime import datetime
-from typing import Dict, List
+import atexit
+import functools
+import hashlib
+import time
+from datetime import datetime, timezone
+from typing import Dict, Iterator, List, Optional
+from urllib.parse import urlencode
 
-from flask import Flask, jsonify, request
-from timecardsystem.timecardservice import views
+from flask import Flask, Response, g, jsonify, request
+from timecardsystem.timecardservice import config, metrics, views
+from timecardsystem.timecardservice.adapters import rabbitmq_event_publisher
 from timecardsystem.timecardservice.bootstrap_script import Bootstrap
 from timecardsystem.timecardservice.domain import commands
-from timecardsystem.timecardservice.services import handlers
+from timecardsystem.timecardservice.entrypoints import (employee_import,
+                                                        payloads)
+from timecardsystem.timecardservice.services import handlers, unit_of_work
 
 app = Flask(__name__)
 
+# The bootstrapped handler tables and the pooled database clients live for
+# the lifetime of the worker process; each request only gets a fresh message
+# bus bound to its own unit of work.
+# with EVENT_PUBLISHING=outbox, events are published by the outbox relay,
+# and with VIEW_PROJECTION=consumer, projected by the event consumer service
+bootstrapper = Bootstrap(
+    unit_of_work_factory=functools.partial(
+        unit_of_work.MongoDBUnitOfWork,
+        use_outbox=config.get_publish_through_outbox()
+    ),
+    publish_external_events=not config.get_publish_through_outbox(),
+    background_event_dispatch=config.get_background_event_dispatch(),
+    project_views=config.get_inline_view_projection()
+)
+bootstrapper.initialize_app()
+# events still queued for background dispatch are handled before exiting,
+# then the publisher's pooled broker connections are closed (atexit runs
+# handlers in reverse order of registration)
+atexit.register(rabbitmq_event_publisher.close_publisher)
+atexit.register(
+    bootstrapper.shutdown, config.get_event_dispatch_drain_timeout()
+)
 
-def create_dates_and_hours(dates_and_hours: Dict[str, Dict[str, str]]):
-    dates_and_hours_dto = {}
-    for date_str, hours in dates_and_hours.items():
-        date_obj = datetime.fromisoformat(date_str)
-        dates_and_hours_dto[date_obj] = hours
 
-    return dates_and_hours_dto
+@app.before_request
+def start_request_timer():
+    g.request_started_at = time.perf_counter()
+
+
+@app.after_request
+def observe_request_duration(response: Response) -> Response:
+    # streamed responses are timed up to their first byte
+    started_at = g.pop("request_started_at", None)
+    if started_at is not None:
+        metrics.HTTP_REQUEST_DURATION.labels(
+            request.method,
+            request.endpoint or "unmatched",
+            str(response.status_code)
+        ).observe(time.perf_counter() - started_at)
+    return response
+
+
+@app.errorhandler(payloads.InvalidPayload)
+def invalid_payload(err: payloads.InvalidPayload):
+    return {"error": str(err)}, 400
+
+
+@app.route("/metrics", methods=["GET"])
+def get_metrics():
+    return Response(metrics.render(), content_type=metrics.CONTENT_TYPE)
 
 
 @app.route("/employees", methods=["GET", "POST"])
 def create_employee():
-    employee_id = request.json["employee_id"]
-    employee_name = request.json["name"]
+    command = payloads.create_employee_command(request.json)
 
-    command = commands.CreateEmployee(
-        str(employee_id), str(employee_name)
-    )
-
-    bootstrapper = Bootstrap()
-    bootstrapper.initialize_app()
     bus = bootstrapper.get_message_bus()
     bus.handle(command)
 
     return "OK", 201
 
 
-@app.route("/timecards", methods=["POST"])
-def create_timecard():
-    timecard_id = request.json["timecard_id"]
-    employee_id = request.json["employee_id"]
-    week_ending_date = request.json["week_ending_date"]
-    week_ending_date = datetime.fromisoformat(week_ending_date)
-
-    dates_and_hours_dto = create_dates_and_hours(
-        request.json["dates_and_hours"]
+@app.route("/employees:import", methods=["POST"])
+def import_employees():
+    # reads the NDJSON body line by line instead of buffering it
+    lines = iter(request.stream.readline, b"")
+    report = employee_import.import_employees(
+        lines, bootstrapper.get_message_bus
     )
+    return report, 200
 
-    command = commands.CreateTimecard(
-        timecard_id,
-        employee_id,
-        week_ending_date,
-        dates_and_hours_dto
-    )
 
-    bootstrapper = Bootstrap()
-    bootstrapper.initialize_app()
+@app.route("/timecards", methods=["POST"])
+def create_timecard():
+    with metrics.REQUEST_PARSE_DURATION.labels("create_timecard").time():
+        command = payloads.create_timecard_command(request.json)
+
     bus = bootstrapper.get_message_bus()
 
     try:
@@ -66,23 +104,207 @@ def create_timecard():
     return "OK", 201
 
 
+@app.route("/timecards:batch", methods=["POST"])
+def create_timecards():
+    with metrics.REQUEST_PARSE_DURATION.labels("create_timecards").time():
+        timecards_json = payloads.timecard_batch(request.json)
+        too_large = len(timecards_json) > config.get_max_timecard_batch_size()
+        if not too_large:
+            results, timecard_commands, command_positions = \
+                payloads.parse_timecard_batch(timecards_json)
+    if too_large:
+        return {
+            "error": "Batch exceeds "
+                     f"{config.get_max_timecard_batch_size()} timecards"
+        }, 413
+
+    if timecard_commands:
+        bus = bootstrapper.get_message_bus()
+        with rabbitmq_event_publisher.batching() as confirms:
+            [command_results] = bus.handle(
+                commands.CreateTimecards(timecard_commands)
+            )
+        _report_publish_failures(command_results, confirms)
+        for position, result in zip(command_positions, command_results):
+            results[position] = result
+
+    all_accepted = all(
+        result["status"] != "rejected" and "publish_error" not in result
+        for result in results
+    )
+    return {"results": results}, 201 if all_accepted else 207
+
+
 @app.route("/timecards/<timecard_id>/submit", methods=["POST"])
 def submit_timecard_for_processing(timecard_id: str):
     command = commands.SubmitTimecardForProcessing(
         timecard_id=timecard_id
     )
 
-    bootstrapper = Bootstrap()
-    bootstrapper.initialize_app()
     bus = bootstrapper.get_message_bus()
     bus.handle(command)
 
     return "OK", 200
 
 
+def _report_publish_failures(results: List[Dict], confirms):
+    # in buffered publish mode, waits for the broker to confirm the events
+    # of the batch and marks the timecards whose events it did not: they
+    # are saved, but consumers have not heard of them
+    failures = {
+        getattr(event, "timecard_id", None): str(error)
+        for event, error in rabbitmq_event_publisher.failed_confirms(
+            confirms, config.get_rabbitmq_in_flight_timeout()
+        )
+    }
+    for result in results:
+        if result["timecard_id"] in failures:
+            result["publish_error"] = failures[result["timecard_id"]]
+
+
+def _parse_iso_date_arg(name: str) -> Optional[datetime]:
+    value = request.args.get(name)
+    return datetime.fromisoformat(value) if value else None
+
+
+def _page_link(cursor_name: str, cursor: str, rel: str) -> str:
+    args = request.args.to_dict()
+    args.pop("after", None)
+    args.pop("before", None)
+    args[cursor_name] = cursor
+    return f'<{request.base_url}?{urlencode(args)}>; rel="{rel}"'
+
+
+def _parse_fields_arg() -> Optional[List[str]]:
+    fields = request.args.get("fields")
+    return fields.split(",") if fields else None
+
+
+def _wants_ndjson() -> bool:
+    return request.args.get("format") == "ndjson" \
+        or request.accept_mimetypes.best == "application/x-ndjson"
+
+
+def _stream_timecards(docs: Iterator[Dict]) -> Response:
+    # emits the documents as they come off the database cursor, either as
+    # one JSON array or as newline-delimited JSON
+    dumps = app.json.dumps
+    if _wants_ndjson():
+        def generate():
+            for doc in docs:
+                yield dumps(doc) + "\n"
+        mimetype = "application/x-ndjson"
+    else:
+        def generate():
+            yield "["
+            separator = ""
+            for doc in docs:
+                yield separator + dumps(doc)
+                separator = ","
+            yield "]"
+        mimetype = "application/json"
+    return Response(generate(), mimetype=mimetype)
+
+
+def _is_not_modified(etag: str, last_modified: datetime) -> bool:
+    # If-None-Match takes precedence over If-Modified-Since (RFC 7232)
+    if request.if_none_match:
+        return request.if_none_match.contains(etag)
+    if request.if_modified_since:
+        return last_modified <= request.if_modified_since
+    return False
+
+
 @app.route("/employees/<employee_id>/timecards", methods=["GET"])
 def get_timecards_for_employee(employee_id: str):
-    results: List[Dict[str, str]] = views.timecards_for_employee(employee_id)
-    if not results:
+    version = views.timecards_version_for_employee(
+        employee_id, unit_of_work.MongoDBViewUnitOfWork()
+    )
+    if not version:
+        return _get_timecards_for_employee(employee_id)
+
+    # the query string is part of the tag, as each page or projection of
+    # the same version is a different representation
+    etag = hashlib.sha1(
+        f"{employee_id}:{version.version}:".encode("utf-8")
+        + request.query_string
+    ).hexdigest()
+    # HTTP dates only carry whole seconds
+    last_modified = version.modified_at.replace(
+        microsecond=0, tzinfo=timezone.utc
+    )
+    if _is_not_modified(etag, last_modified):
+        response = Response(status=304)
+    else:
+        response = app.make_response(_get_timecards_for_employee(employee_id))
+    if response.status_code in (200, 304):
+        response.set_etag(etag)
+        response.last_modified = last_modified
+    return response
+
+
+def _get_timecards_for_employee(employee_id: str):
+    if request.args.get("stream") == "true":
+        return export_timecards_for_employee(employee_id)
+
+    try:
+        limit = min(
+            int(request.args.get("limit", config.get_timecards_page_size())),
+            config.get_max_timecards_page_size()
+        )
+        if limit < 1:
+            raise ValueError("limit must be positive")
+        page = views.timecards_page_for_employee(
+            employee_id,
+            unit_of_work.MongoDBViewUnitOfWork(),
+            limit=limit,
+            after=request.args.get("after"),
+            before=request.args.get("before"),
+            fields=_parse_fields_arg(),
+            week_ending_from=_parse_iso_date_arg("from"),
+            week_ending_to=_parse_iso_date_arg("to")
+        )
+    except (ValueError, views.InvalidCursor, views.InvalidField) as err:
+        return {"error": str(err)}, 400
+
+    is_first_page = not (request.args.get("after")
+                         or request.args.get("before"))
+    if not page.timecards and is_first_page:
         return "not found", 404
-    return jsonify(results), 200
+
+    response = jsonify(page.timecards)
+    links = []
+    if page.next_cursor:
+        links.append(_page_link("after", page.next_cursor, "next"))
+    if page.previous_cursor:
+        links.append(_page_link("before", page.previous_cursor, "prev"))
+    if links:
+        response.headers["Link"] = ", ".join(links)
+    return response, 200
+
+
+def export_timecards_for_employee(employee_id: str):
+    try:
+        docs = views.iter_timecards_for_employee(
+            employee_id,
+            unit_of_work.MongoDBViewUnitOfWork(),
+            fields=views.validate_fields(_parse_fields_arg()),
+            week_ending_from=_parse_iso_date_arg("from"),
+            week_ending_to=_parse_iso_date_arg("to")
+        )
+    except (ValueError, views.InvalidField) as err:
+        return {"error": str(err)}, 400
+    return _stream_timecards(docs)
+
+
+@app.route("/weeks/<week_ending_date>/timecards", methods=["GET"])
+def export_timecards_for_week(week_ending_date: str):
+    try:
+        docs = views.iter_timecards_for_week(
+            datetime.fromisoformat(week_ending_date),
+            unit_of_work.MongoDBViewUnitOfWork(),
+            fields=views.validate_fields(_parse_fields_arg())
+        )
+    except (ValueError, views.InvalidField) as err:
+        return {"error": str(err)}, 400
+    return _stream_timecards(docs)
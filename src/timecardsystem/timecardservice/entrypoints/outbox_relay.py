@@ -0,0 +1,181 @@
+import argparse
+import logging
+import signal
+import sys
+import threading
+from datetime import datetime
+from typing import Dict, List
+
+import pymongo
+from timecardsystem.timecardservice import config, metrics
+from timecardsystem.timecardservice.adapters import (mongodb_client, odm,
+                                                     outbox,
+                                                     rabbitmq_event_publisher)
+
+logger = logging.getLogger(__name__)
+
+RELAYED_EVENTS = metrics.counter(
+    "timecardservice_outbox_relayed_events",
+    "Outbox entries published to the message broker, by event type.",
+    ("event",)
+)
+
+RELAY_BATCH_DURATION = metrics.histogram(
+    "timecardservice_outbox_relay_batch_duration_seconds",
+    "Time spent publishing and marking one batch of outbox entries."
+)
+
+OUTBOX_LAG = metrics.gauge(
+    "timecardservice_outbox_lag_seconds",
+    "Age of the oldest unpublished outbox entry."
+)
+
+
+class OutboxRelay:
+    # Publishes outbox entries in insertion order, batch_size at a time,
+    # through a BufferedEventPublisher: a batch is sent without waiting for
+    # the broker between messages, and the relay then waits up to
+    # confirm_timeout seconds for the broker's confirms. Only the entries
+    # the broker acked are marked published; the rest are published again
+    # with the next batch, so delivery is at least once, with the same
+    # message_id. Run a single relay per outbox.
+
+    def __init__(
+        self,
+        event_outbox: outbox.MongoDBOutbox,
+        publisher: rabbitmq_event_publisher.BufferedEventPublisher = None,
+        batch_size: int = 500,
+        confirm_timeout: float = 30.0
+    ) -> None:
+        self.outbox = event_outbox
+        if publisher is None:
+            publisher = rabbitmq_event_publisher.BufferedEventPublisher(
+                max_batch_size=batch_size
+            )
+        self.publisher = publisher
+        self.batch_size = batch_size
+        self.confirm_timeout = confirm_timeout
+
+    def relay_batch(self) -> int:
+        entries = self.outbox.fetch_pending(self.batch_size)
+        if not entries:
+            OUTBOX_LAG.set(0)
+            return 0
+
+        OUTBOX_LAG.set(
+            (datetime.utcnow() - entries[0]["created_at"]).total_seconds()
+        )
+        with RELAY_BATCH_DURATION.time():
+            published = self._publish(entries)
+        return published
+
+    def _publish(self, entries: List[Dict]) -> int:
+        futures = []
+        for entry in entries:
+            # entries written before messages had ids use their own
+            message_id = entry.get("message_id") or str(entry["_id"])
+            futures.append(self.publisher.publish(
+                entry["body"],
+                entry["event_type"],
+                message_id=message_id,
+                content_encoding=entry.get("content_encoding"),
+                headers=entry.get("headers")
+            ))
+        self.publisher.flush(self.confirm_timeout)
+
+        published_ids = []
+        error = None
+        for entry, future in zip(entries, futures):
+            if not future.done():
+                error = error or rabbitmq_event_publisher.PublishFailed(
+                    "The broker did not confirm the message in time"
+                )
+            elif future.exception() is not None:
+                error = error or future.exception()
+            else:
+                published_ids.append(entry["_id"])
+                RELAYED_EVENTS.labels(entry["event_type"]).inc()
+        # whatever the broker acked is marked, even if other entries in the
+        # batch failed
+        self.outbox.mark_published(published_ids)
+        if error is not None:
+            raise error
+        return len(published_ids)
+
+    def close(self):
+        self.publisher.close(self.confirm_timeout)
+
+    def run(
+        self,
+        stop: threading.Event,
+        poll_interval: float = 0.5,
+        max_backoff: float = 30.0
+    ):
+        # full batches are followed immediately by the next one; otherwise
+        # the outbox is polled every poll_interval seconds
+        backoff = poll_interval
+        while not stop.is_set():
+            try:
+                published = self.relay_batch()
+                backoff = poll_interval
+            except (rabbitmq_event_publisher.PublishNacked,
+                    rabbitmq_event_publisher.PublishFailed,
+                    pymongo.errors.PyMongoError, OSError):
+                logger.exception(
+                    "Publishing outbox entries failed, retrying in %.1fs",
+                    backoff
+                )
+                stop.wait(backoff)
+                backoff = min(backoff * 2, max_backoff)
+                continue
+            if published < self.batch_size:
+                stop.wait(poll_interval)
+        self.close()
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(
+        description="Publish events from the transactional outbox"
+    )
+    parser.add_argument(
+        "--batch-size", type=int, default=config.get_outbox_batch_size()
+    )
+    parser.add_argument(
+        "--poll-interval", type=float,
+        default=config.get_outbox_poll_interval()
+    )
+    parser.add_argument(
+        "--metrics-port", type=int, default=None,
+        help="serve Prometheus metrics on this port"
+    )
+    parser.add_argument(
+        "--once", action="store_true",
+        help="publish one batch and exit"
+    )
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO)
+    if args.metrics_port:
+        metrics.start_http_server(args.metrics_port)
+
+    client = mongodb_client.get_client(
+        config.get_mongodb_uri(), initializer=odm.initialize_database
+    )
+    relay = OutboxRelay(
+        outbox.MongoDBOutbox(client[odm.DATABASE_NAME]),
+        batch_size=args.batch_size
+    )
+    if args.once:
+        published = relay.relay_batch()
+        relay.close()
+        print(f"published {published} events")
+        return 0
+
+    stop = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: stop.set())
+    signal.signal(signal.SIGINT, lambda *_: stop.set())
+    relay.run(stop, poll_interval=args.poll_interval)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,133 @@
+import argparse
+import sys
+from datetime import datetime
+from typing import Collection, List, NamedTuple
+
+import pika
+from timecardsystem.common.dtos.message_dto import (ATTEMPTS_HEADER,
+                                                    failed_attempts,
+                                                    serialized_at)
+from timecardsystem.timecardservice.adapters import rabbitmq_event_publisher
+
+# Lists and replays the messages the retry failure policy has parked:
+#   python -m timecardsystem.timecardservice.entrypoints.parked_messages \
+#       list views
+# Messages are fetched with basic.get and stay unacknowledged until the
+# command is done with them, so those it does not replay return to the
+# parking queue, in their order, when its connection closes.
+
+BODY_PREVIEW_LENGTH = 120
+
+
+class ParkedMessage(NamedTuple):
+    delivery_tag: int
+    properties: pika.BasicProperties
+    body: bytes
+
+
+def fetch(channel, queue_name: str, limit: int) -> List[ParkedMessage]:
+    # the first limit messages parked from queue_name
+    parked = []
+    while len(parked) < limit:
+        method, properties, body = channel.basic_get(
+            rabbitmq_event_publisher.parking_queue_name(queue_name),
+            auto_ack=False
+        )
+        if method is None:
+            break
+        parked.append(ParkedMessage(method.delivery_tag, properties, body))
+    return parked
+
+
+def describe(message: ParkedMessage) -> str:
+    published = serialized_at(message.properties)
+    if published is not None:
+        published = datetime.utcfromtimestamp(published).isoformat()
+    preview = message.body[:BODY_PREVIEW_LENGTH].decode(
+        "utf-8", errors="replace"
+    )
+    return (
+        f"{message.properties.message_id} {message.properties.content_type}"
+        f" attempts={failed_attempts(message.properties)}"
+        f" published={published} bytes={len(message.body)}\n  {preview}"
+    )
+
+
+def replay(
+    channel,
+    queue_name: str,
+    parked: List[ParkedMessage],
+    message_ids: Collection[str] = None
+) -> int:
+    # Publishes the parked messages, or those with message_ids, back to
+    # queue_name with their attempts reset, acking each once the broker
+    # has confirmed it; returns how many were replayed. A message that
+    # cannot be routed raises instead of being dropped.
+    exchange, routing_key = rabbitmq_event_publisher.return_destination(
+        queue_name
+    )
+    replayed = 0
+    for message in parked:
+        if message_ids and message.properties.message_id not in message_ids:
+            continue
+        headers = dict(message.properties.headers or {})
+        headers.pop(ATTEMPTS_HEADER, None)
+        channel.basic_publish(
+            exchange=exchange,
+            routing_key=routing_key,
+            body=message.body,
+            properties=rabbitmq_event_publisher.republished_properties(
+                message.properties, headers
+            ),
+            mandatory=True
+        )
+        channel.basic_ack(message.delivery_tag)
+        replayed += 1
+    return replayed
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(
+        description="Inspect and replay messages parked by the retry "
+                    "failure policy"
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    list_parser = subparsers.add_parser(
+        "list", help="print parked messages, leaving them parked"
+    )
+    replay_parser = subparsers.add_parser(
+        "replay",
+        help="return parked messages to their queue with their attempts "
+             "reset"
+    )
+    replay_parser.add_argument(
+        "--message-id", action="append", dest="message_ids",
+        help="replay only this message; may be repeated"
+    )
+    for subparser in (list_parser, replay_parser):
+        subparser.add_argument("queue", help="the queue they were parked from")
+        subparser.add_argument(
+            "--limit", type=int, default=100,
+            help="most parked messages to read"
+        )
+    args = parser.parse_args(argv)
+
+    connection = rabbitmq_event_publisher.connect()
+    try:
+        channel = connection.channel()
+        channel.confirm_delivery()
+        parked = fetch(channel, args.queue, args.limit)
+        if args.command == "list":
+            for message in parked:
+                print(describe(message))
+            print(f"{len(parked)} parked messages")
+        else:
+            replayed = replay(channel, args.queue, parked, args.message_ids)
+            print(f"{replayed} of {len(parked)} parked messages replayed")
+    finally:
+        connection.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
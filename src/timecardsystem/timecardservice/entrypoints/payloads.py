@@ -0,0 +1,115 @@
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+from typing import Dict, List, Tuple
+
+from timecardsystem.timecardservice.domain import commands
+
+# Request payload parsing shared by the HTTP entrypoints. Payloads are
+# checked here, field by field, and a malformed one raises InvalidPayload,
+# which the entrypoints answer with a 400; any other error raised while
+# serving a request is a bug and surfaces as a 500.
+
+HOURS_TYPES = ("work_hours", "sick_hours", "vacation_hours")
+
+
+class InvalidPayload(Exception):
+    pass
+
+
+def _object(payload, description: str = "Request body") -> Dict:
+    if not isinstance(payload, dict):
+        raise InvalidPayload(f"{description} must be a JSON object")
+    return payload
+
+
+def _field(payload: Dict, name: str, kind=str):
+    if name not in payload:
+        raise InvalidPayload(f"Missing field {name}")
+    value = payload[name]
+    if not isinstance(value, kind) or isinstance(value, bool):
+        raise InvalidPayload(f"Invalid field {name}")
+    return value
+
+
+def _date(value: str, description: str) -> datetime:
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        raise InvalidPayload(f"Invalid date {description}") from None
+
+
+def _hours(value, description: str):
+    try:
+        valid = Decimal(value).is_finite()
+    except (InvalidOperation, ValueError):
+        valid = False
+    if not valid:
+        raise InvalidPayload(f"Invalid hours {description}")
+    return value
+
+
+def create_dates_and_hours(dates_and_hours: Dict[str, Dict[str, str]]):
+    dates_and_hours_dto = {}
+    for date_str, hours in _object(
+        dates_and_hours, "dates_and_hours"
+    ).items():
+        date_obj = _date(date_str, date_str)
+        hours = _object(hours, f"Hours for {date_str}")
+        dates_and_hours_dto[date_obj] = {
+            hours_type: _hours(
+                _field(hours, hours_type, (str, int, float)),
+                f"{hours_type} for {date_str}"
+            )
+            for hours_type in HOURS_TYPES
+        }
+
+    return dates_and_hours_dto
+
+
+def create_employee_command(employee_json: Dict) -> commands.CreateEmployee:
+    employee_json = _object(employee_json)
+    return commands.CreateEmployee(
+        str(_field(employee_json, "employee_id", (str, int))),
+        str(_field(employee_json, "name"))
+    )
+
+
+def create_timecard_command(
+    timecard_json: Dict[str, str]
+) -> commands.CreateTimecard:
+    timecard_json = _object(timecard_json, "Timecard")
+    return commands.CreateTimecard(
+        _field(timecard_json, "timecard_id"),
+        _field(timecard_json, "employee_id"),
+        _date(_field(timecard_json, "week_ending_date"), "week_ending_date"),
+        create_dates_and_hours(_field(timecard_json, "dates_and_hours", dict))
+    )
+
+
+def timecard_batch(batch_json: Dict) -> List:
+    # the items of a POST /timecards:batch body, each parsed on its own
+    return _field(_object(batch_json), "timecards", list)
+
+
+def parse_timecard_batch(
+    timecards_json: List[Dict]
+) -> Tuple[List[Dict], List[commands.CreateTimecard], List[int]]:
+    # malformed items are rejected up front; the rest are validated and
+    # written together by the CreateTimecards handler. Returns the results
+    # list with the rejections filled in, the commands, and the position
+    # of each command's result.
+    results = [None] * len(timecards_json)
+    timecard_commands = []
+    command_positions = []
+    for position, timecard_json in enumerate(timecards_json):
+        try:
+            timecard_commands.append(create_timecard_command(timecard_json))
+            command_positions.append(position)
+        except InvalidPayload:
+            results[position] = {
+                "timecard_id": timecard_json.get("timecard_id")
+                if isinstance(timecard_json, dict) else None,
+                "status": "rejected",
+                "error": "Malformed timecard"
+            }
+    return results, timecard_commands, command_positions
@@ -1,21 +1,163 @@
-from typing import Callable
+import json
+import logging
+import queue
+import threading
+import time
+from typing import (Callable, Dict, List, NamedTuple, Optional, Sequence,
+                    Set, Tuple)
 
 import pika
 from pika.adapters.select_connection import SelectConnection
 from pika.channel import Channel
-from pika.frame import Method
 from pika.spec import BasicProperties
-from timecardsystem.timecardservice import config
+from timecardsystem.common.domain import events
+from timecardsystem.common.dtos import event_codecs
+from timecardsystem.common.dtos.message_dto import (ATTEMPTS_HEADER,
+                                                    MessageConsumerDTO,
+                                                    failed_attempts,
+                                                    serialized_at)
+from timecardsystem.timecardservice import config, metrics
+from timecardsystem.timecardservice.adapters import rabbitmq_event_publisher
+from timecardsystem.timecardservice.adapters.processed_messages import \
+    ProcessedMessages
+
+logger = logging.getLogger(__name__)
+
+PENDING_MESSAGES = metrics.gauge(
+    "timecardservice_consumer_pending_messages",
+    "Received messages waiting for the consumer's handler thread."
+)
+
+CONSUMED_EVENTS = metrics.counter(
+    "timecardservice_consumer_events",
+    "Events received from the broker, by event type and outcome.",
+    ("event", "outcome")
+)
+
+ACK_BATCH_SIZE = metrics.histogram(
+    "timecardservice_consumer_ack_batch_size",
+    "Messages acknowledged per basic.ack sent to the broker.",
+    buckets=(1, 2, 5, 10, 25, 50, 100, 250, 500)
+)
+
+BATCH_SIZE = metrics.histogram(
+    "timecardservice_consumer_batch_events",
+    "Events handed to a streaming consumer's handler in one call.",
+    buckets=(1, 2, 5, 10, 25, 50, 100, 250, 500, 1000)
+)
+
+DUPLICATE_MESSAGES = metrics.counter(
+    "timecardservice_consumer_duplicate_messages",
+    "Redelivered messages acked without being handled, by event type and "
+    "where they were recognized: in memory, in the store, or as a repeat "
+    "within a batch.",
+    ("event", "found_in")
+)
+
+RETRIED_MESSAGES = metrics.counter(
+    "timecardservice_consumer_retried_messages",
+    "Failed messages republished by the retry failure policy, by event type "
+    "and destination: a retry queue or the parking queue.",
+    ("event", "destination")
+)
+
+BATCH_DURATION = metrics.histogram(
+    "timecardservice_consumer_batch_duration_seconds",
+    "Time a streaming consumer's handler spent on one batch."
+)
+
+EVENT_LAG = metrics.histogram(
+    "timecardservice_consumer_event_lag_seconds",
+    "Time from an event being serialized by its publisher to its handling, "
+    "by event type.",
+    ("event",),
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30,
+             60, 300)
+)
+
+REQUEUE = "requeue"
+DEAD_LETTER = "dead-letter"
+RETRY = "retry"
+
+_STOP = object()
 
 HOST, PORT = config.get_rabbitmq_host_and_port()
 
+# the payroll service only processes submitted timecards
+PAYROLL_QUEUE_NAME = "payroll"
+PAYROLL_BINDING_KEYS = (
+    rabbitmq_event_publisher.ROUTING_KEYS["TimecardSubmittedForProcessing"],
+)
+
 
 class Consumer:
+    # Consumes queue_name, declaring it and binding it to the event exchange
+    # with binding_keys first. The keys default to the queue's bindings in
+    # RABBIT_MQ_BINDINGS, or every event for a queue not listed there.
+    #
+    # The broker stops delivering once prefetch_count messages are
+    # unacknowledged (0 for no limit). Acks are sent as one basic.ack with
+    # multiple=True once ack_batch_size messages are waiting for one, or
+    # ack_interval seconds after the first of them, so messages must be
+    # settled in delivery order. A nack first sends the acks waiting
+    # before it. Keep ack_batch_size well below prefetch_count, or
+    # deliveries pause until the interval expires. failure_policy decides
+    # whether messages that failed are requeued, dead-lettered or retried;
+    # without RABBIT_MQ_DEAD_LETTERING, dead-lettered messages are dropped.
+    # Retried messages are republished to the queue's retry queue for
+    # their attempt, which returns them after its delay, and parked once
+    # they have failed max_attempts times, as are undecodable messages;
+    # the consumer declares those queues. A retried message is handled
+    # after messages delivered behind it, even those of the same employee
+    # on a partitioned queue. The arguments default to their
+    # RABBIT_MQ_CONSUMER_* settings.
 
-    def __init__(self):
+    def __init__(
+        self,
+        queue_name: str = rabbitmq_event_publisher.QUEUE_NAME,
+        binding_keys: Sequence[str] = None,
+        prefetch_count: int = None,
+        ack_batch_size: int = None,
+        ack_interval: float = None,
+        failure_policy: str = None,
+        max_attempts: int = None
+    ):
+        self.queue_name = queue_name
+        if prefetch_count is None:
+            prefetch_count = config.get_rabbitmq_consumer_prefetch()
+        if ack_batch_size is None:
+            ack_batch_size = config.get_rabbitmq_consumer_ack_batch_size()
+        if ack_interval is None:
+            ack_interval = config.get_rabbitmq_consumer_ack_interval()
+        if failure_policy is None:
+            failure_policy = config.get_rabbitmq_consumer_failure_policy()
+        if failure_policy not in (REQUEUE, DEAD_LETTER, RETRY):
+            raise ValueError(f"Unknown failure policy {failure_policy!r}")
+        if max_attempts is None:
+            max_attempts = rabbitmq_event_publisher.MAX_ATTEMPTS
+        if max_attempts < 1:
+            raise ValueError("max_attempts must be at least 1")
+        if prefetch_count and ack_batch_size > prefetch_count:
+            raise ValueError("ack_batch_size is larger than prefetch_count")
+        self.prefetch_count = prefetch_count
+        self.ack_batch_size = max(ack_batch_size, 1)
+        self.ack_interval = ack_interval
+        self.failure_policy = failure_policy
+        self.max_attempts = max_attempts
+        self.retry_delays = rabbitmq_event_publisher.retry_delays(
+            max_attempts
+        )
+        if binding_keys is None:
+            binding_keys = rabbitmq_event_publisher.BINDINGS.get(
+                queue_name, ("#",)
+            )
+        self.binding_keys = tuple(binding_keys)
         self.channel: Channel = None
         self.connection: SelectConnection = None
         self.custom_callback: Callable = None
+        self._last_delivery_tag = 0
+        self._pending_acks = 0
+        self._ack_timer = None
 
     def set_on_message_callback(self, callback_func: Callable):
         self.custom_callback = callback_func
@@ -24,24 +166,53 @@ class Consumer:
         parameters = pika.ConnectionParameters(host=HOST, port=PORT)
         connection = pika.SelectConnection(
             parameters,
-            on_open_callback=self.on_connected)
+            on_open_callback=self.on_connected,
+            on_close_callback=self.on_connection_closed)
         self.connection = connection
 
+    def on_connection_closed(self, connection: SelectConnection, reason):
+        # start() returns once the connection is closed, whether by stop()
+        # or by the broker going away
+        self.connection.ioloop.stop()
+
     def on_connected(self, connection: SelectConnection):
         self.connection.channel(on_open_callback=self.on_channel_open)
 
     def on_channel_open(self, new_channel: Channel):
+        # delivery tags are numbered per channel
         self.channel = new_channel
-        self.channel.queue_declare(
-            queue="test",
-            durable=True,
-            exclusive=False,
-            auto_delete=False,
-            callback=self.on_queue_declared
+        self._pending_acks = 0
+        self._cancel_ack_timer()
+        rabbitmq_event_publisher.declare_topology_async(
+            self.channel,
+            self.on_queue_declared,
+            bindings={self.queue_name: self.binding_keys},
+            delays=self.retry_delays if self.failure_policy == RETRY
+            else None
         )
 
-    def on_queue_declared(self, frame: Method):
-        self.channel.basic_consume('test', self.handle_delivery)
+    def on_queue_declared(self):
+        if self.prefetch_count:
+            self.channel.basic_qos(
+                prefetch_count=self.prefetch_count,
+                callback=lambda _: self.start_consuming()
+            )
+        else:
+            self.start_consuming()
+
+    def start_consuming(self):
+        # a consumer of a partitioned queue on its own reads every partition
+        if rabbitmq_event_publisher.PARTITIONS:
+            queue_names = [
+                rabbitmq_event_publisher.partition_queue_name(
+                    self.queue_name, partition
+                )
+                for partition in range(rabbitmq_event_publisher.PARTITIONS)
+            ]
+        else:
+            queue_names = [self.queue_name]
+        for queue_name in queue_names:
+            self.channel.basic_consume(queue_name, self.handle_delivery)
 
     def handle_delivery(
         self,
@@ -56,21 +227,435 @@ class Consumer:
         header: pika.spec.BasicProperties
         body: bytes
         """
-        if self.custom_callback(channel, method, header, body):
+        # a message, including an envelope of several events, is acked or
+        # nacked as a whole. One that cannot be decoded, or is of an event
+        # type this service does not know, perhaps from a newer publisher,
+        # is rejected without requeueing, as redelivering it would fail the
+        # same way. A callback returning False has failed to handle it.
+        if header.content_type not in event_codecs.REGISTRY:
+            logger.warning(
+                "Rejecting %s message of an unknown event type",
+                header.content_type
+            )
+            self.reject_undecodable_message(method.delivery_tag, header, body)
+            return
+        try:
+            handled = self.custom_callback(channel, method, header, body)
+        except Exception:
+            logger.exception(
+                "Rejecting undecodable %s message", header.content_type
+            )
+            self.reject_undecodable_message(method.delivery_tag, header, body)
+            return
+        if handled:
             self.ack_message(method.delivery_tag)
         else:
-            self.nack_message(method.delivery_tag)
+            self.reject_failed_message(method.delivery_tag, header, body)
 
     def ack_message(self, delivery_tag: int):
-        self.channel.basic_ack(delivery_tag)
+        if self.ack_batch_size == 1:
+            self.channel.basic_ack(delivery_tag)
+            ACK_BATCH_SIZE.observe(1)
+            return
+        self._last_delivery_tag = delivery_tag
+        self._pending_acks += 1
+        if self._pending_acks >= self.ack_batch_size:
+            self.flush_acks()
+        elif self._ack_timer is None:
+            self._ack_timer = self.connection.ioloop.call_later(
+                self.ack_interval, self._on_ack_timer
+            )
+
+    def flush_acks(self):
+        self._cancel_ack_timer()
+        if self._pending_acks:
+            self.channel.basic_ack(self._last_delivery_tag, multiple=True)
+            ACK_BATCH_SIZE.observe(self._pending_acks)
+            self._pending_acks = 0
+
+    def nack_message(self, delivery_tag: int, requeue: bool = True):
+        self.flush_acks()
+        self.channel.basic_nack(delivery_tag, requeue=requeue)
+
+    def reject_failed_message(
+        self,
+        delivery_tag: int,
+        header: BasicProperties,
+        body: bytes
+    ):
+        if self.failure_policy == RETRY:
+            self.retry_message(delivery_tag, header, body)
+        else:
+            self.nack_message(
+                delivery_tag, requeue=self.failure_policy == REQUEUE
+            )
+
+    def reject_undecodable_message(
+        self,
+        delivery_tag: int,
+        header: BasicProperties,
+        body: bytes
+    ):
+        # parked at once by the retry policy, as retrying cannot help
+        if self.failure_policy == RETRY:
+            self.retry_message(delivery_tag, header, body, park=True)
+        else:
+            self.nack_message(delivery_tag, requeue=False)
 
-    def nack_message(self, delivery_tag: int):
-        self.channel.basic_nack(delivery_tag)
+    def retry_message(
+        self,
+        delivery_tag: int,
+        header: BasicProperties,
+        body: bytes,
+        park: bool = False
+    ):
+        # Republishes the message with its attempts counted in a header,
+        # keeping its message id and other headers, then acks it. Both go
+        # out on this channel in that order, and the ack is only sent
+        # after the publish, but without publisher confirms a broker
+        # failure in between can still lose the message.
+        attempts = failed_attempts(header) + 1
+        if park or attempts >= self.max_attempts:
+            destination = "parked"
+            routing_key = rabbitmq_event_publisher.parking_queue_name(
+                self.queue_name
+            )
+        else:
+            destination = "retry"
+            routing_key = rabbitmq_event_publisher.retry_queue_name(
+                self.queue_name, self.retry_delays[attempts - 1]
+            )
+        self.channel.basic_publish(
+            exchange="",
+            routing_key=routing_key,
+            body=body,
+            properties=rabbitmq_event_publisher.republished_properties(
+                header, {**(header.headers or {}), ATTEMPTS_HEADER: attempts}
+            )
+        )
+        RETRIED_MESSAGES.labels(header.content_type, destination).inc()
+        self.ack_message(delivery_tag)
+
+    def _on_ack_timer(self):
+        self._ack_timer = None
+        self.flush_acks()
+
+    def _cancel_ack_timer(self):
+        if self._ack_timer is not None:
+            self.connection.ioloop.remove_timeout(self._ack_timer)
+            self._ack_timer = None
 
     def start(self):
         self.connect()
         self.connection.ioloop.start()
 
     def stop(self):
-        self.connection.ioloop.stop()
-        self.connection.close()
+        # may be called from any thread; waiting acks are sent before the
+        # connection closes
+        self.connection.ioloop.add_callback_threadsafe(self._close)
+
+    def _close(self):
+        if self.channel is not None and self.channel.is_open:
+            self.flush_acks()
+        if self.connection.is_closing or self.connection.is_closed:
+            self.connection.ioloop.stop()
+        else:
+            self.connection.close()
+
+
+class _Received(NamedTuple):
+    delivery_tag: int
+    header: BasicProperties
+    # kept for the retry failure policy to republish
+    body: bytes
+    message_id: Optional[str]
+    serialized_at: Optional[float]
+    # None for a message recognized as a duplicate on arrival, which is not
+    # decoded, or for one that could not be decoded
+    events: Optional[List[events.Event]]
+    # rejected by the worker rather than on arrival, so that an ack the
+    # rejection sends cannot cover earlier messages still being handled
+    undecodable: bool = False
+
+    @property
+    def content_type(self) -> str:
+        return self.header.content_type
+
+
+class StreamingConsumer(Consumer):
+    # Decodes each message on the connection's I/O thread and hands its
+    # events to handler, in delivery order, on a single worker thread. The
+    # handler takes a list: the events of up to max_batch_size messages,
+    # as many as arrive within max_batch_wait seconds of the first, so it
+    # can write them in bulk. Messages are acked once their batch has been
+    # handled, so with prefetch_count set the broker holds back further
+    # deliveries while the handler is behind: at most prefetch_count
+    # messages are in memory however long the consumer runs, and the queue
+    # between the threads never fills.
+    #
+    # A message that cannot be decoded, or is of an event type the consumer
+    # does not read, is rejected without requeueing, or parked by the retry
+    # policy, in its turn with the others. When
+    # the handler raises for a batch of several messages, they are handed
+    # to it again one message at a time, and only those that still fail
+    # are requeued, dead-lettered or retried by failure_policy. A message is
+    # redelivered with all of its events, including any handled before the
+    # failure, so handlers must be idempotent.
+    #
+    # With processed_messages, messages whose message_id it holds are
+    # acked without being handled: those it remembers are not even
+    # decoded, and the rest of a batch is looked up in one query before
+    # the handler is called. A message is recorded once handled, before
+    # its ack is sent. If the lookup fails, the batch is handled anyway.
+
+    def __init__(
+        self,
+        handler: Callable[[List[events.Event]], None],
+        queue_name: str = rabbitmq_event_publisher.QUEUE_NAME,
+        binding_keys: Sequence[str] = None,
+        prefetch_count: int = None,
+        message_dto: MessageConsumerDTO = None,
+        max_batch_size: int = 1,
+        max_batch_wait: float = 0.0,
+        processed_messages: ProcessedMessages = None,
+        **settlement
+    ):
+        super().__init__(
+            queue_name, binding_keys, prefetch_count, **settlement
+        )
+        if self.prefetch_count < 1:
+            raise ValueError("A streaming consumer needs a prefetch_count")
+        if max_batch_size > self.prefetch_count:
+            raise ValueError("max_batch_size is larger than prefetch_count")
+        self.handler = handler
+        self.max_batch_size = max(max_batch_size, 1)
+        self.max_batch_wait = max_batch_wait
+        if message_dto is None:
+            message_dto = MessageConsumerDTO()
+            message_dto.set_deserializer(json.loads)
+        self.message_dto = message_dto
+        self.processed_messages = processed_messages
+        # one slot more than prefetch_count leaves room for _STOP
+        self._queue = queue.Queue(maxsize=self.prefetch_count + 1)
+        self._worker: threading.Thread = None
+
+    def start(self):
+        self._start_worker()
+        super().start()
+
+    def stop(self, timeout: float = 30.0) -> bool:
+        # handles the messages already received before closing the
+        # connection; returns False if that took longer than timeout, in
+        # which case the unacked messages are redelivered
+        drained = True
+        if self._worker is not None:
+            self._queue.put(_STOP)
+            self._worker.join(timeout)
+            drained = not self._worker.is_alive()
+            self._worker = None
+        super().stop()
+        return drained
+
+    def handle_delivery(
+        self,
+        channel: Channel,
+        method,
+        header: BasicProperties,
+        body: bytes
+    ):
+        message_id = header.message_id
+        undecodable = False
+        if message_id and self.processed_messages is not None \
+                and message_id in self.processed_messages:
+            # still acked by the worker, to keep acks in delivery order
+            DUPLICATE_MESSAGES.labels(header.content_type, "memory").inc()
+            decoded = None
+        else:
+            try:
+                decoded = self.message_dto.decode_message(header, body)
+            except Exception:
+                logger.exception(
+                    "Rejecting undecodable %s message", header.content_type
+                )
+                decoded = None
+                undecodable = True
+            if decoded is None and not undecodable:
+                # an event type this service does not know, perhaps from a
+                # newer publisher, would fail the same way if redelivered
+                logger.warning(
+                    "Rejecting %s message of an unknown event type",
+                    header.content_type
+                )
+                undecodable = True
+        try:
+            self._queue.put_nowait(_Received(
+                method.delivery_tag, header, body, message_id,
+                serialized_at(header), decoded, undecodable
+            ))
+        except queue.Full:
+            # only if the broker ignored the prefetch limit
+            self.nack_message(method.delivery_tag)
+            return
+        PENDING_MESSAGES.inc()
+
+    def _start_worker(self):
+        if self._worker is None:
+            self._worker = threading.Thread(
+                target=self._work, name="event-consumer", daemon=True
+            )
+            self._worker.start()
+
+    def _work(self):
+        stopping = False
+        while not stopping:
+            batch, stopping = self._next_batch()
+            if batch:
+                self._handle(batch)
+
+    def _next_batch(self) -> Tuple[List[_Received], bool]:
+        # waits for a message, then takes those arriving within
+        # max_batch_wait of it; also returns whether _STOP was reached
+        batch = []
+        stopping = False
+        item = self._queue.get()
+        deadline = time.monotonic() + self.max_batch_wait
+        while item is not _STOP:
+            batch.append(item)
+            if len(batch) >= self.max_batch_size:
+                break
+            try:
+                item = self._queue.get(
+                    timeout=max(deadline - time.monotonic(), 0)
+                )
+            except queue.Empty:
+                break
+        else:
+            stopping = True
+        PENDING_MESSAGES.dec(len(batch))
+        return batch, stopping
+
+    def _handle(self, batch: List[_Received]):
+        # the batch's messages are settled together, in delivery order
+        duplicates = self._duplicates(batch)
+        outcomes = {delivery_tag: True for delivery_tag in duplicates}
+        self._handle_new(
+            [
+                received for received in batch
+                if received.delivery_tag not in duplicates
+                and not received.undecodable
+            ],
+            outcomes
+        )
+        self._settle([
+            (received, outcomes.get(received.delivery_tag, False))
+            for received in batch
+        ])
+
+    def _duplicates(self, batch: List[_Received]) -> Set[int]:
+        # the delivery tags of messages handled before, or repeated within
+        # the batch
+        duplicates = {
+            received.delivery_tag for received in batch
+            if received.events is None and not received.undecodable
+        }
+        if self.processed_messages is None:
+            return duplicates
+        identified = [
+            received for received in batch
+            if received.events is not None and received.message_id
+        ]
+        try:
+            processed = self.processed_messages.processed(
+                received.message_id for received in identified
+            )
+        except Exception:
+            logger.exception("Looking up processed messages failed")
+            processed = set()
+        seen = set()
+        for received in identified:
+            if received.message_id in processed:
+                DUPLICATE_MESSAGES.labels(
+                    received.content_type, "store"
+                ).inc()
+                duplicates.add(received.delivery_tag)
+            elif received.message_id in seen:
+                DUPLICATE_MESSAGES.labels(
+                    received.content_type, "batch"
+                ).inc()
+                duplicates.add(received.delivery_tag)
+            seen.add(received.message_id)
+        return duplicates
+
+    def _handle_new(self, batch: List[_Received], outcomes: Dict[int, bool]):
+        if not batch:
+            return
+        received_events = [
+            event for received in batch for event in received.events
+        ]
+        try:
+            with BATCH_DURATION.time():
+                self.handler(received_events)
+        except Exception:
+            if len(batch) > 1:
+                logger.warning(
+                    "Handling a batch of %d messages failed, retrying them "
+                    "one at a time", len(batch)
+                )
+                for received in batch:
+                    self._handle_new([received], outcomes)
+                return
+            logger.exception("Failed to handle %s", received_events)
+            for event in received_events:
+                CONSUMED_EVENTS.labels(type(event).__name__, "failed").inc()
+            outcomes[batch[0].delivery_tag] = False
+            return
+        self._record_processed(batch)
+        BATCH_SIZE.observe(len(received_events))
+        handled_at = time.time()
+        for received in batch:
+            outcomes[received.delivery_tag] = True
+            for event in received.events:
+                event_type = type(event).__name__
+                CONSUMED_EVENTS.labels(event_type, "handled").inc()
+                if received.serialized_at is not None:
+                    EVENT_LAG.labels(event_type).observe(
+                        max(handled_at - received.serialized_at, 0)
+                    )
+
+    def _record_processed(self, batch: List[_Received]):
+        if self.processed_messages is None:
+            return
+        try:
+            self.processed_messages.record(
+                received.message_id for received in batch
+                if received.message_id
+            )
+        except Exception:
+            # the messages are still acked; a redelivery is handled again
+            logger.exception("Recording processed messages failed")
+
+    def _settle(self, outcomes: List[Tuple[_Received, bool]]):
+        # acks go through the I/O thread, the only one that may use the
+        # channel, in one callback for the batch
+        def callback():
+            for received, handled in outcomes:
+                if received.undecodable:
+                    self.reject_undecodable_message(
+                        received.delivery_tag, received.header, received.body
+                    )
+                elif handled:
+                    self.ack_message(received.delivery_tag)
+                else:
+                    self.reject_failed_message(
+                        received.delivery_tag, received.header, received.body
+                    )
+        self.connection.ioloop.add_callback_threadsafe(callback)
+
+
+def payroll_consumer(
+    handler: Callable[[List[events.Event]], None],
+    **settings
+) -> StreamingConsumer:
+    return StreamingConsumer(
+        handler, PAYROLL_QUEUE_NAME, PAYROLL_BINDING_KEYS, **settings
+    )
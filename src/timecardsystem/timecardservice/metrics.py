@@ -0,0 +1,81 @@
+import prometheus_client
+from prometheus_client import REGISTRY
+
+# In-process metrics, kept and rendered in the Prometheus text exposition
+# format by prometheus_client. Observing a value is cheap enough to leave on
+# around every handler, commit and publish. Each process keeps its own
+# values, so every worker is scraped on its own.
+
+CONTENT_TYPE = prometheus_client.CONTENT_TYPE_LATEST
+
+# seconds, from sub-millisecond in-memory work up to slow broker round-trips
+DEFAULT_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+    0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+
+
+def histogram(name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+    return prometheus_client.Histogram(
+        name, documentation, labelnames, buckets=buckets
+    )
+
+
+def gauge(name, documentation, labelnames=()):
+    return prometheus_client.Gauge(name, documentation, labelnames)
+
+
+def counter(name, documentation, labelnames=()):
+    return prometheus_client.Counter(name, documentation, labelnames)
+
+
+def render() -> str:
+    return prometheus_client.generate_latest(REGISTRY).decode("utf-8")
+
+
+def sample_value(name: str, labels=None) -> float:
+    # the current value of one sample, 0 before anything was recorded
+    return REGISTRY.get_sample_value(name, labels) or 0.0
+
+
+def start_http_server(port: int, host: str = "0.0.0.0"):
+    # serves the metrics of processes without an HTTP entrypoint, such as
+    # the outbox relay, on every path
+    return prometheus_client.start_http_server(port, addr=host)
+
+
+HTTP_REQUEST_DURATION = histogram(
+    "timecardservice_http_request_duration_seconds",
+    "Time spent serving HTTP requests.",
+    ("method", "endpoint", "status")
+)
+
+REQUEST_PARSE_DURATION = histogram(
+    "timecardservice_request_parse_duration_seconds",
+    "Time spent parsing request bodies into commands.",
+    ("endpoint",)
+)
+
+MESSAGE_DURATION = histogram(
+    "timecardservice_message_bus_handle_duration_seconds",
+    "Time the message bus spent on a message and the events it raised.",
+    ("message",)
+)
+
+HANDLER_DURATION = histogram(
+    "timecardservice_handler_duration_seconds",
+    "Time spent in each message handler.",
+    ("stage", "message", "handler")
+)
+
+UNIT_OF_WORK_DURATION = histogram(
+    "timecardservice_unit_of_work_duration_seconds",
+    "Time spent committing or rolling back units of work.",
+    ("unit_of_work", "operation")
+)
+
+PUBLISH_DURATION = histogram(
+    "timecardservice_event_publish_duration_seconds",
+    "Time spent publishing events to the message broker.",
+    ("event",)
+)
@@ -0,0 +1,172 @@
+from typing import Awaitable, Callable, Dict, List
+
+from timecardsystem.common.domain import model as common_model
+from timecardsystem.timecardservice.adapters import async_mongodb_view
+from timecardsystem.timecardservice.domain import commands, events, model
+from timecardsystem.timecardservice.services.handlers import (
+    EmployeeDoesNotExist, TimecardDoesNotExist, apply_create_timecard,
+    build_employees, employee_ids_in_batch,
+    employee_ids_of_timecard_events, plan_timecard_batch,
+    timecard_ids_in_batch, timecard_rows)
+
+from . import async_unit_of_work
+
+# asyncio counterparts of the handlers in handlers.py. Only the I/O differs;
+# building and validating the domain objects is done by the synchronous
+# handlers' helpers, and the same exceptions are raised.
+
+
+async def create_employee(
+    command: commands.CreateEmployee,
+    unit_of_work: async_unit_of_work.AbstractAsyncUnitOfWork
+):
+    async with unit_of_work:
+        employee = model.Employee(
+            common_model.EmployeeID(command.employee_id),
+            common_model.EmployeeName(command.name)
+        )
+        await unit_of_work.employees.add(employee)
+        employee.confirm_employee_created()
+        await unit_of_work.commit()
+
+
+async def import_employees(
+    command: commands.ImportEmployees,
+    unit_of_work: async_unit_of_work.AbstractAsyncUnitOfWork
+) -> Dict[str, int]:
+    async with unit_of_work:
+        employees = build_employees(command)
+        await unit_of_work.employees.add_all(employees)
+        for employee in employees:
+            employee.confirm_employee_created()
+        await unit_of_work.commit()
+    return {"imported": len(employees)}
+
+
+async def create_timecard(
+    command: commands.CreateTimecard,
+    unit_of_work: async_unit_of_work.AbstractAsyncUnitOfWork
+):
+    async with unit_of_work:
+        employee = await unit_of_work.employees.get(
+            common_model.EmployeeID(command.employee_id)
+        )
+        if not employee:
+            raise EmployeeDoesNotExist(
+                f"Employee ID {command.employee_id} does not exist"
+            )
+        timecard = apply_create_timecard(
+            command,
+            await unit_of_work.timecards.get(
+                common_model.TimecardID(command.timecard_id)
+            )
+        )
+        await unit_of_work.timecards.add(timecard)
+        timecard.confirm_timecard_created()
+        await unit_of_work.commit()
+
+
+async def create_timecards(
+    command: commands.CreateTimecards,
+    unit_of_work: async_unit_of_work.AbstractAsyncUnitOfWork
+) -> List[Dict[str, str]]:
+    async with unit_of_work:
+        timecards, results = plan_timecard_batch(
+            command,
+            await unit_of_work.employees.get_many(
+                employee_ids_in_batch(command)
+            ),
+            await unit_of_work.timecards.get_many(
+                timecard_ids_in_batch(command)
+            )
+        )
+        if timecards:
+            await unit_of_work.timecards.add_all(timecards)
+            for timecard in timecards:
+                timecard.confirm_timecard_created()
+        await unit_of_work.commit()
+    return results
+
+
+async def submit_timecard_for_processing(
+    command: commands.SubmitTimecardForProcessing,
+    unit_of_work: async_unit_of_work.AbstractAsyncUnitOfWork
+):
+    async with unit_of_work:
+        timecard = await unit_of_work.timecards.get(
+            common_model.TimecardID(command.timecard_id)
+        )
+        if timecard:
+            timecard.submitted = True
+            await unit_of_work.timecards.add(timecard)
+            await unit_of_work.commit()
+        else:
+            raise TimecardDoesNotExist(
+                f"Timecard does not exist: {command.timecard_id}"
+            )
+
+
+async def add_employee_to_view_model(event: events.EmployeeCreated):
+    await async_mongodb_view.add_employee_to_view_model(
+        common_model.EmployeeID(event.employee_id),
+        common_model.EmployeeName(event.name)
+    )
+
+
+async def add_timecard_to_view_model(
+    event: events.TimecardCreated,
+    unit_of_work: async_unit_of_work.AbstractAsyncUnitOfWork
+):
+    async with unit_of_work:
+        employee = await unit_of_work.employees.get(
+            common_model.EmployeeID(event.employee_id)
+        )
+        if not employee:
+            raise EmployeeDoesNotExist(
+                f"Employee ID {event.employee_id} does not exist"
+            )
+        timecard = await unit_of_work.timecards.get(
+            common_model.TimecardID(event.timecard_id)
+        )
+
+        await async_mongodb_view.add_timecard_to_view_model(
+            employee.id,
+            employee.name,
+            timecard.id,
+            timecard.week_ending_date,
+            timecard.dates_and_hours
+        )
+
+
+async def add_timecards_to_view_model(
+    timecard_events: List[events.TimecardCreated],
+    unit_of_work: async_unit_of_work.AbstractAsyncUnitOfWork
+):
+    async with unit_of_work:
+        employees = await unit_of_work.employees.get_many(
+            employee_ids_of_timecard_events(timecard_events)
+        )
+    await async_mongodb_view.add_timecards_to_view_model_bulk(
+        timecard_rows(timecard_events, employees)
+    )
+
+
+async def publish_employee_created_event(
+    event: events.EmployeeCreated,
+    publish_action: Callable[..., Awaitable]
+):
+    await publish_action(events.PUBLISHED_EVENT_NAMES[type(event)], event)
+
+
+async def publish_timecard_created_event(
+    event: events.TimecardCreated,
+    publish_action: Callable[..., Awaitable]
+):
+    await publish_action(events.PUBLISHED_EVENT_NAMES[type(event)], event)
+
+
+async def publish_timecard_submitted_event(
+    event: events.TimecardSubmittedForProcessing,
+    publish_action: Callable[..., Awaitable]
+):
+    await publish_action(events.PUBLISHED_EVENT_NAMES[type(event)], event)
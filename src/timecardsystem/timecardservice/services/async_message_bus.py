@@ -0,0 +1,100 @@
+from typing import Awaitable, Callable, Dict, List, Type
+
+from timecardsystem.common.domain import commands, events
+from timecardsystem.timecardservice import metrics
+from timecardsystem.timecardservice.services import async_unit_of_work
+from timecardsystem.timecardservice.services.message_bus import (
+    Message, MessageBus, handler_timer)
+
+# asyncio counterpart of message_bus.MessageBus; every handler is a
+# coroutine function.
+
+
+class AsyncMessageBus:
+
+    def __init__(
+        self,
+        unit_of_work: async_unit_of_work.AbstractAsyncUnitOfWork,
+        command_handlers: Dict[
+            Type[commands.Command], Callable[..., Awaitable]
+        ],
+        event_handlers: Dict[
+            Type[events.Event], List[Callable[..., Awaitable]]
+        ],
+        external_event_handlers: Dict[
+            Type[events.Event], List[Callable[..., Awaitable]]
+        ],
+        publish_external_events: bool = True,
+        collect_side_effect_events: bool = True,
+        batch_event_handlers: Dict[
+            Type[events.Event], List[Callable[..., Awaitable]]
+        ] = None
+    ) -> None:
+        self.unit_of_work = unit_of_work
+        self.command_handlers = command_handlers
+        self.event_handlers = event_handlers
+        self.external_event_handlers = external_event_handlers
+        self.queue = []
+        self.publish_external_events = publish_external_events
+        self.collect_side_effect_events = collect_side_effect_events
+        # handlers taking a list of events of one type, passed the events
+        # of that type raised together
+        self.batch_event_handlers = batch_event_handlers or {}
+
+    async def handle(self, message: Message) -> List:
+        results = []
+        self.queue.append(message)
+        while self.queue:
+            message = self.queue.pop(0)
+            with metrics.MESSAGE_DURATION.labels(
+                type(message).__name__
+            ).time():
+                if isinstance(message, commands.Command):
+                    results.append(await self.handle_command(message))
+                elif isinstance(message, events.Event):
+                    run = self._take_run(message)
+                    if len(run) > 1:
+                        await self.handle_event_run(run)
+                    else:
+                        await self.handle_event(message)
+                else:
+                    raise Exception(
+                        f"{message} is not an Event or Command!"
+                    )
+        return results
+
+    async def handle_command(self, command: commands.Command):
+        handler = self.command_handlers[type(command)]
+        with handler_timer("command", command, handler):
+            result = await handler(command)
+        if self.collect_side_effect_events:
+            self.queue.extend(self.unit_of_work.collect_events())
+        return result
+
+    async def handle_event(self, event: events.Event):
+        if type(event) in self.event_handlers:
+            for handler in self.event_handlers[type(event)]:
+                with handler_timer("event", event, handler):
+                    await handler(event)
+                if self.collect_side_effect_events:
+                    self.queue.extend(self.unit_of_work.collect_events())
+
+        await self.publish_external_event(event)
+
+    async def handle_event_run(self, run: List[events.Event]):
+        for handler in self.batch_event_handlers[type(run[0])]:
+            with handler_timer("event_batch", run[0], handler):
+                await handler(run)
+            if self.collect_side_effect_events:
+                self.queue.extend(self.unit_of_work.collect_events())
+        for event in run:
+            await self.publish_external_event(event)
+
+    _take_run = MessageBus._take_run
+
+    async def publish_external_event(self, event: events.Event):
+        if type(event) in self.external_event_handlers \
+                and self.publish_external_events:
+            for handler in self.external_event_handlers[type(event)]:
+                with handler_timer("external_event", event, handler):
+                    await handler(event)
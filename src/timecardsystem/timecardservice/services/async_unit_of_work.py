@@ -0,0 +1,129 @@
+import abc
+
+import pymongo
+from motor.motor_asyncio import AsyncIOMotorClientSession
+from timecardsystem.timecardservice import config
+from timecardsystem.timecardservice.adapters import (async_mongodb_client,
+                                                     async_mongodb_view,
+                                                     async_repositories, odm,
+                                                     outbox)
+from timecardsystem.timecardservice.services import unit_of_work
+
+# asyncio counterparts of the units of work in unit_of_work.py, used with
+# "async with". The collections' schema and indexes are not ensured here;
+# the ASGI entrypoint does that once at startup.
+
+
+class AbstractAsyncUnitOfWork(abc.ABC):
+    employees: async_repositories.AbstractAsyncEmployeeRepository
+    timecards: async_repositories.AbstractAsyncTimecardRepository
+
+    _committed = False
+
+    async def __aenter__(self):
+        self._committed = False
+        return self
+
+    async def __aexit__(self, *args):
+        if self._committed:
+            await self.rollback()
+            return
+        with self._timer("rollback"):
+            await self.rollback()
+
+    async def commit(self):
+        with self._timer("commit"):
+            await self._commit()
+        self._committed = True
+
+    _timer = unit_of_work.AbstractUnitOfWork._timer
+
+    # events are raised on the domain objects, so collecting them does no
+    # I/O and is shared with the synchronous unit of work
+    collect_events = unit_of_work.AbstractUnitOfWork.collect_events
+
+    @abc.abstractmethod
+    async def _commit(self):
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    async def rollback(self):
+        raise NotImplementedError
+
+
+async def create_default_session() -> AsyncIOMotorClientSession:
+    client = async_mongodb_client.get_async_client(config.get_mongodb_uri())
+    return await client.start_session()
+
+
+class MotorUnitOfWork(AbstractAsyncUnitOfWork):
+
+    def __init__(
+        self,
+        session_factory=create_default_session,
+        use_outbox: bool = False
+    ) -> None:
+        self.session_factory = session_factory
+        self.use_outbox = use_outbox
+
+    async def __aenter__(self):
+        self.session = await self.session_factory()
+        self.session.start_transaction()
+        self.pending_events = outbox.PendingEvents()
+        self.timecards = async_repositories.MotorTimecardRepository(
+            self.session
+        )
+        self.employees = async_repositories.MotorEmployeeRepository(
+            self.session
+        )
+        return await super().__aenter__()
+
+    async def __aexit__(self, *args):
+        await super().__aexit__(*args)
+        await self.session.end_session()
+
+    async def _commit(self):
+        if self.use_outbox:
+            documents = outbox.create_outbox_documents(
+                self.pending_events.take(
+                    [*self.timecards.seen, *self.employees.seen]
+                )
+            )
+            if documents:
+                database = self.session.client[odm.DATABASE_NAME]
+                await database[odm.OUTBOX_COLLECTION_NAME].insert_many(
+                    documents, ordered=True, session=self.session
+                )
+        await self.session.commit_transaction()
+
+    async def rollback(self):
+        # same workaround as MongoDBUnitOfWork.rollback
+        try:
+            await self.session.abort_transaction()
+        except pymongo.errors.InvalidOperation:
+            pass
+
+
+async def create_default_view_session() -> AsyncIOMotorClientSession:
+    client = async_mongodb_view.get_async_view_client()
+    return await client.start_session()
+
+
+class MotorViewUnitOfWork(AbstractAsyncUnitOfWork):
+
+    def __init__(self, session_factory=create_default_view_session) -> None:
+        self.session_factory = session_factory
+
+    async def __aenter__(self):
+        self.session = await self.session_factory()
+        return await super().__aenter__()
+
+    async def __aexit__(self, *args):
+        await super().__aexit__(*args)
+        await self.session.end_session()
+
+    async def _commit(self):
+        pass
+
+    async def rollback(self):
+        pass
@@ -0,0 +1,178 @@
+import logging
+import queue
+import threading
+import time
+import zlib
+from typing import Callable, Iterable, List
+
+from timecardsystem.common.domain import events
+from timecardsystem.common.dtos.message_dto import PARTITION_KEY_FIELD
+from timecardsystem.timecardservice import metrics
+
+logger = logging.getLogger(__name__)
+
+QUEUE_DEPTH = metrics.gauge(
+    "timecardservice_event_dispatch_queue_depth",
+    "Events waiting for a background dispatch worker."
+)
+
+IN_PROGRESS = metrics.gauge(
+    "timecardservice_event_dispatch_in_progress",
+    "Dispatched events being handled, by workers or inline."
+)
+
+DISPATCHED_EVENTS = metrics.counter(
+    "timecardservice_event_dispatch_events",
+    "Events handed to background dispatch, by outcome.",
+    ("event", "outcome")
+)
+
+QUEUE_WAIT_DURATION = metrics.histogram(
+    "timecardservice_event_dispatch_queue_wait_seconds",
+    "Time events spent queued before a worker picked them up."
+)
+
+_STOP = object()
+
+
+class DispatcherStopped(Exception):
+    pass
+
+
+class BackgroundEventDispatcher:
+    # Handles events on a bounded pool of worker threads, so the request
+    # that raised them returns once its own transaction has committed.
+    # Each event is handled by a fresh message bus from bus_factory, with
+    # its own unit of work, and events raised while handling it are handled
+    # on the same worker.
+    #
+    # Each worker has a queue of its own, and an event goes to the queue
+    # its employee id hashes to, so one employee's events are handled by a
+    # single worker, in the order they were submitted.
+    #
+    # Backpressure: a submit call may wait up to put_timeout seconds in all
+    # for queue space. Once that is spent, the caller handles the rest of
+    # its events itself, in order, which slows the producing requests down
+    # to the rate the workers sustain instead of dropping events. Events
+    # handled inline can overtake the same employee's events still queued.
+
+    def __init__(
+        self,
+        bus_factory: Callable,
+        workers: int = 4,
+        max_queue_size: int = 1000,
+        put_timeout: float = 0.5
+    ) -> None:
+        self.bus_factory = bus_factory
+        self.workers = workers
+        self.put_timeout = put_timeout
+        # max_queue_size is shared out between the workers' queues
+        self._queues = [
+            queue.Queue(maxsize=max(max_queue_size // workers, 1))
+            for _ in range(workers)
+        ]
+        self._threads: List[threading.Thread] = []
+        self._lock = threading.Lock()
+        self._stopped = False
+
+    def start(self):
+        with self._lock:
+            if self._threads or self._stopped:
+                return
+            for number, worker_queue in enumerate(self._queues):
+                thread = threading.Thread(
+                    target=self._work,
+                    args=(worker_queue,),
+                    name=f"event-dispatcher-{number}",
+                    daemon=True
+                )
+                thread.start()
+                self._threads.append(thread)
+
+    def submit(self, dispatched_events: Iterable[events.Event]):
+        if self._stopped:
+            raise DispatcherStopped("Event dispatcher is shut down")
+        self.start()
+        dispatched_events = list(dispatched_events)
+        deadline = time.monotonic() + self.put_timeout
+        for position, event in enumerate(dispatched_events):
+            QUEUE_DEPTH.inc()
+            try:
+                self._queue_for(event).put(
+                    (time.perf_counter(), event),
+                    timeout=max(deadline - time.monotonic(), 0)
+                )
+            except queue.Full:
+                QUEUE_DEPTH.dec()
+                logger.warning(
+                    "Event dispatch queue full, handling %d events inline",
+                    len(dispatched_events) - position
+                )
+                for event in dispatched_events[position:]:
+                    self._handle(event, "inline")
+                return
+
+    def shutdown(self, timeout: float = 30.0) -> bool:
+        # stops accepting events, then waits up to timeout seconds for the
+        # queued ones to be handled. Returns False if some were not.
+        with self._lock:
+            self._stopped = True
+            threads = list(self._threads)
+        deadline = time.monotonic() + timeout
+        stopping = []
+        for worker_queue, thread in zip(self._queues, threads):
+            # a queue that stays full past the deadline belongs to a worker
+            # stuck on an event, which is left running
+            try:
+                worker_queue.put(
+                    _STOP, timeout=max(deadline - time.monotonic(), 0)
+                )
+            except queue.Full:
+                continue
+            stopping.append(thread)
+        for thread in stopping:
+            thread.join(max(deadline - time.monotonic(), 0))
+        drained = len(stopping) == len(threads) \
+            and not any(thread.is_alive() for thread in threads)
+        if not drained:
+            logger.error(
+                "Event dispatcher shut down with %d events still queued",
+                self.queue_depth()
+            )
+        return drained
+
+    def queue_depth(self) -> int:
+        return sum(worker_queue.qsize() for worker_queue in self._queues)
+
+    def _queue_for(self, event: events.Event) -> queue.Queue:
+        key = str(getattr(event, PARTITION_KEY_FIELD, type(event).__name__))
+        shard = zlib.crc32(key.encode("utf-8")) % len(self._queues)
+        return self._queues[shard]
+
+    def _work(self, worker_queue: queue.Queue):
+        while True:
+            item = worker_queue.get()
+            try:
+                if item is _STOP:
+                    return
+                queued_at, event = item
+                QUEUE_DEPTH.dec()
+                QUEUE_WAIT_DURATION.observe(
+                    time.perf_counter() - queued_at
+                )
+                self._handle(event, "handled")
+            finally:
+                worker_queue.task_done()
+
+    def _handle(self, event: events.Event, outcome: str):
+        IN_PROGRESS.inc()
+        try:
+            self.bus_factory().handle(event)
+        except Exception:
+            # the command that raised the event has already committed, so
+            # the failure cannot be reported to its caller
+            logger.exception("Failed to handle %s", event)
+            outcome = "failed"
+        finally:
+            IN_PROGRESS.dec()
+        DISPATCHED_EVENTS.labels(type(event).__name__, outcome).inc()
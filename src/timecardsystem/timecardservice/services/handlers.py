@@ -1,6 +1,6 @@
 from datetime import datetime
 from decimal import Decimal
-from typing import Callable, Dict
+from typing import Callable, Dict, List, Optional, Tuple
 
 from timecardsystem.common.domain import model as common_model
 from timecardsystem.timecardservice.adapters import mongodb_view
@@ -48,6 +48,56 @@ def create_employee(
         unit_of_work.commit()
 
 
+def build_employees(
+    command: commands.ImportEmployees
+) -> List[model.Employee]:
+    # later records for the same employee ID win, like repeated
+    # CreateEmployee commands would
+    employees = {}
+    for employee_command in command.employees:
+        employee = model.Employee(
+            common_model.EmployeeID(employee_command.employee_id),
+            common_model.EmployeeName(employee_command.name)
+        )
+        employees[employee.id] = employee
+    return list(employees.values())
+
+
+def import_employees(
+    command: commands.ImportEmployees,
+    unit_of_work: unit_of_work.AbstractUnitOfWork
+) -> Dict[str, int]:
+    with unit_of_work:
+        employees = build_employees(command)
+        unit_of_work.employees.add_all(employees)
+        for employee in employees:
+            employee.confirm_employee_created()
+        unit_of_work.commit()
+    return {"imported": len(employees)}
+
+
+def apply_create_timecard(
+    command: commands.CreateTimecard,
+    timecard: Optional[model.Timecard]
+) -> model.Timecard:
+    if timecard:
+        timecard.dates_and_hours = _convert_dates_and_hours(
+            command.dates_and_hours
+        )
+    else:
+        timecard = model.Timecard(
+            common_model.TimecardID(command.timecard_id),
+            employee_id=common_model.EmployeeID(command.employee_id),
+            week_ending_date=command.week_ending_date,
+            dates_and_hours=_convert_dates_and_hours(
+                command.dates_and_hours
+            )
+        )
+    if not timecard.validate_timecard():
+        raise InvalidTimecard(f"Invalid timecard {timecard.id.value}")
+    return timecard
+
+
 def create_timecard(
     command: commands.CreateTimecard,
     unit_of_work: unit_of_work.AbstractUnitOfWork
@@ -60,29 +110,93 @@ def create_timecard(
             raise EmployeeDoesNotExist(
                 f"Employee ID {command.employee_id} does not exist"
             )
-        timecard = unit_of_work.timecards.get(
-            common_model.TimecardID(command.timecard_id)
-        )
-        if timecard:
-            timecard.dates_and_hours = _convert_dates_and_hours(
-                command.dates_and_hours
+        timecard = apply_create_timecard(
+            command,
+            unit_of_work.timecards.get(
+                common_model.TimecardID(command.timecard_id)
             )
-        else:
-            timecard = model.Timecard(
-                common_model.TimecardID(command.timecard_id),
-                employee_id=common_model.EmployeeID(command.employee_id),
-                week_ending_date=command.week_ending_date,
-                dates_and_hours=_convert_dates_and_hours(
-                    command.dates_and_hours
-                )
-            )
-        if not timecard.validate_timecard():
-            raise InvalidTimecard(f"Invalid timecard {timecard.id.value}")
+        )
         unit_of_work.timecards.add(timecard)
         timecard.confirm_timecard_created()
         unit_of_work.commit()
 
 
+def employee_ids_in_batch(
+    command: commands.CreateTimecards
+) -> List[common_model.EmployeeID]:
+    return [
+        common_model.EmployeeID(timecard_command.employee_id)
+        for timecard_command in command.timecards
+    ]
+
+
+def timecard_ids_in_batch(
+    command: commands.CreateTimecards
+) -> List[common_model.TimecardID]:
+    return [
+        common_model.TimecardID(timecard_command.timecard_id)
+        for timecard_command in command.timecards
+    ]
+
+
+def plan_timecard_batch(
+    command: commands.CreateTimecards,
+    employees: Dict[common_model.EmployeeID, model.Employee],
+    existing_timecards: Dict[common_model.TimecardID, model.Timecard]
+) -> Tuple[List[model.Timecard], List[Dict[str, str]]]:
+    # validates every timecard in the batch against the employees and
+    # timecards loaded up front, rejecting invalid ones individually.
+    # Returns the timecards to write and a result per command.
+    results = []
+    accepted_timecards: Dict[common_model.TimecardID, model.Timecard] = {}
+    for timecard_command in command.timecards:
+        timecard_id = common_model.TimecardID(timecard_command.timecard_id)
+        employee_id = common_model.EmployeeID(timecard_command.employee_id)
+        existing_timecard = accepted_timecards.get(timecard_id) \
+            or existing_timecards.get(timecard_id)
+        try:
+            if employee_id not in employees:
+                raise EmployeeDoesNotExist(
+                    f"Employee ID {employee_id.value} does not exist"
+                )
+            timecard = apply_create_timecard(
+                timecard_command, existing_timecard
+            )
+        except (EmployeeDoesNotExist, InvalidTimecard) as err:
+            results.append({
+                "timecard_id": timecard_id.value,
+                "status": "rejected",
+                "error": str(err)
+            })
+            continue
+
+        accepted_timecards[timecard_id] = timecard
+        results.append({
+            "timecard_id": timecard_id.value,
+            "status": "updated" if existing_timecard else "created"
+        })
+    return list(accepted_timecards.values()), results
+
+
+def create_timecards(
+    command: commands.CreateTimecards,
+    unit_of_work: unit_of_work.AbstractUnitOfWork
+) -> List[Dict[str, str]]:
+    # all accepted timecards are written in one bulk write
+    with unit_of_work:
+        timecards, results = plan_timecard_batch(
+            command,
+            unit_of_work.employees.get_many(employee_ids_in_batch(command)),
+            unit_of_work.timecards.get_many(timecard_ids_in_batch(command))
+        )
+        if timecards:
+            unit_of_work.timecards.add_all(timecards)
+            for timecard in timecards:
+                timecard.confirm_timecard_created()
+        unit_of_work.commit()
+    return results
+
+
 def submit_timecard_for_processing(
     command: commands.SubmitTimecardForProcessing,
     unit_of_work: unit_of_work.AbstractUnitOfWork
@@ -133,22 +247,97 @@ def add_timecard_to_view_model(
         )
 
 
+def _received_value(value):
+    # events received from other services carry value objects where
+    # locally raised ones carry plain values
+    return getattr(value, "value", value)
+
+
+def _received_dates_and_hours(
+    dates_and_hours: Dict
+) -> Dict[datetime, model.WorkDayHours]:
+    if all(isinstance(hours, model.WorkDayHours)
+           for hours in dates_and_hours.values()):
+        return dates_and_hours
+    return _convert_dates_and_hours(dates_and_hours)
+
+
+def add_employees_to_view_model(
+    employee_events: List[events.EmployeeCreated]
+):
+    mongodb_view.add_employees_to_view_model_bulk([
+        (
+            common_model.EmployeeID(_received_value(event.employee_id)),
+            common_model.EmployeeName(_received_value(event.name))
+        )
+        for event in employee_events
+    ])
+
+
+def employee_ids_of_timecard_events(
+    timecard_events: List[events.TimecardCreated]
+) -> List[common_model.EmployeeID]:
+    return [
+        common_model.EmployeeID(_received_value(event.employee_id))
+        for event in timecard_events
+    ]
+
+
+def timecard_rows(
+    timecard_events: List[events.TimecardCreated],
+    employees: Dict[common_model.EmployeeID, model.Employee]
+) -> List[Dict]:
+    # the view rows are built from the events themselves and the employees
+    # they belong to
+    rows = []
+    for employee_id, event in zip(
+        employee_ids_of_timecard_events(timecard_events), timecard_events
+    ):
+        employee = employees.get(employee_id)
+        if not employee:
+            raise EmployeeDoesNotExist(
+                f"Employee ID {employee_id.value} does not exist"
+            )
+        rows.append(mongodb_view.create_timecard_row(
+            employee.id,
+            employee.name,
+            common_model.TimecardID(_received_value(event.timecard_id)),
+            event.week_ending_date,
+            _received_dates_and_hours(event.dates_and_hours)
+        ))
+    return rows
+
+
+def add_timecards_to_view_model(
+    timecard_events: List[events.TimecardCreated],
+    unit_of_work: unit_of_work.AbstractUnitOfWork
+):
+    # only the employees' names are looked up, in one query for the batch
+    with unit_of_work:
+        employees = unit_of_work.employees.get_many(
+            employee_ids_of_timecard_events(timecard_events)
+        )
+    mongodb_view.add_timecards_to_view_model_bulk(
+        timecard_rows(timecard_events, employees)
+    )
+
+
 def publish_employee_created_event(
     event: events.EmployeeCreated,
     publish_action: Callable
 ):
-    publish_action("employee_created", event)
+    return publish_action(events.PUBLISHED_EVENT_NAMES[type(event)], event)
 
 
 def publish_timecard_created_event(
     event: events.TimecardCreated,
     publish_action: Callable
 ):
-    publish_action("timecard_created", event)
+    return publish_action(events.PUBLISHED_EVENT_NAMES[type(event)], event)
 
 
 def publish_timecard_submitted_event(
     event: events.TimecardSubmittedForProcessing,
     publish_action: Callable
 ):
-    publish_action("timecard_submitted", event)
+    return publish_action(events.PUBLISHED_EVENT_NAMES[type(event)], event)
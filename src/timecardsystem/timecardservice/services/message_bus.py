@@ -1,10 +1,20 @@
-from typing import Callable, Dict, Type, Union
+import itertools
+from typing import Callable, Dict, List, Optional, Type, Union
 
 from timecardsystem.common.domain import commands, events
+from timecardsystem.timecardservice import metrics
 from timecardsystem.timecardservice.services import unit_of_work
 
 Message = Union[commands.Command, events.Event]
 
+
+def handler_timer(stage: str, message: Message, handler: Callable):
+    return metrics.HANDLER_DURATION.labels(
+        stage,
+        type(message).__name__,
+        getattr(handler, "__name__", "handler")
+    ).time()
+
 # Code modified from class MessageBus obtained from
 # https://github.com/cosmicpython/code/blob/master/src/allocation/service_layer/messagebus.py
 
@@ -18,7 +28,10 @@ class MessageBus:
         event_handlers: Dict[Type[events.Event], Callable],
         external_event_handlers: Dict[Type[events.Event], Callable],
         publish_external_events: bool = True,
-        collect_side_effect_events: bool = True
+        collect_side_effect_events: bool = True,
+        event_dispatcher: Optional[Callable[[List[events.Event]], None]] =
+        None,
+        batch_event_handlers: Dict[Type[events.Event], Callable] = None
     ) -> None:
         self.unit_of_work = unit_of_work
         self.command_handlers = command_handlers
@@ -27,32 +40,97 @@ class MessageBus:
         self.queue = []
         self.publish_external_events = publish_external_events
         self.collect_side_effect_events = collect_side_effect_events
+        # when set, events raised by commands are handed to it instead of
+        # being handled before handle() returns
+        self.event_dispatcher = event_dispatcher
+        # handlers taking a list of events of one type, used by
+        # handle_batch
+        self.batch_event_handlers = batch_event_handlers or {}
 
-    def handle(self, message: Message):
+    def handle(self, message: Message) -> List:
+        # returns whatever the command handlers returned, in order
+        results = []
         self.queue.append(message)
         while self.queue:
             message = self.queue.pop(0)
-            if isinstance(message, commands.Command):
-                self.handle_command(message)
-            elif isinstance(message, events.Event):
-                self.handle_event(message)
-            else:
-                raise Exception(f"{message} is not an Event or Command!")
+            with metrics.MESSAGE_DURATION.labels(
+                type(message).__name__
+            ).time():
+                if isinstance(message, commands.Command):
+                    results.append(self.handle_command(message))
+                elif isinstance(message, events.Event):
+                    run = self._take_run(message)
+                    if len(run) > 1:
+                        self.handle_event_run(run)
+                    else:
+                        self.handle_event(message)
+                else:
+                    raise Exception(
+                        f"{message} is not an Event or Command!"
+                    )
+        return results
+
+    def handle_batch(self, received: List[events.Event]):
+        # Handles a micro-batch of events, such as those received from
+        # other services. Each run of consecutive events of a type with
+        # batch handlers is passed to them in one call, so projections can
+        # be written in bulk; other events are handled one at a time, in
+        # order. Events raised on the way are handled after their run.
+        for event_type, run in itertools.groupby(received, key=type):
+            run = list(run)
+            if event_type not in self.batch_event_handlers:
+                for event in run:
+                    self.handle(event)
+                continue
+            self.handle_event_run(run)
+            while self.queue:
+                self.handle(self.queue.pop(0))
+
+    def handle_event_run(self, run: List[events.Event]):
+        # consecutive events of one type, passed to its batch handlers in
+        # one call and then published one by one
+        for handler in self.batch_event_handlers[type(run[0])]:
+            with handler_timer("event_batch", run[0], handler):
+                handler(run)
+            if self.collect_side_effect_events:
+                self.queue.extend(self.unit_of_work.collect_events())
+        for event in run:
+            self.publish_external_event(event)
+
+    def _take_run(self, event: events.Event) -> List[events.Event]:
+        # the event and the events of its type queued right behind it, such
+        # as those raised together by a bulk command, when the type has
+        # batch handlers
+        run = [event]
+        if type(event) in self.batch_event_handlers:
+            while self.queue and type(self.queue[0]) is type(event):
+                run.append(self.queue.pop(0))
+        return run
 
     def handle_command(self, command: commands.Command):
         handler = self.command_handlers[type(command)]
-        handler(command)
+        with handler_timer("command", command, handler):
+            result = handler(command)
         if self.collect_side_effect_events:
-            self.queue.extend(self.unit_of_work.collect_events())
+            raised_events = list(self.unit_of_work.collect_events())
+            if self.event_dispatcher and raised_events:
+                self.event_dispatcher(raised_events)
+            else:
+                self.queue.extend(raised_events)
+        return result
 
     def handle_event(self, event: events.Event):
         if type(event) in self.event_handlers:
             for handler in self.event_handlers[type(event)]:
-                handler(event)
+                with handler_timer("event", event, handler):
+                    handler(event)
                 if self.collect_side_effect_events:
                     self.queue.extend(self.unit_of_work.collect_events())
+        self.publish_external_event(event)
 
+    def publish_external_event(self, event: events.Event):
         if type(event) in self.external_event_handlers \
                 and self.publish_external_events:
             for handler in self.external_event_handlers[type(event)]:
-                handler(event)
+                with handler_timer("external_event", event, handler):
+                    handler(event)
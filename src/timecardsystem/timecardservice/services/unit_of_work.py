@@ -2,8 +2,10 @@ import abc
 
 import pymongo
 from timecardsystem.timecardservice.adapters import repositories
-from timecardsystem.timecardservice import config
-from timecardsystem.timecardservice.adapters import odm
+from timecardsystem.timecardservice import config, metrics
+from timecardsystem.timecardservice.adapters import (mongodb_client,
+                                                     mongodb_view, odm,
+                                                     outbox)
 
 # Code modified from class AbstractUnitOfWork obtained from
 # https://github.com/cosmicpython/code/blob/master/src/allocation/service_layer/unit_of_work.py
@@ -13,14 +15,30 @@ class AbstractUnitOfWork(abc.ABC):
     employees: repositories.AbstractEmployeeRepository
     timecards: repositories.AbstractTimecardRepository
 
+    # whether the unit of work was committed since it was entered; rolling
+    # back after a commit does nothing, so only real rollbacks are timed
+    _committed = False
+
     def __enter__(self):
+        self._committed = False
         return self
 
     def __exit__(self, *args):
-        self.rollback()
+        if self._committed:
+            self.rollback()
+            return
+        with self._timer("rollback"):
+            self.rollback()
 
     def commit(self):
-        self._commit()
+        with self._timer("commit"):
+            self._commit()
+        self._committed = True
+
+    def _timer(self, operation: str):
+        return metrics.UNIT_OF_WORK_DURATION.labels(
+            type(self).__name__, operation
+        ).time()
 
     def collect_events(self):
         if self.timecards.seen:
@@ -42,22 +60,30 @@ class AbstractUnitOfWork(abc.ABC):
 
 
 def create_default_session() -> pymongo.database.Database:
-    # starts up the client connection to the database
-    # schema restrictions for all collections.
-    client = pymongo.MongoClient(config.get_mongodb_uri())
-    odm.startup_timecards_collection(client)
-    odm.startup_employees_collection(client)
+    # borrows the process-wide pooled client; the schema restrictions and
+    # indexes for all collections are ensured once, when it is created.
+    client = mongodb_client.get_client(
+        config.get_mongodb_uri(), initializer=odm.initialize_database
+    )
     return client.start_session()
 
 
 class MongoDBUnitOfWork(AbstractUnitOfWork):
 
-    def __init__(self, session_factory=create_default_session) -> None:
+    def __init__(
+        self,
+        session_factory=create_default_session,
+        use_outbox: bool = False
+    ) -> None:
         self.session_factory = session_factory
+        # when set, events to publish are written to the outbox on commit
+        # and published by the outbox relay instead of the message bus
+        self.use_outbox = use_outbox
 
     def __enter__(self):
         self.session = self.session_factory()
         self.session.start_transaction()
+        self.pending_events = outbox.PendingEvents()
         self.timecards = repositories.MongoDBTimecardRepository(
             self.session
         )
@@ -66,7 +92,23 @@ class MongoDBUnitOfWork(AbstractUnitOfWork):
         )
         return super().__enter__()
 
+    def __exit__(self, *args):
+        super().__exit__(*args)
+        # hand the server session back to the client's pool
+        self.session.end_session()
+
     def _commit(self):
+        if self.use_outbox:
+            outbox.MongoDBOutbox(
+                self.session.client[odm.DATABASE_NAME]
+            ).add_all(
+                outbox.create_outbox_documents(
+                    self.pending_events.take(
+                        [*self.timecards.seen, *self.employees.seen]
+                    )
+                ),
+                session=self.session
+            )
         self.session.commit_transaction()
 
     def rollback(self):
@@ -79,9 +121,8 @@ class MongoDBUnitOfWork(AbstractUnitOfWork):
 
 
 def create_default_view_session() -> pymongo.database.Database:
-    # starts up the client connection to the database
-    # schema restrictions for all collections.
-    client = pymongo.MongoClient(config.get_mongodb_view_uri())
+    # borrows the process-wide pooled client for the view database
+    client = mongodb_view.get_view_client()
     return client.start_session()
 
 
@@ -94,6 +135,10 @@ class MongoDBViewUnitOfWork(AbstractUnitOfWork):
         self.session = self.session_factory()
         return super().__enter__()
 
+    def __exit__(self, *args):
+        super().__exit__(*args)
+        self.session.end_session()
+
     def _commit(self):
         pass
 
@@ -1,7 +1,295 @@
-from typing import Dict, List
+import base64
+import json
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+import pymongo
+from pymongo.collection import Collection
+from timecardsystem.timecardservice import config
 from timecardsystem.timecardservice.services import unit_of_work
 from timecardsystem.timecardservice.adapters import mongodb_view
 
+TIMECARD_VIEW_FIELDS = frozenset({
+    "employee_id",
+    "employee_name",
+    "timecard_id",
+    "week_ending_date",
+    "dates_and_hours",
+})
+
+# pages are ordered on this key; timecard_id breaks ties between timecards
+# sharing a week ending date
+KEYSET_FIELDS = ("week_ending_date", "timecard_id")
+
+
+class InvalidCursor(Exception):
+    pass
+
+
+class InvalidField(Exception):
+    pass
+
+
+@dataclass
+class TimecardsVersion:
+    version: int
+    modified_at: datetime
+
+
+@dataclass
+class TimecardsPage:
+    timecards: List[Dict[str, str]]
+    next_cursor: Optional[str] = None
+    previous_cursor: Optional[str] = None
+
+
+def encode_cursor(doc: Dict) -> str:
+    key = [doc["week_ending_date"].isoformat(), doc["timecard_id"]]
+    return base64.urlsafe_b64encode(
+        json.dumps(key).encode("utf-8")
+    ).decode("ascii")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, str]:
+    try:
+        week_ending_date, timecard_id = json.loads(
+            base64.urlsafe_b64decode(cursor.encode("ascii"))
+        )
+        return datetime.fromisoformat(week_ending_date), timecard_id
+    except (ValueError, TypeError) as err:
+        raise InvalidCursor(f"Invalid cursor {cursor}") from err
+
+
+def _timecards_view_collection(
+    unit_of_work: unit_of_work.MongoDBViewUnitOfWork
+) -> Collection:
+    client = unit_of_work.session.client
+    view_database = client[mongodb_view.DATABASE_NAME]
+    return view_database[mongodb_view.TIMECARDS_VIEW_COLLECTION_NAME]
+
+
+def _week_ending_range_filter(
+    week_ending_from: Optional[datetime],
+    week_ending_to: Optional[datetime]
+) -> Dict:
+    week_ending_range = {}
+    if week_ending_from:
+        week_ending_range["$gte"] = week_ending_from
+    if week_ending_to:
+        week_ending_range["$lte"] = week_ending_to
+    return {"week_ending_date": week_ending_range} \
+        if week_ending_range else {}
+
+
+def _keyset_filter(cursor: str, operator: str) -> Dict:
+    week_ending_date, timecard_id = decode_cursor(cursor)
+    return {"$or": [
+        {"week_ending_date": {operator: week_ending_date}},
+        {
+            "week_ending_date": week_ending_date,
+            "timecard_id": {operator: timecard_id}
+        },
+    ]}
+
+
+def validate_fields(
+    fields: Optional[Iterable[str]]
+) -> Optional[Iterable[str]]:
+    # generators only run once iterated, so callers that stream results
+    # validate the requested fields up front
+    unknown_fields = set(fields or ()) - TIMECARD_VIEW_FIELDS
+    if unknown_fields:
+        raise InvalidField(
+            f"Unknown fields: {', '.join(sorted(unknown_fields))}"
+        )
+    return fields
+
+
+def _projection(fields: Optional[Iterable[str]]) -> Dict[str, int]:
+    if not validate_fields(fields):
+        return {"_id": 0}
+    projection = {"_id": 0}
+    # the keyset fields are always read so cursors can be built
+    for field in set(fields) | set(KEYSET_FIELDS):
+        projection[field] = 1
+    return projection
+
+
+TIMECARDS_VERSION_PROJECTION = {
+    "timecards_version": 1,
+    "timecards_modified_at": 1
+}
+
+
+def version_from_employee_doc(
+    employee_doc: Optional[Dict]
+) -> Optional[TimecardsVersion]:
+    if not employee_doc or "timecards_version" not in employee_doc:
+        return None
+    return TimecardsVersion(
+        employee_doc["timecards_version"],
+        employee_doc["timecards_modified_at"]
+    )
+
+
+def timecards_version_for_employee(
+    employee_id: str,
+    unit_of_work: unit_of_work.MongoDBViewUnitOfWork
+) -> Optional[TimecardsVersion]:
+    with unit_of_work:
+        client = unit_of_work.session.client
+        view_database = client[mongodb_view.DATABASE_NAME]
+        employee_doc = view_database[
+            mongodb_view.EMPLOYEES_VIEW_COLLECTION_NAME
+        ].find_one(
+            {"_id": employee_id},
+            projection=TIMECARDS_VERSION_PROJECTION
+        )
+    return version_from_employee_doc(employee_doc)
+
+
+def _is_paging_backwards(after: Optional[str], before: Optional[str]):
+    return bool(before and not after)
+
+
+def build_page_query(
+    employee_id: str,
+    limit: int,
+    after: Optional[str] = None,
+    before: Optional[str] = None,
+    fields: Optional[List[str]] = None,
+    week_ending_from: Optional[datetime] = None,
+    week_ending_to: Optional[datetime] = None
+) -> Dict:
+    # keyset pagination on (week_ending_date, timecard_id): every page is a
+    # bounded range scan of the employee_id_week_ending_date_timecard_id
+    # index, however deep into the employee's history it is. Returns the
+    # keyword arguments for Collection.find.
+    conditions = [
+        {"employee_id": employee_id},
+        _week_ending_range_filter(week_ending_from, week_ending_to)
+    ]
+    if after:
+        conditions.append(_keyset_filter(after, "$gt"))
+    if before:
+        conditions.append(_keyset_filter(before, "$lt"))
+
+    # paging backwards reads the index in reverse, then restores the order
+    direction = pymongo.DESCENDING if _is_paging_backwards(after, before) \
+        else pymongo.ASCENDING
+    return {
+        "filter": {"$and": conditions},
+        "projection": _projection(fields),
+        "sort": [(field, direction) for field in KEYSET_FIELDS],
+        # one extra document tells whether another page follows
+        "limit": limit + 1,
+    }
+
+
+def build_page(
+    docs: List[Dict],
+    limit: int,
+    after: Optional[str] = None,
+    before: Optional[str] = None,
+    fields: Optional[List[str]] = None
+) -> TimecardsPage:
+    has_more = len(docs) > limit
+    docs = docs[:limit]
+    if _is_paging_backwards(after, before):
+        docs.reverse()
+        # paging back from a cursor means there is always a next page
+        has_next, has_previous = True, has_more
+    else:
+        has_next, has_previous = has_more, bool(after)
+
+    page = TimecardsPage(docs)
+    if docs and has_next:
+        page.next_cursor = encode_cursor(docs[-1])
+    if docs and has_previous:
+        page.previous_cursor = encode_cursor(docs[0])
+
+    if fields:
+        for doc in docs:
+            _strip_unrequested_keyset_fields(doc, fields)
+    return page
+
+
+def timecards_page_for_employee(
+    employee_id: str,
+    unit_of_work: unit_of_work.MongoDBViewUnitOfWork,
+    limit: int,
+    after: Optional[str] = None,
+    before: Optional[str] = None,
+    fields: Optional[List[str]] = None,
+    week_ending_from: Optional[datetime] = None,
+    week_ending_to: Optional[datetime] = None
+) -> TimecardsPage:
+    query = build_page_query(
+        employee_id, limit, after, before, fields,
+        week_ending_from, week_ending_to
+    )
+    with unit_of_work:
+        cursor = _timecards_view_collection(unit_of_work).find(**query)
+        docs = [doc for doc in cursor]
+    return build_page(docs, limit, after, before, fields)
+
+
+def _strip_unrequested_keyset_fields(doc: Dict, fields: List[str]):
+    for field in KEYSET_FIELDS:
+        if field not in fields:
+            del doc[field]
+
+
+def _iter_timecards(
+    unit_of_work: unit_of_work.MongoDBViewUnitOfWork,
+    query: Dict,
+    fields: Optional[List[str]],
+    batch_size: Optional[int]
+) -> Iterator[Dict]:
+    # the unit of work stays open while the caller consumes the generator;
+    # documents are fetched from the server batch_size at a time.
+    projection = _projection(fields)
+    with unit_of_work:
+        cursor = _timecards_view_collection(unit_of_work).find(
+            query,
+            projection=projection,
+            sort=[(field, pymongo.ASCENDING) for field in KEYSET_FIELDS],
+            batch_size=batch_size or config.get_view_cursor_batch_size()
+        )
+        try:
+            for doc in cursor:
+                if fields:
+                    _strip_unrequested_keyset_fields(doc, fields)
+                yield doc
+        finally:
+            cursor.close()
+
+
+def iter_timecards_for_employee(
+    employee_id: str,
+    unit_of_work: unit_of_work.MongoDBViewUnitOfWork,
+    fields: Optional[List[str]] = None,
+    week_ending_from: Optional[datetime] = None,
+    week_ending_to: Optional[datetime] = None,
+    batch_size: Optional[int] = None
+) -> Iterator[Dict]:
+    query = {
+        "employee_id": employee_id,
+        **_week_ending_range_filter(week_ending_from, week_ending_to)
+    }
+    return _iter_timecards(unit_of_work, query, fields, batch_size)
+
+
+def iter_timecards_for_week(
+    week_ending_date: datetime,
+    unit_of_work: unit_of_work.MongoDBViewUnitOfWork,
+    fields: Optional[List[str]] = None,
+    batch_size: Optional[int] = None
+) -> Iterator[Dict]:
+    query = {"week_ending_date": week_ending_date}
+    return _iter_timecards(unit_of_work, query, fields, batch_size)
+
 
 def timecards_for_employee(
     employee_id: str,
@@ -9,11 +297,7 @@ def timecards_for_employee(
 ) -> List[Dict[str, str]]:
     cursor = []
     with unit_of_work:
-        client = unit_of_work.session.client
-        view_database = client[mongodb_view.DATABASE_NAME]
-        timecards_view_c = view_database[
-            mongodb_view.TIMECARDS_VIEW_COLLECTION_NAME
-        ]
+        timecards_view_c = _timecards_view_collection(unit_of_work)
         cursor = timecards_view_c.find({
             "employee_id": employee_id
         })
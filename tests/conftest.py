@@ -7,7 +7,9 @@ import pytest
 import requests
 import tenacity
 from timecardsystem.timecardservice import config
-from timecardsystem.timecardservice.adapters import mongodb_view, odm
+from timecardsystem.timecardservice.adapters import (mongodb_view, odm,
+                                                     rabbitmq_event_publisher)
+from timecardsystem.timecardservice.entrypoints import rabbitmq_event_consumer
 
 
 @pytest.fixture
@@ -67,6 +69,16 @@ def wait_for_api_to_be_available():
     return requests.get(config.get_api_url())
 
 
+@tenacity.retry(stop=tenacity.stop_after_delay(10))
+def wait_for_async_api_to_be_available():
+    return requests.get(config.get_async_api_url())
+
+
+@pytest.fixture
+def async_timecardservice_api():
+    wait_for_async_api_to_be_available()
+
+
 @pytest.fixture
 def restart_timecardservice_api():
     app_path = "../src/timecardsystem/timecardservice/entrypoints/flask_app.py"
@@ -102,12 +114,7 @@ def purge_rabbitmq_queue():
     )
     channel = connection.channel()
 
-    channel.queue_declare(
-        queue="test",
-        durable=True,
-        exclusive=False,
-        auto_delete=False
-    )
+    rabbitmq_event_publisher.declare_topology(channel)
 
     channel.queue_purge("test")
     channel.close()
@@ -127,6 +134,24 @@ def purge_rabbitmq_queue():
     del connection
 
 
+@pytest.fixture
+def purge_payroll_queue():
+    # the payroll queue has to be bound before events are published to it
+    HOST, PORT = config.get_rabbitmq_host_and_port()
+    connection = pika.BlockingConnection(
+        pika.ConnectionParameters(host=HOST, port=PORT)
+    )
+    channel = connection.channel()
+    rabbitmq_event_publisher.declare_topology(channel, {
+        rabbitmq_event_consumer.PAYROLL_QUEUE_NAME:
+            rabbitmq_event_consumer.PAYROLL_BINDING_KEYS
+    })
+    channel.queue_purge(rabbitmq_event_consumer.PAYROLL_QUEUE_NAME)
+    yield
+    channel.queue_purge(rabbitmq_event_consumer.PAYROLL_QUEUE_NAME)
+    connection.close()
+
+
 @tenacity.retry(stop=tenacity.stop_after_delay(15))
 def wait_for_rabbitmq_to_start_up():
     HOST, PORT = config.get_rabbitmq_host_and_port()
@@ -79,3 +79,87 @@ def test_post_to_create_timecard(
         f"{api_url}/timecards", json=payload
     )
     assert response.status_code == 201
+
+
+@pytest.mark.usefixtures("restart_timecardservice_api")
+def test_post_batch_of_timecards(
+    setup_and_destroy_mongodb_data, start_up_rabbitmq
+):
+    api_url = config.get_api_url()
+    employee_id = "5dbf600d-305a-4f77-b2b8-51401f443597"
+    payload = {
+        "employee_id": employee_id,
+        "name": "Azure Diamond"
+    }
+
+    response = requests.post(
+        f"{api_url}/employees", json=payload
+    )
+    assert response.status_code == 201
+
+    dates_and_hours_json = {
+        f"2022-08-{day:02d}": {
+            "work_hours": "8.0",
+            "sick_hours": "0.0",
+            "vacation_hours": "0.0",
+        }
+        for day in range(8, 13)
+    }
+    payload = {
+        "timecards": [
+            {
+                "timecard_id": "aaa6eaa1-3197-4b3e-9b52-c91c55b91956",
+                "employee_id": employee_id,
+                "week_ending_date": "2022-08-12",
+                "dates_and_hours": dates_and_hours_json
+            },
+            {
+                "timecard_id": "0e0c7c38-8f0a-4d84-a1f3-2b8e6f0c5b3d",
+                "employee_id": "e2b9a4d6-5b9e-4c71-8b2a-6c0f1d3e4a5b",
+                "week_ending_date": "2022-08-12",
+                "dates_and_hours": dates_and_hours_json
+            },
+        ]
+    }
+
+    response = requests.post(
+        f"{api_url}/timecards:batch", json=payload
+    )
+    assert response.status_code == 207
+    results = response.json()["results"]
+    assert results[0]["status"] == "created"
+    assert results[1]["status"] == "rejected"
+
+
+@pytest.mark.usefixtures("async_timecardservice_api")
+def test_async_api_creates_and_pages_timecards(
+    setup_and_destroy_mongodb_data, start_up_rabbitmq
+):
+    api_url = config.get_async_api_url()
+    employee_id = "5dbf600d-305a-4f77-b2b8-51401f443597"
+    response = requests.post(
+        f"{api_url}/employees",
+        json={"employee_id": employee_id, "name": "Azure Diamond"}
+    )
+    assert response.status_code == 201
+
+    response = requests.post(f"{api_url}/timecards", json={
+        "timecard_id": "0e6c8f0e-7e2e-4d5b-8f7e-3f6f1b0c2a11",
+        "employee_id": employee_id,
+        "week_ending_date": "2022-08-12",
+        "dates_and_hours": {
+            f"2022-08-{day:02d}": {
+                "work_hours": "8.0",
+                "sick_hours": "0.0",
+                "vacation_hours": "0.0"
+            }
+            for day in range(8, 13)
+        }
+    })
+    assert response.status_code == 201
+
+    response = requests.get(f"{api_url}/employees/{employee_id}/timecards")
+    assert response.status_code == 200
+    assert [timecard["employee_id"] for timecard in response.json()] == \
+        [employee_id]
+    assert "ETag" in response.headers
@@ -236,3 +236,113 @@ def test_submit_timecard_command_creates_timecard_submitted_event(
     assert timecard_submitted_event.employee_id.value == employee_id
 
     assert len(dto.deserialized_messages) == 0
+
+
+@pytest.mark.usefixtures("restart_timecardservice_api")
+def test_payroll_consumer_only_receives_timecard_submitted_events(
+    setup_and_destroy_mongodb_data,
+    start_up_rabbitmq,
+    purge_rabbitmq_queue,
+    purge_payroll_queue
+):
+    api_url = config.get_api_url()
+    employee_id = "5dbf600d-305a-4f77-b2b8-51401f443597"
+    response = requests.post(
+        f"{api_url}/employees",
+        json={"employee_id": employee_id, "name": "Azure Diamond"}
+    )
+    assert response.status_code == 201
+
+    timecard_id = "aaa6eaa1-3197-4b3e-9b52-c91c55b91956"
+    response = requests.post(
+        f"{api_url}/timecards",
+        json={
+            "timecard_id": timecard_id,
+            "employee_id": employee_id,
+            "week_ending_date": "2022-08-12",
+            "dates_and_hours": {
+                "2022-08-12": {
+                    "work_hours": "8.0",
+                    "sick_hours": "0.0",
+                    "vacation_hours": "0.0",
+                },
+            }
+        }
+    )
+    assert response.status_code == 201
+    response = requests.post(f"{api_url}/timecards/{timecard_id}/submit")
+    assert response.status_code == 200
+
+    received = []
+    consumer = rabbitmq_event_consumer.payroll_consumer(received.extend)
+
+    t = Thread(target=consumer.start)
+    t.start()
+    time.sleep(5)
+    consumer.stop()
+    t.join()
+
+    assert len(received) == 1
+    event = received.pop(0)
+    assert type(event).__name__ == "TimecardSubmittedForProcessing"
+    assert event.timecard_id.value == timecard_id
+
+
+@pytest.mark.usefixtures("restart_timecardservice_api")
+def test_batch_of_timecards_is_published_in_one_envelope(
+    setup_and_destroy_mongodb_data,
+    start_up_rabbitmq,
+    purge_rabbitmq_queue
+):
+    api_url = config.get_api_url()
+    employee_id = "5dbf600d-305a-4f77-b2b8-51401f443597"
+    response = requests.post(
+        f"{api_url}/employees",
+        json={"employee_id": employee_id, "name": "Azure Diamond"}
+    )
+    assert response.status_code == 201
+
+    timecard_ids = [
+        f"aaa6eaa1-3197-4b3e-9b52-{number:012d}" for number in range(3)
+    ]
+    response = requests.post(
+        f"{api_url}/timecards:batch",
+        json={"timecards": [
+            {
+                "timecard_id": timecard_id,
+                "employee_id": employee_id,
+                "week_ending_date": "2022-08-12",
+                "dates_and_hours": {
+                    "2022-08-12": {
+                        "work_hours": "8.0",
+                        "sick_hours": "0.0",
+                        "vacation_hours": "0.0",
+                    },
+                }
+            }
+            for timecard_id in timecard_ids
+        ]}
+    )
+    assert response.status_code == 201
+
+    deliveries = []
+    dto = MessageConsumerDTO()
+    dto.set_deserializer(callable_func=json.loads)
+
+    def receive(channel, method, header, body):
+        deliveries.append(header.content_type)
+        return dto.receive_message(channel, method, header, body)
+
+    consumer = rabbitmq_event_consumer.Consumer()
+    consumer.set_on_message_callback(receive)
+
+    t = Thread(target=consumer.start)
+    t.start()
+    time.sleep(5)
+    consumer.stop()
+    t.join()
+
+    assert deliveries == ["EmployeeCreated", "TimecardCreated"]
+    assert [
+        event.timecard_id.value for event in dto.deserialized_messages[1:]
+    ] == timecard_ids
@@ -0,0 +1,34 @@
+from timecardsystem.timecardservice.adapters import indexes, odm
+
+
+def test_ensure_schema_only_changes_collections_once(mongodb_database):
+    client = mongodb_database.client
+    try:
+        first_run = odm.ensure_schema(client)
+        second_run = odm.ensure_schema(client)
+    finally:
+        client.drop_database(odm.DATABASE_NAME)
+
+    assert all(first_run.values())
+    assert not any(second_run.values())
+
+
+def test_ensure_indexes_creates_missing_and_reports_extra(mongodb_database):
+    client = mongodb_database.client
+    timecards_collection = \
+        mongodb_database[odm.TIMECARDS_COLLECTION_NAME]
+    try:
+        timecards_collection.create_index("submitted", name="submitted")
+        first_run = indexes.ensure_indexes(
+            timecards_collection, odm.TIMECARD_INDEXES
+        )
+        second_run = indexes.ensure_indexes(
+            timecards_collection, odm.TIMECARD_INDEXES
+        )
+    finally:
+        client.drop_database(odm.DATABASE_NAME)
+
+    assert first_run.created == ["employee_id_week_ending_date"]
+    assert first_run.extra == ["submitted"]
+    assert second_run.created == []
+    assert second_run.extra == ["submitted"]
@@ -1,8 +1,12 @@
+import pytest
 from timecardsystem.common.domain import model as common_model
 from timecardsystem.timecardservice.adapters import odm
 from timecardsystem.timecardservice.domain import model
 from timecardsystem.timecardservice.services import unit_of_work
 
+from ..common import (convert_dates_and_hours_to_domain,
+                      create_dates_and_hours, create_datetime_from_iso)
+
 
 def test_can_save_an_employee(mongodb_session_factory):
     employee_id = common_model.EmployeeID(
@@ -50,3 +54,91 @@ def test_can_retrieve_an_employee(mongodb_session_factory):
 
     assert employee.id == employee_id
     assert employee.name == employee_name
+
+
+def test_commit_writes_raised_events_to_the_outbox(mongodb_session_factory):
+    employee = model.Employee(
+        common_model.EmployeeID("94687e57-7316-4b92-8e76-4ac5c5c07230"),
+        common_model.EmployeeName("Azure Diamond")
+    )
+
+    test_unit_of_work = unit_of_work.MongoDBUnitOfWork(
+        mongodb_session_factory, use_outbox=True
+    )
+    with test_unit_of_work:
+        test_unit_of_work.employees.add(employee)
+        employee.confirm_employee_created()
+        test_unit_of_work.commit()
+        # a second commit does not write the same event again
+        test_unit_of_work.commit()
+
+    database = mongodb_session_factory().client[odm.DATABASE_NAME]
+    entries = list(database[odm.OUTBOX_COLLECTION_NAME].find())
+    assert [entry["event_type"] for entry in entries] == ["EmployeeCreated"]
+    assert entries[0]["published_at"] is None
+
+
+def test_uncommitted_writes_and_their_events_are_rolled_back(
+    mongodb_session_factory
+):
+    employee = model.Employee(
+        common_model.EmployeeID("94687e57-7316-4b92-8e76-4ac5c5c07230"),
+        common_model.EmployeeName("Azure Diamond")
+    )
+    timecard = model.Timecard(
+        common_model.TimecardID("2437bf34-ef8a-4af2-8bd0-609d09cb4e5c"),
+        employee.id,
+        create_datetime_from_iso("2022-08-12"),
+        convert_dates_and_hours_to_domain(create_dates_and_hours())
+    )
+
+    test_unit_of_work = unit_of_work.MongoDBUnitOfWork(
+        mongodb_session_factory, use_outbox=True
+    )
+    with pytest.raises(RuntimeError):
+        with test_unit_of_work:
+            test_unit_of_work.employees.add(employee)
+            employee.confirm_employee_created()
+            test_unit_of_work.timecards.add(timecard)
+            timecard.confirm_timecard_created()
+            raise RuntimeError("failed before commit")
+
+    database = mongodb_session_factory().client[odm.DATABASE_NAME]
+    assert database[odm.EMPLOYEES_COLLECTION_NAME].count_documents({}) == 0
+    assert database[odm.TIMECARDS_COLLECTION_NAME].count_documents({}) == 0
+    assert database[odm.OUTBOX_COLLECTION_NAME].count_documents({}) == 0
+
+
+def test_timecard_batch_is_written_in_the_transaction(
+    mongodb_session_factory
+):
+    employee = model.Employee(
+        common_model.EmployeeID("94687e57-7316-4b92-8e76-4ac5c5c07230"),
+        common_model.EmployeeName("Azure Diamond")
+    )
+    timecards = [
+        model.Timecard(
+            common_model.TimecardID(f"timecard-{number}"),
+            employee.id,
+            create_datetime_from_iso("2022-08-12"),
+            convert_dates_and_hours_to_domain(create_dates_and_hours())
+        )
+        for number in range(3)
+    ]
+
+    test_unit_of_work = unit_of_work.MongoDBUnitOfWork(
+        mongodb_session_factory
+    )
+    with pytest.raises(RuntimeError):
+        with test_unit_of_work:
+            test_unit_of_work.employees.add(employee)
+            test_unit_of_work.timecards.add_all(timecards)
+            # reads in the transaction see its uncommitted writes
+            assert test_unit_of_work.employees.get_many([employee.id])
+            assert len(test_unit_of_work.timecards.get_many(
+                [timecard.id for timecard in timecards]
+            )) == 3
+            raise RuntimeError("failed before commit")
+
+    database = mongodb_session_factory().client[odm.DATABASE_NAME]
+    assert database[odm.TIMECARDS_COLLECTION_NAME].count_documents({}) == 0
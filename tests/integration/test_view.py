@@ -4,7 +4,7 @@ from typing import Set
 import pytest
 from timecardsystem.common.domain import model as common_model
 from timecardsystem.timecardservice import bootstrap_script
-from timecardsystem.timecardservice.domain import commands, model
+from timecardsystem.timecardservice.domain import commands, events, model
 from timecardsystem.timecardservice.services import message_bus, unit_of_work
 from timecardsystem.timecardservice.adapters import repositories, mongodb_view
 from timecardsystem.timecardservice import views
@@ -119,3 +119,100 @@ def test_timecard_view(
     assert "2022-08-10T00:00:00" in doc["dates_and_hours"]
     assert "2022-08-11T00:00:00" in doc["dates_and_hours"]
     assert "2022-08-12T00:00:00" in doc["dates_and_hours"]
+
+
+def test_timecards_page_for_employee_pages_by_week_ending_date(
+    mongodb_view_session_factory
+):
+    employee_id = "88f67519-f5dc-4ba1-8dac-03e024ccd251"
+    session = mongodb_view_session_factory()
+    timecards_view_c = session.client[mongodb_view.DATABASE_NAME][
+        mongodb_view.TIMECARDS_VIEW_COLLECTION_NAME
+    ]
+    week_ending_dates = [
+        datetime.fromisoformat(f"2022-08-{day:02d}") for day in (5, 12, 19)
+    ]
+    timecards_view_c.insert_many([
+        {
+            "employee_id": employee_id,
+            "employee_name": "Azure Diamond",
+            "timecard_id": f"timecard-{number}",
+            "week_ending_date": week_ending_date,
+            "dates_and_hours": {}
+        }
+        for number, week_ending_date in enumerate(week_ending_dates)
+    ])
+
+    first_page = views.timecards_page_for_employee(
+        employee_id,
+        unit_of_work.MongoDBViewUnitOfWork(mongodb_view_session_factory),
+        limit=2,
+        fields=["timecard_id"]
+    )
+    assert first_page.timecards == [
+        {"timecard_id": "timecard-0"}, {"timecard_id": "timecard-1"}
+    ]
+    assert first_page.previous_cursor is None
+
+    second_page = views.timecards_page_for_employee(
+        employee_id,
+        unit_of_work.MongoDBViewUnitOfWork(mongodb_view_session_factory),
+        limit=2,
+        after=first_page.next_cursor
+    )
+    assert [doc["timecard_id"] for doc in second_page.timecards] == \
+        ["timecard-2"]
+    assert second_page.next_cursor is None
+
+    previous_page = views.timecards_page_for_employee(
+        employee_id,
+        unit_of_work.MongoDBViewUnitOfWork(mongodb_view_session_factory),
+        limit=2,
+        before=second_page.previous_cursor
+    )
+    assert [doc["timecard_id"] for doc in previous_page.timecards] == \
+        ["timecard-0", "timecard-1"]
+
+    filtered_page = views.timecards_page_for_employee(
+        employee_id,
+        unit_of_work.MongoDBViewUnitOfWork(mongodb_view_session_factory),
+        limit=10,
+        week_ending_from=week_ending_dates[1],
+        week_ending_to=week_ending_dates[1]
+    )
+    assert [doc["timecard_id"] for doc in filtered_page.timecards] == \
+        ["timecard-1"]
+
+
+def test_batch_of_timecards_is_projected_in_bulk(
+    mongodb_view_bus: message_bus.MessageBus
+):
+    mongodb_view.DATABASE_NAME = "test_view"
+    test_message_bus = create_test_bootstrap().get_message_bus()
+    employee_id = "5b8a3f2c-5b1d-4c52-9a56-4f0b5a0f6f21"
+    test_message_bus.unit_of_work.employees.add(
+        model.Employee(
+            common_model.EmployeeID(employee_id),
+            common_model.EmployeeName("Azure Diamond")
+        )
+    )
+    week_ending_dates = [
+        datetime.fromisoformat(f"2022-08-{day:02d}") for day in (5, 12)
+    ]
+
+    test_message_bus.handle_batch([
+        events.TimecardCreated(
+            f"c3d1a1e4-0f0e-4f55-8d8e-00000000000{number}",
+            employee_id,
+            week_ending_date,
+            create_dates_and_hours()
+        )
+        for number, week_ending_date in enumerate(week_ending_dates)
+    ])
+
+    rows = views.timecards_for_employee(
+        employee_id, mongodb_view_bus.unit_of_work
+    )
+    assert sorted(doc["week_ending_date"] for doc in rows) == \
+        week_ending_dates
+    assert {doc["employee_name"] for doc in rows} == {"Azure Diamond"}
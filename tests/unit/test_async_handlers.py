@@ -0,0 +1,328 @@
+import asyncio
+import json
+from typing import Dict, List
+
+import pytest
+from timecardsystem.common.domain import model as common_model
+from timecardsystem.common.dtos import message_dto
+from timecardsystem.timecardservice.adapters import (
+    async_mongodb_view, async_rabbitmq_event_publisher, async_repositories)
+from timecardsystem.timecardservice.async_bootstrap_script import \
+    AsyncBootstrap
+from timecardsystem.timecardservice.domain import commands, events, model
+from timecardsystem.timecardservice.entrypoints import asgi_app
+from timecardsystem.timecardservice.services import (async_message_bus,
+                                                     async_unit_of_work,
+                                                     handlers)
+
+from ..common import create_dates_and_hours, create_datetime_from_iso
+
+
+class FakeAsyncEmployeeRepository(
+    async_repositories.AbstractAsyncEmployeeRepository
+):
+
+    def __init__(self):
+        self._employees: Dict[str, model.Employee] = {}
+        super().__init__()
+
+    async def _add(self, employee: model.Employee):
+        self._employees[employee.id.value] = employee
+
+    async def _add_all(self, employees: List[model.Employee]):
+        for employee in employees:
+            await self._add(employee)
+
+    async def _get(self, employee_id: common_model.EmployeeID):
+        return self._employees.get(employee_id.value)
+
+    async def _get_many(self, employee_ids):
+        return {
+            employee_id: self._employees[employee_id.value]
+            for employee_id in employee_ids
+            if employee_id.value in self._employees
+        }
+
+
+class FakeAsyncTimecardRepository(
+    async_repositories.AbstractAsyncTimecardRepository
+):
+
+    def __init__(self):
+        self._timecards: Dict[str, model.Timecard] = {}
+        super().__init__()
+
+    async def _add(self, timecard: model.Timecard):
+        self._timecards[timecard.id.value] = timecard
+
+    async def _add_all(self, timecards: List[model.Timecard]):
+        for timecard in timecards:
+            await self._add(timecard)
+
+    async def _get(self, timecard_id: common_model.TimecardID):
+        return self._timecards.get(timecard_id.value)
+
+    async def _get_many(self, timecard_ids):
+        return {
+            timecard_id: self._timecards[timecard_id.value]
+            for timecard_id in timecard_ids
+            if timecard_id.value in self._timecards
+        }
+
+
+class FakeAsyncUnitOfWork(async_unit_of_work.AbstractAsyncUnitOfWork):
+
+    def __init__(self) -> None:
+        self.employees = FakeAsyncEmployeeRepository()
+        self.timecards = FakeAsyncTimecardRepository()
+        self.processed_commit = False
+
+    async def _commit(self):
+        self.processed_commit = True
+
+    async def rollback(self):
+        pass
+
+
+def create_test_async_bootstrap(fake_unit_of_work=None):
+    fake_unit_of_work = fake_unit_of_work or FakeAsyncUnitOfWork()
+    bootstrap = AsyncBootstrap(
+        unit_of_work_factory=lambda: fake_unit_of_work,
+        collect_side_effect_events=False,
+        publish_external_events=False
+    )
+    bootstrap.initialize_app()
+    return bootstrap
+
+
+def create_timecard_command(timecard_id: str, employee_id: str):
+    return commands.CreateTimecard(
+        timecard_id,
+        employee_id,
+        create_datetime_from_iso("2022-08-12"),
+        create_dates_and_hours()
+    )
+
+
+employee_id = "c8b5734f-e4b4-47c8-a326-f79c23e696de"
+timecard_id = "c5def653-5315-4a4d-b9dc-78beae7e3013"
+
+
+def test_create_employee_and_timecard():
+    async def scenario():
+        message_bus = create_test_async_bootstrap().get_message_bus()
+        await message_bus.handle(
+            commands.CreateEmployee(employee_id, "Azure Diamond")
+        )
+        await message_bus.handle(
+            create_timecard_command(timecard_id, employee_id)
+        )
+        return message_bus.unit_of_work
+
+    uow = asyncio.run(scenario())
+
+    timecard = asyncio.run(
+        uow.timecards.get(common_model.TimecardID(timecard_id))
+    )
+    assert timecard.employee_id.value == employee_id
+    assert uow.processed_commit
+
+
+def test_create_timecard_for_unknown_employee_raises_error():
+    message_bus = create_test_async_bootstrap().get_message_bus()
+
+    with pytest.raises(
+        handlers.EmployeeDoesNotExist,
+        match=f"Employee ID {employee_id} does not exist"
+    ):
+        asyncio.run(message_bus.handle(
+            create_timecard_command(timecard_id, employee_id)
+        ))
+
+
+def test_create_timecards_reports_result_per_timecard():
+    unknown_employee_id = "0b8c2f43-52a5-4c0b-9d1e-1b1a8b0d0c11"
+
+    async def scenario():
+        message_bus = create_test_async_bootstrap().get_message_bus()
+        await message_bus.handle(
+            commands.CreateEmployee(employee_id, "Azure Diamond")
+        )
+        return await message_bus.handle(commands.CreateTimecards([
+            create_timecard_command(timecard_id, employee_id),
+            create_timecard_command(
+                "5f0d3b0e-2f5c-4d39-8b6b-1f3fa3f4f0a2", unknown_employee_id
+            ),
+        ]))
+
+    [results] = asyncio.run(scenario())
+
+    assert [result["status"] for result in results] == \
+        ["created", "rejected"]
+
+
+def test_submit_unknown_timecard_raises_error():
+    message_bus = create_test_async_bootstrap().get_message_bus()
+
+    with pytest.raises(handlers.TimecardDoesNotExist):
+        asyncio.run(message_bus.handle(
+            commands.SubmitTimecardForProcessing(timecard_id)
+        ))
+
+
+def test_message_bus_publishes_collected_events():
+    published = []
+
+    async def publish(event):
+        published.append(event)
+
+    async def create_employee(command):
+        await handlers_uow.employees.add(model.Employee(
+            common_model.EmployeeID(command.employee_id),
+            common_model.EmployeeName(command.name)
+        ))
+        employee = await handlers_uow.employees.get(
+            common_model.EmployeeID(command.employee_id)
+        )
+        employee.confirm_employee_created()
+
+    handlers_uow = FakeAsyncUnitOfWork()
+    message_bus = async_message_bus.AsyncMessageBus(
+        handlers_uow,
+        {commands.CreateEmployee: create_employee},
+        {},
+        {events.EmployeeCreated: [publish]}
+    )
+
+    asyncio.run(message_bus.handle(
+        commands.CreateEmployee(employee_id, "Azure Diamond")
+    ))
+
+    assert published == [events.EmployeeCreated(employee_id, "Azure Diamond")]
+
+
+def call_asgi_app(method: str, path: str, body: Dict = None):
+    messages = []
+    request_body = json.dumps(body).encode("utf-8") if body else b""
+
+    async def receive():
+        return {"type": "http.request", "body": request_body}
+
+    async def send(message):
+        messages.append(message)
+
+    scope = {
+        "type": "http",
+        "method": method,
+        "path": path,
+        "query_string": b"",
+        "headers": [(b"host", b"testserver")],
+    }
+    asyncio.run(asgi_app.app(scope, receive, send))
+    start, body_message = messages
+    return start["status"], body_message["body"]
+
+
+def test_asgi_app_routes_commands(monkeypatch):
+    monkeypatch.setattr(
+        asgi_app, "bootstrapper", create_test_async_bootstrap()
+    )
+
+    status, _ = call_asgi_app(
+        "POST",
+        "/employees",
+        {"employee_id": employee_id, "name": "Azure Diamond"}
+    )
+    assert status == 201
+
+    status, body = call_asgi_app("POST", "/timecards", {
+        "timecard_id": timecard_id,
+        "employee_id": "unknown",
+        "week_ending_date": "2022-08-12",
+        "dates_and_hours": {}
+    })
+    assert status == 400
+    assert json.loads(body) == {"error": "Employee ID unknown does not exist"}
+
+
+def test_asgi_app_unknown_routes():
+    assert call_asgi_app("GET", "/unknown")[0] == 404
+    assert call_asgi_app("GET", "/timecards:batch")[0] == 405
+
+
+def test_asgi_app_rejects_malformed_payloads(monkeypatch):
+    monkeypatch.setattr(
+        asgi_app, "bootstrapper", create_test_async_bootstrap()
+    )
+
+    status, body = call_asgi_app("POST", "/timecards", {
+        "timecard_id": timecard_id,
+        "employee_id": employee_id,
+        "week_ending_date": "not a date",
+        "dates_and_hours": {}
+    })
+    assert status == 400
+    assert json.loads(body) == {"error": "Invalid date week_ending_date"}
+    assert call_asgi_app("POST", "/employees", {"name": "Azure"})[0] == 400
+
+
+def test_asgi_app_answers_view_errors_with_server_error(monkeypatch):
+    class FailingMessageBus:
+
+        async def handle(self, message):
+            raise KeyError("bug")
+
+    class FailingBootstrap:
+
+        def get_message_bus(self):
+            return FailingMessageBus()
+
+    monkeypatch.setattr(asgi_app, "bootstrapper", FailingBootstrap())
+
+    # the error is re-raised for the ASGI server to log
+    with pytest.raises(KeyError):
+        call_asgi_app(
+            "POST",
+            "/employees",
+            {"employee_id": employee_id, "name": "Azure Diamond"}
+        )
+
+
+def test_created_timecards_are_projected_and_published_together(
+    monkeypatch
+):
+    projected = []
+    published = []
+
+    async def add_timecards_to_view_model_bulk(rows):
+        projected.append(sorted(row["timecard_id"] for row in rows))
+
+    async def publish(dto):
+        published.append(dto.headers.get(message_dto.EVENT_COUNT_HEADER))
+
+    monkeypatch.setattr(
+        async_mongodb_view, "add_timecards_to_view_model_bulk",
+        add_timecards_to_view_model_bulk
+    )
+    monkeypatch.setattr(async_rabbitmq_event_publisher, "_publish", publish)
+    fake_unit_of_work = FakeAsyncUnitOfWork()
+    bootstrap = AsyncBootstrap(unit_of_work_factory=lambda: fake_unit_of_work)
+    bootstrap.initialize_app()
+
+    async def scenario():
+        await fake_unit_of_work.employees.add(model.Employee(
+            common_model.EmployeeID(employee_id),
+            common_model.EmployeeName("Azure Diamond")
+        ))
+        async with async_rabbitmq_event_publisher.batching():
+            await bootstrap.get_message_bus().handle(
+                commands.CreateTimecards([
+                    create_timecard_command(f"timecard-{number}", employee_id)
+                    for number in range(3)
+                ])
+            )
+
+    asyncio.run(scenario())
+
+    assert projected == [["timecard-0", "timecard-1", "timecard-2"]]
+    assert published == [3]
@@ -0,0 +1,95 @@
+import json
+
+import pytest
+from timecardsystem.common.dtos import (binary_wire_format, event_codecs,
+                                        message_dto)
+from timecardsystem.timecardservice.domain import events
+
+from ..common import create_dates_and_hours, create_datetime_from_iso
+
+TIMECARD_ID = "aaa6eaa1-3197-4b3e-9b52-c91c55b91956"
+EMPLOYEE_ID = "5dbf600d-305a-4f77-b2b8-51401f443597"
+
+
+class FakeHeader:
+
+    def __init__(self, content_type, content_encoding=None, headers=None):
+        self.content_type = content_type
+        self.content_encoding = content_encoding
+        self.headers = headers
+
+
+def timecard_created(timecard_id=TIMECARD_ID) -> events.TimecardCreated:
+    return events.TimecardCreated(
+        timecard_id,
+        EMPLOYEE_ID,
+        create_datetime_from_iso("2022-08-12"),
+        create_dates_and_hours()
+    )
+
+
+def serialize(event, binary=True) -> message_dto.MessagePublisherDTO:
+    dto = message_dto.MessagePublisherDTO(binary=binary)
+    dto.set_serializer(json.dumps)
+    dto.serialize_outgoing_message(event)
+    return dto
+
+
+def receive(dto: message_dto.MessagePublisherDTO):
+    consumer_dto = message_dto.MessageConsumerDTO()
+    consumer_dto.set_deserializer(json.loads)
+    consumer_dto.receive_message(
+        None, None,
+        FakeHeader(dto.message_properties, dto.content_encoding),
+        dto.serialized_message
+    )
+    [event] = consumer_dto.deserialized_messages
+    return event
+
+
+def test_timecard_created_is_several_times_smaller_than_json():
+    binary = serialize(timecard_created())
+    text = serialize(timecard_created(), binary=False)
+
+    assert binary.content_encoding == binary_wire_format.CONTENT_ENCODING
+    assert text.content_encoding is None
+    assert len(binary.serialized_message) * 4 < len(text.serialized_message)
+
+
+def test_binary_fields_decode_to_the_json_fields():
+    for event in (
+        timecard_created(),
+        events.EmployeeCreated(EMPLOYEE_ID, "Azure Diamond"),
+        events.TimecardSubmittedForProcessing(TIMECARD_ID, EMPLOYEE_ID),
+    ):
+        name, fields = event_codecs.REGISTRY.encode(event)
+        decoded = binary_wire_format.loads(
+            name, binary_wire_format.dumps(name, fields)
+        )
+        assert json.loads(json.dumps(decoded)).keys() == fields.keys()
+        assert event_codecs.REGISTRY.decode(name, decoded) == \
+            event_codecs.REGISTRY.decode(name, fields)
+
+
+def test_consumer_reads_binary_and_json_messages():
+    from_binary = receive(serialize(timecard_created()))
+    from_json = receive(serialize(timecard_created(), binary=False))
+
+    assert from_binary == from_json
+    assert from_binary.timecard_id.value == TIMECARD_ID
+
+
+def test_events_that_do_not_fit_are_sent_as_json():
+    dto = serialize(timecard_created(timecard_id="timecard-0"))
+
+    assert dto.content_encoding is None
+    assert receive(dto).timecard_id.value == "timecard-0"
+
+
+@pytest.mark.parametrize("hours", ["8.125", "-1.0", "700.0"])
+def test_hours_outside_fixed_point_range_are_not_binary_encodable(hours):
+    name, fields = event_codecs.REGISTRY.encode(timecard_created())
+    fields["dates_and_hours"]["2022-08-08T00:00:00"]["work_hours"] = hours
+
+    with pytest.raises(binary_wire_format.NotBinaryEncodable):
+        binary_wire_format.dumps(name, fields)
@@ -0,0 +1,42 @@
+import pytest
+from timecardsystem.common.domain import model as common_model
+from timecardsystem.timecardservice.adapters import mongodb_client
+from timecardsystem.timecardservice.bootstrap_script import (
+    Bootstrap, BootstrapNotInitialized)
+from timecardsystem.timecardservice.domain import commands
+
+from .test_handlers import FakeUnitOfWork
+
+
+def test_get_message_bus_before_initialize_raises_error():
+    bootstrap = Bootstrap(unit_of_work=FakeUnitOfWork())
+    with pytest.raises(BootstrapNotInitialized):
+        bootstrap.get_message_bus()
+
+
+def test_unit_of_work_factory_gives_each_bus_its_own_unit_of_work():
+    bootstrap = Bootstrap(
+        unit_of_work_factory=FakeUnitOfWork,
+        collect_side_effect_events=False,
+        publish_external_events=False
+    )
+    bootstrap.initialize_app()
+    first_bus = bootstrap.get_message_bus()
+    second_bus = bootstrap.get_message_bus()
+    assert first_bus.unit_of_work is not second_bus.unit_of_work
+
+    employee_id = "c8b5734f-e4b4-47c8-a326-f79c23e696de"
+    first_bus.handle(commands.CreateEmployee(employee_id, "Azure Diamond"))
+
+    employee_id = common_model.EmployeeID(employee_id)
+    assert first_bus.unit_of_work.employees.get(employee_id) is not None
+    assert second_bus.unit_of_work.employees.get(employee_id) is None
+
+
+def test_get_client_reuses_one_client_per_uri():
+    uri = "mongodb://localhost:1"
+    try:
+        client = mongodb_client.get_client(uri)
+        assert mongodb_client.get_client(uri) is client
+    finally:
+        mongodb_client.close_clients()
@@ -0,0 +1,247 @@
+import pytest
+from timecardsystem.timecardservice.adapters import rabbitmq_event_publisher
+from timecardsystem.timecardservice.domain import events
+from timecardsystem.timecardservice.entrypoints import consumer_pool
+
+from .test_rabbitmq_event_consumer import (Delivery, FakeConnection,
+                                           Properties, RecordingChannel,
+                                           employee_created_body)
+
+
+def test_balance_spreads_partitions_evenly():
+    target = consumer_pool.balance(range(8), [0, 1, 2], {})
+
+    counts = sorted(
+        list(target.values()).count(slot) for slot in (0, 1, 2)
+    )
+    assert counts == [2, 3, 3]
+    assert sorted(target) == list(range(8))
+
+
+def test_balance_moves_only_the_partitions_of_a_dead_worker():
+    current = {0: 0, 1: 1, 2: 2, 3: 0, 4: 1, 5: 2}
+
+    target = consumer_pool.balance(range(6), [0, 2], current)
+
+    assert {p: s for p, s in target.items() if current[p] != 1} == \
+        {0: 0, 2: 2, 3: 0, 5: 2}
+    assert sorted(target.values()) == [0, 0, 0, 2, 2, 2]
+
+
+def test_balance_gives_a_new_worker_its_share():
+    current = {partition: partition % 2 for partition in range(6)}
+
+    target = consumer_pool.balance(range(6), [0, 1, 2], current)
+
+    moved = [p for p in target if target[p] != current[p]]
+    assert len(moved) == 2
+    assert all(target[p] == 2 for p in moved)
+
+
+class PartitionChannel(RecordingChannel):
+
+    def __init__(self):
+        super().__init__()
+        self.consuming = {}
+        self.cancelled = {}
+
+    def basic_consume(self, queue, on_message_callback):
+        consumer_tag = f"ctag-{queue}"
+        self.consuming[consumer_tag] = on_message_callback
+        return consumer_tag
+
+    def basic_cancel(self, consumer_tag, callback):
+        del self.consuming[consumer_tag]
+        self.cancelled[consumer_tag] = callback
+
+
+@pytest.fixture
+def partition_consumer():
+    released = []
+    handled = []
+    consumer = consumer_pool.PartitionConsumer(
+        handled.extend,
+        "test",
+        on_released=released.append,
+        prefetch_count=10,
+        ack_batch_size=1
+    )
+    consumer.channel = PartitionChannel()
+    consumer.connection = FakeConnection()
+    consumer.start_consuming()
+    return consumer, released, handled
+
+
+def deliver(consumer, partition, delivery_tag):
+    on_message = consumer.channel.consuming[f"ctag-test.{partition}"]
+    on_message(
+        consumer.channel,
+        Delivery(delivery_tag),
+        Properties("EmployeeCreated"),
+        employee_created_body(delivery_tag)
+    )
+
+
+def test_partition_consumer_subscribes_to_its_partitions(partition_consumer):
+    consumer, _, _ = partition_consumer
+
+    consumer.assign([3, 1])
+
+    assert sorted(consumer.channel.consuming) == ["ctag-test.1", "ctag-test.3"]
+    assert consumer.partitions == {1, 3}
+
+
+def test_partition_is_released_once_its_messages_are_settled(
+    partition_consumer
+):
+    consumer, released, handled = partition_consumer
+    consumer.assign([0, 1])
+    deliver(consumer, 0, 1)
+    deliver(consumer, 1, 2)
+
+    consumer.assign([1])
+    consumer.channel.cancelled["ctag-test.0"](None)
+
+    # message 1 is still waiting for the handler thread
+    assert released == []
+    consumer._start_worker()
+    consumer._queue.put(consumer_pool.rabbitmq_event_consumer._STOP)
+    consumer._worker.join(5)
+    assert released == [0]
+    assert consumer.channel.acks == [1, 2]
+    assert len(handled) == 2
+
+
+def test_idle_partition_is_released_when_cancelled(partition_consumer):
+    consumer, released, _ = partition_consumer
+    consumer.assign([0])
+
+    consumer.assign([])
+    consumer.channel.cancelled["ctag-test.0"](None)
+
+    assert released == [0]
+    assert consumer.channel.consuming == {}
+
+
+class FakeControl:
+
+    def __init__(self):
+        self.sent = []
+
+    def send(self, message):
+        self.sent.append(message)
+
+    def close(self):
+        pass
+
+
+class FakeProcess:
+    pid = 1
+    exitcode = 1
+    sentinel = None
+
+    def __init__(self, **kwargs):
+        self.name = kwargs["name"]
+
+    def start(self):
+        pass
+
+
+class FakeContext:
+
+    def Pipe(self):
+        return FakeControl(), FakeControl()
+
+    def Process(self, **kwargs):
+        return FakeProcess(**kwargs)
+
+
+@pytest.fixture
+def pool():
+    pool = consumer_pool.ConsumerPool(
+        lambda: print, workers=2, partitions=4, context=FakeContext()
+    )
+    for slot in range(2):
+        pool._start_worker(slot)
+    pool._rebalance()
+    return pool
+
+
+def test_pool_spreads_partitions_over_its_workers(pool):
+    assert pool.assignment() == {0: {0, 1}, 1: {2, 3}}
+    assert pool._workers[0].control.sent == [("assign", (0, 1))]
+
+
+def test_dead_workers_partitions_move_to_the_survivors(pool):
+    pool._on_worker_exit(1)
+
+    assert pool.assignment() == {0: {0, 1, 2, 3}}
+    assert pool._workers[0].control.sent[-1] == ("assign", (0, 1, 2, 3))
+    assert 1 in pool._restarts
+
+
+def test_restarted_worker_gets_partitions_once_released(pool):
+    pool._on_worker_exit(1)
+    pool._start_worker(1)
+    pool._rebalance()
+
+    # the survivor lets go first, and the new worker waits for it
+    assert pool._workers[0].control.sent[-1] == ("assign", (0, 1))
+    assert pool._workers[1].control.sent == []
+
+    pool._on_released(2)
+    pool._on_released(3)
+
+    assert pool.assignment() == {0: {0, 1}, 1: {2, 3}}
+    assert pool._workers[1].control.sent[-1] == ("assign", (2, 3))
+
+
+def test_pool_needs_partitions(monkeypatch):
+    monkeypatch.setattr(rabbitmq_event_publisher, "PARTITIONS", 0)
+
+    with pytest.raises(ValueError):
+        consumer_pool.ConsumerPool(lambda: print, workers=2)
+
+
+def test_partitioned_queue_is_a_group_behind_a_hash_exchange(monkeypatch):
+    monkeypatch.setattr(rabbitmq_event_publisher, "PARTITIONS", 2)
+
+    declarations = rabbitmq_event_publisher.topology_declarations(
+        {"test": ("#",)}
+    )
+
+    exchange = rabbitmq_event_publisher.partition_exchange_name("test")
+    assert [
+        (method, arguments.get("queue") or arguments.get("exchange"))
+        for method, arguments in declarations
+    ] == [
+        ("exchange_declare", rabbitmq_event_publisher.EXCHANGE_NAME),
+        ("exchange_declare", exchange),
+        ("exchange_bind", None),
+        ("queue_declare", "test.0"),
+        ("queue_bind", "test.0"),
+        ("queue_declare", "test.1"),
+        ("queue_bind", "test.1"),
+    ]
+    assert declarations[1][1]["arguments"] == {
+        "hash-header": "x-partition-key"
+    }
+    assert declarations[3][1]["arguments"] == {
+        "x-single-active-consumer": True
+    }
+
+
+def test_partitioned_envelopes_hold_one_employees_events(monkeypatch):
+    monkeypatch.setattr(rabbitmq_event_publisher, "PARTITIONS", 2)
+    batched_events = [
+        events.EmployeeCreated(f"employee-{number}", "Azure Diamond")
+        for number in (0, 0, 1)
+    ]
+
+    envelopes = list(rabbitmq_event_publisher.serialize_envelopes(
+        batched_events
+    ))
+
+    assert [
+        (dto.headers["x-partition-key"], count) for dto, count in envelopes
+    ] == [("employee-0", 2), ("employee-1", 1)]
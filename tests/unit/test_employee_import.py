@@ -0,0 +1,80 @@
+from timecardsystem.common.domain import model as common_model
+from timecardsystem.timecardservice.adapters import (mongodb_view,
+                                                     rabbitmq_event_publisher)
+from timecardsystem.timecardservice.bootstrap_script import Bootstrap
+from timecardsystem.timecardservice.entrypoints import employee_import
+
+from .test_event_envelopes import RecordingPublisher
+from .test_handlers import FakeUnitOfWork, create_test_bootstrap
+
+
+def create_ndjson_lines(number_of_employees: int):
+    for number in range(number_of_employees):
+        yield (
+            f'{{"employee_id": "employee-{number}", '
+            f'"name": "Employee {number}"}}\n'
+        ).encode("utf-8")
+
+
+def test_iter_employee_chunks_groups_records_lazily():
+    errors = []
+    chunks = employee_import.iter_employee_chunks(
+        create_ndjson_lines(5), 2, lambda *error: errors.append(error)
+    )
+    assert [len(chunk) for chunk in chunks] == [2, 2, 1]
+    assert errors == []
+
+
+def test_iter_employee_chunks_reports_malformed_lines():
+    errors = []
+    lines = [
+        b'{"employee_id": "employee-1", "name": "Employee 1"}\n',
+        b"\n",
+        b"not json\n",
+        b'{"employee_id": "employee-2"}\n',
+    ]
+    chunks = list(employee_import.iter_employee_chunks(
+        lines, 10, lambda *error: errors.append(error)
+    ))
+    assert [command.employee_id for command in chunks[0]] == ["employee-1"]
+    assert [line_number for line_number, _ in errors] == [3, 4]
+
+
+def test_import_employees_imports_every_chunk():
+    bootstrap = create_test_bootstrap()
+
+    report = employee_import.import_employees(
+        create_ndjson_lines(5), bootstrap.get_message_bus, chunk_size=2
+    )
+
+    assert report == {"imported": 5, "rejected": 0, "errors": []}
+    employees = bootstrap.get_message_bus().unit_of_work.employees
+    for number in range(5):
+        assert employees.get(
+            common_model.EmployeeID(f"employee-{number}")
+        ) is not None
+
+
+def test_import_projects_and_publishes_each_chunk_in_bulk(monkeypatch):
+    publisher = RecordingPublisher()
+    monkeypatch.setattr(
+        rabbitmq_event_publisher, "get_publisher", lambda: publisher
+    )
+    projected = []
+    monkeypatch.setattr(
+        mongodb_view, "add_employees_to_view_model_bulk",
+        lambda employees: projected.append(len(employees))
+    )
+    monkeypatch.setattr(
+        mongodb_view, "add_employee_to_view_model",
+        lambda *employee: projected.append(1)
+    )
+    bootstrap = Bootstrap(unit_of_work=FakeUnitOfWork())
+    bootstrap.initialize_app()
+
+    employee_import.import_employees(
+        create_ndjson_lines(6), bootstrap.get_message_bus, chunk_size=3
+    )
+
+    assert projected == [3, 3]
+    assert [len(batch) for batch in publisher.published] == [3, 3]
@@ -0,0 +1,108 @@
+import json
+from dataclasses import dataclass
+from decimal import Decimal
+
+import pytest
+from timecardsystem.common.domain import events as common_events
+from timecardsystem.common.dtos import event_codecs, message_dto
+from timecardsystem.timecardservice.domain import events
+
+from ..common import create_dates_and_hours, create_datetime_from_iso
+
+
+class FakeHeader:
+
+    def __init__(self, content_type):
+        self.content_type = content_type
+        self.content_encoding = None
+        self.headers = None
+
+
+def round_trip(event):
+    publisher_dto = message_dto.MessagePublisherDTO()
+    publisher_dto.set_serializer(json.dumps)
+    publisher_dto.serialize_outgoing_message(event)
+
+    consumer_dto = message_dto.MessageConsumerDTO()
+    consumer_dto.set_deserializer(json.loads)
+    assert consumer_dto.receive_message(
+        None, None,
+        FakeHeader(publisher_dto.message_properties),
+        publisher_dto.serialized_message
+    )
+    [received] = consumer_dto.deserialized_messages
+    return publisher_dto, received
+
+
+def test_timecard_created_is_encoded_without_python_types():
+    event = events.TimecardCreated(
+        "timecard-0",
+        "employee-0",
+        create_datetime_from_iso("2022-08-12"),
+        create_dates_and_hours()
+    )
+
+    name, fields = event_codecs.REGISTRY.encode(event)
+
+    assert name == "TimecardCreated"
+    assert fields["week_ending_date"] == "2022-08-12T00:00:00"
+    assert fields["dates_and_hours"]["2022-08-08T00:00:00"] == {
+        "work_hours": "8.0", "sick_hours": "0.0", "vacation_hours": "0.0"
+    }
+
+
+def test_timecard_created_round_trips_to_domain_values():
+    event = events.TimecardCreated(
+        "timecard-0",
+        "employee-0",
+        create_datetime_from_iso("2022-08-12"),
+        create_dates_and_hours()
+    )
+
+    publisher_dto, received = round_trip(event)
+
+    assert publisher_dto.message_properties == "TimecardCreated"
+    assert received.timecard_id.value == "timecard-0"
+    assert received.employee_id.value == "employee-0"
+    assert received.week_ending_date == event.week_ending_date
+    work_day = received.dates_and_hours[create_datetime_from_iso("2022-08-08")]
+    assert work_day.work_hours == Decimal("8.0")
+
+
+def test_employee_created_and_timecard_submitted_round_trip():
+    _, employee_created = round_trip(
+        events.EmployeeCreated("employee-0", "Azure Diamond")
+    )
+    _, submitted = round_trip(
+        events.TimecardSubmittedForProcessing("timecard-0", "employee-0")
+    )
+
+    assert employee_created.name.value == "Azure Diamond"
+    assert submitted.timecard_id.value == "timecard-0"
+
+
+def test_unregistered_events_are_rejected():
+    consumer_dto = message_dto.MessageConsumerDTO()
+    consumer_dto.set_deserializer(json.loads)
+
+    assert not consumer_dto.receive_message(
+        None, None, FakeHeader("TimecardDeleted"), b"{}"
+    )
+    with pytest.raises(event_codecs.UnknownEvent):
+        event_codecs.REGISTRY.encode(common_events.Event())
+
+
+def test_new_event_needs_a_single_registration():
+    @dataclass
+    class TimecardDeleted(common_events.Event):
+        timecard_id: str
+
+    registry = event_codecs.CodecRegistry()
+    registry.register(TimecardDeleted)
+
+    name, fields = registry.encode(TimecardDeleted("timecard-0"))
+
+    assert (name, fields) == ("TimecardDeleted", {"timecard_id": "timecard-0"})
+    assert registry.decode(name, fields) == TimecardDeleted("timecard-0")
+    with pytest.raises(ValueError):
+        registry.register(TimecardDeleted)
@@ -0,0 +1,171 @@
+import threading
+import time
+
+import pytest
+from timecardsystem.timecardservice.bootstrap_script import Bootstrap
+from timecardsystem.timecardservice.domain import commands, events
+from timecardsystem.timecardservice.services import (event_dispatcher,
+                                                     handlers)
+from timecardsystem.timecardservice.services.message_bus import MessageBus
+
+from .test_handlers import FakeUnitOfWork
+
+
+class RecordingBus:
+
+    def __init__(self, handled, release=None):
+        self.handled = handled
+        self.release = release
+
+    def handle(self, event):
+        # only the workers block, so events handled inline get through
+        on_worker = threading.current_thread().name.startswith(
+            "event-dispatcher-"
+        )
+        if self.release and on_worker:
+            self.release.wait(5)
+        self.handled.append((threading.current_thread().name, event))
+
+
+def employee_created(number: int) -> events.EmployeeCreated:
+    return events.EmployeeCreated(f"employee-{number}", "Azure Diamond")
+
+
+def test_shutdown_drains_queued_events():
+    handled = []
+    dispatcher = event_dispatcher.BackgroundEventDispatcher(
+        lambda: RecordingBus(handled), workers=2
+    )
+
+    dispatcher.submit([employee_created(number) for number in range(20)])
+
+    assert dispatcher.shutdown(timeout=5)
+    assert sorted(event.employee_id for _, event in handled) == \
+        sorted(f"employee-{number}" for number in range(20))
+    assert all(
+        name.startswith("event-dispatcher-") for name, _ in handled
+    )
+    with pytest.raises(event_dispatcher.DispatcherStopped):
+        dispatcher.submit([employee_created(0)])
+
+
+def test_full_queue_handles_events_in_the_caller():
+    handled = []
+    release = threading.Event()
+    dispatcher = event_dispatcher.BackgroundEventDispatcher(
+        lambda: RecordingBus(handled, release),
+        workers=1,
+        max_queue_size=1,
+        put_timeout=0.01
+    )
+
+    # the worker blocks on the first event and the second fills the queue,
+    # so the third has nowhere to go
+    dispatcher.submit([employee_created(0)])
+    while dispatcher.queue_depth():
+        pass
+    dispatcher.submit([employee_created(1), employee_created(2)])
+
+    assert handled == [(threading.current_thread().name, employee_created(2))]
+    release.set()
+    assert dispatcher.shutdown(timeout=5)
+    assert len(handled) == 3
+
+
+def test_shutdown_gives_up_on_a_full_queue_at_the_deadline():
+    handled = []
+    release = threading.Event()
+    dispatcher = event_dispatcher.BackgroundEventDispatcher(
+        lambda: RecordingBus(handled, release),
+        workers=1,
+        max_queue_size=1
+    )
+    dispatcher.submit([employee_created(0)])
+    while dispatcher.queue_depth():
+        pass
+    dispatcher.submit([employee_created(1)])
+
+    started = time.monotonic()
+    assert not dispatcher.shutdown(timeout=0.05)
+    assert time.monotonic() - started < 1
+    release.set()
+
+
+def test_submit_waits_for_queue_space_once_per_call():
+    handled = []
+    release = threading.Event()
+    dispatcher = event_dispatcher.BackgroundEventDispatcher(
+        lambda: RecordingBus(handled, release),
+        workers=1,
+        max_queue_size=1,
+        put_timeout=0.2
+    )
+    dispatcher.submit([employee_created(0)])
+    while dispatcher.queue_depth():
+        pass
+
+    started = time.monotonic()
+    dispatcher.submit([employee_created(number) for number in range(1, 6)])
+
+    # event 1 fills the queue; the rest are handled inline, in order, after
+    # a single wait
+    assert time.monotonic() - started < 0.4
+    assert handled == [
+        (threading.current_thread().name, employee_created(number))
+        for number in range(2, 6)
+    ]
+    release.set()
+    assert dispatcher.shutdown(timeout=5)
+
+
+def test_each_employees_events_are_handled_in_order_by_one_worker():
+    handled = []
+    dispatcher = event_dispatcher.BackgroundEventDispatcher(
+        lambda: RecordingBus(handled), workers=4
+    )
+
+    dispatcher.submit([
+        events.EmployeeCreated(f"employee-{number % 5}", f"name-{number}")
+        for number in range(100)
+    ])
+
+    assert dispatcher.shutdown(timeout=5)
+    for employee in range(5):
+        employee_events = [
+            (name, event.name) for name, event in handled
+            if event.employee_id == f"employee-{employee}"
+        ]
+        assert len({name for name, _ in employee_events}) == 1
+        assert [event_name for _, event_name in employee_events] == [
+            f"name-{number}" for number in range(employee, 100, 5)
+        ]
+
+
+def test_message_bus_hands_raised_events_to_dispatcher():
+    dispatched = []
+    fake_unit_of_work = FakeUnitOfWork()
+    message_bus = MessageBus(
+        fake_unit_of_work,
+        {
+            commands.CreateEmployee:
+            lambda c: handlers.create_employee(c, fake_unit_of_work)
+        },
+        {},
+        {},
+        event_dispatcher=dispatched.extend
+    )
+
+    message_bus.handle(commands.CreateEmployee("employee-0", "Azure Diamond"))
+
+    assert dispatched == [
+        events.EmployeeCreated("employee-0", "Azure Diamond")
+    ]
+    assert message_bus.queue == []
+
+
+def test_background_dispatch_needs_a_unit_of_work_factory():
+    bootstrap = Bootstrap(
+        unit_of_work=FakeUnitOfWork(), background_event_dispatch=True
+    )
+    with pytest.raises(ValueError):
+        bootstrap.initialize_app()
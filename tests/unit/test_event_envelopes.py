@@ -0,0 +1,143 @@
+import json
+
+import pytest
+from timecardsystem.common.dtos import message_dto
+from timecardsystem.timecardservice.adapters import rabbitmq_event_publisher
+from timecardsystem.timecardservice.domain import events
+
+from ..common import create_dates_and_hours, create_datetime_from_iso
+
+EMPLOYEE_ID = "5dbf600d-305a-4f77-b2b8-51401f443597"
+
+
+class FakeHeader:
+
+    def __init__(self, dto: message_dto.MessagePublisherDTO):
+        self.content_type = dto.message_properties
+        self.content_encoding = dto.content_encoding
+        self.headers = dto.headers
+
+
+def timecard_created(number: int) -> events.TimecardCreated:
+    return events.TimecardCreated(
+        f"aaa6eaa1-3197-4b3e-9b52-{number:012d}",
+        EMPLOYEE_ID,
+        create_datetime_from_iso("2022-08-12"),
+        create_dates_and_hours()
+    )
+
+
+def employee_created(number: int) -> events.EmployeeCreated:
+    return events.EmployeeCreated(f"employee-{number}", "Azure Diamond")
+
+
+def receive(dto: message_dto.MessagePublisherDTO, body=None):
+    consumer_dto = message_dto.MessageConsumerDTO()
+    consumer_dto.set_deserializer(json.loads)
+    acked = consumer_dto.receive_message(
+        None, None, FakeHeader(dto),
+        dto.serialized_message if body is None else body
+    )
+    return acked, consumer_dto.deserialized_messages
+
+
+def test_consecutive_events_of_a_type_share_envelopes_in_order():
+    batched_events = [
+        employee_created(0),
+        timecard_created(0), timecard_created(1), timecard_created(2),
+        employee_created(1),
+    ]
+
+    envelopes = list(rabbitmq_event_publisher.serialize_envelopes(
+        batched_events, max_events=2
+    ))
+
+    assert [(dto.message_properties, count) for dto, count in envelopes] \
+        == [
+            ("EmployeeCreated", 1),
+            ("TimecardCreated", 2),
+            ("TimecardCreated", 1),
+            ("EmployeeCreated", 1),
+        ]
+    headers = [dict(dto.headers) for dto, _ in envelopes]
+    assert all(
+        header.pop(message_dto.SERIALIZED_AT_HEADER) > 0
+        for header in headers
+    )
+    assert headers[0] == {message_dto.PARTITION_KEY_HEADER: "employee-0"}
+    assert headers[1] == {
+        message_dto.EVENT_COUNT_HEADER: 2,
+        message_dto.PARTITION_KEY_HEADER: EMPLOYEE_ID,
+    }
+
+
+@pytest.mark.parametrize("binary", [False, True])
+def test_consumer_unpacks_every_event_of_an_envelope(binary):
+    dto = message_dto.MessagePublisherDTO(binary=binary)
+    dto.set_serializer(json.dumps)
+    dto.serialize_outgoing_batch([timecard_created(n) for n in range(3)])
+
+    acked, received = receive(dto)
+
+    assert acked
+    assert [event.timecard_id.value for event in received] == [
+        f"aaa6eaa1-3197-4b3e-9b52-{number:012d}" for number in range(3)
+    ]
+
+
+def test_malformed_envelope_delivers_none_of_its_events():
+    dto = message_dto.MessagePublisherDTO()
+    dto.set_serializer(json.dumps)
+    dto.serialize_outgoing_batch([timecard_created(n) for n in range(2)])
+    fields_list = json.loads(dto.serialized_message)
+    del fields_list[1]["week_ending_date"]
+
+    consumer_dto = message_dto.MessageConsumerDTO()
+    consumer_dto.set_deserializer(json.loads)
+    with pytest.raises(KeyError):
+        consumer_dto.receive_message(
+            None, None, FakeHeader(dto), json.dumps(fields_list)
+        )
+
+    assert consumer_dto.deserialized_messages == []
+
+
+def test_envelope_of_mixed_event_types_is_rejected():
+    dto = message_dto.MessagePublisherDTO()
+    dto.set_serializer(json.dumps)
+
+    with pytest.raises(ValueError):
+        dto.serialize_outgoing_batch(
+            [timecard_created(0), employee_created(0)]
+        )
+
+
+class RecordingPublisher:
+
+    def __init__(self):
+        self.published = []
+
+    def publish_event(self, name, event):
+        self.published.append([event])
+
+    def publish_events(self, batched_events, max_events):
+        self.published.append(list(batched_events))
+
+
+def test_events_published_while_batching_are_sent_together(monkeypatch):
+    publisher = RecordingPublisher()
+    monkeypatch.setattr(
+        rabbitmq_event_publisher, "get_publisher", lambda: publisher
+    )
+
+    with rabbitmq_event_publisher.batching():
+        for number in range(3):
+            rabbitmq_event_publisher.publish_event(
+                "timecard_created", timecard_created(number)
+            )
+        assert publisher.published == []
+    rabbitmq_event_publisher.publish_event(
+        "employee_created", employee_created(0)
+    )
+
+    assert [len(batch) for batch in publisher.published] == [3, 1]
@@ -0,0 +1,175 @@
+import pytest
+from timecardsystem.timecardservice.adapters import (event_spool,
+                                                     rabbitmq_event_publisher)
+from timecardsystem.timecardservice.domain import events
+
+from .test_rabbitmq_event_publisher import FakeBroker
+
+
+def record(number: int):
+    return {"body": f"body-{number}", "event_type": "EmployeeCreated",
+            "message_id": None}
+
+
+def test_records_are_read_in_append_order(tmp_path):
+    spool = event_spool.MmapSpool(str(tmp_path / "events.spool"), 4096)
+    for number in range(3):
+        spool.append(record(number))
+
+    records = spool.peek(10)
+
+    assert [body["body"] for _, body in records] == \
+        ["body-0", "body-1", "body-2"]
+    assert len(spool) == 3
+
+
+def test_committed_records_are_not_read_again(tmp_path):
+    spool = event_spool.MmapSpool(str(tmp_path / "events.spool"), 4096)
+    for number in range(2):
+        spool.append(record(number))
+    [(size, _)] = spool.peek(1)
+
+    spool.commit(size)
+
+    assert [body["body"] for _, body in spool.peek(10)] == ["body-1"]
+
+
+def test_unread_records_survive_reopening(tmp_path):
+    path = str(tmp_path / "events.spool")
+    spool = event_spool.MmapSpool(path, 4096)
+    for number in range(3):
+        spool.append(record(number))
+    [(size, _)] = spool.peek(1)
+    spool.commit(size)
+    spool.close()
+
+    reopened = event_spool.MmapSpool(path, 4096)
+
+    assert len(reopened) == 2
+    assert [body["body"] for _, body in reopened.peek(10)] == \
+        ["body-1", "body-2"]
+
+
+def test_torn_record_is_discarded_on_reopening(tmp_path):
+    path = str(tmp_path / "events.spool")
+    spool = event_spool.MmapSpool(path, 4096)
+    spool.append(record(0))
+    spool.append(record(1))
+    # corrupt the last record's payload
+    spool._map[spool._write_offset - 2] ^= 0xFF
+    spool.close()
+
+    reopened = event_spool.MmapSpool(path, 4096)
+
+    assert [body["body"] for _, body in reopened.peek(10)] == ["body-0"]
+
+
+def test_full_spool_rejects_appends_until_drained(tmp_path):
+    spool = event_spool.MmapSpool(str(tmp_path / "events.spool"), 256)
+    while True:
+        try:
+            spool.append(record(0))
+        except event_spool.SpoolFull:
+            break
+
+    for size, _ in spool.peek(100):
+        spool.commit(size)
+    spool.append(record(1))
+
+    assert len(spool) == 1
+
+
+def test_spool_draining_while_appending_reclaims_its_space(tmp_path):
+    path = str(tmp_path / "events.spool")
+    spool = event_spool.MmapSpool(path, 512)
+
+    # far more than fits at once, never more than two left unread
+    for number in range(200):
+        spool.append(record(number))
+        if len(spool) == 3:
+            [(size, _)] = spool.peek(1)
+            spool.commit(size)
+    spool.close()
+
+    reopened = event_spool.MmapSpool(path, 512)
+    assert [body["body"] for _, body in reopened.peek(10)] == \
+        ["body-198", "body-199"]
+
+
+def test_each_process_takes_its_own_spool_file(tmp_path):
+    first = event_spool.open_spool(str(tmp_path), 4096)
+
+    with pytest.raises(event_spool.SpoolLocked):
+        event_spool.MmapSpool(first.path, 4096)
+    second = event_spool.open_spool(str(tmp_path), 4096)
+
+    assert second.path != first.path
+
+
+def employee_created(number: int) -> events.EmployeeCreated:
+    return events.EmployeeCreated(f"employee-{number}", "Azure Diamond")
+
+
+def unreachable():
+    raise rabbitmq_event_publisher.pika.exceptions.AMQPConnectionError()
+
+
+def test_events_are_spooled_while_broker_is_unreachable_and_replayed(
+    tmp_path
+):
+    broker = FakeBroker()
+    spool = event_spool.MmapSpool(str(tmp_path / "events.spool"), 4096)
+    publisher = rabbitmq_event_publisher.RabbitMQEventPublisher(
+        unreachable, spool=spool
+    )
+    publisher.publish_event("employee_created", employee_created(0))
+    # the broker is back, but later events queue behind the spooled one
+    publisher.connection_factory = broker.connect
+    publisher.publish_event("employee_created", employee_created(1))
+    assert broker.published == []
+
+    replayer = rabbitmq_event_publisher.SpoolReplayer(spool, publisher)
+    replayed = replayer.replay_batch()
+
+    assert replayed == 2
+    assert ['"employee-0"' in body for body in broker.published] == \
+        [True, False]
+    assert len(spool) == 0
+    publisher.publish_event("employee_created", employee_created(2))
+    assert len(broker.published) == 3
+
+
+def test_binary_bodies_are_spooled_and_replayed_unchanged(tmp_path):
+    broker = FakeBroker()
+    spool = event_spool.MmapSpool(str(tmp_path / "events.spool"), 4096)
+    publisher = rabbitmq_event_publisher.RabbitMQEventPublisher(
+        unreachable, spool=spool
+    )
+    publisher.publish(b"\x01\x00\xff", "EmployeeCreated",
+                      content_encoding="x-timecardsystem-binary")
+
+    publisher.connection_factory = broker.connect
+    rabbitmq_event_publisher.SpoolReplayer(spool, publisher).replay_batch()
+
+    assert broker.published == [b"\x01\x00\xff"]
+
+
+def test_replayer_keeps_events_the_broker_nacked(tmp_path):
+    broker = FakeBroker()
+    spool = event_spool.MmapSpool(str(tmp_path / "events.spool"), 4096)
+    publisher = rabbitmq_event_publisher.RabbitMQEventPublisher(
+        broker.connect, spool=spool
+    )
+    for number in range(3):
+        spool.append(record(number))
+    broker.nacked_bodies.add("body-1")
+    replayer = rabbitmq_event_publisher.SpoolReplayer(spool, publisher)
+
+    with pytest.raises(rabbitmq_event_publisher.pika.exceptions.NackError):
+        replayer.replay_batch()
+
+    [replay_channel] = broker.connections[-1].channels
+    assert replay_channel.confirming
+    assert broker.published == ["body-0"]
+    assert [body["body"] for _, body in spool.peek(10)] == \
+        ["body-1", "body-2"]
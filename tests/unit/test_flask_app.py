@@ -0,0 +1,161 @@
+from concurrent.futures import Future
+from datetime import datetime, timezone
+
+import pytest
+from timecardsystem.timecardservice import views
+from timecardsystem.timecardservice.adapters import rabbitmq_event_publisher
+from timecardsystem.timecardservice.domain import events
+from timecardsystem.timecardservice.entrypoints import flask_app
+
+docs = [
+    {"timecard_id": "timecard-0", "week_ending_date": "2022-08-05"},
+    {"timecard_id": "timecard-1", "week_ending_date": "2022-08-12"},
+]
+
+
+def test_stream_timecards_as_json_array():
+    with flask_app.app.test_request_context("/"):
+        response = flask_app._stream_timecards(iter(docs))
+        body = response.get_data()
+
+    assert response.mimetype == "application/json"
+    assert flask_app.app.json.loads(body) == docs
+
+
+def test_stream_timecards_as_ndjson():
+    with flask_app.app.test_request_context("/?format=ndjson"):
+        response = flask_app._stream_timecards(iter(docs))
+        lines = response.get_data().splitlines()
+
+    assert response.mimetype == "application/x-ndjson"
+    assert [flask_app.app.json.loads(line) for line in lines] == docs
+
+
+def test_stream_timecards_with_no_documents():
+    with flask_app.app.test_request_context("/"):
+        response = flask_app._stream_timecards(iter([]))
+        assert response.get_data() == b"[]"
+
+
+def test_stream_timecards_serializes_dates_like_jsonify():
+    doc = {"week_ending_date": datetime.fromisoformat("2022-08-12")}
+    with flask_app.app.test_request_context("/"):
+        response = flask_app._stream_timecards(iter([doc]))
+        body = response.get_data()
+        assert flask_app.app.json.loads(body) == \
+            flask_app.app.json.loads(flask_app.jsonify([doc]).data)
+
+
+@pytest.fixture
+def fake_timecards_view(monkeypatch):
+    version = views.TimecardsVersion(
+        3, datetime.fromisoformat("2022-08-12T10:30:15.250")
+    )
+    pages_read = []
+
+    def timecards_version_for_employee(employee_id, unit_of_work):
+        return version
+
+    def timecards_page_for_employee(employee_id, unit_of_work, **kwargs):
+        pages_read.append(kwargs)
+        return views.TimecardsPage(docs)
+
+    monkeypatch.setattr(
+        views, "timecards_version_for_employee",
+        timecards_version_for_employee
+    )
+    monkeypatch.setattr(
+        views, "timecards_page_for_employee", timecards_page_for_employee
+    )
+    return version, pages_read
+
+
+def test_get_timecards_answers_if_none_match_with_not_modified(
+    fake_timecards_view
+):
+    version, pages_read = fake_timecards_view
+    client = flask_app.app.test_client()
+    url = "/employees/88f67519-f5dc-4ba1-8dac-03e024ccd251/timecards"
+
+    response = client.get(url)
+    assert response.status_code == 200
+    etag, _ = response.get_etag()
+    assert response.last_modified == \
+        version.modified_at.replace(microsecond=0, tzinfo=timezone.utc)
+
+    response = client.get(url, headers={"If-None-Match": f'"{etag}"'})
+    assert response.status_code == 304
+    assert response.get_data() == b""
+    assert len(pages_read) == 1
+
+    version.version += 1
+    response = client.get(url, headers={"If-None-Match": f'"{etag}"'})
+    assert response.status_code == 200
+    assert len(pages_read) == 2
+
+
+def test_get_timecards_answers_if_modified_since_with_not_modified(
+    fake_timecards_view
+):
+    version, pages_read = fake_timecards_view
+    client = flask_app.app.test_client()
+    url = "/employees/88f67519-f5dc-4ba1-8dac-03e024ccd251/timecards"
+
+    last_modified = client.get(url).headers["Last-Modified"]
+    response = client.get(url, headers={"If-Modified-Since": last_modified})
+    assert response.status_code == 304
+    assert len(pages_read) == 1
+
+
+def test_etag_differs_per_query_string(fake_timecards_view):
+    client = flask_app.app.test_client()
+    url = "/employees/88f67519-f5dc-4ba1-8dac-03e024ccd251/timecards"
+
+    assert client.get(url).get_etag() != \
+        client.get(f"{url}?limit=1").get_etag()
+
+
+def test_malformed_payloads_are_rejected():
+    client = flask_app.app.test_client()
+
+    response = client.post("/timecards", json={
+        "timecard_id": "timecard-0",
+        "employee_id": "88f67519-f5dc-4ba1-8dac-03e024ccd251",
+        "week_ending_date": "2022-08-12",
+        "dates_and_hours": {"2022-08-08": {"work_hours": "eight"}}
+    })
+
+    assert response.status_code == 400
+    assert response.get_json() == {
+        "error": "Invalid hours work_hours for 2022-08-08"
+    }
+    assert client.post("/timecards:batch", json=[]).status_code == 400
+
+
+def test_unconfirmed_timecard_events_are_reported_per_item():
+    confirmed, nacked = Future(), Future()
+    confirmed.set_result(True)
+    nacked.set_exception(rabbitmq_event_publisher.PublishNacked("rejected"))
+    week_ending_date = datetime.fromisoformat("2022-08-12")
+    results = [
+        {"timecard_id": "timecard-0", "status": "created"},
+        {"timecard_id": "timecard-1", "status": "updated"},
+    ]
+
+    flask_app._report_publish_failures(results, [
+        (events.TimecardCreated(
+            timecard_id, "employee-0", week_ending_date, {}
+        ), future)
+        for timecard_id, future in [
+            ("timecard-0", confirmed), ("timecard-1", nacked)
+        ]
+    ])
+
+    assert results == [
+        {"timecard_id": "timecard-0", "status": "created"},
+        {
+            "timecard_id": "timecard-1",
+            "status": "updated",
+            "publish_error": "rejected"
+        },
+    ]
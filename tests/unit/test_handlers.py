@@ -2,7 +2,9 @@ from typing import Set
 
 import pytest
 from timecardsystem.common.domain import model as common_model
-from timecardsystem.timecardservice.adapters import repositories
+from timecardsystem.timecardservice.adapters import (mongodb_view,
+                                                     rabbitmq_event_publisher,
+                                                     repositories)
 from timecardsystem.timecardservice.bootstrap_script import Bootstrap
 from timecardsystem.timecardservice.domain import commands, events, model
 from timecardsystem.timecardservice.services import unit_of_work, handlers
@@ -292,3 +294,229 @@ class TestEventTimecardCreated:
             match=f"Employee ID {employee_id} does not exist"
         ):
             message_bus.handle(event)
+
+
+class TestCreateTimecards:
+
+    def test_create_timecards_reports_result_per_timecard(self):
+        bootstrap = create_test_bootstrap()
+        message_bus = bootstrap.get_message_bus()
+
+        employee_id = "c8b5734f-e4b4-47c8-a326-f79c23e696de"
+        inject_employee(employee_id, message_bus)
+        unknown_employee_id = "0b8c2f43-52a5-4c0b-9d1e-1b1a8b0d0c11"
+        week_ending_date = create_datetime_from_iso("2022-08-12")
+
+        invalid_dates_and_hours = create_dates_and_hours()
+        del invalid_dates_and_hours[create_datetime_from_iso("2022-08-12")]
+
+        command = commands.CreateTimecards([
+            commands.CreateTimecard(
+                "c5def653-5315-4a4d-b9dc-78beae7e3013",
+                employee_id,
+                week_ending_date,
+                create_dates_and_hours()
+            ),
+            commands.CreateTimecard(
+                "9a3c4c41-6a7e-4a57-a8a5-5e2b8f2f6a01",
+                employee_id,
+                week_ending_date,
+                invalid_dates_and_hours
+            ),
+            commands.CreateTimecard(
+                "5f0d3b0e-2f5c-4d39-8b6b-1f3fa3f4f0a2",
+                unknown_employee_id,
+                week_ending_date,
+                create_dates_and_hours()
+            ),
+        ])
+        [results] = message_bus.handle(command)
+
+        assert [result["status"] for result in results] == \
+            ["created", "rejected", "rejected"]
+        assert results[1]["error"] == \
+            "Invalid timecard 9a3c4c41-6a7e-4a57-a8a5-5e2b8f2f6a01"
+        assert results[2]["error"] == \
+            f"Employee ID {unknown_employee_id} does not exist"
+
+        timecards = message_bus.unit_of_work.timecards
+        assert timecards.get(common_model.TimecardID(
+            "c5def653-5315-4a4d-b9dc-78beae7e3013"
+        )) is not None
+        assert timecards.get(common_model.TimecardID(
+            "9a3c4c41-6a7e-4a57-a8a5-5e2b8f2f6a01"
+        )) is None
+        assert message_bus.unit_of_work.processed_commit
+
+    def test_create_timecards_updates_existing_timecard(self):
+        bootstrap = create_test_bootstrap()
+        message_bus = bootstrap.get_message_bus()
+
+        employee_id = "c8b5734f-e4b4-47c8-a326-f79c23e696de"
+        inject_employee(employee_id, message_bus)
+        timecard_id = "c5def653-5315-4a4d-b9dc-78beae7e3013"
+        week_ending_date = create_datetime_from_iso("2022-08-12")
+
+        message_bus.handle(commands.CreateTimecard(
+            timecard_id,
+            employee_id,
+            week_ending_date,
+            create_dates_and_hours()
+        ))
+
+        changed_dates_and_hours = create_dates_and_hours()
+        changed_dates_and_hours[create_datetime_from_iso("2022-08-08")] = {
+            "work_hours": "7.0",
+            "sick_hours": "1.0",
+            "vacation_hours": "0.0"
+        }
+        [results] = message_bus.handle(commands.CreateTimecards([
+            commands.CreateTimecard(
+                timecard_id,
+                employee_id,
+                week_ending_date,
+                changed_dates_and_hours
+            )
+        ]))
+
+        assert results == [{"timecard_id": timecard_id, "status": "updated"}]
+        timecard = message_bus.unit_of_work.timecards.get(
+            common_model.TimecardID(timecard_id)
+        )
+        assert timecard.dates_and_hours == \
+            convert_dates_and_hours_to_domain(changed_dates_and_hours)
+
+
+def received_employee_created(employee_id: str) -> events.EmployeeCreated:
+    # as decoded by the event consumer, with value objects
+    return events.EmployeeCreated(
+        common_model.EmployeeID(employee_id),
+        common_model.EmployeeName("Azure Diamond")
+    )
+
+
+def received_timecard_created(
+    timecard_id: str,
+    employee_id: str
+) -> events.TimecardCreated:
+    return events.TimecardCreated(
+        common_model.TimecardID(timecard_id),
+        common_model.EmployeeID(employee_id),
+        create_datetime_from_iso("2022-08-12"),
+        convert_dates_and_hours_to_domain(create_dates_and_hours())
+    )
+
+
+@pytest.fixture
+def bulk_writes(monkeypatch):
+    writes = []
+    monkeypatch.setattr(
+        mongodb_view, "add_employees_to_view_model_bulk",
+        lambda employees: writes.append(("employees", employees))
+    )
+    monkeypatch.setattr(
+        mongodb_view, "add_timecards_to_view_model_bulk",
+        lambda rows: writes.append(("timecards", rows))
+    )
+    return writes
+
+
+class TestHandleBatch:
+
+    def test_runs_of_a_type_are_projected_in_one_bulk_write(
+        self, bulk_writes
+    ):
+        message_bus = create_test_bootstrap().get_message_bus()
+        employee_id = "c8b5734f-e4b4-47c8-a326-f79c23e696de"
+        inject_employee(employee_id, message_bus)
+
+        message_bus.handle_batch([
+            received_employee_created("employee-0"),
+            received_employee_created("employee-1"),
+            received_timecard_created("timecard-0", employee_id),
+            received_timecard_created("timecard-1", employee_id),
+            received_employee_created("employee-2"),
+        ])
+
+        assert [(kind, len(batch)) for kind, batch in bulk_writes] == [
+            ("employees", 2), ("timecards", 2), ("employees", 1)
+        ]
+        rows = bulk_writes[1][1]
+        assert [row["timecard_id"] for row in rows] == [
+            "timecard-0", "timecard-1"
+        ]
+        assert rows[0]["employee_name"] == "Azure Diamond"
+
+    def test_locally_raised_events_are_projected_too(self, bulk_writes):
+        message_bus = create_test_bootstrap().get_message_bus()
+        employee_id = "c8b5734f-e4b4-47c8-a326-f79c23e696de"
+        inject_employee(employee_id, message_bus)
+
+        message_bus.handle_batch([events.TimecardCreated(
+            "timecard-0",
+            employee_id,
+            create_datetime_from_iso("2022-08-12"),
+            create_dates_and_hours()
+        )])
+
+        [(_, [row])] = bulk_writes
+        assert row["dates_and_hours"]["2022-08-08T00:00:00"] == [
+            "8.0", "0.0", "0.0"
+        ]
+
+    def test_timecard_of_unknown_employee_fails_the_batch(self, bulk_writes):
+        message_bus = create_test_bootstrap().get_message_bus()
+
+        with pytest.raises(handlers.EmployeeDoesNotExist):
+            message_bus.handle_batch([
+                received_timecard_created("timecard-0", "employee-0")
+            ])
+        assert bulk_writes == []
+
+    def test_views_can_be_left_to_the_consumer(self, bulk_writes):
+        bootstrap = Bootstrap(
+            unit_of_work=FakeUnitOfWork(),
+            publish_external_events=False,
+            project_views=False
+        )
+        bootstrap.initialize_app()
+        message_bus = bootstrap.get_message_bus()
+
+        message_bus.handle_batch([received_employee_created("employee-0")])
+        message_bus.handle(events.EmployeeCreated("employee-1", "Azure"))
+
+        assert message_bus.event_handlers == {}
+        assert bulk_writes == []
+
+    def test_created_timecards_are_projected_and_published_together(
+        self, bulk_writes, monkeypatch
+    ):
+        published = []
+        monkeypatch.setattr(
+            rabbitmq_event_publisher, "publish_events", published.append
+        )
+        bootstrap = Bootstrap(unit_of_work=FakeUnitOfWork())
+        bootstrap.initialize_app()
+        message_bus = bootstrap.get_message_bus()
+        employee_id = "c8b5734f-e4b4-47c8-a326-f79c23e696de"
+        inject_employee(employee_id, message_bus)
+
+        with rabbitmq_event_publisher.batching():
+            message_bus.handle(commands.CreateTimecards([
+                commands.CreateTimecard(
+                    f"timecard-{number}",
+                    employee_id,
+                    create_datetime_from_iso("2022-08-12"),
+                    create_dates_and_hours()
+                )
+                for number in range(3)
+            ]))
+
+        assert [(kind, len(batch)) for kind, batch in bulk_writes] == [
+            ("timecards", 3)
+        ]
+        # the fake unit of work collects events in no particular order
+        assert [
+            sorted(event.timecard_id for event in batch)
+            for batch in published
+        ] == [["timecard-0", "timecard-1", "timecard-2"]]
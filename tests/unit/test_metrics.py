@@ -0,0 +1,67 @@
+from timecardsystem.timecardservice import metrics
+from timecardsystem.timecardservice.domain import commands
+from timecardsystem.timecardservice.entrypoints import flask_app
+
+from .test_handlers import FakeUnitOfWork, create_test_bootstrap
+
+
+def handler_calls() -> float:
+    return metrics.sample_value(
+        "timecardservice_handler_duration_seconds_count",
+        {
+            "stage": "command",
+            "message": "CreateEmployee",
+            "handler": "create_employee",
+        }
+    )
+
+
+def rollbacks() -> float:
+    return metrics.sample_value(
+        "timecardservice_unit_of_work_duration_seconds_count",
+        {"unit_of_work": "FakeUnitOfWork", "operation": "rollback"}
+    )
+
+
+def test_histograms_use_the_default_buckets():
+    metrics.PUBLISH_DURATION.labels("TestEvent").observe(0.003)
+
+    assert metrics.sample_value(
+        "timecardservice_event_publish_duration_seconds_bucket",
+        {"event": "TestEvent", "le": "0.005"}
+    ) == 1
+    assert 'timecardservice_event_publish_duration_seconds_bucket' \
+        '{event="TestEvent",le="0.0025"} 0.0' in metrics.render()
+
+
+def test_message_bus_times_each_handler():
+    calls_before = handler_calls()
+
+    message_bus = create_test_bootstrap().get_message_bus()
+    message_bus.handle(commands.CreateEmployee(
+        "c8b5734f-e4b4-47c8-a326-f79c23e696de", "Azure Diamond"
+    ))
+
+    assert handler_calls() == calls_before + 1
+
+
+def test_only_real_rollbacks_are_timed():
+    rollbacks_before = rollbacks()
+    uow = FakeUnitOfWork()
+
+    with uow:
+        uow.commit()
+    with uow:
+        pass
+
+    assert rollbacks() == rollbacks_before + 1
+
+
+def test_metrics_endpoint_serves_prometheus_text():
+    response = flask_app.app.test_client().get("/metrics")
+
+    assert response.status_code == 200
+    assert response.content_type == metrics.CONTENT_TYPE
+    body = response.get_data(as_text=True)
+    assert "# TYPE timecardservice_handler_duration_seconds histogram" \
+        in body
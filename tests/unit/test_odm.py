@@ -0,0 +1,34 @@
+from timecardsystem.timecardservice.adapters import mongodb_view, odm
+
+
+def test_validator_fingerprint_ignores_key_order():
+    validator = odm.create_validator(odm.TIMECARD_SCHEMA)
+    reordered = {
+        "$jsonSchema": {
+            "required": validator["$jsonSchema"]["required"],
+            "properties": dict(
+                reversed(validator["$jsonSchema"]["properties"].items())
+            ),
+            "bsonType": "object",
+        }
+    }
+    assert odm.fingerprint_validator(validator) == \
+        odm.fingerprint_validator(reordered)
+
+
+def test_validator_fingerprint_changes_with_schema():
+    timecard_validator = odm.create_validator(odm.TIMECARD_SCHEMA)
+    employee_validator = odm.create_validator(odm.EMPLOYEE_SCHEMA)
+    assert odm.fingerprint_validator(timecard_validator) != \
+        odm.fingerprint_validator(employee_validator)
+
+
+def test_declared_index_names_are_unique():
+    for index_models in (
+        odm.TIMECARD_INDEXES, odm.EMPLOYEE_INDEXES,
+        mongodb_view.TIMECARDS_VIEW_INDEXES,
+        mongodb_view.EMPLOYEES_VIEW_INDEXES,
+        mongodb_view.PROCESSED_MESSAGES_INDEXES
+    ):
+        names = [model.document["name"] for model in index_models]
+        assert len(names) == len(set(names))
@@ -0,0 +1,224 @@
+import asyncio
+import collections
+import json
+from concurrent.futures import Future
+from datetime import datetime
+
+import pytest
+from timecardsystem.timecardservice.adapters import (outbox,
+                                                     rabbitmq_event_publisher)
+from timecardsystem.timecardservice.domain import events, model
+from timecardsystem.common.domain import model as common_model
+from timecardsystem.timecardservice.entrypoints import outbox_relay
+from timecardsystem.timecardservice.services import (async_unit_of_work,
+                                                     unit_of_work)
+
+
+class FakeOutbox:
+
+    def __init__(self, entries):
+        self.entries = entries
+        self.published_ids = []
+
+    def fetch_pending(self, limit):
+        return [
+            entry for entry in self.entries
+            if entry["_id"] not in self.published_ids
+        ][:limit]
+
+    def mark_published(self, ids):
+        self.published_ids.extend(ids)
+        return len(ids)
+
+
+class FakePublisher:
+    # confirms every message on flush, except those it nacks or leaves
+    # unconfirmed; records how many were sent before each flush
+
+    def __init__(self, nacked_bodies=(), unconfirmed_bodies=()):
+        self.nacked_bodies = nacked_bodies
+        self.unconfirmed_bodies = unconfirmed_bodies
+        self.published = []
+        self.flushes = []
+        self._pending = []
+
+    def publish(self, body, event_type, message_id=None,
+                content_encoding=None, headers=None):
+        future = Future()
+        self.published.append((body, message_id))
+        self._pending.append((body, future))
+        return future
+
+    def flush(self, timeout=None):
+        self.flushes.append(len(self._pending))
+        for body, future in self._pending:
+            if body in self.nacked_bodies:
+                future.set_exception(rabbitmq_event_publisher.PublishNacked())
+            elif body not in self.unconfirmed_bodies:
+                future.set_result(True)
+        self._pending = []
+        return not self.unconfirmed_bodies
+
+
+def create_entries(count):
+    return [
+        {
+            "_id": number,
+            "body": json.dumps({"employee_id": f"employee-{number}"}),
+            "event_type": "EmployeeCreated",
+            "created_at": datetime.utcnow(),
+            "published_at": None,
+        }
+        for number in range(count)
+    ]
+
+
+def test_outbox_documents_hold_the_serialized_event():
+    event = events.EmployeeCreated("employee-0", "Azure Diamond")
+
+    [document] = outbox.create_outbox_documents([event])
+
+    assert document["name"] == "employee_created"
+    assert document["event_type"] == "EmployeeCreated"
+    assert json.loads(document["body"]) == {
+        "employee_id": "employee-0", "name": "Azure Diamond"
+    }
+    assert document["published_at"] is None
+    assert len(document["message_id"]) == 36
+
+
+def test_pending_events_are_taken_once():
+    employee = model.Employee(
+        common_model.EmployeeID("employee-0"),
+        common_model.EmployeeName("Azure Diamond")
+    )
+    pending_events = outbox.PendingEvents()
+    employee.confirm_employee_created()
+
+    assert len(pending_events.take([employee])) == 1
+    assert pending_events.take([employee]) == []
+
+
+class RecordingCollection:
+
+    def __init__(self):
+        self.inserts = []
+
+    def insert_many(self, documents, ordered, session=None):
+        self.inserts.append((len(documents), session))
+
+
+class TransactionSession:
+
+    def __init__(self):
+        self.collection = RecordingCollection()
+        self.client = collections.defaultdict(
+            lambda: collections.defaultdict(lambda: self.collection)
+        )
+        self.committed = False
+
+    def start_transaction(self):
+        pass
+
+    def commit_transaction(self):
+        self.committed = True
+
+    def abort_transaction(self):
+        pass
+
+    def end_session(self):
+        pass
+
+
+def created_employee():
+    employee = model.Employee(
+        common_model.EmployeeID("employee-0"),
+        common_model.EmployeeName("Azure Diamond")
+    )
+    employee.confirm_employee_created()
+    return employee
+
+
+def test_outbox_entries_are_written_in_the_units_transaction():
+    session = TransactionSession()
+    uow = unit_of_work.MongoDBUnitOfWork(lambda: session, use_outbox=True)
+
+    with uow:
+        uow.employees.seen.add(created_employee())
+        uow.commit()
+
+    assert session.collection.inserts == [(1, session)]
+    assert session.committed
+
+
+class AsyncRecordingCollection(RecordingCollection):
+
+    async def insert_many(self, documents, ordered, session=None):
+        super().insert_many(documents, ordered, session)
+
+
+class AsyncTransactionSession(TransactionSession):
+
+    def __init__(self):
+        super().__init__()
+        self.collection = AsyncRecordingCollection()
+
+    async def commit_transaction(self):
+        super().commit_transaction()
+
+    async def abort_transaction(self):
+        pass
+
+    async def end_session(self):
+        pass
+
+
+def test_motor_outbox_entries_are_written_in_the_units_transaction():
+    session = AsyncTransactionSession()
+
+    async def session_factory():
+        return session
+    uow = async_unit_of_work.MotorUnitOfWork(session_factory, use_outbox=True)
+
+    async def create():
+        async with uow:
+            uow.employees.seen.add(created_employee())
+            await uow.commit()
+    asyncio.run(create())
+
+    assert session.collection.inserts == [(1, session)]
+    assert session.committed
+
+
+def test_relay_publishes_batches_in_order_with_message_ids():
+    fake_outbox = FakeOutbox(create_entries(5))
+    publisher = FakePublisher()
+    relay = outbox_relay.OutboxRelay(
+        fake_outbox, publisher=publisher, batch_size=3
+    )
+
+    assert relay.relay_batch() == 3
+    assert relay.relay_batch() == 2
+    assert relay.relay_batch() == 0
+    assert fake_outbox.published_ids == [0, 1, 2, 3, 4]
+    assert [message_id for _, message_id in publisher.published] \
+        == ["0", "1", "2", "3", "4"]
+    # a batch is sent in full before waiting for the broker
+    assert publisher.flushes == [3, 2]
+
+
+def test_relay_marks_only_the_entries_the_broker_acked():
+    entries = create_entries(4)
+    fake_outbox = FakeOutbox(entries)
+    relay = outbox_relay.OutboxRelay(
+        fake_outbox,
+        publisher=FakePublisher(
+            nacked_bodies={entries[1]["body"]},
+            unconfirmed_bodies={entries[3]["body"]}
+        )
+    )
+
+    with pytest.raises(rabbitmq_event_publisher.PublishNacked):
+        relay.relay_batch()
+
+    assert fake_outbox.published_ids == [0, 2]
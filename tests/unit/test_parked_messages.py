@@ -0,0 +1,73 @@
+from timecardsystem.timecardservice.entrypoints import parked_messages
+
+from .test_rabbitmq_event_consumer import Delivery, Properties
+
+
+class ParkingChannel:
+    # a parking queue read with basic.get
+
+    def __init__(self, messages):
+        self.queued = [
+            (Delivery(delivery_tag), properties, body)
+            for delivery_tag, (properties, body) in enumerate(messages, 1)
+        ]
+        self.gets = []
+        self.published = []
+        self.acks = []
+
+    def basic_get(self, queue, auto_ack):
+        self.gets.append(queue)
+        if not self.queued:
+            return None, None, None
+        return self.queued.pop(0)
+
+    def basic_publish(self, exchange, routing_key, body, properties,
+                      mandatory):
+        self.published.append((exchange, routing_key, body, properties))
+
+    def basic_ack(self, delivery_tag):
+        self.acks.append(delivery_tag)
+
+
+def parked(count):
+    return [
+        (
+            Properties(
+                "EmployeeCreated",
+                {"x-attempts": 5, "x-partition-key": f"employee-{number}"},
+                f"message-{number}"
+            ),
+            b'{"employee_id": "employee-%d"}' % number
+        )
+        for number in range(count)
+    ]
+
+
+def test_fetch_reads_up_to_limit_from_the_parking_queue():
+    channel = ParkingChannel(parked(3))
+
+    fetched = parked_messages.fetch(channel, "views", limit=2)
+
+    assert [message.delivery_tag for message in fetched] == [1, 2]
+    assert channel.gets == ["views.parked", "views.parked"]
+    assert "attempts=5" in parked_messages.describe(fetched[0])
+
+
+def test_replay_returns_chosen_messages_with_attempts_reset():
+    channel = ParkingChannel(parked(3))
+    fetched = parked_messages.fetch(channel, "views", limit=10)
+
+    replayed = parked_messages.replay(
+        channel, "views", fetched, {"message-0", "message-2"}
+    )
+
+    assert replayed == 2
+    assert [
+        (exchange, routing_key, properties.message_id, properties.headers)
+        for exchange, routing_key, _, properties in channel.published
+    ] == [
+        ("", "views", "message-0", {"x-partition-key": "employee-0"}),
+        ("", "views", "message-2", {"x-partition-key": "employee-2"}),
+    ]
+    # message 2 stays unacked, so it returns to the parking queue
+    assert channel.acks == [1, 3]
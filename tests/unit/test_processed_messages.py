@@ -0,0 +1,53 @@
+from timecardsystem.timecardservice.adapters import mongodb_view
+from timecardsystem.timecardservice.adapters.processed_messages import \
+    ProcessedMessages
+
+
+def test_least_recently_seen_ids_are_forgotten_first():
+    processed_messages = ProcessedMessages(max_size=2, persistent=False)
+    processed_messages.record(["message-0", "message-1"])
+
+    assert "message-0" in processed_messages
+    processed_messages.record(["message-2"])
+
+    assert "message-0" in processed_messages
+    assert "message-1" not in processed_messages
+    assert len(processed_messages) == 2
+
+
+def test_only_ids_missing_from_memory_are_looked_up(monkeypatch):
+    lookups = []
+
+    def processed_message_ids(message_ids):
+        message_ids = list(message_ids)
+        lookups.append(message_ids)
+        return {"message-2"} & set(message_ids)
+    monkeypatch.setattr(
+        mongodb_view, "processed_message_ids", processed_message_ids
+    )
+    monkeypatch.setattr(
+        mongodb_view, "record_processed_messages", lambda message_ids: None
+    )
+    processed_messages = ProcessedMessages()
+    processed_messages.record(["message-0"])
+
+    found = processed_messages.processed(
+        ["message-0", "message-1", "message-2"]
+    )
+
+    assert found == {"message-0", "message-2"}
+    assert lookups == [["message-1", "message-2"]]
+    # what the store knew is remembered for the next redelivery
+    assert "message-2" in processed_messages
+
+
+def test_recorded_ids_are_written_to_the_store(monkeypatch):
+    recorded = []
+    monkeypatch.setattr(
+        mongodb_view, "record_processed_messages",
+        lambda message_ids: recorded.extend(message_ids)
+    )
+
+    ProcessedMessages().record(iter(["message-0", "message-1"]))
+
+    assert recorded == ["message-0", "message-1"]
@@ -0,0 +1,686 @@
+import json
+import threading
+import time
+
+import pytest
+from timecardsystem.timecardservice import config, metrics
+from timecardsystem.timecardservice.adapters import (mongodb_view,
+                                                     rabbitmq_event_publisher)
+from timecardsystem.timecardservice.adapters.processed_messages import \
+    ProcessedMessages
+from timecardsystem.timecardservice.entrypoints import rabbitmq_event_consumer
+
+
+class FakeAsyncChannel:
+    # answers every declaration at once, as the broker would
+
+    def __init__(self):
+        self.calls = []
+
+    def exchange_declare(self, callback, **arguments):
+        self.calls.append(("exchange_declare", arguments["exchange"]))
+        callback(None)
+
+    def queue_declare(self, callback, **arguments):
+        self.calls.append(("queue_declare", arguments["queue"]))
+        callback(None)
+
+    def queue_bind(self, callback, **arguments):
+        self.calls.append(
+            ("queue_bind", arguments["queue"], arguments["routing_key"])
+        )
+        callback(None)
+
+    def basic_qos(self, prefetch_count, callback):
+        self.calls.append(("basic_qos", prefetch_count))
+        callback(None)
+
+    def basic_consume(self, queue, on_message_callback):
+        self.calls.append(("basic_consume", queue))
+
+
+def test_payroll_consumer_binds_only_submitted_timecards():
+    consumer = rabbitmq_event_consumer.payroll_consumer(list)
+    channel = FakeAsyncChannel()
+
+    consumer.on_channel_open(channel)
+
+    assert channel.calls == [
+        ("exchange_declare", rabbitmq_event_publisher.EXCHANGE_NAME),
+        ("queue_declare", "payroll"),
+        ("queue_bind", "payroll", "timecard.submitted"),
+        ("basic_qos", 100),
+        ("basic_consume", "payroll"),
+    ]
+
+
+def test_default_consumer_receives_every_event():
+    consumer = rabbitmq_event_consumer.Consumer()
+
+    assert consumer.queue_name == "test"
+    assert consumer.binding_keys == ("#",)
+
+
+def test_bindings_are_read_from_the_environment(monkeypatch):
+    monkeypatch.setenv(
+        "RABBIT_MQ_BINDINGS",
+        "test=#;payroll=timecard.submitted;audit=employee.*,timecard.*"
+    )
+
+    assert config.get_rabbitmq_bindings() == {
+        "test": ("#",),
+        "payroll": ("timecard.submitted",),
+        "audit": ("employee.*", "timecard.*"),
+    }
+
+
+class FakeDelivery:
+    delivery_tag = 7
+
+
+class FakeProperties:
+    content_type = "TimecardCreated"
+
+
+class RecordingChannel:
+    is_open = True
+
+    def __init__(self):
+        self.acks = []
+        self.nacks = []
+        self.published = []
+
+    def basic_ack(self, delivery_tag, multiple=False):
+        if multiple:
+            delivery_tag = (delivery_tag, True)
+        self.acks.append(delivery_tag)
+
+    def basic_nack(self, delivery_tag, requeue=True):
+        self.nacks.append((delivery_tag, requeue))
+
+    def basic_publish(self, exchange, routing_key, body, properties):
+        self.published.append((exchange, routing_key, body, properties))
+
+
+def test_undecodable_message_is_rejected_without_requeueing():
+    consumer = rabbitmq_event_consumer.Consumer()
+    consumer.channel = RecordingChannel()
+
+    def fail(*args):
+        raise KeyError("week_ending_date")
+    consumer.set_on_message_callback(fail)
+
+    consumer.handle_delivery(
+        consumer.channel, FakeDelivery(), FakeProperties(), b"[]"
+    )
+
+    assert consumer.channel.nacks == [(7, False)]
+
+
+def test_unknown_event_type_is_rejected_without_requeueing():
+    consumer = rabbitmq_event_consumer.Consumer(failure_policy="requeue")
+    consumer.channel = RecordingChannel()
+    received = []
+    consumer.set_on_message_callback(
+        lambda *args: received.append(args) or False
+    )
+    properties = FakeProperties()
+    properties.content_type = "TimecardArchived"
+
+    consumer.handle_delivery(
+        consumer.channel, FakeDelivery(), properties, b"{}"
+    )
+
+    assert received == []
+    assert consumer.channel.nacks == [(7, False)]
+
+
+def test_message_the_callback_failed_follows_the_failure_policy():
+    consumer = rabbitmq_event_consumer.Consumer(failure_policy="requeue")
+    consumer.channel = RecordingChannel()
+    consumer.set_on_message_callback(lambda *args: False)
+
+    consumer.handle_delivery(
+        consumer.channel, FakeDelivery(), FakeProperties(), b"{}"
+    )
+
+    assert consumer.channel.nacks == [(7, True)]
+
+
+def test_prefetch_is_set_before_consuming(monkeypatch):
+    monkeypatch.setenv("RABBIT_MQ_CONSUMER_PREFETCH", "500")
+    consumer = rabbitmq_event_consumer.Consumer()
+    channel = FakeAsyncChannel()
+
+    consumer.on_channel_open(channel)
+
+    assert channel.calls[-2:] == [
+        ("basic_qos", 500),
+        ("basic_consume", "test"),
+    ]
+
+
+def test_ack_batch_larger_than_prefetch_is_refused():
+    with pytest.raises(ValueError):
+        rabbitmq_event_consumer.Consumer(prefetch_count=10, ack_batch_size=20)
+
+
+class FakeIOLoop:
+
+    def __init__(self):
+        self.timers = []
+
+    def add_callback_threadsafe(self, callback):
+        callback()
+
+    def call_later(self, delay, callback):
+        self.timers.append(callback)
+        return callback
+
+    def remove_timeout(self, timer):
+        self.timers.remove(timer)
+
+    def fire_timers(self):
+        timers, self.timers = self.timers, []
+        for callback in timers:
+            callback()
+
+
+class FakeConnection:
+
+    def __init__(self):
+        self.ioloop = FakeIOLoop()
+
+
+def batching_consumer(ack_batch_size=3, failure_policy="requeue"):
+    consumer = rabbitmq_event_consumer.Consumer(
+        prefetch_count=10,
+        ack_batch_size=ack_batch_size,
+        failure_policy=failure_policy
+    )
+    consumer.channel = RecordingChannel()
+    consumer.connection = FakeConnection()
+    return consumer
+
+
+def test_acks_are_sent_together_once_the_batch_is_full():
+    consumer = batching_consumer()
+
+    for delivery_tag in range(1, 8):
+        consumer.ack_message(delivery_tag)
+
+    assert consumer.channel.acks == [(3, True), (6, True)]
+
+
+def test_waiting_acks_are_sent_when_the_interval_expires():
+    consumer = batching_consumer()
+
+    consumer.ack_message(1)
+    consumer.ack_message(2)
+    consumer.connection.ioloop.fire_timers()
+
+    assert consumer.channel.acks == [(2, True)]
+    assert consumer.connection.ioloop.timers == []
+
+
+def test_nack_sends_waiting_acks_first():
+    consumer = batching_consumer(failure_policy="dead-letter")
+
+    consumer.ack_message(1)
+    consumer.ack_message(2)
+    consumer.reject_failed_message(3, FakeProperties(), b"{}")
+    consumer.ack_message(4)
+
+    assert consumer.channel.acks == [(2, True)]
+    assert consumer.channel.nacks == [(3, False)]
+    assert len(consumer.connection.ioloop.timers) == 1
+
+
+def test_unknown_failure_policy_is_refused():
+    with pytest.raises(ValueError):
+        rabbitmq_event_consumer.Consumer(failure_policy="drop")
+
+
+class Delivery:
+
+    def __init__(self, delivery_tag):
+        self.delivery_tag = delivery_tag
+
+
+class Properties:
+
+    def __init__(self, content_type, headers=None, message_id=None):
+        self.content_type = content_type
+        self.content_encoding = None
+        self.headers = headers
+        self.message_id = message_id
+
+
+def employee_created_body(number: int) -> bytes:
+    return json.dumps({
+        "employee_id": f"employee-{number}",
+        "name": "Azure Diamond",
+    }).encode("utf-8")
+
+
+def streaming_consumer(handler, prefetch_count=10, start_worker=True,
+                       ack_batch_size=1, **kwargs):
+    consumer = rabbitmq_event_consumer.StreamingConsumer(
+        handler, prefetch_count=prefetch_count,
+        ack_batch_size=ack_batch_size, **kwargs
+    )
+    consumer.channel = RecordingChannel()
+    consumer.connection = FakeConnection()
+    if start_worker:
+        consumer._start_worker()
+    return consumer
+
+
+def stop_worker(consumer):
+    consumer._queue.put(rabbitmq_event_consumer._STOP)
+    consumer._worker.join(5)
+
+
+def test_streaming_consumer_acks_messages_once_handled_in_order():
+    handled = []
+    consumer = streaming_consumer(handled.extend)
+
+    for number in range(5):
+        consumer.handle_delivery(
+            consumer.channel,
+            Delivery(number),
+            Properties("EmployeeCreated"),
+            employee_created_body(number)
+        )
+    stop_worker(consumer)
+
+    assert [event.employee_id.value for event in handled] == [
+        f"employee-{number}" for number in range(5)
+    ]
+    assert consumer.channel.acks == [0, 1, 2, 3, 4]
+    assert consumer.message_dto.deserialized_messages == []
+
+
+def test_streaming_consumer_holds_back_acks_while_handler_is_busy():
+    release = threading.Event()
+    handled = []
+
+    def handler(received):
+        release.wait(5)
+        handled.extend(received)
+    consumer = streaming_consumer(handler, prefetch_count=3)
+
+    # the broker sends no more than prefetch_count unacked messages
+    for number in range(3):
+        consumer.handle_delivery(
+            consumer.channel,
+            Delivery(number),
+            Properties("EmployeeCreated"),
+            employee_created_body(number)
+        )
+
+    assert consumer.channel.acks == []
+    release.set()
+    stop_worker(consumer)
+    assert consumer.channel.acks == [0, 1, 2]
+
+
+def test_streaming_consumer_requeues_message_whose_handler_failed():
+    def handler(received):
+        raise RuntimeError("database unavailable")
+    consumer = streaming_consumer(handler)
+
+    consumer.handle_delivery(
+        consumer.channel,
+        Delivery(3),
+        Properties("EmployeeCreated"),
+        employee_created_body(0)
+    )
+    consumer.handle_delivery(
+        consumer.channel,
+        Delivery(4),
+        Properties("EmployeeCreated"),
+        b"{"
+    )
+    stop_worker(consumer)
+
+    assert consumer.channel.acks == []
+    assert sorted(consumer.channel.nacks) == [(3, True), (4, False)]
+
+
+def test_message_of_an_unknown_event_type_is_not_requeued():
+    handled = []
+    consumer = streaming_consumer(handled.extend)
+
+    consumer.handle_delivery(
+        consumer.channel,
+        Delivery(5),
+        Properties("EmployeePromoted"),
+        employee_created_body(0)
+    )
+    stop_worker(consumer)
+
+    assert handled == []
+    assert consumer.channel.nacks == [(5, False)]
+
+
+def test_streaming_consumer_hands_on_each_event_of_an_envelope():
+    handled = []
+    consumer = streaming_consumer(handled.extend)
+    body = json.dumps([
+        json.loads(employee_created_body(number)) for number in range(3)
+    ]).encode("utf-8")
+
+    consumer.handle_delivery(
+        consumer.channel,
+        Delivery(1),
+        Properties("EmployeeCreated", {"x-event-count": 3}),
+        body
+    )
+    stop_worker(consumer)
+
+    assert [event.employee_id.value for event in handled] == [
+        "employee-0", "employee-1", "employee-2"
+    ]
+    assert consumer.channel.acks == [1]
+
+
+def deliver_employees(consumer, numbers, headers=None):
+    for number in numbers:
+        consumer.handle_delivery(
+            consumer.channel,
+            Delivery(number),
+            Properties("EmployeeCreated", headers),
+            employee_created_body(number)
+        )
+
+
+def test_streaming_consumer_hands_waiting_messages_over_in_one_batch():
+    batches = []
+    consumer = streaming_consumer(
+        batches.append, start_worker=False, max_batch_size=3
+    )
+
+    deliver_employees(consumer, range(5))
+    consumer._start_worker()
+    stop_worker(consumer)
+
+    assert [
+        [event.employee_id.value for event in batch] for batch in batches
+    ] == [
+        ["employee-0", "employee-1", "employee-2"],
+        ["employee-3", "employee-4"],
+    ]
+    assert consumer.channel.acks == [0, 1, 2, 3, 4]
+
+
+def test_failed_batch_is_retried_one_message_at_a_time():
+    batches = []
+
+    def handler(received):
+        batches.append(len(received))
+        if any(event.employee_id.value == "employee-2" for event in received):
+            raise RuntimeError("bad employee")
+    consumer = streaming_consumer(
+        handler, start_worker=False, max_batch_size=4
+    )
+
+    deliver_employees(consumer, range(4))
+    consumer._start_worker()
+    stop_worker(consumer)
+
+    assert batches == [4, 1, 1, 1, 1]
+    assert consumer.channel.acks == [0, 1, 3]
+    assert consumer.channel.nacks == [(2, True)]
+
+
+def test_streaming_consumer_reports_lag_by_event_type():
+    def lag(sample):
+        return metrics.sample_value(
+            f"timecardservice_consumer_event_lag_seconds_{sample}",
+            {"event": "EmployeeCreated"}
+        )
+
+    observed = lag("count")
+    consumer = streaming_consumer(lambda received: None)
+
+    deliver_employees(
+        consumer, range(2),
+        {"x-serialized-at": int(time.time() * 1000) - 2000}
+    )
+    stop_worker(consumer)
+
+    assert lag("count") == observed + 2
+    assert lag("sum") >= 4
+
+
+def test_batch_larger_than_prefetch_is_refused():
+    with pytest.raises(ValueError):
+        rabbitmq_event_consumer.StreamingConsumer(
+            print, prefetch_count=10, max_batch_size=20
+        )
+
+
+def deliver_message(consumer, delivery_tag, message_id, body=None):
+    consumer.handle_delivery(
+        consumer.channel,
+        Delivery(delivery_tag),
+        Properties("EmployeeCreated", message_id=message_id),
+        employee_created_body(delivery_tag) if body is None else body
+    )
+
+
+def test_remembered_redelivery_is_acked_without_being_decoded():
+    handled = []
+    consumer = streaming_consumer(
+        handled.extend,
+        processed_messages=ProcessedMessages(persistent=False)
+    )
+
+    deliver_message(consumer, 0, "message-0")
+    stop_worker(consumer)
+    consumer._worker = None
+    consumer._start_worker()
+    # a body that does not decode shows it is never looked at
+    deliver_message(consumer, 1, "message-0", body=b"{")
+    stop_worker(consumer)
+
+    assert len(handled) == 1
+    assert consumer.channel.acks == [0, 1]
+    assert consumer.channel.nacks == []
+
+
+def test_duplicates_found_in_the_store_are_acked_in_order(monkeypatch):
+    recorded = []
+    monkeypatch.setattr(
+        mongodb_view, "processed_message_ids",
+        lambda message_ids: {"message-1"} & set(message_ids)
+    )
+    monkeypatch.setattr(
+        mongodb_view, "record_processed_messages",
+        lambda message_ids: recorded.extend(message_ids)
+    )
+    batches = []
+    consumer = streaming_consumer(
+        batches.append,
+        start_worker=False,
+        max_batch_size=4,
+        processed_messages=ProcessedMessages()
+    )
+
+    for delivery_tag, message_id in enumerate(
+        ["message-0", "message-1", "message-2", "message-0"]
+    ):
+        deliver_message(consumer, delivery_tag, message_id)
+    consumer._start_worker()
+    stop_worker(consumer)
+
+    assert [
+        [event.employee_id.value for event in batch] for batch in batches
+    ] == [["employee-0", "employee-2"]]
+    assert consumer.channel.acks == [0, 1, 2, 3]
+    assert recorded == ["message-0", "message-2"]
+
+
+def test_batch_is_handled_when_the_store_is_unreachable(monkeypatch):
+    def unreachable(message_ids):
+        raise OSError("connection refused")
+    monkeypatch.setattr(mongodb_view, "processed_message_ids", unreachable)
+    monkeypatch.setattr(
+        mongodb_view, "record_processed_messages", unreachable
+    )
+    handled = []
+    consumer = streaming_consumer(
+        handled.extend, processed_messages=ProcessedMessages()
+    )
+
+    deliver_message(consumer, 0, "message-0")
+    stop_worker(consumer)
+
+    assert len(handled) == 1
+    assert consumer.channel.acks == [0]
+
+
+def test_dead_lettering_declares_a_dead_letter_queue_per_queue(monkeypatch):
+    monkeypatch.setattr(rabbitmq_event_publisher, "DEAD_LETTERING", True)
+
+    declarations = rabbitmq_event_publisher.topology_declarations(
+        {"payroll": ("timecard.submitted",)}
+    )
+
+    dead_letter_exchange = rabbitmq_event_publisher.DEAD_LETTER_EXCHANGE_NAME
+    assert [
+        (method, arguments.get("exchange"), arguments.get("queue"))
+        for method, arguments in declarations
+    ] == [
+        ("exchange_declare", rabbitmq_event_publisher.EXCHANGE_NAME, None),
+        ("exchange_declare", dead_letter_exchange, None),
+        ("queue_declare", None, "payroll.dead-letter"),
+        ("queue_bind", dead_letter_exchange, "payroll.dead-letter"),
+        ("queue_declare", None, "payroll"),
+        ("queue_bind", rabbitmq_event_publisher.EXCHANGE_NAME, "payroll"),
+    ]
+    assert declarations[4][1]["arguments"] == {
+        "x-dead-letter-exchange": dead_letter_exchange,
+        "x-dead-letter-routing-key": "payroll",
+    }
+
+
+def test_retry_delays_double_up_to_the_last_attempt(monkeypatch):
+    monkeypatch.setattr(rabbitmq_event_publisher, "RETRY_DELAY", 1.5)
+
+    assert rabbitmq_event_publisher.retry_delays(4) == (1.5, 3.0, 6.0)
+    assert rabbitmq_event_publisher.retry_delays(1) == ()
+
+
+def test_failed_message_is_retried_later_then_parked(monkeypatch):
+    monkeypatch.setattr(rabbitmq_event_publisher, "RETRY_DELAY", 2.0)
+
+    def handler(received):
+        raise RuntimeError("database unavailable")
+    consumer = streaming_consumer(
+        handler, failure_policy="retry", max_attempts=3
+    )
+
+    for attempts in (None, 1, 2):
+        headers = {"x-partition-key": "employee-0"}
+        if attempts:
+            headers["x-attempts"] = attempts
+        consumer.handle_delivery(
+            consumer.channel,
+            Delivery(attempts or 0),
+            Properties("EmployeeCreated", headers, "message-0"),
+            employee_created_body(0)
+        )
+    stop_worker(consumer)
+
+    assert [
+        (exchange, routing_key, properties.headers["x-attempts"])
+        for exchange, routing_key, _, properties in consumer.channel.published
+    ] == [
+        ("", "test.retry.2000ms", 1),
+        ("", "test.retry.4000ms", 2),
+        ("", "test.parked", 3),
+    ]
+    _, _, body, properties = consumer.channel.published[0]
+    assert body == employee_created_body(0)
+    assert properties.message_id == "message-0"
+    assert properties.headers["x-partition-key"] == "employee-0"
+    assert consumer.channel.acks == [0, 1, 2]
+    assert consumer.channel.nacks == []
+
+
+def test_undecodable_message_is_parked_by_the_retry_policy():
+    handled = []
+    consumer = streaming_consumer(handled.extend, failure_policy="retry")
+
+    consumer.handle_delivery(
+        consumer.channel, Delivery(1), Properties("EmployeeCreated"), b"{"
+    )
+    stop_worker(consumer)
+
+    assert handled == []
+    assert [
+        routing_key for _, routing_key, _, _ in consumer.channel.published
+    ] == ["test.parked"]
+    assert consumer.channel.acks == [1]
+
+
+def test_undecodable_message_is_parked_after_earlier_messages_are_handled():
+    handled = []
+    consumer = streaming_consumer(
+        handled.extend, start_worker=False, ack_batch_size=3,
+        failure_policy="retry"
+    )
+
+    deliver_employees(consumer, [1])
+    consumer.handle_delivery(
+        consumer.channel, Delivery(2), Properties("EmployeeCreated"), b"{"
+    )
+    consumer.connection.ioloop.fire_timers()
+
+    # an ack sent now would cover message 1 before it has been handled
+    assert consumer.channel.acks == []
+    assert consumer.channel.published == []
+    consumer._start_worker()
+    stop_worker(consumer)
+    consumer.connection.ioloop.fire_timers()
+    assert len(handled) == 1
+    assert consumer.channel.acks == [(2, True)]
+    assert [
+        routing_key for _, routing_key, _, _ in consumer.channel.published
+    ] == ["test.parked"]
+
+
+def test_retry_policy_declares_retry_and_parking_queues(monkeypatch):
+    monkeypatch.setattr(rabbitmq_event_publisher, "RETRY_DELAY", 5.0)
+    consumer = rabbitmq_event_consumer.Consumer(
+        "payroll", ("timecard.submitted",),
+        failure_policy="retry", max_attempts=3
+    )
+    channel = FakeAsyncChannel()
+
+    consumer.on_channel_open(channel)
+
+    assert channel.calls[3:6] == [
+        ("queue_declare", "payroll.parked"),
+        ("queue_declare", "payroll.retry.5000ms"),
+        ("queue_declare", "payroll.retry.10000ms"),
+    ]
+    declarations = rabbitmq_event_publisher.topology_declarations(
+        {"payroll": ("timecard.submitted",)}, consumer.retry_delays
+    )
+    assert declarations[4][1]["arguments"] == {
+        "x-message-ttl": 5000,
+        "x-dead-letter-exchange": "",
+        "x-dead-letter-routing-key": "payroll",
+    }
+
+
+def test_partitioned_queue_retries_through_its_hash_exchange(monkeypatch):
+    monkeypatch.setattr(rabbitmq_event_publisher, "PARTITIONS", 2)
+
+    assert rabbitmq_event_publisher.return_destination("payroll") == (
+        rabbitmq_event_publisher.partition_exchange_name("payroll"),
+        "payroll",
+    )
@@ -0,0 +1,354 @@
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import pika
+import pytest
+from timecardsystem.timecardservice.adapters import rabbitmq_event_publisher
+from timecardsystem.timecardservice.domain import events
+
+
+class FakeChannel:
+
+    def __init__(self, connection):
+        self.connection = connection
+        self.is_open = True
+        self.in_use = False
+        self.declared_queues = []
+        self.declared_exchanges = []
+        self.bindings = []
+        self.confirming = False
+
+    def confirm_delivery(self):
+        self.confirming = True
+
+    def exchange_declare(self, exchange, exchange_type, **kwargs):
+        self.declared_exchanges.append((exchange, exchange_type))
+
+    def queue_declare(self, queue, **kwargs):
+        self.declared_queues.append(queue)
+
+    def queue_bind(self, queue, exchange, routing_key):
+        self.bindings.append((queue, routing_key))
+
+    def basic_publish(self, exchange, routing_key, body, properties):
+        if self.connection.fail_next_publish:
+            self.connection.fail_next_publish = False
+            self.connection.is_open = False
+            raise pika.exceptions.StreamLostError("connection lost")
+        if body in self.connection.broker.nacked_bodies:
+            raise pika.exceptions.NackError([body])
+        # a channel must never be used by two threads at once
+        assert not self.in_use
+        self.in_use = True
+        self.connection.broker.published.append(body)
+        self.connection.broker.message_ids.append(properties.message_id)
+        self.connection.broker.routing_keys.append((exchange, routing_key))
+        self.in_use = False
+
+
+class FakeConnection:
+
+    def __init__(self, broker):
+        self.broker = broker
+        self.is_open = True
+        self.fail_next_publish = False
+        self.channels = []
+
+    def channel(self):
+        channel = FakeChannel(self)
+        self.channels.append(channel)
+        return channel
+
+    def process_data_events(self, time_limit):
+        pass
+
+    def close(self):
+        self.is_open = False
+
+
+class FakeBroker:
+
+    def __init__(self):
+        self.connections = []
+        self.published = []
+        self.message_ids = []
+        self.routing_keys = []
+        self.nacked_bodies = set()
+        self._lock = threading.Lock()
+
+    def connect(self):
+        with self._lock:
+            connection = FakeConnection(self)
+            self.connections.append(connection)
+            return connection
+
+
+def employee_created(number: int) -> events.EmployeeCreated:
+    return events.EmployeeCreated(f"employee-{number}", "Azure Diamond")
+
+
+def test_connection_is_reused_and_topology_declared_once():
+    broker = FakeBroker()
+    publisher = rabbitmq_event_publisher.RabbitMQEventPublisher(
+        broker.connect
+    )
+
+    for number in range(3):
+        publisher.publish_event("employee_created", employee_created(number))
+
+    assert len(broker.connections) == 1
+    [channel] = broker.connections[0].channels
+    assert channel.declared_exchanges == [
+        (rabbitmq_event_publisher.EXCHANGE_NAME, "topic")
+    ]
+    assert channel.declared_queues == [rabbitmq_event_publisher.QUEUE_NAME]
+    assert channel.bindings == [(rabbitmq_event_publisher.QUEUE_NAME, "#")]
+    assert len(broker.published) == 3
+
+
+def test_every_message_is_stamped_with_its_own_id():
+    broker = FakeBroker()
+    publisher = rabbitmq_event_publisher.RabbitMQEventPublisher(
+        broker.connect
+    )
+
+    for number in range(3):
+        publisher.publish_event("employee_created", employee_created(number))
+    publisher.publish_events([employee_created(3), employee_created(4)])
+
+    assert len(set(broker.message_ids)) == 4
+    assert None not in broker.message_ids
+
+
+def test_events_are_routed_by_event_type():
+    broker = FakeBroker()
+    publisher = rabbitmq_event_publisher.RabbitMQEventPublisher(
+        broker.connect
+    )
+
+    publisher.publish_event("employee_created", employee_created(0))
+    publisher.publish_event(
+        "timecard_submitted",
+        events.TimecardSubmittedForProcessing("timecard-0", "employee-0")
+    )
+
+    exchange = rabbitmq_event_publisher.EXCHANGE_NAME
+    assert broker.routing_keys == [
+        (exchange, "employee.created"),
+        (exchange, "timecard.submitted"),
+    ]
+
+
+def test_publish_reconnects_after_connection_loss():
+    broker = FakeBroker()
+    publisher = rabbitmq_event_publisher.RabbitMQEventPublisher(
+        broker.connect
+    )
+    publisher.publish_event("employee_created", employee_created(0))
+    broker.connections[0].fail_next_publish = True
+
+    publisher.publish_event("employee_created", employee_created(1))
+
+    assert len(broker.connections) == 2
+    assert not broker.connections[0].is_open
+    assert len(broker.published) == 2
+
+
+def test_concurrent_publishes_are_bounded_by_max_connections():
+    broker = FakeBroker()
+    publisher = rabbitmq_event_publisher.RabbitMQEventPublisher(
+        broker.connect, max_connections=4
+    )
+
+    with ThreadPoolExecutor(max_workers=16) as executor:
+        list(executor.map(
+            lambda number: publisher.publish_event(
+                "employee_created", employee_created(number)
+            ),
+            range(200)
+        ))
+
+    assert len(broker.published) == 200
+    assert len(broker.connections) <= 4
+
+
+def test_closed_publisher_refuses_to_publish():
+    broker = FakeBroker()
+    publisher = rabbitmq_event_publisher.RabbitMQEventPublisher(
+        broker.connect
+    )
+    publisher.publish_event("employee_created", employee_created(0))
+
+    publisher.close()
+
+    assert not broker.connections[0].is_open
+    with pytest.raises(pika.exceptions.ConnectionWrongStateError):
+        publisher.publish_event("employee_created", employee_created(1))
+
+
+def test_confirm_tracker_resolves_multiple_acks_up_to_the_tag():
+    tracker = rabbitmq_event_publisher.ConfirmTracker()
+    futures = [Future() for _ in range(4)]
+    for future in futures:
+        tracker.track(future)
+
+    tracker.resolve(3, multiple=True, acked=True)
+
+    assert [future.done() for future in futures] == [True, True, True, False]
+    assert all(future.result() for future in futures[:3])
+    assert len(tracker) == 1
+
+
+def test_confirm_tracker_reports_nacks_per_message():
+    tracker = rabbitmq_event_publisher.ConfirmTracker()
+    accepted, rejected = Future(), Future()
+    tracker.track(accepted)
+    tracker.track(rejected)
+
+    tracker.resolve(2, multiple=False, acked=False)
+    tracker.resolve(1, multiple=False, acked=True)
+
+    assert accepted.result() is True
+    with pytest.raises(rabbitmq_event_publisher.PublishNacked):
+        rejected.result()
+
+
+def test_confirm_tracker_reset_fails_unconfirmed_and_restarts_tags():
+    tracker = rabbitmq_event_publisher.ConfirmTracker()
+    lost = Future()
+    tracker.track(lost)
+
+    tracker.reset(rabbitmq_event_publisher.PublishFailed("connection lost"))
+
+    with pytest.raises(rabbitmq_event_publisher.PublishFailed):
+        lost.result()
+    assert tracker.track(Future()) == 1
+
+
+class FakeConfirmChannel:
+    is_open = True
+
+    def __init__(self):
+        self.published = []
+
+    def basic_publish(self, exchange, routing_key, body, properties):
+        self.published.append(body)
+
+
+class FakeFrame:
+
+    def __init__(self, method):
+        self.method = method
+
+
+def buffered_publisher(**kwargs):
+    # drives the I/O side by hand instead of from a broker connection
+    publisher = rabbitmq_event_publisher.BufferedEventPublisher(**kwargs)
+    publisher._thread = threading.current_thread()
+    publisher._channel = FakeConfirmChannel()
+    return publisher
+
+
+def test_buffered_publisher_sends_on_flush_and_reports_confirms():
+    publisher = buffered_publisher(max_batch_size=100)
+    futures = [
+        publisher.publish_event("employee_created", employee_created(number))
+        for number in range(3)
+    ]
+    assert publisher._channel.published == []
+
+    publisher._flush()
+    publisher._on_delivery_confirmation(
+        FakeFrame(pika.spec.Basic.Ack(delivery_tag=2, multiple=True))
+    )
+    publisher._on_delivery_confirmation(
+        FakeFrame(pika.spec.Basic.Nack(delivery_tag=3))
+    )
+
+    assert len(publisher._channel.published) == 3
+    assert futures[0].result() and futures[1].result()
+    with pytest.raises(rabbitmq_event_publisher.PublishNacked):
+        futures[2].result()
+    assert publisher.flush(timeout=0)
+
+
+def test_buffered_publish_fails_when_no_room_frees_up_in_time():
+    publisher = buffered_publisher(max_in_flight=1, in_flight_timeout=0.01)
+    sent = publisher.publish_event("employee_created", employee_created(0))
+
+    refused = publisher.publish_event(
+        "employee_created", employee_created(1)
+    )
+
+    with pytest.raises(rabbitmq_event_publisher.PublishFailed):
+        refused.result(timeout=0)
+    publisher._flush()
+    publisher._on_delivery_confirmation(
+        FakeFrame(pika.spec.Basic.Ack(delivery_tag=1))
+    )
+    assert sent.result() is True
+    assert publisher.publish_event(
+        "employee_created", employee_created(2)
+    ).done() is False
+
+
+def test_buffered_publisher_keeps_unsent_messages_across_reconnects():
+    publisher = buffered_publisher()
+    sent = publisher.publish_event("employee_created", employee_created(0))
+    publisher._flush()
+    unsent = publisher.publish_event("employee_created", employee_created(1))
+
+    publisher._tracker.reset(
+        rabbitmq_event_publisher.PublishFailed("connection lost")
+    )
+    publisher._channel = FakeConfirmChannel()
+    publisher._flush()
+    publisher._on_delivery_confirmation(
+        FakeFrame(pika.spec.Basic.Ack(delivery_tag=1))
+    )
+
+    with pytest.raises(rabbitmq_event_publisher.PublishFailed):
+        sent.result()
+    assert unsent.result() is True
+
+
+def test_buffered_publisher_logs_messages_the_broker_nacked(caplog):
+    publisher = buffered_publisher()
+    nacked = publisher.publish_event("employee_created", employee_created(0))
+
+    publisher._flush()
+    publisher._on_delivery_confirmation(
+        FakeFrame(pika.spec.Basic.Nack(delivery_tag=1))
+    )
+
+    assert nacked.exception() is not None
+    [record] = caplog.records
+    assert record.levelname == "ERROR"
+    assert "EmployeeCreated" in record.getMessage()
+
+
+def test_batching_collects_the_confirms_of_its_events(monkeypatch):
+    publisher = buffered_publisher()
+    monkeypatch.setattr(
+        rabbitmq_event_publisher, "get_publisher", lambda: publisher
+    )
+    monkeypatch.setenv("EVENT_ENVELOPE_MAX_EVENTS", "2")
+    batched = [employee_created(number) for number in range(3)]
+
+    with rabbitmq_event_publisher.batching() as confirms:
+        for event in batched:
+            rabbitmq_event_publisher.publish_event("employee_created", event)
+        assert confirms == []
+    publisher._flush()
+    publisher._on_delivery_confirmation(
+        FakeFrame(pika.spec.Basic.Nack(delivery_tag=1))
+    )
+
+    assert [event for event, _ in confirms] == batched
+    failed = rabbitmq_event_publisher.failed_confirms(confirms, timeout=0)
+    assert [event for event, _ in failed] == batched
+    assert [type(error) for _, error in failed] == [
+        rabbitmq_event_publisher.PublishNacked,
+        rabbitmq_event_publisher.PublishNacked,
+        rabbitmq_event_publisher.PublishFailed
+    ]
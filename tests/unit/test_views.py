@@ -0,0 +1,34 @@
+from datetime import datetime
+
+import pytest
+from timecardsystem.timecardservice import views
+
+
+def test_cursor_round_trips_keyset():
+    doc = {
+        "week_ending_date": datetime.fromisoformat("2022-08-12"),
+        "timecard_id": "c5def653-5315-4a4d-b9dc-78beae7e3013"
+    }
+    cursor = views.encode_cursor(doc)
+    assert views.decode_cursor(cursor) == \
+        (doc["week_ending_date"], doc["timecard_id"])
+
+
+def test_decode_invalid_cursor_raises_error():
+    with pytest.raises(views.InvalidCursor):
+        views.decode_cursor("not-a-cursor")
+
+
+def test_projection_always_includes_keyset_fields():
+    projection = views._projection(["dates_and_hours"])
+    assert projection == {
+        "_id": 0,
+        "dates_and_hours": 1,
+        "week_ending_date": 1,
+        "timecard_id": 1
+    }
+
+
+def test_projection_rejects_unknown_fields():
+    with pytest.raises(views.InvalidField, match="Unknown fields: salary"):
+        views._projection(["timecard_id", "salary"])